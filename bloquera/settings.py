@@ -46,13 +46,16 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.MetricasPeticionMiddleware', # Consultas SQL y tiempos por petición
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.EstaticosMiddleware', # STATIC_ROOT precomprimido (si ESTATICOS_SERVIR=True)
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.middleware.PerfiladorMiddleware', # Solo si PERFILADOR_ACTIVO=True
 ]
 
 ROOT_URLCONF = 'bloquera.urls'
@@ -77,17 +80,76 @@ WSGI_APPLICATION = 'bloquera.wsgi.application'
 
 
 # --- Configuración de Base de Datos ---
-# Lee OBLIGATORIAMENTE la configuración de la BD desde el entorno.
-# Usamos .get() con valores 'dummy' para que el 'collectstatic'
-# (que se ejecuta durante el 'build') no falle, ya que necesita
-# leer este archivo de settings para funcionar.
+# Se lee desde el entorno. DB_ENGINE=sqlite (por defecto) usa db.sqlite3;
+# DB_ENGINE=postgresql usa DB_NAME, DB_USER, DB_PASSWORD, DB_HOST y DB_PORT.
+#
+# PostgreSQL:
+# - Conexiones persistentes: cada proceso reutiliza su conexión durante
+#   DB_CONN_MAX_AGE segundos (60 por defecto) y la verifica antes de usarla
+#   (CONN_HEALTH_CHECKS) para no fallar con conexiones cortadas.
+# - DB_POOL=True usa el pool de conexiones de Django (requiere psycopg 3:
+#   pip install "psycopg[binary,pool]"); reemplaza a las conexiones persistentes.
+# - Los '.iterator()' usan cursores del lado del servidor (filas por bloques).
+#   Detrás de PgBouncer en modo transacción hay que desactivarlos con DB_PGBOUNCER=True.
+#
+# SQLite (DB_NAME cambia la ruta del archivo):
+# - Modo WAL: las lecturas no esperan a las escrituras ni al revés (solo las
+#   escrituras se turnan). synchronous=NORMAL es seguro con WAL (una caída
+#   del equipo puede perder la última transacción, nunca corromper la base).
+# - Las transacciones empiezan con BEGIN IMMEDIATE: toman el permiso de
+#   escritura al comenzar y esperan su turno hasta DB_SQLITE_ESPERA segundos,
+#   en lugar de fallar con "database is locked" al pasar de lectura a escritura.
+# - DB_SQLITE_WAL=False vuelve al modo por defecto de SQLite (por ejemplo,
+#   si el archivo está en un disco de red, donde WAL no funciona).
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+DB_ENGINE = os.environ.get('DB_ENGINE', 'sqlite')
+
+if DB_ENGINE == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('DB_NAME', 'bloquera'),
+            'USER': os.environ.get('DB_USER', 'bloquera'),
+            'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+            'HOST': os.environ.get('DB_HOST', 'localhost'),
+            'PORT': os.environ.get('DB_PORT', '5432'),
+            'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+            'CONN_HEALTH_CHECKS': os.environ.get('DB_CONN_HEALTH_CHECKS', 'True') == 'True',
+            'DISABLE_SERVER_SIDE_CURSORS': os.environ.get('DB_PGBOUNCER', 'False') == 'True',
+            'OPTIONS': {},
+        }
     }
-}
+    if os.environ.get('DB_POOL', 'False') == 'True':
+        DATABASES['default']['CONN_MAX_AGE'] = 0 # El pool no admite conexiones persistentes
+        DATABASES['default']['OPTIONS']['pool'] = {
+            'min_size': int(os.environ.get('DB_POOL_MIN', 2)),
+            'max_size': int(os.environ.get('DB_POOL_MAX', 10)),
+            'timeout': int(os.environ.get('DB_POOL_TIMEOUT', 10)),
+        }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('DB_NAME', BASE_DIR / 'db.sqlite3'),
+            'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 0)),
+            'OPTIONS': {},
+        }
+    }
+    if os.environ.get('DB_SQLITE_WAL', 'True') == 'True':
+        DATABASES['default']['OPTIONS'] = {
+            'timeout': int(os.environ.get('DB_SQLITE_ESPERA', 20)), # busy_timeout (segundos)
+            'transaction_mode': 'IMMEDIATE',
+            'init_command': (
+                'PRAGMA journal_mode=WAL;'
+                'PRAGMA synchronous=NORMAL;'
+                'PRAGMA mmap_size=134217728;' # 128 MB mapeados en memoria
+                'PRAGMA cache_size=-64000;' # 64 MB de caché de páginas por conexión
+                'PRAGMA temp_store=MEMORY;'
+            ),
+        }
+
+# Tiempo máximo (segundos) de las consultas de reportes (0 = sin límite)
+REPORTES_LIMITE_SEGUNDOS = int(os.environ.get('REPORTES_LIMITE_SEGUNDOS', 30))
 
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
@@ -105,8 +167,22 @@ USE_TZ = True
 
 # Static files (CSS, JavaScript, Images)
 STATIC_URL = '/static/'
-STATICFILES_DIRS = [ ... ]
+# Los archivos estáticos de cada app viven en '<app>/static/' (los encuentra AppDirectoriesFinder)
+STATICFILES_DIRS = []
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
+# 'collectstatic' genera nombres con hash del contenido ('style.3f2a9c1b0d4e.css')
+# y versiones '.gz' (y '.br' si está instalado 'brotli') de cada archivo.
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'core.estaticos.EstaticosComprimidos'},
+}
+# EstaticosMiddleware sirve STATIC_ROOT con caché 'immutable' y la mejor
+# codificación aceptada. False si los sirve un servidor web (nginx, etc.).
+ESTATICOS_SERVIR = os.environ.get('ESTATICOS_SERVIR', 'True') == 'True'
+# Identifica el código desplegado (commit, etiqueta) en los ETag de páginas y
+# documentos: un despliegue nuevo invalida lo que guardaron los navegadores.
+# Vacía = huella del contenido de los '.py' y plantillas del proyecto.
+VERSION_DESPLIEGUE = os.environ.get('VERSION_DESPLIEGUE', '')
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -114,7 +190,125 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 CRISPY_ALLOWED_TEMPLATE_PACKS = "bootstrap5"
 CRISPY_TEMPLATE_PACK = "bootstrap5"
 
+# --- Caché y sesiones ---
+# - 'default': caché en memoria de cada proceso (reportes, calendario).
+# - 'sesiones': caché en archivos compartida por todos los procesos del
+#   servidor (CACHE_DIRECTORIO). Guarda las sesiones y los usuarios
+#   autenticados, así una petición con la caché caliente no consulta
+#   'django_session' ni 'auth_user'. Al ser compartida, cerrar sesión o
+#   cambiar la contraseña tiene efecto en todos los workers de inmediato.
+#
+# SESIONES elige dónde viven las sesiones:
+# - 'cached_db' (por defecto): caché + base de datos (la base es el respaldo).
+# - 'signed_cookies': en la cookie firmada, sin consultas. El contenido es
+#   legible por el navegador y una cookie copiada sigue siendo válida hasta
+#   que expira, aunque el usuario cierre sesión.
+# - 'db': solo base de datos (comportamiento por defecto de Django).
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'sesiones': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('CACHE_DIRECTORIO', os.path.join(BASE_DIR, 'cache', 'sesiones')),
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+}
+
+SESIONES = os.environ.get('SESIONES', 'cached_db')
+SESSION_ENGINE = {
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+    'db': 'django.contrib.sessions.backends.db',
+}[SESIONES]
+SESSION_CACHE_ALIAS = 'sesiones'
+
+# Segundos que un usuario autenticado se guarda en la caché 'sesiones'
+# (0 lo desactiva). Se invalida al guardar o eliminar el usuario.
+USUARIO_CACHE_SEGUNDOS = int(os.environ.get('USUARIO_CACHE_SEGUNDOS', 300))
+
+# --- Registro (logging) ---
+# 'bloquera.rendimiento' recibe una línea por petición con consultas y tiempos.
+# 'bloquera.consultas_lentas' escribe una línea JSON por consulta que supere
+# CONSULTAS_LENTAS_MS (0 lo desactiva); 'manage.py consultas_lentas' la resume.
+CONSULTAS_LENTAS_MS = float(os.environ.get('CONSULTAS_LENTAS_MS', 200))
+CONSULTAS_LENTAS_ARCHIVO = os.environ.get('CONSULTAS_LENTAS_ARCHIVO', os.path.join(BASE_DIR, 'consultas_lentas.log'))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'simple': {'format': '%(asctime)s %(levelname)s %(name)s %(message)s'},
+        'mensaje': {'format': '%(message)s'},
+    },
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler', 'formatter': 'simple'},
+        'consultas_lentas': {
+            'class': 'logging.handlers.WatchedFileHandler',
+            'filename': CONSULTAS_LENTAS_ARCHIVO,
+            'formatter': 'mensaje',
+            'delay': True,
+        },
+    },
+    'loggers': {
+        'bloquera.rendimiento': {
+            'handlers': ['console'],
+            'level': os.environ.get('LOG_RENDIMIENTO', 'INFO'),
+            'propagate': False,
+        },
+        'bloquera.consultas_lentas': {
+            'handlers': ['consultas_lentas'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+    },
+}
+
+# --- Métricas (Prometheus) ---
+# Con varios procesos (gunicorn, etc.) METRICAS_DIRECTORIO debe apuntar a un
+# directorio compartido y vacío al iniciar el servidor: cada proceso vuelca
+# ahí sus valores y '/metrics' los suma. METRICAS_TOKEN protege el endpoint.
+METRICAS_DIRECTORIO = os.environ.get('METRICAS_DIRECTORIO') or None
+METRICAS_INTERVALO = float(os.environ.get('METRICAS_INTERVALO', 1))
+METRICAS_TOKEN = os.environ.get('METRICAS_TOKEN', '')
+
+# --- Perfilador (cProfile) ---
+# Con PERFILADOR_ACTIVO=True, un usuario staff puede agregar '?perfilar=html'
+# o '?perfilar=prof' a cualquier URL. PERFILADOR_MUESTREO (0 a 1) perfila
+# además esa fracción de las peticiones y las guarda en PERFILADOR_DIRECTORIO.
+PERFILADOR_ACTIVO = os.environ.get('PERFILADOR_ACTIVO', 'False') == 'True'
+PERFILADOR_MUESTREO = float(os.environ.get('PERFILADOR_MUESTREO', 0))
+PERFILADOR_DIRECTORIO = os.environ.get('PERFILADOR_DIRECTORIO', os.path.join(BASE_DIR, 'perfiles'))
+
+# Reportes
+# Segundos que un reporte calculado permanece en la caché.
+REPORTES_CACHE_TIMEOUT = int(os.environ.get('REPORTES_CACHE_TIMEOUT', 300))
+
+# Liquidaciones de sueldo
+# Procesos para generar los PDF en lote (0 = uno por CPU).
+LIQUIDACIONES_PROCESOS = int(os.environ.get('LIQUIDACIONES_PROCESOS', 0))
+
+# Tareas en segundo plano (core/tareas.py, 'manage.py run_worker')
+# Con TAREAS_SEGUNDO_PLANO=True las operaciones largas (liquidaciones en
+# ZIP, exportaciones CSV) se encolan y la vista responde al instante con la
+# página de estado de la tarea; requiere al menos un 'run_worker' corriendo. Los
+# archivos generados quedan en TAREAS_DIRECTORIO por TAREAS_RETENCION_DIAS.
+TAREAS_SEGUNDO_PLANO = os.environ.get('TAREAS_SEGUNDO_PLANO', 'False') == 'True'
+TAREAS_DIRECTORIO = os.environ.get('TAREAS_DIRECTORIO', os.path.join(BASE_DIR, 'tareas'))
+TAREAS_CONCURRENCIA = int(os.environ.get('TAREAS_CONCURRENCIA', 2)) # Hilos por worker
+TAREAS_INTENTOS = int(os.environ.get('TAREAS_INTENTOS', 3))
+TAREAS_REINTENTO_SEGUNDOS = int(os.environ.get('TAREAS_REINTENTO_SEGUNDOS', 30)) # Se duplica en cada reintento
+TAREAS_LATIDO_SEGUNDOS = int(os.environ.get('TAREAS_LATIDO_SEGUNDOS', 30)) # El worker marca así que sigue vivo
+TAREAS_TIEMPO_MAXIMO = int(os.environ.get('TAREAS_TIEMPO_MAXIMO', 300)) # Sin latido por más tiempo = worker caído
+TAREAS_RETENCION_DIAS = int(os.environ.get('TAREAS_RETENCION_DIAS', 7))
+
 # Autenticación
+# ModelBackend queda como respaldo para las sesiones abiertas antes de usar
+# el backend con caché (la sesión guarda la ruta del backend que la autenticó).
+AUTHENTICATION_BACKENDS = [
+    'core.autenticacion.BackendUsuarioCacheado',
+    'django.contrib.auth.backends.ModelBackend',
+]
 LOGIN_URL = 'core:login'
 LOGIN_REDIRECT_URL = 'core:home'
 LOGOUT_REDIRECT_URL = 'core:login'
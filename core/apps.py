@@ -4,3 +4,16 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        # Registro de consultas lentas en cada conexión nueva a la base de datos
+        from django.db.backends.signals import connection_created
+        from .consultas_lentas import instalar
+        connection_created.connect(instalar, dispatch_uid='core.consultas_lentas')
+
+        # Usuarios en caché (BackendUsuarioCacheado): invalidar al guardar o eliminar
+        from django.contrib.auth import get_user_model
+        from django.db.models.signals import post_delete, post_save
+        from .autenticacion import invalidar_usuario
+        post_save.connect(invalidar_usuario, sender=get_user_model(), dispatch_uid='core.usuario_cacheado')
+        post_delete.connect(invalidar_usuario, sender=get_user_model(), dispatch_uid='core.usuario_cacheado')
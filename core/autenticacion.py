@@ -0,0 +1,86 @@
+# core/autenticacion.py
+"""
+Backend de autenticación que guarda el usuario en la caché.
+
+Con el backend por defecto, cada petición autenticada consulta
+'auth_user' para reconstruir 'request.user'. Este backend guarda el
+usuario en la caché 'sesiones' (compartida entre procesos) por
+USUARIO_CACHE_SEGUNDOS y lo invalida cuando el usuario se guarda o se
+elimina (cambio de contraseña, desactivación, último acceso...).
+
+La caché 'sesiones' son archivos en disco, así que no se guarda el hash
+de la contraseña: solo los demás campos del usuario y el hash de sesión
+que Django deriva de ella (HMAC con SECRET_KEY). El usuario se
+reconstruye con la contraseña como campo diferido; si algo la necesita
+(cambiar la contraseña, 'check_password') se lee de la base de datos en
+ese momento. Guardar el usuario invalida la caché, así que el hash de
+sesión nunca queda desfasado.
+
+Las escrituras que no emiten señales (p. ej. 'User.objects.filter(...)
+.update(is_active=False)') no invalidan la caché: quien las haga debe
+llamar a 'invalidar_usuarios' con los IDs afectados; si no, el cambio se
+nota recién cuando vence la entrada (USUARIO_CACHE_SEGUNDOS).
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import caches
+from django.db import router
+
+
+def _clave(user_id):
+    return f"auth:usuario:{user_id}"
+
+
+def _para_cache(usuario):
+    """Campos del usuario sin la contraseña, más su hash de sesión."""
+    campos = [
+        (campo.attname, getattr(usuario, campo.attname))
+        for campo in usuario._meta.concrete_fields if campo.attname != 'password'
+    ]
+    return {'campos': campos, 'hash_sesion': usuario.get_session_auth_hash()}
+
+
+def _desde_cache(datos):
+    """Usuario con la contraseña diferida que responde el hash de sesión guardado."""
+    modelo = get_user_model()
+    nombres = [nombre for nombre, _ in datos['campos']]
+    usuario = modelo.from_db(router.db_for_read(modelo), nombres, [valor for _, valor in datos['campos']])
+    hash_sesion = datos['hash_sesion']
+
+    def get_session_auth_hash():
+        # Si en esta petición se cargó o cambió la contraseña, se calcula con ella
+        if 'password' in usuario.__dict__:
+            return modelo.get_session_auth_hash(usuario)
+        return hash_sesion
+
+    usuario.get_session_auth_hash = get_session_auth_hash
+    return usuario
+
+
+class BackendUsuarioCacheado(ModelBackend):
+
+    def get_user(self, user_id):
+        segundos = settings.USUARIO_CACHE_SEGUNDOS
+        if not segundos:
+            return super().get_user(user_id)
+
+        cache = caches[settings.SESSION_CACHE_ALIAS]
+        datos = cache.get(_clave(user_id))
+        if datos is None:
+            usuario = super().get_user(user_id)
+            if usuario is not None:
+                cache.set(_clave(user_id), _para_cache(usuario), segundos)
+        else:
+            usuario = _desde_cache(datos)
+        return usuario if self.user_can_authenticate(usuario) else None
+
+
+def invalidar_usuarios(*ids):
+    """Borra de la caché los usuarios indicados (tras un 'update()' de QuerySet)."""
+    caches[settings.SESSION_CACHE_ALIAS].delete_many([_clave(user_id) for user_id in ids])
+
+
+def invalidar_usuario(sender, instance, **kwargs):
+    """Receptor de 'post_save' / 'post_delete' del modelo de usuario."""
+    invalidar_usuarios(instance.pk)
@@ -0,0 +1,116 @@
+# core/condicional.py
+"""
+GET condicionales (ETag / Last-Modified) para vistas de un solo objeto.
+
+'condicional_por_version(Modelo, "parametro")' envuelve el decorador
+'condition()' de Django: el ETag sale de la 'version' del objeto
+(ver ModeloVersionado) y, si la página muestra datos de objetos
+relacionados, de la versión de estos. Un cliente que ya tiene la
+respuesta recibe un 304 con una sola consulta, sin cargar el objeto ni
+sus relaciones ni generar el documento.
+"""
+import functools
+import hashlib
+import os
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib import messages
+from django.db.models import Count, Max
+from django.views.decorators.http import condition
+
+
+@functools.cache
+def version_codigo():
+    """
+    Identifica el código desplegado. Forma parte de los ETag para que un
+    cambio de plantilla o de formato invalide las respuestas guardadas por
+    los navegadores, y debe ser igual en todos los procesos y servidores.
+
+    Es VERSION_DESPLIEGUE si está configurada (p. ej. el commit o la
+    etiqueta que se despliega). Si no, una huella del contenido de los
+    '.py' y plantillas de las apps del proyecto (no de sus fechas de
+    modificación, que cambian de un servidor a otro).
+    """
+    if settings.VERSION_DESPLIEGUE:
+        return settings.VERSION_DESPLIEGUE
+    base = str(settings.BASE_DIR)
+    huella = hashlib.md5()
+    for app in apps.get_app_configs():
+        if not app.path.startswith(base) or 'site-packages' in app.path:
+            continue
+        for carpeta, subcarpetas, archivos in os.walk(app.path):
+            subcarpetas.sort() # Mismo recorrido en cualquier sistema de archivos
+            for nombre in sorted(archivos):
+                if nombre.endswith(('.py', '.html')):
+                    ruta = os.path.join(carpeta, nombre)
+                    huella.update(os.path.relpath(ruta, base).encode())
+                    with open(ruta, 'rb') as archivo:
+                        huella.update(archivo.read())
+    return huella.hexdigest()[:12]
+
+
+def condicional_por_version(modelo, parametro, pagina=False, relacionadas=()):
+    """
+    Decorador de vistas: ETag y Last-Modified a partir de 'version' y
+    'actualizado' del objeto cuyo pk llega en el kwarg 'parametro'.
+
+    Args:
+        modelo: Un ModeloVersionado.
+        parametro (str): Nombre del kwarg de la URL con la clave primaria.
+        pagina (bool): Para páginas HTML. El ETag es distinto por usuario
+                       (nombre en la barra, etc.) y, si hay mensajes
+                       pendientes (messages), se responde siempre completo
+                       para que se muestren.
+        relacionadas (iterable[str]): Rutas de relaciones a otros
+                       ModeloVersionado que también se muestran (ej.
+                       'detalles__producto'). Su 'actualizado' más reciente
+                       y su cantidad entran en el ETag y en Last-Modified,
+                       en la misma consulta (agregada).
+
+    Las respuestas llevan 'Cache-Control: private, no-cache' (el navegador
+    guarda la respuesta pero la revalida siempre).
+    """
+    def estado(request, kwargs):
+        # etag_func y last_modified_func se llaman por separado: una sola consulta
+        if not hasattr(request, '_estado_version'):
+            request._estado_version = None
+            if not (pagina and len(messages.get_messages(request))): # len() no marca los mensajes como leídos
+                consulta = modelo.objects.filter(pk=kwargs[parametro])
+                agregados = []
+                for i, ruta in enumerate(relacionadas):
+                    consulta = consulta.annotate(**{
+                        f'_ultima_{i}': Max(f'{ruta}__actualizado'),
+                        f'_cantidad_{i}': Count(f'{ruta}__pk', distinct=True),
+                    })
+                    agregados += [f'_ultima_{i}', f'_cantidad_{i}']
+                request._estado_version = consulta.values_list('version', 'actualizado', *agregados).first()
+        return request._estado_version
+
+    def etag(request, *args, **kwargs):
+        fila = estado(request, kwargs)
+        if fila is None:
+            return None
+        partes = [modelo._meta.label_lower, str(kwargs[parametro]), str(fila[0]), version_codigo()]
+        partes += [str(valor.timestamp()) if hasattr(valor, 'timestamp') else str(valor) for valor in fila[2:]]
+        if pagina:
+            partes.append(str(request.user.pk))
+        return hashlib.md5(':'.join(partes).encode()).hexdigest()
+
+    def ultima_modificacion(request, *args, **kwargs):
+        fila = estado(request, kwargs)
+        if fila is None:
+            return None
+        return max([fila[1], *(valor for valor in fila[2::2] if valor is not None)])
+
+    def decorador(vista):
+        condicionada = condition(etag_func=etag, last_modified_func=ultima_modificacion)(vista)
+
+        @functools.wraps(vista)
+        def envoltura(request, *args, **kwargs):
+            response = condicionada(request, *args, **kwargs)
+            if response.has_header('ETag'):
+                response.setdefault('Cache-Control', 'private, no-cache')
+            return response
+        return envoltura
+    return decorador
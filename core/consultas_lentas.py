@@ -0,0 +1,180 @@
+# core/consultas_lentas.py
+"""
+Registro de consultas lentas.
+
+Cada conexión a la base de datos lleva un envoltorio (execute_wrapper) que
+mide todas las consultas. Las que superan CONSULTAS_LENTAS_MS se registran
+en el logger 'bloquera.consultas_lentas' como una línea JSON con:
+
+- la huella de la sentencia (SQL normalizado, sin valores),
+- la vista que la originó y la línea de código del proyecto que la lanzó,
+- la primera vez que el proceso ve una huella, su plan de ejecución
+  (EXPLAIN, o EXPLAIN QUERY PLAN en SQLite).
+
+'manage.py consultas_lentas' agrega el archivo de registro por huella
+(cantidad, percentiles) y muestra las peores.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+import traceback
+
+from django.conf import settings
+from django.utils import timezone
+
+from .instrumentacion import percentil, vista_actual
+
+logger = logging.getLogger('bloquera.consultas_lentas')
+
+_NUMEROS = re.compile(r"\b\d+(\.\d+)?\b")
+_TEXTOS = re.compile(r"'(?:[^']|'')*'")
+_LISTAS = re.compile(r"\((?:\s*(?:%s|\?)\s*,)+\s*(?:%s|\?)\s*\)")
+_ESPACIOS = re.compile(r"\s+")
+
+# Archivos del propio proyecto que no cuentan como "origen" de una consulta
+_INFRAESTRUCTURA = {
+    os.path.join(os.path.dirname(__file__), nombre)
+    for nombre in ('consultas_lentas.py', 'instrumentacion.py', 'middleware.py', 'perfilador.py')
+}
+
+
+def normalizar(sql):
+    """SQL sin valores literales: dos consultas iguales salvo parámetros dan el mismo texto."""
+    sql = _TEXTOS.sub('?', sql)
+    sql = _NUMEROS.sub('?', sql)
+    sql = sql.replace('%s', '?')
+    sql = _LISTAS.sub('(...)', sql)
+    return _ESPACIOS.sub(' ', sql).strip()
+
+
+def huella(sql_normalizado):
+    return hashlib.md5(sql_normalizado.encode()).hexdigest()[:12]
+
+
+def _origen():
+    """Marco más interno del código del proyecto (fuera de librerías) que lanzó la consulta."""
+    base = str(settings.BASE_DIR)
+    for marco in reversed(traceback.extract_stack()):
+        if (marco.filename.startswith(base) and marco.filename not in _INFRAESTRUCTURA
+                and 'site-packages' not in marco.filename):
+            return f"{os.path.relpath(marco.filename, base)}:{marco.lineno} en {marco.name}"
+    return None
+
+
+class RegistroConsultasLentas:
+    """
+    Envoltorio de 'connection.execute_wrappers' (uno por conexión).
+    Las huellas ya explicadas se comparten entre conexiones del proceso.
+    """
+
+    explicadas = set()
+    _candado = threading.Lock()
+
+    def __init__(self, connection, umbral_ms):
+        self.connection = connection
+        self.umbral = umbral_ms / 1000
+        self.explicando = False
+
+    def __call__(self, execute, sql, params, many, context):
+        if self.explicando:
+            return execute(sql, params, many, context)
+        inicio = time.perf_counter()
+        resultado = execute(sql, params, many, context)
+        # Solo las consultas que terminaron bien: tras un error la transacción
+        # puede quedar abortada (PostgreSQL) y el EXPLAIN también fallaría
+        duracion = time.perf_counter() - inicio
+        if duracion >= self.umbral:
+            self.registrar(sql, params, many, duracion)
+        return resultado
+
+    def registrar(self, sql, params, many, duracion):
+        normalizado = normalizar(sql)
+        clave = huella(normalizado)
+        with self._candado:
+            nueva = clave not in self.explicadas
+            self.explicadas.add(clave)
+
+        registro = {
+            'fecha': timezone.now().isoformat(),
+            'huella': clave,
+            'ms': round(duracion * 1000, 2),
+            'sql': normalizado,
+            'vista': vista_actual.get(),
+            'origen': _origen(),
+            'base': self.connection.alias,
+            'pid': os.getpid(),
+        }
+        if nueva and not many:
+            registro['plan'] = self.explicar(sql, params)
+        logger.warning(json.dumps(registro, ensure_ascii=False, default=str))
+
+    def explicar(self, sql, params):
+        """Plan de ejecución de una consulta SELECT (None si no aplica o falla)."""
+        if not sql.lstrip().upper().startswith(('SELECT', 'WITH')):
+            return None
+        prefijo = 'EXPLAIN QUERY PLAN' if self.connection.vendor == 'sqlite' else 'EXPLAIN'
+        self.explicando = True
+        try:
+            with self.connection.cursor() as cursor:
+                cursor.execute(f"{prefijo} {sql}", params)
+                return [" | ".join(str(columna) for columna in fila) for fila in cursor.fetchall()]
+        except Exception as e: # Un plan que no se puede obtener no debe romper la petición
+            return [f"No se pudo obtener el plan: {e}"]
+        finally:
+            self.explicando = False
+
+
+def instalar(sender, connection, **kwargs):
+    """Receptor de 'connection_created': agrega el registro a cada conexión nueva."""
+    umbral = settings.CONSULTAS_LENTAS_MS
+    if umbral and umbral > 0:
+        connection.execute_wrappers.append(RegistroConsultasLentas(connection, umbral))
+
+
+def leer_registro(lineas):
+    """
+    Agrega las líneas JSON del registro por huella.
+
+    Returns:
+        list[dict]: Una fila por huella con 'cantidad', 'total_ms', 'p50_ms',
+                    'p95_ms', 'max_ms', 'sql', 'vistas', 'origenes' y 'plan'.
+    """
+    grupos = {}
+    for linea in lineas:
+        inicio = linea.find('{')
+        if inicio < 0:
+            continue
+        try:
+            registro = json.loads(linea[inicio:])
+        except ValueError:
+            continue
+        grupo = grupos.setdefault(registro['huella'], {
+            'huella': registro['huella'], 'sql': registro['sql'], 'tiempos': [],
+            'vistas': set(), 'origenes': set(), 'plan': None,
+        })
+        grupo['tiempos'].append(registro['ms'])
+        if registro.get('vista'):
+            grupo['vistas'].add(registro['vista'])
+        if registro.get('origen'):
+            grupo['origenes'].add(registro['origen'])
+        if grupo['plan'] is None and registro.get('plan'):
+            grupo['plan'] = registro['plan']
+
+    resultado = []
+    for grupo in grupos.values():
+        tiempos = grupo.pop('tiempos')
+        grupo.update({
+            'cantidad': len(tiempos),
+            'total_ms': round(sum(tiempos), 2),
+            'p50_ms': percentil(tiempos, 50),
+            'p95_ms': percentil(tiempos, 95),
+            'max_ms': max(tiempos),
+            'vistas': sorted(grupo['vistas']),
+            'origenes': sorted(grupo['origenes']),
+        })
+        resultado.append(grupo)
+    return resultado
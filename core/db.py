@@ -0,0 +1,73 @@
+# core/db.py
+"""
+Utilidades de base de datos comunes a todas las apps.
+"""
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+
+@contextmanager
+def limite_de_tiempo(segundos=None, using=DEFAULT_DB_ALIAS):
+    """
+    Limita el tiempo de las consultas ejecutadas dentro del bloque.
+
+    - PostgreSQL: 'SET LOCAL statement_timeout' dentro de una transacción
+      (el límite desaparece al terminar el bloque).
+    - SQLite: un "progress handler" que interrumpe la consulta en curso al
+      vencer el plazo (el plazo es para todo el bloque).
+
+    Una consulta que supera el límite lanza 'django.db.OperationalError'.
+
+    Los bloques se pueden anidar (p. ej. un reporte cacheado que se calcula
+    dentro de una vista que ya tiene límite): rige el plazo más corto y, al
+    salir del bloque interior, vuelve a regir el del exterior.
+
+    Args:
+        segundos (float, opcional): Por defecto, REPORTES_LIMITE_SEGUNDOS. 0 o None lo desactiva.
+    """
+    if segundos is None:
+        segundos = settings.REPORTES_LIMITE_SEGUNDOS
+    connection = connections[using]
+    if not segundos or connection.vendor not in ('postgresql', 'sqlite'):
+        yield
+        return
+
+    exterior = getattr(connection, 'plazo_limite', None)
+    plazo = time.monotonic() + segundos
+    if exterior is not None and exterior <= plazo:
+        yield # El bloque exterior ya vence antes: su plazo sigue rigiendo
+        return
+
+    if connection.vendor == 'postgresql':
+        with transaction.atomic(using=using):
+            _statement_timeout(connection, segundos)
+            connection.plazo_limite = plazo
+            try:
+                yield
+            finally:
+                connection.plazo_limite = exterior
+            # Si hubo un error, revertir el savepoint ya deshizo el SET LOCAL
+            if exterior is not None:
+                _statement_timeout(connection, exterior - time.monotonic())
+        return
+
+    connection.ensure_connection()
+    conexion = connection.connection
+    conexion.set_progress_handler(lambda: time.monotonic() > plazo, 10000)
+    connection.plazo_limite = plazo
+    try:
+        yield
+    finally:
+        connection.plazo_limite = exterior
+        if exterior is None:
+            conexion.set_progress_handler(None, 0)
+        else:
+            conexion.set_progress_handler(lambda: time.monotonic() > exterior, 10000)
+
+
+def _statement_timeout(connection, segundos):
+    with connection.cursor() as cursor:
+        cursor.execute(f"SET LOCAL statement_timeout = {max(int(segundos * 1000), 1)}")
@@ -0,0 +1,126 @@
+# core/estaticos.py
+"""
+Archivos estáticos con huella y precomprimidos.
+
+- 'EstaticosComprimidos' (STORAGES['staticfiles']): en 'collectstatic'
+  copia cada archivo con un hash de su contenido en el nombre
+  ('style.3f2a9c1b0d4e.css', vía ManifestStaticFilesStorage) y escribe al
+  lado las versiones '.gz' y, si está instalado el paquete 'brotli', '.br'.
+- 'ArchivoEstatico' / 'buscar': lo que usa 'EstaticosMiddleware' para
+  servirlos desde STATIC_ROOT eligiendo la codificación según
+  Accept-Encoding. Un archivo con hash nunca cambia de contenido, así que
+  se sirve con caché de un año e 'immutable': el navegador no lo vuelve a
+  pedir hasta que el hash (la URL) cambie.
+"""
+import gzip
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.utils._os import safe_join
+from django.utils.http import http_date
+
+try:
+    import brotli
+except ImportError: # Opcional: sin 'brotli' solo se generan los '.gz'
+    brotli = None
+
+# Extensiones que vale la pena comprimir (las imágenes ya vienen comprimidas)
+COMPRIMIBLES = {'.css', '.js', '.mjs', '.map', '.json', '.svg', '.txt', '.html', '.xml', '.ico', '.ttf', '.otf', '.eot'}
+# Solo se guarda la versión comprimida si ahorra al menos este porcentaje
+AHORRO_MINIMO = 0.05
+
+CACHE_INMUTABLE = 'public, max-age=31536000, immutable'
+CACHE_SIN_HASH = 'public, max-age=60'
+
+_CON_HASH = re.compile(r'\.[0-9a-f]{12}\.[^./]+$')
+
+
+class EstaticosComprimidos(ManifestStaticFilesStorage):
+    """
+    ManifestStaticFilesStorage que además precomprime los archivos.
+
+    No es estricto: una plantilla que referencia un archivo que no existe
+    (o un entorno sin 'collectstatic', como los tests) recibe la URL sin
+    hash en lugar de un error 500.
+    """
+
+    manifest_strict = False
+
+    def stored_name(self, name):
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            return name
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run=dry_run, **options)
+        if dry_run:
+            return
+        for nombre in list(self.hashed_files.values()) + list(paths):
+            self.comprimir(nombre)
+
+    def comprimir(self, nombre):
+        """Escribe '<archivo>.gz' (y '.br') junto al archivo si conviene."""
+        if os.path.splitext(nombre)[1].lower() not in COMPRIMIBLES or not self.exists(nombre):
+            return
+        ruta = self.path(nombre)
+        with open(ruta, 'rb') as archivo:
+            contenido = archivo.read()
+        versiones = {'.gz': gzip.compress(contenido, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            versiones['.br'] = brotli.compress(contenido)
+        for extension, comprimido in versiones.items():
+            if len(comprimido) <= len(contenido) * (1 - AHORRO_MINIMO):
+                with open(ruta + extension, 'wb') as archivo:
+                    archivo.write(comprimido)
+
+
+class ArchivoEstatico:
+    """Un archivo de STATIC_ROOT con sus versiones precomprimidas disponibles."""
+
+    def __init__(self, ruta, nombre):
+        self.ruta = ruta
+        estado = os.stat(ruta)
+        self.etag = f'"{int(estado.st_mtime):x}-{estado.st_size:x}"'
+        self.modificado = http_date(estado.st_mtime)
+        self.tipo = mimetypes.guess_type(nombre)[0] or 'application/octet-stream'
+        self.cache_control = CACHE_INMUTABLE if _CON_HASH.search(nombre) else CACHE_SIN_HASH
+        self.comprimidos = [
+            (codificacion, ruta + extension)
+            for codificacion, extension in (('br', '.br'), ('gzip', '.gz'))
+            if os.path.isfile(ruta + extension)
+        ]
+
+    def elegir(self, accept_encoding):
+        """(ruta, codificación o None) según la cabecera Accept-Encoding."""
+        aceptadas = {
+            parte.split(';')[0].strip() for parte in accept_encoding.lower().replace(' ', '').split(',')
+            if not parte.endswith(';q=0') # 'gzip;q=0' = no aceptada
+        }
+        for codificacion, ruta in self.comprimidos:
+            if codificacion in aceptadas:
+                return ruta, codificacion
+        return self.ruta, None
+
+
+_archivos = {} # {nombre relativo: ArchivoEstatico}; STATIC_ROOT no cambia sin reiniciar
+
+
+def buscar(nombre):
+    """ArchivoEstatico de 'nombre' (relativo a STATIC_ROOT) o None si no existe."""
+    if nombre in _archivos:
+        return _archivos[nombre]
+    try:
+        ruta = safe_join(settings.STATIC_ROOT, nombre)
+    except SuspiciousFileOperation: # '../' fuera de STATIC_ROOT
+        return None
+    if not os.path.isfile(ruta):
+        return None
+    archivo = ArchivoEstatico(ruta, nombre)
+    if archivo.cache_control == CACHE_INMUTABLE:
+        _archivos[nombre] = archivo # Los que no tienen hash pueden cambiar: se revisan en cada petición
+    return archivo
@@ -0,0 +1,78 @@
+# core/instrumentacion.py
+"""
+Medición de consultas SQL y tiempos por petición.
+
+'medir()' registra, mientras está activo, cuántas consultas ejecuta la
+conexión a la base de datos, cuánto tiempo tardan en total y el tiempo
+total transcurrido. Lo usan el middleware de métricas y los tests de
+presupuesto de consultas.
+"""
+import time
+from contextlib import contextmanager, ExitStack
+from contextvars import ContextVar
+
+from django.db import connections
+
+# Nombre de la vista que atiende la petición en curso (lo fija el middleware de métricas)
+vista_actual = ContextVar('vista_actual', default=None)
+
+
+def percentil(valores, p):
+    """Percentil 'p' (0 a 100) por el método del rango más cercano."""
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, round(p / 100 * (len(ordenados) - 1)))]
+
+
+class Medicion:
+    """Resultado de una medición (se completa al salir de 'medir()')."""
+
+    def __init__(self, guardar_sentencias=False):
+        self.guardar_sentencias = guardar_sentencias
+        self.consultas = 0
+        self.tiempo_db = 0.0 # segundos
+        self.tiempo_total = 0.0 # segundos
+        self.sentencias = [] # [(sql, segundos)] si guardar_sentencias es True
+
+    @property
+    def tiempo_db_ms(self):
+        return round(self.tiempo_db * 1000, 2)
+
+    @property
+    def tiempo_total_ms(self):
+        return round(self.tiempo_total * 1000, 2)
+
+    def __call__(self, execute, sql, params, many, context):
+        """Envoltorio para 'connection.execute_wrapper'."""
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duracion = time.perf_counter() - inicio
+            self.consultas += 1
+            self.tiempo_db += duracion
+            if self.guardar_sentencias:
+                self.sentencias.append((sql, duracion))
+
+
+@contextmanager
+def medir(guardar_sentencias=False):
+    """
+    Mide las consultas de todas las bases de datos configuradas en el hilo actual.
+
+    Las consultas que se ejecutan en otros hilos (por ejemplo, las de las
+    vistas asíncronas con thread_sensitive=False) no se cuentan.
+
+    Uso:
+        with medir() as m:
+            ...
+        print(m.consultas, m.tiempo_db_ms, m.tiempo_total_ms)
+    """
+    medicion = Medicion(guardar_sentencias)
+    inicio = time.perf_counter()
+    with ExitStack() as pila:
+        for alias in connections:
+            pila.enter_context(connections[alias].execute_wrapper(medicion))
+        try:
+            yield medicion
+        finally:
+            medicion.tiempo_total = time.perf_counter() - inicio
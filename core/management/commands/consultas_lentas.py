@@ -0,0 +1,67 @@
+# core/management/commands/consultas_lentas.py
+"""
+Comando: python manage.py consultas_lentas [--archivo ruta.log] [--top 15] [--orden total|p95|max|cantidad] [--planes]
+
+Resume el registro de consultas lentas por huella (SQL normalizado):
+cantidad, tiempo total, p50/p95/máximo, vistas y líneas de código que las
+originan y, con --planes, el plan de ejecución capturado.
+"""
+import glob
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.consultas_lentas import leer_registro
+
+ORDENES = {
+    'total': 'total_ms',
+    'p95': 'p95_ms',
+    'max': 'max_ms',
+    'cantidad': 'cantidad',
+}
+
+
+class Command(BaseCommand):
+    help = "Muestra las consultas lentas más costosas agrupadas por huella."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--archivo', default=settings.CONSULTAS_LENTAS_ARCHIVO,
+                            help="Archivo de registro (se incluyen también sus rotaciones '.1', '.2', ...).")
+        parser.add_argument('--top', type=int, default=15, help="Cantidad de huellas a mostrar.")
+        parser.add_argument('--orden', choices=ORDENES, default='total', help="Criterio de orden.")
+        parser.add_argument('--vista', help="Solo consultas originadas en esta vista (ej. 'ventas:lista_ordenes').")
+        parser.add_argument('--planes', action='store_true', help="Muestra el plan de ejecución de cada huella.")
+
+    def handle(self, *args, **options):
+        archivos = sorted(glob.glob(glob.escape(options['archivo']) + '*'))
+        if not archivos:
+            raise CommandError(f"No existe el registro {options['archivo']} (¿CONSULTAS_LENTAS_MS es 0?).")
+
+        lineas = []
+        for ruta in archivos:
+            with open(ruta, encoding='utf-8', errors='replace') as archivo:
+                lineas.extend(archivo)
+        grupos = leer_registro(lineas)
+        if options['vista']:
+            grupos = [g for g in grupos if options['vista'] in g['vistas']]
+        if not grupos:
+            self.stdout.write("Sin consultas lentas registradas.")
+            return
+
+        grupos.sort(key=lambda g: g[ORDENES[options['orden']]], reverse=True)
+        self.stdout.write(f"{len(grupos)} huellas en {len(lineas)} registros. Las {min(options['top'], len(grupos))} peores por {options['orden']}:\n")
+        for posicion, grupo in enumerate(grupos[:options['top']], start=1):
+            self.stdout.write(self.style.WARNING(
+                f"{posicion}. [{grupo['huella']}] {grupo['cantidad']}× | total {grupo['total_ms']:.1f} ms | "
+                f"p50 {grupo['p50_ms']:.1f} ms | p95 {grupo['p95_ms']:.1f} ms | máx {grupo['max_ms']:.1f} ms"
+            ))
+            self.stdout.write(f"   {grupo['sql'][:500]}")
+            if grupo['vistas']:
+                self.stdout.write(f"   Vistas: {', '.join(grupo['vistas'])}")
+            for origen in grupo['origenes'][:5]:
+                self.stdout.write(f"   Origen: {origen}")
+            if options['planes'] and grupo['plan']:
+                self.stdout.write("   Plan:")
+                for linea in grupo['plan']:
+                    self.stdout.write(f"     {linea}")
+            self.stdout.write("")
@@ -0,0 +1,54 @@
+# core/management/commands/generar_datos_prueba.py
+"""
+Comando: python manage.py generar_datos_prueba [--escala 1] [--anios 3] [--semilla 0] [--lote 5000] [--limpiar]
+
+Carga un conjunto de datos sintéticos (ventas, pagos, gastos, trabajadores
+y asistencias) para pruebas de carga. Los datos quedan marcados y se
+pueden eliminar con --limpiar.
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.sinteticos import eliminar_datos, generar_datos
+
+
+class Command(BaseCommand):
+    help = "Genera datos sintéticos (escala 1 ≈ 20.000 filas; escala 100 > 1.000.000)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--escala', type=float, default=1, help="Multiplicador de volumen.")
+        parser.add_argument('--anios', type=int, default=3, help="Años de historia.")
+        parser.add_argument('--semilla', type=int, default=0, help="Semilla (los mismos datos en cada ejecución).")
+        parser.add_argument('--lote', type=int, default=5000, help="Filas por INSERT.")
+        parser.add_argument('--limpiar', action='store_true',
+                            help="Elimina los datos sintéticos existentes antes de generar (o solo elimina si --escala 0).")
+
+    def handle(self, *args, **options):
+        if options['escala'] < 0 or options['anios'] < 1 or options['lote'] < 1:
+            raise CommandError("--escala no puede ser negativa; --anios y --lote deben ser al menos 1.")
+
+        if options['limpiar']:
+            eliminadas = eliminar_datos()
+            self.stdout.write(f"{eliminadas} filas sintéticas eliminadas.")
+            if not options['escala']:
+                return
+        elif not options['escala']:
+            raise CommandError("--escala 0 solo tiene sentido junto con --limpiar.")
+
+        inicio = time.perf_counter()
+        try:
+            cantidades = generar_datos(options['escala'], options['anios'], options['semilla'], options['lote'])
+        except Exception as e:
+            raise CommandError(
+                f"No se pudieron generar los datos ({e}). "
+                "Si ya existen datos sintéticos, ejecute nuevamente con --limpiar."
+            )
+        segundos = time.perf_counter() - inicio
+
+        for tipo, cantidad in cantidades.items():
+            self.stdout.write(f"  {tipo}: {cantidad}")
+        total = sum(cantidades.values())
+        self.stdout.write(self.style.SUCCESS(
+            f"{total} filas generadas en {segundos:.1f} s ({total / segundos:,.0f} filas/s)."
+        ))
@@ -0,0 +1,201 @@
+# core/management/commands/medir_concurrencia_sqlite.py
+"""
+Comando: python manage.py medir_concurrencia_sqlite [--segundos 10] [--escritores 3] [--lectores 4]
+
+Compara SQLite en su modo por defecto (journal de rollback, transacciones
+DEFERRED) con el modo ajustado del proyecto (WAL + BEGIN IMMEDIATE, ver
+DATABASES en settings) bajo escrituras y lecturas concurrentes:
+
+- Escritores: crean órdenes ('crear_orden') y registran gastos, como dos
+  cajeros y una persona de administración trabajando a la vez.
+- Lectores: consultan el detalle de una orden y el stock de un producto.
+
+Cada modo corre en un proceso aparte sobre una base de datos temporal
+propia (migrada y con datos sintéticos), así la base real no se toca.
+El reporte muestra las lecturas por segundo y su latencia (p50/p95/máx)
+mientras se escribe, y las escrituras completadas y fallidas
+("database is locked").
+"""
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import date
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.urls import reverse
+
+from core.instrumentacion import percentil
+from core.sinteticos import generar_datos
+from inventario.models import Producto
+from ventas.models import OrdenCompra
+
+MODOS = {
+    'por_defecto': {'DB_SQLITE_WAL': 'False'},
+    'wal': {'DB_SQLITE_WAL': 'True'},
+}
+
+
+class Command(BaseCommand):
+    help = "Lecturas y escrituras concurrentes en SQLite: modo por defecto vs. WAL + BEGIN IMMEDIATE."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--segundos', type=float, default=10, help="Duración de cada modo.")
+        parser.add_argument('--escritores', type=int, default=3, help="Hilos que escriben.")
+        parser.add_argument('--lectores', type=int, default=4, help="Hilos que leen.")
+        parser.add_argument('--salida', help="Archivo JSON donde guardar los resultados.")
+        parser.add_argument('--hijo', action='store_true', help="Uso interno: ejecuta un modo en este proceso.")
+
+    def handle(self, *args, **options):
+        if options['hijo']:
+            if connection.vendor != 'sqlite':
+                raise CommandError("Este benchmark es solo para SQLite.")
+            resultado = self.ejecutar_carga(options['segundos'], options['escritores'], options['lectores'])
+            self.stdout.write(json.dumps(resultado))
+            return
+
+        resultados = {}
+        for modo, variables in MODOS.items():
+            self.stdout.write(f"Modo {modo}...")
+            with tempfile.TemporaryDirectory() as directorio:
+                entorno = dict(os.environ, DB_ENGINE='sqlite', DB_NAME=os.path.join(directorio, 'bloquera.sqlite3'),
+                               CONSULTAS_LENTAS_MS='0', **variables)
+                proceso = subprocess.run(
+                    [sys.executable, os.path.join(settings.BASE_DIR, 'manage.py'), 'medir_concurrencia_sqlite',
+                     '--hijo', '--segundos', str(options['segundos']),
+                     '--escritores', str(options['escritores']), '--lectores', str(options['lectores'])],
+                    env=entorno, capture_output=True, text=True,
+                )
+            if proceso.returncode != 0:
+                raise CommandError(f"El modo {modo} falló:\n{proceso.stderr}")
+            datos = resultados[modo] = json.loads(proceso.stdout.strip().splitlines()[-1])
+            self.stdout.write(
+                f"  journal {datos['journal_mode']:<8} lecturas {datos['lecturas_por_segundo']:>7.1f}/s | "
+                f"p50 {datos['lectura_p50_ms']:.1f} ms | p95 {datos['lectura_p95_ms']:.1f} ms | "
+                f"máx {datos['lectura_max_ms']:.1f} ms"
+            )
+            estilo = self.style.ERROR if datos['escrituras_fallidas'] else self.style.SUCCESS
+            self.stdout.write(estilo(
+                f"  escrituras {datos['escrituras']} ({datos['escrituras_por_segundo']:.1f}/s) | "
+                f"fallidas {datos['escrituras_fallidas']} | p95 {datos['escritura_p95_ms']:.1f} ms"
+            ))
+
+        if options['salida']:
+            with open(options['salida'], 'w', encoding='utf-8') as archivo:
+                json.dump(resultados, archivo, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Resultados en {options['salida']}"))
+
+    # --- Proceso hijo ---
+
+    def preparar(self):
+        """Base temporal migrada, con datos sintéticos y un usuario; devuelve el contexto de las peticiones."""
+        call_command('migrate', verbosity=0)
+        generar_datos(escala=0.2, anios=1)
+        usuario = User.objects.create(username='benchmark')
+        productos = list(Producto.objects.values_list('pk', flat=True)[:3])
+        orden = OrdenCompra.objects.values_list('pk', flat=True).first()
+
+        hoy = date.today().isoformat()
+        nueva_orden = {
+            'fecha': hoy, 'cliente': 'Cliente benchmark', 'rut': '', 'direccion': '', 'tipo_proyecto': 'BLOQUERA',
+            'detalles-TOTAL_FORMS': str(len(productos)), 'detalles-INITIAL_FORMS': '0',
+            'detalles-MIN_NUM_FORMS': '0', 'detalles-MAX_NUM_FORMS': '1000',
+        }
+        for i, pk in enumerate(productos):
+            nueva_orden.update({
+                f'detalles-{i}-producto': str(pk), f'detalles-{i}-cantidad': '1',
+                f'detalles-{i}-precio_unitario': '1000',
+            })
+        nuevo_gasto = {
+            'fecha': hoy, 'categoria': 'OTRO', 'descripcion': 'Gasto benchmark', 'monto': '1000',
+            'tipo_proyecto': 'BLOQUERA',
+        }
+        escrituras = [
+            (reverse('ventas:crear_orden'), nueva_orden),
+            (reverse('finanzas:registrar_gasto'), nuevo_gasto),
+        ]
+        lecturas = [
+            reverse('ventas:detalle_orden', args=[orden]),
+            reverse('inventario:api_get_stock', args=[productos[0]]),
+        ]
+        return usuario, escrituras, lecturas
+
+    def ejecutar_carga(self, segundos, escritores, lectores):
+        logging.getLogger('bloquera.rendimiento').setLevel(logging.WARNING) # Sin una línea por petición
+
+        usuario, escrituras, lecturas = self.preparar()
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA journal_mode")
+            journal_mode = cursor.fetchone()[0]
+        clientes = []
+        for _ in range(escritores + lectores):
+            cliente = Client()
+            cliente.force_login(usuario)
+            clientes.append(cliente)
+        connection.close()
+
+        candado = threading.Lock()
+        tiempos_lectura, tiempos_escritura, fallidas = [], [], []
+        fin = time.monotonic() + segundos
+
+        def escritor(cliente, n):
+            ruta, datos = escrituras[n % len(escrituras)]
+            propios, errores = [], 0
+            while time.monotonic() < fin:
+                inicio = time.perf_counter()
+                try:
+                    # Éxito = redirección; un error atrapado por la vista vuelve a mostrar el formulario
+                    exito = cliente.post(ruta, datos).status_code == 302
+                except Exception: # "database is locked" fuera del bloque que la vista atrapa
+                    exito = False
+                if exito:
+                    propios.append((time.perf_counter() - inicio) * 1000)
+                else:
+                    errores += 1
+            with candado:
+                tiempos_escritura.extend(propios)
+                fallidas.append(errores)
+
+        def lector(cliente, n):
+            propios, i = [], n
+            while time.monotonic() < fin:
+                inicio = time.perf_counter()
+                try:
+                    cliente.get(lecturas[i % len(lecturas)])
+                except Exception:
+                    pass # Se cuenta igual: la latencia incluye la espera hasta el error
+                propios.append((time.perf_counter() - inicio) * 1000)
+                i += 1
+            with candado:
+                tiempos_lectura.extend(propios)
+
+        hebras = [threading.Thread(target=escritor, args=(clientes[n], n)) for n in range(escritores)]
+        hebras += [threading.Thread(target=lector, args=(clientes[escritores + n], n)) for n in range(lectores)]
+        inicio = time.monotonic()
+        for hebra in hebras:
+            hebra.start()
+        for hebra in hebras:
+            hebra.join()
+        duracion = time.monotonic() - inicio
+
+        return {
+            'journal_mode': journal_mode,
+            'lecturas': len(tiempos_lectura),
+            'lecturas_por_segundo': round(len(tiempos_lectura) / duracion, 1),
+            'lectura_p50_ms': round(percentil(tiempos_lectura, 50), 2) if tiempos_lectura else 0,
+            'lectura_p95_ms': round(percentil(tiempos_lectura, 95), 2) if tiempos_lectura else 0,
+            'lectura_max_ms': round(max(tiempos_lectura), 2) if tiempos_lectura else 0,
+            'escrituras': len(tiempos_escritura),
+            'escrituras_por_segundo': round(len(tiempos_escritura) / duracion, 1),
+            'escritura_p95_ms': round(percentil(tiempos_escritura, 95), 2) if tiempos_escritura else 0,
+            'escrituras_fallidas': sum(fallidas),
+        }
@@ -0,0 +1,179 @@
+# core/management/commands/medir_conexiones.py
+"""
+Comando: python manage.py medir_conexiones [--segundos 10] [--hilos 8] [--variantes sin_persistencia,persistente,pool]
+
+Mide peticiones por segundo de las vistas principales con distintas
+estrategias de conexión a la base de datos configurada (pensado para
+PostgreSQL local):
+
+- sin_persistencia: una conexión nueva por petición (CONN_MAX_AGE=0).
+- persistente: cada hilo reutiliza su conexión (CONN_MAX_AGE=60).
+- pool: pool de conexiones de Django (DB_POOL=True, requiere psycopg 3).
+
+Cada variante corre en un proceso aparte (la configuración de la base de
+datos se lee al iniciar) y las peticiones pasan por el WSGIHandler real,
+por lo que se abren y cierran conexiones igual que en producción. Solo se
+hacen lecturas; conviene cargar datos antes con 'generar_datos_prueba'.
+"""
+import io
+import json
+import logging
+import os
+import subprocess
+import sys
+import threading
+import time
+from importlib import import_module
+from wsgiref.util import setup_testing_defaults
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.auth.models import User
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.urls import reverse
+
+from core.instrumentacion import percentil
+from inventario.models import Producto
+from ventas.models import OrdenCompra
+
+VARIANTES = {
+    'sin_persistencia': {'DB_CONN_MAX_AGE': '0', 'DB_POOL': 'False'},
+    'persistente': {'DB_CONN_MAX_AGE': '60', 'DB_POOL': 'False'},
+    'pool': {'DB_CONN_MAX_AGE': '0', 'DB_POOL': 'True'},
+}
+
+
+class Command(BaseCommand):
+    help = "Peticiones por segundo de las vistas principales con y sin conexiones persistentes / pool."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--segundos', type=float, default=10, help="Duración de cada variante.")
+        parser.add_argument('--hilos', type=int, default=8, help="Peticiones concurrentes.")
+        parser.add_argument('--variantes', default=','.join(VARIANTES), help="Variantes separadas por coma.")
+        parser.add_argument('--salida', help="Archivo JSON donde guardar los resultados.")
+        parser.add_argument('--hijo', action='store_true', help="Uso interno: ejecuta una variante en este proceso.")
+
+    def handle(self, *args, **options):
+        if options['hijo']:
+            resultado = self.ejecutar_carga(options['segundos'], options['hilos'])
+            self.stdout.write(json.dumps(resultado))
+            return
+
+        variantes = options['variantes'].split(',')
+        desconocidas = set(variantes) - set(VARIANTES)
+        if desconocidas:
+            raise CommandError(f"Variantes desconocidas: {', '.join(sorted(desconocidas))}")
+        if connection.vendor != 'postgresql':
+            self.stderr.write(self.style.WARNING(
+                f"La base configurada es {connection.vendor}: los resultados no representan PostgreSQL "
+                "(use DB_ENGINE=postgresql). La variante 'pool' se omite."
+            ))
+            variantes = [v for v in variantes if v != 'pool']
+
+        resultados = {}
+        for variante in variantes:
+            self.stdout.write(f"Variante {variante}...")
+            entorno = dict(os.environ, **VARIANTES[variante])
+            proceso = subprocess.run(
+                [sys.executable, os.path.join(settings.BASE_DIR, 'manage.py'), 'medir_conexiones', '--hijo',
+                 '--segundos', str(options['segundos']), '--hilos', str(options['hilos'])],
+                env=entorno, capture_output=True, text=True,
+            )
+            if proceso.returncode != 0:
+                self.stderr.write(proceso.stderr.strip().splitlines()[-1] if proceso.stderr.strip() else "Error")
+                continue
+            resultados[variante] = json.loads(proceso.stdout.strip().splitlines()[-1])
+            datos = resultados[variante]
+            self.stdout.write(
+                f"  {datos['peticiones_por_segundo']:>8.1f} pet/s | p50 {datos['p50_ms']:.1f} ms | "
+                f"p95 {datos['p95_ms']:.1f} ms | conexiones abiertas {datos['conexiones_abiertas']} | "
+                f"errores {datos['errores']}"
+            )
+
+        if options['salida']:
+            with open(options['salida'], 'w', encoding='utf-8') as archivo:
+                json.dump({'motor': connection.vendor, 'hilos': options['hilos'], 'variantes': resultados},
+                          archivo, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Resultados en {options['salida']}"))
+
+    # --- Proceso hijo ---
+
+    def rutas(self):
+        orden = OrdenCompra.objects.order_by('-fecha').values_list('pk', flat=True).first()
+        producto = Producto.objects.values_list('pk', flat=True).first()
+        if not orden or not producto:
+            raise CommandError("No hay órdenes o productos: cargue datos con 'generar_datos_prueba'.")
+        return [
+            (reverse('inventario:api_get_stock', args=[producto]), ''),
+            (reverse('ventas:detalle_orden', args=[orden]), ''),
+            (reverse('recursos_humanos:api_asistencia_feed'), 'start=2025-01-01&end=2025-02-01'),
+            (reverse('core:home'), ''),
+        ]
+
+    def cookie_de_sesion(self):
+        """Sesión autenticada de un usuario de prueba (sin contraseña utilizable)."""
+        usuario, creado = User.objects.get_or_create(username='benchmark')
+        if creado:
+            usuario.set_unusable_password()
+            usuario.save()
+        sesion = import_module(settings.SESSION_ENGINE).SessionStore()
+        sesion[SESSION_KEY] = str(usuario.pk)
+        sesion[BACKEND_SESSION_KEY] = 'django.contrib.auth.backends.ModelBackend'
+        sesion[HASH_SESSION_KEY] = usuario.get_session_auth_hash()
+        sesion.save()
+        return f"{settings.SESSION_COOKIE_NAME}={sesion.session_key}"
+
+    def ejecutar_carga(self, segundos, hilos):
+        logging.getLogger('bloquera.rendimiento').setLevel(logging.WARNING) # Sin una línea por petición
+
+        rutas = self.rutas()
+        cookie = self.cookie_de_sesion()
+        connection.close()
+
+        aplicacion = WSGIHandler()
+        abiertas = []
+        connection_created.connect(lambda **kwargs: abiertas.append(1), weak=False)
+        tiempos, errores = [], []
+        fin = time.monotonic() + segundos
+
+        def trabajador(desplazamiento):
+            propios, fallas, i = [], 0, desplazamiento
+            while time.monotonic() < fin:
+                ruta, consulta = rutas[i % len(rutas)]
+                i += 1
+                entorno = {'PATH_INFO': ruta, 'QUERY_STRING': consulta, 'HTTP_COOKIE': cookie,
+                           'wsgi.input': io.BytesIO(), 'SERVER_NAME': 'localhost'}
+                setup_testing_defaults(entorno)
+                estado = []
+                inicio = time.perf_counter()
+                cuerpo = aplicacion(entorno, lambda s, h, exc_info=None: estado.append(s))
+                try:
+                    b''.join(cuerpo)
+                finally:
+                    if hasattr(cuerpo, 'close'):
+                        cuerpo.close() # Emite request_finished (cierra o conserva la conexión)
+                propios.append((time.perf_counter() - inicio) * 1000)
+                if not estado or not estado[0].startswith('200'):
+                    fallas += 1
+            tiempos.extend(propios)
+            errores.append(fallas)
+
+        inicio = time.monotonic()
+        hebras = [threading.Thread(target=trabajador, args=(n,)) for n in range(hilos)]
+        for hebra in hebras:
+            hebra.start()
+        for hebra in hebras:
+            hebra.join()
+        duracion = time.monotonic() - inicio
+
+        return {
+            'peticiones': len(tiempos),
+            'peticiones_por_segundo': round(len(tiempos) / duracion, 1),
+            'p50_ms': round(percentil(tiempos, 50), 2) if tiempos else None,
+            'p95_ms': round(percentil(tiempos, 95), 2) if tiempos else None,
+            'conexiones_abiertas': len(abiertas),
+            'errores': sum(errores),
+        }
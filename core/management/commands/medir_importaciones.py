@@ -0,0 +1,71 @@
+# core/management/commands/medir_importaciones.py
+"""
+Comando: python manage.py medir_importaciones [--repeticiones 5] [--top 15]
+
+Mide el arranque en frío de un worker: 'django.setup()' más la carga de
+todas las URLs (y con ellas, todas las vistas), en un proceso nuevo con
+'python -X importtime'. Muestra la mediana del tiempo total y los
+paquetes que más tardan en importarse, para detectar librerías pesadas
+que convendría importar solo al usarlas (como ReportLab y python-docx en
+'ventas/documentos.py').
+"""
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+ARRANQUE = (
+    "import django; django.setup(); "
+    "from django.urls import get_resolver; get_resolver().url_patterns"
+)
+
+
+class Command(BaseCommand):
+    help = "Tiempo de importación al iniciar un worker (django.setup() + URLs), con 'python -X importtime'."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeticiones', type=int, default=5, help="Procesos a medir (se informa la mediana).")
+        parser.add_argument('--top', type=int, default=15, help="Paquetes a mostrar.")
+
+    def handle(self, *args, **options):
+        entorno = dict(os.environ, DJANGO_SETTINGS_MODULE=settings.SETTINGS_MODULE)
+        totales, por_paquete = [], {}
+        for _ in range(options['repeticiones']):
+            inicio = time.perf_counter()
+            proceso = subprocess.run(
+                [sys.executable, '-X', 'importtime', '-c', ARRANQUE],
+                cwd=settings.BASE_DIR, env=entorno, capture_output=True, text=True,
+            )
+            totales.append((time.perf_counter() - inicio) * 1000)
+            if proceso.returncode != 0:
+                raise CommandError(proceso.stderr.strip().splitlines()[-1])
+            for paquete, microsegundos in self.leer_importtime(proceso.stderr).items():
+                por_paquete.setdefault(paquete, []).append(microsegundos)
+
+        self.stdout.write(
+            f"Arranque (proceso completo): mediana {statistics.median(totales):.0f} ms "
+            f"en {options['repeticiones']} procesos"
+        )
+        medianas = {paquete: statistics.median(tiempos) / 1000 for paquete, tiempos in por_paquete.items()}
+        self.stdout.write(f"Importaciones: {sum(medianas.values()):.0f} ms. Paquetes más costosos:")
+        for paquete, ms in sorted(medianas.items(), key=lambda item: item[1], reverse=True)[:options['top']]:
+            self.stdout.write(f"  {paquete:<30} {ms:>8.1f} ms")
+
+    @staticmethod
+    def leer_importtime(salida):
+        """
+        Tiempo propio (µs) de cada paquete de primer nivel a partir de la
+        salida de '-X importtime' ("import time: propio | acumulado | módulo").
+        """
+        tiempos = {}
+        for linea in salida.splitlines():
+            if not linea.startswith('import time:') or 'self [us]' in linea:
+                continue
+            propio, _, modulo = linea[len('import time:'):].split('|')
+            paquete = modulo.strip().split('.')[0]
+            tiempos[paquete] = tiempos.get(paquete, 0) + int(propio)
+        return tiempos
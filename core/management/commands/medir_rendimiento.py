@@ -0,0 +1,194 @@
+# core/management/commands/medir_rendimiento.py
+"""
+Comando: python manage.py medir_rendimiento [--escalas 1,10,100] [--repeticiones 5] [--salida rendimiento.json] [--comparar anterior.json]
+
+Benchmark de las vistas y reportes principales a distintos volúmenes de
+datos. Trabaja sobre una base de datos de prueba propia (la real no se
+toca): en cada escala la llena con 'generar_datos()' y mide cada caso
+varias veces (tiempo y cantidad de consultas SQL).
+
+El resultado se escribe en un JSON que incluye el commit actual, para
+comparar ejecuciones con --comparar.
+"""
+import json
+import logging
+import platform
+import statistics
+import subprocess
+import time
+from datetime import date, timedelta
+
+import django
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import reverse
+from django.utils import timezone
+
+from core.instrumentacion import medir, percentil
+from core.sinteticos import eliminar_datos, generar_datos
+from core.views import reporte_graficos_data
+from inventario.models import Producto
+from ventas.models import OrdenCompra
+
+
+def _commit_actual():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True, cwd=settings.BASE_DIR).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = "Mide tiempos y consultas de las vistas principales a escala 1×/10×/100× y genera un reporte JSON."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--escalas', default='1,10,100', help="Escalas separadas por coma.")
+        parser.add_argument('--repeticiones', type=int, default=5, help="Mediciones por caso.")
+        parser.add_argument('--anios', type=int, default=3, help="Años de historia generados.")
+        parser.add_argument('--salida', default='rendimiento.json', help="Archivo JSON del reporte.")
+        parser.add_argument('--comparar', help="Reporte anterior con el que comparar las medianas.")
+
+    def handle(self, *args, **options):
+        try:
+            escalas = [float(e) for e in options['escalas'].split(',')]
+        except ValueError:
+            raise CommandError("--escalas debe ser una lista de números separados por coma (ej. 1,10,100).")
+        if options['repeticiones'] < 1:
+            raise CommandError("--repeticiones debe ser al menos 1.")
+
+        anterior = None
+        if options['comparar']:
+            try:
+                with open(options['comparar'], encoding='utf-8') as archivo:
+                    anterior = json.load(archivo)
+            except (OSError, ValueError) as e:
+                raise CommandError(f"No se pudo leer {options['comparar']}: {e}")
+
+        reporte = {
+            'commit': _commit_actual(),
+            'fecha': timezone.now().isoformat(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'motor': connection.vendor,
+            'repeticiones': options['repeticiones'],
+            'escalas': {},
+        }
+
+        # El registro por petición del middleware no aporta nada aquí
+        logging.getLogger('bloquera.rendimiento').setLevel(logging.WARNING)
+        settings.DEBUG = False
+        setup_test_environment()
+        nombre_original = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            for escala in escalas:
+                eliminar_datos()
+                self.stdout.write(f"Escala {escala:g}: generando datos...")
+                inicio = time.perf_counter()
+                filas = generar_datos(escala, options['anios'])
+                carga = time.perf_counter() - inicio
+                self.stdout.write(f"  {sum(filas.values())} filas en {carga:.1f} s")
+
+                mediciones = self.medir_escala(options['repeticiones'])
+                reporte['escalas'][f"{escala:g}"] = {'filas': filas, 'carga_s': round(carga, 2), 'casos': mediciones}
+                for caso, datos in mediciones.items():
+                    self.stdout.write(
+                        f"  {caso:<28} mediana {datos['mediana_ms']:>9.1f} ms  "
+                        f"p95 {datos['p95_ms']:>9.1f} ms  consultas {datos['consultas']}"
+                    )
+        finally:
+            connection.creation.destroy_test_db(nombre_original, verbosity=0)
+            teardown_test_environment()
+
+        with open(options['salida'], 'w', encoding='utf-8') as archivo:
+            json.dump(reporte, archivo, indent=2, ensure_ascii=False)
+        self.stdout.write(self.style.SUCCESS(f"Reporte escrito en {options['salida']}"))
+
+        if anterior:
+            self.comparar(anterior, reporte)
+
+    # --- Casos medidos ---
+
+    def casos(self, cliente):
+        """{nombre: función sin argumentos que ejecuta el caso y devuelve la respuesta (o None)}."""
+        orden = OrdenCompra.objects.order_by('-fecha').values_list('pk', flat=True).first()
+        productos = list(Producto.objects.values_list('pk', 'precio_costo')[:3])
+        hoy = date.today()
+        feed = reverse('recursos_humanos:api_asistencia_feed') + (
+            f"?start={(hoy.replace(day=1) - timedelta(days=6)).isoformat()}"
+            f"&end={(hoy.replace(day=1) + timedelta(days=36)).isoformat()}"
+        )
+        nueva_orden = {
+            'fecha': hoy.isoformat(), 'cliente': 'Cliente benchmark', 'rut': '', 'direccion': '',
+            'tipo_proyecto': 'BLOQUERA',
+            'detalles-TOTAL_FORMS': str(len(productos)), 'detalles-INITIAL_FORMS': '0',
+            'detalles-MIN_NUM_FORMS': '0', 'detalles-MAX_NUM_FORMS': '1000',
+        }
+        for i, (pk, costo) in enumerate(productos):
+            nueva_orden.update({
+                f'detalles-{i}-producto': str(pk), f'detalles-{i}-cantidad': '5',
+                f'detalles-{i}-precio_unitario': str(costo * 2),
+            })
+
+        def reporte_graficos():
+            reporte_graficos_data()
+
+        def feed_sin_cache():
+            cache.clear()
+            return cliente.get(feed)
+
+        return {
+            'reporte_graficos_data': reporte_graficos,
+            'descargar_orden_pdf': lambda: cliente.get(reverse('ventas:descargar_orden_pdf', args=[orden])),
+            'asistencia_feed': feed_sin_cache,
+            'asistencia_feed (caché)': lambda: cliente.get(feed),
+            'crear_orden': lambda: cliente.post(reverse('ventas:crear_orden'), nueva_orden),
+        }
+
+    def medir_escala(self, repeticiones):
+        usuario, _ = User.objects.get_or_create(username='benchmark')
+        cliente = Client()
+        cliente.force_login(usuario)
+
+        resultados = {}
+        for nombre, caso in self.casos(cliente).items():
+            caso() # Calentamiento (imports, plantillas, caché)
+            tiempos, consultas = [], 0
+            for _ in range(repeticiones):
+                with medir() as medicion:
+                    respuesta = caso()
+                    if respuesta is not None:
+                        if respuesta.status_code >= 400:
+                            raise CommandError(f"{nombre} respondió {respuesta.status_code}")
+                        b''.join(getattr(respuesta, 'streaming_content', [b'']))
+                tiempos.append(medicion.tiempo_total_ms)
+                consultas = max(consultas, medicion.consultas)
+            resultados[nombre] = {
+                'min_ms': min(tiempos),
+                'mediana_ms': round(statistics.median(tiempos), 2),
+                'p95_ms': percentil(tiempos, 95),
+                'media_ms': round(statistics.mean(tiempos), 2),
+                'consultas': consultas,
+            }
+        return resultados
+
+    def comparar(self, anterior, actual):
+        """Imprime la razón entre medianas (actual / anterior) por escala y caso."""
+        self.stdout.write(f"\nComparación con {anterior.get('commit')} (actual / anterior):")
+        for escala, datos in actual['escalas'].items():
+            previos = anterior.get('escalas', {}).get(escala, {}).get('casos', {})
+            for caso, medicion in datos['casos'].items():
+                if caso not in previos or not previos[caso]['mediana_ms']:
+                    continue
+                razon = medicion['mediana_ms'] / previos[caso]['mediana_ms']
+                estilo = self.style.ERROR if razon > 1.2 else self.style.SUCCESS if razon < 0.8 else str
+                self.stdout.write(estilo(
+                    f"  {escala:>5}× {caso:<28} {razon:5.2f}×  "
+                    f"consultas {previos[caso]['consultas']} → {medicion['consultas']}"
+                ))
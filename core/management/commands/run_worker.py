@@ -0,0 +1,109 @@
+# core/management/commands/run_worker.py
+"""
+Comando: python manage.py run_worker [--concurrencia 2] [--procesos 1] [--intervalo 1] [--una-vez]
+
+Ejecuta las tareas en segundo plano de core/tareas.py. Cada worker tiene
+un pool de '--concurrencia' hilos (por defecto TAREAS_CONCURRENCIA) que
+reclaman tareas de la base de datos; '--procesos N' lanza N workers como
+procesos hijos (útil para tareas de CPU como los PDF, que en un mismo
+proceso compiten por el GIL). Se pueden correr varios 'run_worker' en
+paralelo, incluso en otras máquinas: nunca toman la misma tarea.
+
+Se detiene con Ctrl+C / SIGTERM después de terminar las tareas en curso.
+'--una-vez' procesa lo pendiente y sale (para cron o tests).
+"""
+import os
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+from django.utils.module_loading import autodiscover_modules
+
+from core import tareas
+
+# Cada cuánto se revisan las tareas abandonadas y se borran las antiguas
+MANTENCION_SEGUNDOS = 60
+
+
+class Command(BaseCommand):
+    help = "Ejecuta las tareas en segundo plano pendientes (cola en la base de datos)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrencia', type=int, default=None,
+                            help="Hilos que ejecutan tareas (por defecto TAREAS_CONCURRENCIA).")
+        parser.add_argument('--procesos', type=int, default=1, help="Procesos worker a lanzar.")
+        parser.add_argument('--intervalo', type=float, default=1.0,
+                            help="Segundos de espera cuando no hay tareas pendientes.")
+        parser.add_argument('--una-vez', action='store_true', help="Procesa lo pendiente y termina.")
+
+    def handle(self, *args, **options):
+        if options['procesos'] > 1:
+            return self.lanzar_procesos(options)
+
+        autodiscover_modules('tareas') # Registra las tareas de cada app (solo en el worker)
+        concurrencia = max(options['concurrencia'] or settings.TAREAS_CONCURRENCIA, 1)
+        self.detener = threading.Event()
+        for senal in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(senal, lambda *_: self.detener.set())
+
+        self.stdout.write(
+            f"Worker {os.getpid()}: {concurrencia} hilo(s), tareas registradas: {', '.join(sorted(tareas.REGISTRO))}"
+        )
+        self.mantencion()
+        with ThreadPoolExecutor(max_workers=concurrencia, thread_name_prefix='tarea') as pool:
+            hilos = [pool.submit(self.bucle, options['intervalo'], options['una_vez']) for _ in range(concurrencia)]
+            for hilo in hilos:
+                hilo.result()
+        connection.close()
+        self.stdout.write(f"Worker {os.getpid()} detenido.")
+
+    def bucle(self, intervalo, una_vez):
+        """Reclama y ejecuta tareas hasta que se pida detener el worker."""
+        nombre = f"{socket.gethostname()}:{os.getpid()}:{threading.current_thread().name}"
+        ultima_mantencion = time.monotonic()
+        try:
+            while not self.detener.is_set():
+                close_old_connections() # Como entre peticiones: descarta conexiones caídas o vencidas
+                tarea = tareas.reclamar(nombre)
+                if tarea is not None:
+                    tareas.ejecutar(tarea)
+                    continue
+                if una_vez:
+                    break
+                if time.monotonic() - ultima_mantencion > MANTENCION_SEGUNDOS:
+                    self.mantencion()
+                    ultima_mantencion = time.monotonic()
+                self.detener.wait(intervalo)
+        finally:
+            connection.close() # Cada hilo tiene su propia conexión
+
+    def mantencion(self):
+        reencoladas = tareas.reencolar_abandonadas()
+        eliminadas = tareas.limpiar_antiguas()
+        if reencoladas or eliminadas:
+            self.stdout.write(f"Tareas abandonadas reencoladas: {reencoladas}, antiguas eliminadas: {eliminadas}")
+
+    def lanzar_procesos(self, options):
+        """Lanza 'run_worker' en procesos hijos y espera a que terminen (reenvía SIGINT/SIGTERM)."""
+        comando = [sys.executable, os.path.join(settings.BASE_DIR, 'manage.py'), 'run_worker',
+                   '--intervalo', str(options['intervalo'])]
+        if options['concurrencia']:
+            comando += ['--concurrencia', str(options['concurrencia'])]
+        if options['una_vez']:
+            comando.append('--una-vez')
+        hijos = [subprocess.Popen(comando) for _ in range(options['procesos'])]
+
+        def reenviar(senal, _):
+            for hijo in hijos:
+                hijo.send_signal(senal)
+        for senal in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(senal, reenviar)
+        for hijo in hijos:
+            hijo.wait()
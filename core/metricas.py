@@ -0,0 +1,296 @@
+# core/metricas.py
+"""
+Métricas de la aplicación en formato de texto de Prometheus.
+
+- Contadores e histogramas en memoria del proceso: actualizar uno es sumar
+  en un diccionario bajo un candado propio de la métrica (sin E/S).
+- Con METRICAS_DIRECTORIO configurado, cada proceso vuelca sus valores a
+  '<directorio>/metricas-<pid>-<id>.json' como máximo una vez por
+  METRICAS_INTERVALO segundos (y al terminar). El endpoint '/metrics' suma
+  los archivos de todos los procesos, así cualquier worker responde con el
+  total del servidor. El '<id>' aleatorio distingue a un proceso nuevo que
+  reutiliza el PID de uno terminado: su archivo no pisa el del anterior.
+- Un error al volcar (disco lleno, permisos) se registra en el log y no
+  llega a quien actualiza la métrica.
+
+Uso:
+    ORDENES_CREADAS.inc(tipo_proyecto='BLOQUERA')
+    DURACION_PETICION.observe(0.132, vista='ventas:lista_ordenes', metodo='GET')
+"""
+import atexit
+import contextlib
+import functools
+import glob
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+import uuid
+
+from django.conf import settings
+
+logger = logging.getLogger('bloquera.rendimiento')
+
+BUCKETS_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+BUCKETS_CONSULTAS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+BUCKETS_TAREAS = (0.1, 0.5, 1, 5, 10, 30, 60, 300, 900)
+
+_METRICAS = {} # {nombre: métrica}, en orden de registro
+
+
+class _Metrica:
+    tipo = None
+
+    def __init__(self, nombre, ayuda, etiquetas=()):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+        self.valores = {} # {(valores de etiquetas): valor}
+        self._candado = threading.Lock()
+        _METRICAS[nombre] = self
+
+    def _clave(self, etiquetas):
+        return tuple(str(etiquetas.get(nombre, '')) for nombre in self.etiquetas)
+
+    def _texto_etiquetas(self, clave, extra=None):
+        pares = list(zip(self.etiquetas, clave)) + ([extra] if extra else [])
+        if not pares:
+            return ''
+        escapar = lambda v: str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        return '{' + ','.join(f'{nombre}="{escapar(valor)}"' for nombre, valor in pares) + '}'
+
+
+class Contador(_Metrica):
+    tipo = 'counter'
+
+    def inc(self, cantidad=1, **etiquetas):
+        clave = self._clave(etiquetas)
+        with self._candado:
+            self.valores[clave] = self.valores.get(clave, 0) + cantidad
+        _volcar_si_corresponde()
+
+    @staticmethod
+    def sumar(a, b):
+        return (a or 0) + b
+
+    def lineas(self, valores):
+        for clave, valor in sorted(valores.items()):
+            yield f"{self.nombre}{self._texto_etiquetas(clave)} {valor}"
+
+
+class Histograma(_Metrica):
+    tipo = 'histogram'
+
+    def __init__(self, nombre, ayuda, etiquetas=(), buckets=BUCKETS_SEGUNDOS):
+        super().__init__(nombre, ayuda, etiquetas)
+        self.buckets = tuple(buckets)
+
+    def observe(self, valor, **etiquetas):
+        clave = self._clave(etiquetas)
+        with self._candado:
+            serie = self.valores.get(clave)
+            if serie is None:
+                # [conteos por bucket (no acumulados) ..., +Inf, suma]
+                serie = self.valores[clave] = [0] * (len(self.buckets) + 2)
+            for i, limite in enumerate(self.buckets):
+                if valor <= limite:
+                    serie[i] += 1
+                    break
+            else:
+                serie[-2] += 1
+            serie[-1] += valor
+        _volcar_si_corresponde()
+
+    @staticmethod
+    def sumar(a, b):
+        return [x + y for x, y in zip(a, b)] if a else list(b)
+
+    def lineas(self, valores):
+        for clave, serie in sorted(valores.items()):
+            acumulado = 0
+            for limite, conteo in zip(self.buckets + ('+Inf',), serie[:-1]):
+                acumulado += conteo
+                yield f"{self.nombre}_bucket{self._texto_etiquetas(clave, ('le', limite))} {acumulado}"
+            yield f"{self.nombre}_sum{self._texto_etiquetas(clave)} {round(serie[-1], 6)}"
+            yield f"{self.nombre}_count{self._texto_etiquetas(clave)} {acumulado}"
+
+
+# --- Métricas de la aplicación ---
+
+DURACION_PETICION = Histograma(
+    'bloquera_http_request_duration_seconds', "Duración de las peticiones HTTP por vista.",
+    etiquetas=('vista', 'metodo'),
+)
+CONSULTAS_PETICION = Histograma(
+    'bloquera_db_queries_per_request', "Consultas SQL por petición HTTP.",
+    etiquetas=('vista',), buckets=BUCKETS_CONSULTAS,
+)
+ORDENES_CREADAS = Contador(
+    'bloquera_ordenes_creadas_total', "Órdenes de compra creadas.", etiquetas=('tipo_proyecto',),
+)
+ORDENES_SIN_STOCK = Contador(
+    'bloquera_ordenes_rechazadas_sin_stock_total', "Órdenes rechazadas en 'crear_orden' por falta de stock.",
+)
+DEVOLUCIONES = Contador(
+    'bloquera_devoluciones_total', "Devoluciones parciales y anulaciones de órdenes.", etiquetas=('tipo',),
+)
+PAGOS_REGISTRADOS = Contador('bloquera_pagos_registrados_total', "Pagos (abonos) registrados en órdenes.")
+MONTO_PAGOS = Contador('bloquera_pagos_monto_pesos_total', "Suma de los pagos registrados en órdenes (pesos).")
+DOCUMENTOS_GENERADOS = Contador(
+    'bloquera_documentos_generados_total', "Documentos generados (PDF/DOCX).", etiquetas=('formato',),
+)
+DURACION_DOCUMENTO = Histograma(
+    'bloquera_documento_duracion_seconds', "Tiempo de generación de documentos (PDF/DOCX).",
+    etiquetas=('formato',),
+)
+
+TAREAS_EJECUTADAS = Contador(
+    'bloquera_tareas_ejecutadas_total', "Ejecuciones de tareas en segundo plano por resultado.",
+    etiquetas=('tipo', 'resultado'),
+)
+DURACION_TAREA = Histograma(
+    'bloquera_tarea_duracion_seconds', "Duración de las tareas en segundo plano.",
+    etiquetas=('tipo',), buckets=BUCKETS_TAREAS,
+)
+
+
+def medir_documento(formato):
+    """
+    Decorador de vistas que generan documentos: cuenta las respuestas
+    exitosas y registra cuánto tardó la vista en generarlas.
+    """
+    def decorador(vista):
+        @functools.wraps(vista)
+        def envoltura(request, *args, **kwargs):
+            inicio = time.perf_counter()
+            respuesta = vista(request, *args, **kwargs)
+            if respuesta.status_code == 200:
+                DURACION_DOCUMENTO.observe(time.perf_counter() - inicio, formato=formato)
+                DOCUMENTOS_GENERADOS.inc(formato=formato)
+            return respuesta
+        return envoltura
+    return decorador
+
+
+# --- Volcado y agregación entre procesos ---
+
+_ultimo_volcado = 0.0
+_candado_volcado = threading.Lock()
+_proceso = (None, None) # (pid, nombre del archivo de este proceso)
+
+
+def _archivo_propio():
+    """
+    Ruta del archivo de este proceso. El nombre se genera de nuevo si
+    cambia el PID (un worker creado con fork no hereda el del padre).
+    """
+    global _proceso
+    pid = os.getpid()
+    if _proceso[0] != pid:
+        _proceso = (pid, f"metricas-{pid}-{uuid.uuid4().hex[:12]}.json")
+    return os.path.join(settings.METRICAS_DIRECTORIO, _proceso[1])
+
+
+def _instantanea():
+    instantanea = {}
+    for metrica in _METRICAS.values():
+        with metrica._candado:
+            instantanea[metrica.nombre] = [
+                [list(clave), list(valor) if isinstance(valor, list) else valor]
+                for clave, valor in metrica.valores.items()
+            ]
+    return instantanea
+
+
+def volcar():
+    """
+    Escribe los valores de este proceso en METRICAS_DIRECTORIO.
+
+    Un solo hilo vuelca a la vez y cada volcado usa su propio archivo
+    temporal (mkstemp) que luego reemplaza al del proceso (escritura atómica).
+    """
+    directorio = settings.METRICAS_DIRECTORIO
+    if not directorio:
+        return
+    with _candado_volcado:
+        os.makedirs(directorio, exist_ok=True)
+        descriptor, temporal = tempfile.mkstemp(prefix='.metricas-', suffix='.tmp', dir=directorio)
+        try:
+            with os.fdopen(descriptor, 'w', encoding='utf-8') as archivo:
+                json.dump(_instantanea(), archivo)
+            os.replace(temporal, _archivo_propio())
+        except BaseException:
+            with contextlib.suppress(OSError):
+                os.unlink(temporal)
+            raise
+
+
+def _volcar_sin_errores():
+    try:
+        volcar()
+    except Exception:
+        logger.exception("No se pudieron volcar las métricas en %s", settings.METRICAS_DIRECTORIO)
+
+
+def _volcar_si_corresponde():
+    global _ultimo_volcado
+    if not settings.METRICAS_DIRECTORIO or time.monotonic() - _ultimo_volcado < settings.METRICAS_INTERVALO:
+        return
+    # Revisar y marcar el intervalo bajo el candado: solo un hilo vuelca por intervalo
+    # (los demás siguen de largo sin esperar)
+    if not _candado_volcado.acquire(blocking=False):
+        return
+    try:
+        if time.monotonic() - _ultimo_volcado < settings.METRICAS_INTERVALO:
+            return
+        _ultimo_volcado = time.monotonic()
+    finally:
+        _candado_volcado.release()
+    _volcar_sin_errores()
+
+
+atexit.register(_volcar_sin_errores)
+
+
+def valores_agregados():
+    """
+    Valores de todas las métricas sumando los procesos.
+    Los archivos de procesos ya terminados se conservan para que los
+    contadores no retrocedan.
+    """
+    propios = _instantanea()
+    por_proceso = [propios]
+    if settings.METRICAS_DIRECTORIO:
+        propio = _archivo_propio()
+        for ruta in glob.glob(os.path.join(settings.METRICAS_DIRECTORIO, 'metricas-*.json')):
+            if ruta == propio:
+                continue
+            try:
+                with open(ruta, encoding='utf-8') as archivo:
+                    por_proceso.append(json.load(archivo))
+            except (OSError, ValueError):
+                continue # Archivo a medio escribir o eliminado: se omite en esta lectura
+
+    totales = {nombre: {} for nombre in _METRICAS}
+    for datos in por_proceso:
+        for nombre, filas in datos.items():
+            metrica = _METRICAS.get(nombre)
+            if metrica is None:
+                continue
+            for clave, valor in filas:
+                clave = tuple(clave)
+                totales[nombre][clave] = metrica.sumar(totales[nombre].get(clave), valor)
+    return totales
+
+
+def exposicion():
+    """Texto de todas las métricas en el formato de exposición de Prometheus."""
+    totales = valores_agregados()
+    lineas = []
+    for nombre, metrica in _METRICAS.items():
+        lineas.append(f"# HELP {nombre} {metrica.ayuda}")
+        lineas.append(f"# TYPE {nombre} {metrica.tipo}")
+        lineas.extend(metrica.lineas(totales[nombre]))
+    return "\n".join(lineas) + "\n"
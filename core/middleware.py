@@ -0,0 +1,164 @@
+# core/middleware.py
+"""
+Middlewares propios del proyecto.
+"""
+import logging
+import random
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified
+
+from . import estaticos, metricas
+from .instrumentacion import medir, vista_actual
+from .perfilador import perfilar
+
+logger = logging.getLogger('bloquera.rendimiento')
+
+
+class MetricasPeticionMiddleware:
+    """
+    Mide cada petición: cantidad de consultas SQL, tiempo total en la base
+    de datos y tiempo total de la petición.
+
+    - Con DEBUG=True los valores se agregan como cabeceras de la respuesta
+      (X-DB-Queries, X-DB-Time-ms, X-Request-Time-ms y Server-Timing).
+    - Siempre se emite un registro estructurado en el logger
+      'bloquera.rendimiento' (campos en 'extra').
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with medir() as medicion:
+            try:
+                response = self.get_response(request)
+            finally:
+                vista_actual.set(None)
+
+        match = getattr(request, 'resolver_match', None)
+        datos = {
+            'metodo': request.method,
+            'ruta': request.path,
+            'vista': match.view_name if match else None,
+            'estado': response.status_code,
+            'consultas': medicion.consultas,
+            'tiempo_db_ms': medicion.tiempo_db_ms,
+            'tiempo_total_ms': medicion.tiempo_total_ms,
+        }
+        vista = datos['vista'] or 'sin_vista' # 404 y similares: una sola serie
+        metricas.DURACION_PETICION.observe(medicion.tiempo_total, vista=vista, metodo=request.method)
+        metricas.CONSULTAS_PETICION.observe(medicion.consultas, vista=vista)
+        logger.info(
+            "%(metodo)s %(ruta)s %(estado)s consultas=%(consultas)s db=%(tiempo_db_ms)sms total=%(tiempo_total_ms)sms",
+            datos, extra=datos
+        )
+
+        if settings.DEBUG:
+            response['X-DB-Queries'] = str(medicion.consultas)
+            response['X-DB-Time-ms'] = str(medicion.tiempo_db_ms)
+            response['X-Request-Time-ms'] = str(medicion.tiempo_total_ms)
+            response['Server-Timing'] = f'db;dur={medicion.tiempo_db_ms}, total;dur={medicion.tiempo_total_ms}'
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # Para que el registro de consultas lentas sepa qué vista las originó
+        vista_actual.set(request.resolver_match.view_name)
+
+
+class PerfiladorMiddleware:
+    """
+    Perfilador a pedido (cProfile + SQL) para usuarios staff.
+
+    - Un usuario staff agrega '?perfilar=html' (o '?perfilar=prof'), o la
+      cabecera 'X-Perfilar: html|prof', a cualquier URL y recibe el reporte
+      en lugar de la página.
+    - Con PERFILADOR_MUESTREO > 0 se perfila esa fracción del tráfico normal
+      (cualquier usuario): la respuesta no cambia (las de streaming siguen
+      en streaming) y el perfil se guarda en PERFILADOR_DIRECTORIO; si no
+      se puede guardar, se registra el error y la petición sigue igual.
+
+    Si PERFILADOR_ACTIVO es False el middleware se retira de la cadena al
+    iniciar (cero costo por petición).
+    """
+
+    def __init__(self, get_response):
+        if not settings.PERFILADOR_ACTIVO:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        self.muestreo = settings.PERFILADOR_MUESTREO
+
+    def __call__(self, request):
+        formato = request.GET.get('perfilar') or request.headers.get('X-Perfilar')
+        if formato and request.user.is_staff:
+            return self.reporte(request, formato)
+        if self.muestreo and random.random() < self.muestreo:
+            perfil = perfilar(self.get_response, request)
+            try:
+                ruta = perfil.guardar(settings.PERFILADOR_DIRECTORIO)
+            except OSError: # Disco lleno, permisos...: el usuario igual recibe su respuesta
+                logger.exception("No se pudo guardar el perfil de %s", request.path)
+            else:
+                logger.info("Perfil guardado en %s", ruta)
+            return perfil.respuesta
+        return self.get_response(request)
+
+    def reporte(self, request, formato):
+        perfil = perfilar(self.get_response, request, consumir_streaming=True)
+        if formato == 'prof':
+            response = HttpResponse(perfil.datos_prof(), content_type='application/octet-stream')
+            response['Content-Disposition'] = f'attachment; filename="{perfil.nombre_base()}.prof"'
+        else:
+            response = HttpResponse(perfil.html())
+        response['Cache-Control'] = 'no-store'
+        return response
+
+
+class EstaticosMiddleware:
+    """
+    Sirve STATIC_ROOT (lo generado por 'collectstatic') sin un servidor web
+    aparte, para instalaciones de un solo proceso/binario.
+
+    - Entrega la versión '.br' o '.gz' precomprimida si el navegador la
+      acepta (Accept-Encoding), con 'Vary: Accept-Encoding'.
+    - Los archivos con hash en el nombre se sirven con caché de un año e
+      'immutable'; el resto con una caché corta y ETag/Last-Modified (304).
+    - No toca la sesión ni la base de datos.
+
+    Con ESTATICOS_SERVIR=False (p. ej. detrás de nginx) se retira de la
+    cadena al iniciar.
+    """
+
+    def __init__(self, get_response):
+        if not settings.ESTATICOS_SERVIR:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        self.prefijo = settings.STATIC_URL if settings.STATIC_URL.startswith('/') else '/' + settings.STATIC_URL
+
+    def __call__(self, request):
+        if request.method in ('GET', 'HEAD') and request.path_info.startswith(self.prefijo):
+            archivo = estaticos.buscar(request.path_info[len(self.prefijo):])
+            if archivo is not None:
+                return self.servir(request, archivo)
+        return self.get_response(request)
+
+    def servir(self, request, archivo):
+        cabeceras = {
+            'Cache-Control': archivo.cache_control,
+            'ETag': archivo.etag,
+            'Last-Modified': archivo.modificado,
+        }
+        if archivo.comprimidos:
+            cabeceras['Vary'] = 'Accept-Encoding'
+        if (request.headers.get('If-None-Match') == archivo.etag
+                or request.headers.get('If-Modified-Since') == archivo.modificado):
+            response = HttpResponseNotModified()
+        else:
+            ruta, codificacion = archivo.elegir(request.headers.get('Accept-Encoding', ''))
+            response = FileResponse(open(ruta, 'rb'), content_type=archivo.tipo)
+            if codificacion:
+                response['Content-Encoding'] = codificacion
+        for nombre, valor in cabeceras.items():
+            response[nombre] = valor
+        return response
@@ -1,3 +1,113 @@
+# core/models.py
+"""
+Modelos base compartidos por las apps y la cola de tareas en segundo plano.
+"""
+from django.conf import settings
 from django.db import models
+from django.db.models import F
+from django.utils import timezone
 
-# Create your models here.
+
+class VersionadoQuerySet(models.QuerySet):
+    """
+    QuerySet que mantiene 'version' y 'actualizado' también en las
+    escrituras masivas: 'update()' (incluidas las que usan F()) y
+    'bulk_update()'. 'bulk_create()' usa los valores por defecto.
+    """
+
+    def update(self, **kwargs):
+        kwargs.setdefault('version', F('version') + 1)
+        kwargs.setdefault('actualizado', timezone.now())
+        return super().update(**kwargs)
+
+    def bulk_update(self, objs, fields, batch_size=None):
+        ahora = timezone.now()
+        for obj in objs:
+            obj.version += 1
+            obj.actualizado = ahora
+        fields = list(fields) + [campo for campo in ('version', 'actualizado') if campo not in fields]
+        return super().bulk_update(objs, fields, batch_size=batch_size)
+
+
+class ModeloVersionado(models.Model):
+    """
+    Modelo abstracto con fecha de última modificación y contador de versión.
+
+    Cada escritura (save, update, bulk_update) incrementa 'version' y
+    actualiza 'actualizado'; con ellos se responden los GET condicionales
+    (ETag / Last-Modified, ver core/condicional.py) con una sola consulta
+    por clave primaria.
+    """
+
+    version = models.PositiveIntegerField(default=1, editable=False)
+    actualizado = models.DateTimeField(default=timezone.now, editable=False)
+
+    objects = VersionadoQuerySet.as_manager()
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            self.version += 1
+        self.actualizado = timezone.now()
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'version', 'actualizado'}
+        super().save(*args, **kwargs)
+
+
+class Tarea(models.Model):
+    """
+    Trabajo pesado que se ejecuta en segundo plano ('manage.py run_worker').
+
+    La vista que la encola responde de inmediato con la página de estado
+    de la tarea; el worker la reclama, la ejecuta y, si produce un archivo,
+    lo deja en TAREAS_DIRECTORIO para descargarlo. Ver core/tareas.py.
+    """
+
+    class Estado(models.TextChoices):
+        PENDIENTE = 'PENDIENTE', 'Pendiente'
+        EN_CURSO = 'EN_CURSO', 'En curso'
+        COMPLETADA = 'COMPLETADA', 'Completada'
+        FALLIDA = 'FALLIDA', 'Fallida'
+
+    tipo = models.CharField(max_length=100) # Nombre registrado con @tarea
+    argumentos = models.JSONField(default=dict, blank=True)
+    descripcion = models.CharField(max_length=200, blank=True)
+    estado = models.CharField(max_length=10, choices=Estado.choices, default=Estado.PENDIENTE)
+    usuario = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='tareas'
+    )
+
+    intentos = models.PositiveSmallIntegerField(default=0)
+    max_intentos = models.PositiveSmallIntegerField(default=3)
+    disponible_desde = models.DateTimeField(default=timezone.now) # Se posterga al reintentar
+    creada = models.DateTimeField(auto_now_add=True)
+    iniciada = models.DateTimeField(null=True, blank=True)
+    latido = models.DateTimeField(null=True, blank=True) # Lo renueva el worker mientras la ejecuta
+    terminada = models.DateTimeField(null=True, blank=True)
+    trabajador = models.CharField(max_length=100, blank=True) # 'host:pid:hilo' que la reclamó
+    error = models.TextField(blank=True)
+
+    # Resultado (si la tarea genera un archivo)
+    archivo = models.CharField(max_length=255, blank=True) # Relativo a TAREAS_DIRECTORIO
+    nombre_archivo = models.CharField(max_length=255, blank=True)
+    tipo_contenido = models.CharField(max_length=100, blank=True)
+
+    class Meta:
+        ordering = ['-creada']
+        indexes = [
+            # La consulta del worker: pendientes ya disponibles, por antigüedad
+            models.Index(fields=['estado', 'disponible_desde'], name='tarea_estado_disp_idx'),
+        ]
+
+    def __str__(self):
+        return f"Tarea #{self.pk} {self.tipo} ({self.get_estado_display()})"
+
+    @property
+    def terminada_ok(self):
+        return self.estado == self.Estado.COMPLETADA
+
+    @property
+    def activa(self):
+        return self.estado in (self.Estado.PENDIENTE, self.Estado.EN_CURSO)
@@ -0,0 +1,128 @@
+# core/perfilador.py
+"""
+Perfilado de peticiones con cProfile (lo usa 'PerfiladorMiddleware').
+
+Ejecuta la petición completa bajo cProfile y, al mismo tiempo, registra
+cada sentencia SQL con su duración. El resultado se entrega como reporte
+HTML, como archivo '.prof' (compatible con pstats/snakeviz) o se guarda
+en PERFILADOR_DIRECTORIO cuando la petición fue elegida por muestreo.
+"""
+import cProfile
+import io
+import json
+import marshal
+import os
+import pstats
+import re
+from collections import Counter
+
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from .instrumentacion import medir
+
+# Funciones que se muestran en el reporte HTML
+LIMITE_FUNCIONES = 60
+
+
+class Perfil:
+    """Resultado de perfilar una petición."""
+
+    def __init__(self, request, respuesta, profiler, medicion):
+        self.request = request
+        self.respuesta = respuesta
+        self.profiler = profiler
+        self.medicion = medicion
+        match = getattr(request, 'resolver_match', None)
+        self.vista = match.view_name if match else None
+
+    def datos_prof(self):
+        """Contenido de un archivo '.prof' (el mismo formato de 'pstats.Stats.dump_stats')."""
+        self.profiler.create_stats()
+        return marshal.dumps(self.profiler.stats)
+
+    def texto_pstats(self, orden='cumulative', limite=LIMITE_FUNCIONES):
+        salida = io.StringIO()
+        pstats.Stats(self.profiler, stream=salida).sort_stats(orden).print_stats(limite)
+        return salida.getvalue()
+
+    def sentencias_repetidas(self):
+        """Sentencias ejecutadas más de una vez (ignorando los valores de los parámetros)."""
+        formas = Counter(re.sub(r"\b\d+\b|'[^']*'", '?', sql) for sql, _ in self.medicion.sentencias)
+        return [(sql, veces) for sql, veces in formas.most_common() if veces > 1]
+
+    def nombre_base(self):
+        """Nombre de archivo sin extensión (ej. '20251104-153012-123456-ventas_descargar_orden_pdf')."""
+        vista = re.sub(r'[^A-Za-z0-9]+', '_', self.vista or 'sin_vista')
+        return f"{timezone.now():%Y%m%d-%H%M%S-%f}-{vista}"
+
+    def html(self):
+        sentencias = [
+            {'numero': i, 'sql': sql, 'ms': round(segundos * 1000, 2)}
+            for i, (sql, segundos) in enumerate(self.medicion.sentencias, start=1)
+        ]
+        return render_to_string('core/perfil.html', {
+            'perfil': self,
+            'metodo': self.request.method,
+            'ruta': self.request.get_full_path(),
+            'estado': self.respuesta.status_code,
+            'tipo_contenido': self.respuesta.get('Content-Type', ''),
+            'tiempo_total_ms': self.medicion.tiempo_total_ms,
+            'tiempo_db_ms': self.medicion.tiempo_db_ms,
+            'consultas': self.medicion.consultas,
+            'sentencias': sentencias,
+            'lentas': sorted(sentencias, key=lambda s: s['ms'], reverse=True)[:10],
+            'repetidas': self.sentencias_repetidas(),
+            'por_acumulado': self.texto_pstats('cumulative'),
+            'por_propio': self.texto_pstats('tottime'),
+        })
+
+    def guardar(self, directorio):
+        """
+        Guarda '<nombre>.prof' y '<nombre>.json' (resumen y SQL) en 'directorio'.
+
+        Returns:
+            str: Ruta del archivo '.prof'.
+        """
+        os.makedirs(directorio, exist_ok=True)
+        base = os.path.join(directorio, self.nombre_base())
+        with open(base + '.prof', 'wb') as archivo:
+            archivo.write(self.datos_prof())
+        with open(base + '.json', 'w', encoding='utf-8') as archivo:
+            json.dump({
+                'metodo': self.request.method,
+                'ruta': self.request.get_full_path(),
+                'vista': self.vista,
+                'estado': self.respuesta.status_code,
+                'tiempo_total_ms': self.medicion.tiempo_total_ms,
+                'tiempo_db_ms': self.medicion.tiempo_db_ms,
+                'consultas': self.medicion.consultas,
+                'sentencias': [[sql, round(segundos * 1000, 3)] for sql, segundos in self.medicion.sentencias],
+            }, archivo, ensure_ascii=False, indent=1)
+        return base + '.prof'
+
+
+def perfilar(get_response, request, consumir_streaming=False):
+    """
+    Ejecuta 'get_response(request)' bajo cProfile registrando el SQL.
+
+    Con 'consumir_streaming' (el reporte a pedido, que reemplaza la
+    respuesta) las respuestas en streaming se consumen dentro del perfil,
+    así se mide también lo que se genera al enviarlas. Sin él (muestreo)
+    se dejan intactas para que sigan llegando de a trozos al cliente: el
+    perfil cubre solo hasta que la vista devuelve la respuesta.
+
+    Returns:
+        Perfil
+    """
+    profiler = cProfile.Profile()
+    with medir(guardar_sentencias=True) as medicion:
+        profiler.enable()
+        try:
+            respuesta = get_response(request)
+            if consumir_streaming and respuesta.streaming:
+                contenido = b''.join(respuesta.streaming_content)
+                respuesta.streaming_content = [contenido]
+        finally:
+            profiler.disable()
+    return Perfil(request, respuesta, profiler, medicion)
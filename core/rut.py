@@ -0,0 +1,48 @@
+# core/rut.py
+"""
+Utilidades para el RUT chileno, compartidas por las distintas apps.
+"""
+
+
+def normalizar_rut(valor):
+    """
+    Normaliza un RUT para comparaciones e índices: quita puntos, guion y
+    espacios y pasa el dígito verificador a mayúscula.
+
+    Ej.: '12.345.678-k' -> '12345678K'
+    """
+    if not valor:
+        return ''
+    return ''.join(c for c in str(valor) if c.isalnum()).upper()
+
+
+def digito_verificador(cuerpo):
+    """
+    Dígito verificador (módulo 11) del número de un RUT.
+
+    Ej.: 12345678 -> '5'
+    """
+    suma, factor = 0, 2
+    for digito in reversed(str(cuerpo)):
+        suma += int(digito) * factor
+        factor = 2 if factor == 7 else factor + 1
+    resto = 11 - suma % 11
+    return {11: '0', 10: 'K'}.get(resto, str(resto))
+
+
+def rut_valido(valor):
+    """True si el RUT (con o sin formato) tiene número y dígito verificador correcto."""
+    rut = normalizar_rut(valor)
+    return len(rut) >= 2 and rut[:-1].isdigit() and digito_verificador(rut[:-1]) == rut[-1]
+
+
+def formatear_rut(valor):
+    """
+    Formato de presentación de un RUT normalizado.
+
+    Ej.: '12345678K' -> '12.345.678-K'
+    """
+    rut = normalizar_rut(valor)
+    if len(rut) < 2 or not rut[:-1].isdigit():
+        return valor or ''
+    return f"{int(rut[:-1]):,}".replace(',', '.') + f"-{rut[-1]}"
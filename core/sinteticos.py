@@ -0,0 +1,270 @@
+# core/sinteticos.py
+"""
+Generación de datos sintéticos para pruebas de carga y benchmarks.
+
+Crea años de ventas (con detalle y pagos), gastos, trabajadores y su
+asistencia diaria. Todo se inserta con 'bulk_create' por lotes, por lo que
+un millón de filas se carga en minutos.
+
+Los registros generados llevan una marca reconocible (prefijo 'SIM') para
+poder eliminarlos con 'eliminar_datos()' sin tocar los datos reales.
+"""
+import random
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.utils import timezone
+
+from finanzas.models import Gasto
+from inventario.models import Producto
+from recursos_humanos.calendario import invalidar_meses
+from recursos_humanos.models import Asistencia, AsistenciaMes, Trabajador
+from core.rut import digito_verificador, formatear_rut
+from ventas.models import Cliente, DetalleOrden, Devolucion, OrdenCompra, texto_busqueda
+
+MARCA = 'SIM'
+
+# Cantidades a escala 1 (se multiplican por la escala pedida)
+BASE = {
+    'productos': 25,
+    'clientes': 60,
+    'trabajadores': 12,
+    'ordenes_por_dia': 2,
+    'gastos_por_semana': 6,
+}
+
+# Cantidad de líneas por orden y su probabilidad relativa
+LINEAS_POR_ORDEN = ([1, 2, 3, 4, 5, 6], [25, 30, 20, 12, 8, 5])
+
+CATEGORIAS_GASTO = [codigo for codigo, _ in Gasto.CATEGORIAS_GASTO if codigo != 'SALARIO']
+PROYECTOS = [codigo for codigo, _ in Trabajador.TIPO_PROYECTO]
+
+
+def _dias(desde, hasta):
+    dia = desde
+    while dia <= hasta:
+        yield dia
+        dia += timedelta(days=1)
+
+
+def _lotes(iterable, tamano):
+    lote = []
+    for elemento in iterable:
+        lote.append(elemento)
+        if len(lote) >= tamano:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+
+def _rut_sintetico(numero):
+    """RUT reconocible y único (ej. 'SIM-0000123')."""
+    return f"{MARCA}-{numero:07d}"
+
+
+def _crear_productos(azar, cantidad):
+    productos = [
+        Producto(
+            nombre=f"[{MARCA}] Producto {i:05d}",
+            stock=10_000_000, # Suficiente para que 'crear_orden' nunca falle por stock
+            precio_costo=Decimal(azar.randrange(200, 20000, 50)),
+        )
+        for i in range(cantidad)
+    ]
+    return Producto.objects.bulk_create(productos)
+
+
+def _crear_trabajadores(azar, cantidad):
+    trabajadores = [
+        Trabajador(
+            nombre=f"Trabajador {MARCA} {i:05d}",
+            rut=_rut_sintetico(i),
+            tipo_proyecto=azar.choice(PROYECTOS),
+            cargo=azar.choice(['Maestro', 'Ayudante', 'Operador', 'Jornal']),
+            salario_por_dia=Decimal(azar.randrange(25000, 60000, 500)),
+        )
+        for i in range(cantidad)
+    ]
+    return Trabajador.objects.bulk_create(trabajadores)
+
+
+def _ordenes(azar, desde, hasta, por_dia, clientes):
+    """Genera (número, (cliente, rut, id de la ficha), fecha) de cada orden del período."""
+    numero = 0
+    for dia in _dias(desde, hasta):
+        # Cantidad de órdenes del día alrededor del promedio (domingo, casi nada)
+        promedio = por_dia * (0.2 if dia.weekday() == 6 else 1)
+        for _ in range(int(azar.expovariate(1 / promedio) + 0.5) if promedio else 0):
+            numero += 1
+            cliente = azar.choice(clientes)
+            fecha = timezone.make_aware(datetime.combine(dia, time(azar.randint(8, 18), azar.randint(0, 59))))
+            yield numero, cliente, fecha
+
+
+def _crear_clientes(cantidad):
+    """Crea las fichas de cliente y devuelve [(nombre, rut con formato, id de la ficha)]."""
+    datos = [(f"Cliente {MARCA} {i:05d}", f"{10_000_000 + i}{digito_verificador(10_000_000 + i)}")
+             for i in range(cantidad)]
+    Cliente.objects.bulk_create(
+        [Cliente(rut=rut, nombre=nombre, nombre_busqueda=texto_busqueda(nombre)) for nombre, rut in datos],
+        ignore_conflicts=True, # Si se genera dos veces, las fichas ya existen
+    )
+    ids = dict(Cliente.objects.filter(rut__in=[rut for _, rut in datos]).values_list('rut', 'pk'))
+    return [(nombre, formatear_rut(rut), ids[rut]) for nombre, rut in datos]
+
+
+def _crear_ordenes(azar, desde, hasta, escala, productos, lote):
+    """Inserta órdenes y sus detalles por lotes. Devuelve (órdenes, detalles)."""
+    clientes = _crear_clientes(int(BASE['clientes'] * escala) or 1)
+    lineas, pesos = LINEAS_POR_ORDEN
+    hoy = date.today()
+    total_ordenes = total_detalles = 0
+
+    generador = _ordenes(azar, desde, hasta, BASE['ordenes_por_dia'] * escala, clientes)
+    for bloque in _lotes(generador, lote):
+        ordenes, lineas_por_orden = [], []
+        for numero, (cliente, rut, ficha), fecha in bloque:
+            detalle = []
+            for producto in azar.sample(productos, min(azar.choices(lineas, pesos)[0], len(productos))):
+                costo = producto.precio_costo
+                precio = (costo * Decimal(azar.uniform(1.15, 1.8))).quantize(Decimal('1'))
+                detalle.append((producto, azar.randint(1, 400), precio))
+            total = sum(cantidad * precio for _, cantidad, precio in detalle)
+            total_costo = sum(cantidad * p.precio_costo for p, cantidad, _ in detalle)
+
+            # Pagos: las órdenes antiguas casi siempre están pagadas
+            limite_pagada, limite_abonada = (0.97, 0.985) if (hoy - fecha.date()).days > 90 else (0.55, 0.8)
+            suerte = azar.random()
+            if suerte < limite_pagada:
+                pagado, estado = total, OrdenCompra.EstadoPago.PAGADA
+            elif suerte < limite_abonada:
+                pagado, estado = (total * Decimal(azar.uniform(0.1, 0.9))).quantize(Decimal('1')), OrdenCompra.EstadoPago.ABONADA
+            else:
+                pagado, estado = Decimal(0), OrdenCompra.EstadoPago.PENDIENTE
+
+            ordenes.append(OrdenCompra(
+                numero_venta=f"{MARCA}-{fecha.year}-{numero:06d}",
+                fecha=fecha, cliente=cliente, rut=rut, ficha_cliente_id=ficha,
+                total=total, total_costo=total_costo, total_utilidad=total - total_costo,
+                monto_pagado=pagado, estado_pago=estado,
+                tipo_proyecto='BLOQUERA' if azar.random() < 0.8 else 'CONSTRUCTORA',
+            ))
+            lineas_por_orden.append(detalle)
+
+        with transaction.atomic():
+            OrdenCompra.objects.bulk_create(ordenes)
+            detalles = [
+                DetalleOrden(orden=orden, producto=producto, cantidad=cantidad,
+                             precio_unitario=precio, costo_unitario_en_venta=producto.precio_costo)
+                for orden, detalle in zip(ordenes, lineas_por_orden)
+                for producto, cantidad, precio in detalle
+            ]
+            DetalleOrden.objects.bulk_create(detalles, batch_size=lote)
+        total_ordenes += len(ordenes)
+        total_detalles += len(detalles)
+    return total_ordenes, total_detalles
+
+
+def _gastos(azar, desde, hasta, por_semana):
+    """Gastos diarios con el promedio semanal pedido (también bajo uno por día, a escalas chicas)."""
+    por_dia = por_semana / 7
+    for dia in _dias(desde, hasta):
+        # La parte entera siempre; la fracción, con esa probabilidad: el promedio es exactamente 'por_dia'
+        cantidad = int(por_dia) + (azar.random() < por_dia - int(por_dia))
+        for _ in range(cantidad):
+            yield Gasto(
+                fecha=dia,
+                categoria=azar.choice(CATEGORIAS_GASTO),
+                descripcion=f"[{MARCA}] Gasto {dia.isoformat()}",
+                monto=Decimal(azar.randrange(5000, 800000, 500)),
+                tipo_proyecto=azar.choice(PROYECTOS),
+            )
+
+
+def _asistencias(azar, desde, hasta, trabajadores):
+    """Asistencia de lunes a sábado, con ~10% de ausencias."""
+    for dia in _dias(desde, hasta):
+        if dia.weekday() == 6:
+            continue
+        for trabajador in trabajadores:
+            if azar.random() < 0.9:
+                yield Asistencia(trabajador_id=trabajador.pk, fecha=dia, tipo_proyecto=trabajador.tipo_proyecto)
+
+
+def _insertar(modelo, objetos, lote):
+    cantidad = 0
+    for bloque in _lotes(objetos, lote):
+        modelo.objects.bulk_create(bloque)
+        cantidad += len(bloque)
+    return cantidad
+
+
+def generar_datos(escala=1, anios=3, semilla=0, lote=5000, hasta=None):
+    """
+    Genera un conjunto de datos sintéticos.
+
+    A escala 1 y 3 años son ~2.000 órdenes, ~5.000 líneas, ~950 gastos y
+    ~11.000 asistencias; todo crece linealmente con la escala (a escala 100,
+    más de un millón de filas en total).
+
+    Args:
+        escala (float): Multiplicador de volumen.
+        anios (int): Años de historia hacia atrás desde 'hasta'.
+        semilla (int): Semilla del generador (mismos datos en cada ejecución).
+        lote (int): Filas por INSERT.
+        hasta (date, opcional): Último día generado (por defecto, hoy).
+
+    Returns:
+        dict: Cantidad de filas creadas por tipo.
+    """
+    azar = random.Random(semilla)
+    hasta = hasta or date.today()
+    desde = hasta - timedelta(days=365 * anios)
+
+    productos = _crear_productos(azar, max(int(BASE['productos'] * min(escala, 10)), 1))
+    trabajadores = _crear_trabajadores(azar, max(int(BASE['trabajadores'] * escala), 1))
+    ordenes, detalles = _crear_ordenes(azar, desde, hasta, escala, productos, lote)
+    gastos = _insertar(Gasto, _gastos(azar, desde, hasta, BASE['gastos_por_semana'] * escala), lote)
+    asistencias = _insertar(Asistencia, _asistencias(azar, desde, hasta, trabajadores), lote)
+
+    # Las asistencias se insertaron sin señales: reconstruir los resúmenes del período
+    AsistenciaMes.reconstruir(desde, hasta, lote=lote)
+    invalidar_meses(AsistenciaMes.objects.filter(mes__gte=desde.replace(day=1)).dates('mes', 'month'))
+
+    return {
+        'productos': len(productos),
+        'trabajadores': len(trabajadores),
+        'ordenes': ordenes,
+        'detalles': detalles,
+        'gastos': gastos,
+        'asistencias': asistencias,
+    }
+
+
+@transaction.atomic
+def eliminar_datos():
+    """
+    Elimina todos los registros sintéticos (los que llevan la marca MARCA).
+
+    Las asistencias se borran con '_raw_delete' (un solo DELETE, sin cargar
+    filas ni emitir señales); sus resúmenes mensuales se borran junto con ellas.
+
+    Returns:
+        int: Cantidad de filas eliminadas.
+    """
+    trabajadores = Trabajador.objects.filter(rut__startswith=f"{MARCA}-")
+    meses = list(AsistenciaMes.objects.filter(trabajador__in=trabajadores).dates('mes', 'month'))
+    asistencias = Asistencia.objects.filter(trabajador__in=trabajadores)
+    eliminadas = asistencias._raw_delete(asistencias.db)
+    eliminadas += AsistenciaMes.objects.filter(trabajador__in=trabajadores).delete()[0]
+    eliminadas += trabajadores.delete()[0]
+    eliminadas += Devolucion.objects.filter(orden__numero_venta__startswith=f"{MARCA}-").delete()[0]
+    eliminadas += DetalleOrden.objects.filter(orden__numero_venta__startswith=f"{MARCA}-").delete()[0]
+    eliminadas += OrdenCompra.objects.filter(numero_venta__startswith=f"{MARCA}-").delete()[0]
+    eliminadas += Cliente.objects.filter(nombre__startswith=f"Cliente {MARCA} ", ordenes__isnull=True).delete()[0]
+    eliminadas += Gasto.objects.filter(descripcion__startswith=f"[{MARCA}]").delete()[0]
+    eliminadas += Producto.objects.filter(nombre__startswith=f"[{MARCA}]").delete()[0]
+    invalidar_meses(meses)
+    return eliminadas
@@ -0,0 +1,261 @@
+# core/tareas.py
+"""
+Cola de tareas en segundo plano sobre la propia base de datos (sin broker).
+
+- Una app registra sus tareas en su módulo 'tareas.py' con '@tarea(nombre)';
+  'run_worker' descubre esos módulos al iniciar (la web no los importa).
+- La vista llama a 'encolar(...)' y responde de inmediato con la página de
+  estado de la tarea (ver core.views.estado_tarea).
+- 'run_worker' reclama las tareas pendientes: con 'SELECT ... FOR UPDATE
+  SKIP LOCKED' donde el motor lo permite (PostgreSQL), o con un 'UPDATE'
+  condicionado al estado en SQLite, que solo un worker puede ganar.
+- Si la tarea falla se reintenta hasta 'max_intentos' veces, esperando
+  TAREAS_REINTENTO_SEGUNDOS × 2^(intento - 1) entre intentos.
+- Mientras corre, un hilo renueva su 'latido' cada TAREAS_LATIDO_SEGUNDOS;
+  solo se reencola la que lleva TAREAS_TIEMPO_MAXIMO sin latir (worker
+  caído). El resultado se guarda solo si la tarea sigue en manos del mismo
+  worker y del mismo intento: si otro la tomó, se descarta.
+- Si la función devuelve un 'Archivo', sus trozos se escriben en
+  TAREAS_DIRECTORIO/<id>/ y se descargan desde core:descargar_tarea.
+
+Uso:
+    @tarea('recursos_humanos.liquidaciones')
+    def liquidaciones(fecha_inicio, fecha_fin, tipo_proyecto):
+        ...
+        return Archivo('liquidaciones.zip', 'application/zip', trozos)
+
+    tarea = encolar('recursos_humanos.liquidaciones', usuario=request.user,
+                    descripcion="Liquidaciones de marzo", fecha_inicio='2025-03-01', ...)
+"""
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+from datetime import timedelta
+from typing import Iterable, NamedTuple
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from . import metricas
+from .models import Tarea
+
+logger = logging.getLogger('bloquera.tareas')
+
+REGISTRO = {} # {nombre: función}
+
+
+class Archivo(NamedTuple):
+    """Resultado de una tarea que genera un archivo para descargar."""
+    nombre: str
+    tipo_contenido: str
+    trozos: Iterable[bytes]
+
+
+class ErrorPermanente(Exception):
+    """Error que no se arregla reintentando (datos inválidos, etc.): la tarea falla de inmediato."""
+
+
+def tarea(nombre):
+    """Decorador: registra la función como tarea de tipo 'nombre'."""
+    def decorador(funcion):
+        REGISTRO[nombre] = funcion
+        return funcion
+    return decorador
+
+
+def encolar(tipo, usuario=None, descripcion='', **argumentos):
+    """
+    Crea una tarea pendiente y la devuelve.
+
+    Los argumentos se guardan como JSON: las fechas deben pasarse como
+    texto (isoformat) y los objetos por su clave primaria.
+    """
+    return Tarea.objects.create(
+        tipo=tipo,
+        argumentos=argumentos,
+        descripcion=descripcion[:200],
+        usuario=usuario if usuario is not None and usuario.is_authenticated else None,
+        max_intentos=max(settings.TAREAS_INTENTOS, 1),
+    )
+
+
+def reclamar(trabajador):
+    """
+    Marca como 'en curso' la tarea pendiente más antigua y la devuelve
+    (o None si no hay). Dos workers nunca reclaman la misma tarea.
+    """
+    ahora = timezone.now()
+    pendientes = Tarea.objects.filter(
+        estado=Tarea.Estado.PENDIENTE, disponible_desde__lte=ahora
+    ).order_by('disponible_desde', 'pk')
+    if not pendientes.exists(): # Lo habitual: evita abrir una transacción de escritura cada intervalo
+        return None
+
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            tarea = pendientes.select_for_update(skip_locked=True).first()
+            if tarea is None:
+                return None
+            tarea.estado = Tarea.Estado.EN_CURSO
+            tarea.intentos += 1
+            tarea.iniciada = tarea.latido = ahora
+            tarea.trabajador = trabajador
+            tarea.save(update_fields=['estado', 'intentos', 'iniciada', 'latido', 'trabajador'])
+            return tarea
+
+    # SQLite: sin FOR UPDATE, pero el UPDATE ... WHERE estado = 'PENDIENTE'
+    # es atómico; si otro worker la tomó antes, no actualiza ninguna fila.
+    for pk in pendientes.values_list('pk', flat=True)[:10]:
+        reclamada = Tarea.objects.filter(pk=pk, estado=Tarea.Estado.PENDIENTE).update(
+            estado=Tarea.Estado.EN_CURSO, intentos=F('intentos') + 1, iniciada=ahora, latido=ahora,
+            trabajador=trabajador,
+        )
+        if reclamada:
+            return Tarea.objects.get(pk=pk)
+    return None
+
+
+def _propia(tarea):
+    """La tarea, solo si sigue en curso en manos del mismo worker y en el mismo intento."""
+    return Tarea.objects.filter(
+        pk=tarea.pk, estado=Tarea.Estado.EN_CURSO, trabajador=tarea.trabajador, intentos=tarea.intentos
+    )
+
+
+def _latir(tarea, detener):
+    """Renueva el latido de la tarea hasta que se pide detener (corre en su propio hilo)."""
+    try:
+        while not detener.wait(settings.TAREAS_LATIDO_SEGUNDOS):
+            try:
+                _propia(tarea).update(latido=timezone.now())
+            except Exception:
+                logger.exception("No se pudo renovar el latido de la tarea %s", tarea.pk)
+    finally:
+        connection.close() # La conexión de este hilo
+
+
+@contextmanager
+def _latiendo(tarea):
+    """Mantiene vivo el latido de la tarea mientras dura el bloque."""
+    detener = threading.Event()
+    hilo = threading.Thread(target=_latir, args=(tarea, detener), name=f"latido-{tarea.pk}", daemon=True)
+    hilo.start()
+    try:
+        yield
+    finally:
+        detener.set()
+        hilo.join()
+
+
+def ruta_archivo(tarea):
+    """Ruta absoluta del archivo generado por la tarea."""
+    return os.path.join(settings.TAREAS_DIRECTORIO, tarea.archivo)
+
+
+def _guardar_archivo(tarea, resultado):
+    """
+    Escribe los trozos en TAREAS_DIRECTORIO/<id>/ (vía un temporal propio,
+    para no dejar archivos a medias ni mezclarse con otro intento).
+    """
+    carpeta = os.path.join(settings.TAREAS_DIRECTORIO, str(tarea.pk))
+    os.makedirs(carpeta, exist_ok=True)
+    nombre = os.path.basename(resultado.nombre)
+    descriptor, temporal = tempfile.mkstemp(dir=carpeta, suffix='.parcial')
+    try:
+        with os.fdopen(descriptor, 'wb') as archivo:
+            for trozo in resultado.trozos:
+                archivo.write(trozo)
+        if _propia(tarea).exists(): # Si otro worker la tomó, su archivo es el que vale
+            os.replace(temporal, os.path.join(carpeta, nombre))
+    finally:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+    tarea.archivo = f"{tarea.pk}/{nombre}"
+    tarea.nombre_archivo = nombre
+    tarea.tipo_contenido = resultado.tipo_contenido
+
+
+def ejecutar(tarea):
+    """
+    Ejecuta una tarea ya reclamada y guarda el resultado: completada,
+    pendiente de nuevo (reintento con espera creciente) o fallida.
+
+    Si mientras corría la tarea se reencoló y otro worker la tomó, el
+    resultado de esta ejecución se descarta y no pisa el del otro intento.
+    """
+    inicio = time.perf_counter()
+    campos = ['estado', 'terminada', 'error', 'disponible_desde']
+    try:
+        funcion = REGISTRO.get(tarea.tipo)
+        if funcion is None:
+            raise ErrorPermanente(f"Tipo de tarea desconocido: {tarea.tipo}")
+        with _latiendo(tarea):
+            resultado = funcion(**tarea.argumentos)
+            if isinstance(resultado, Archivo):
+                _guardar_archivo(tarea, resultado)
+                campos += ['archivo', 'nombre_archivo', 'tipo_contenido']
+    except Exception as exc:
+        tarea.error = traceback.format_exc()[-5000:]
+        if isinstance(exc, ErrorPermanente) or tarea.intentos >= tarea.max_intentos:
+            tarea.estado = Tarea.Estado.FALLIDA
+            tarea.terminada = timezone.now()
+            resultado_metrica = 'fallida'
+            logger.error("Tarea %s (%s) fallida tras %s intento(s): %s", tarea.pk, tarea.tipo, tarea.intentos, exc)
+        else:
+            espera = settings.TAREAS_REINTENTO_SEGUNDOS * 2 ** (tarea.intentos - 1)
+            tarea.estado = Tarea.Estado.PENDIENTE
+            tarea.disponible_desde = timezone.now() + timedelta(seconds=espera)
+            resultado_metrica = 'reintento'
+            logger.warning("Tarea %s (%s) falló (intento %s), se reintenta en %s s: %s",
+                           tarea.pk, tarea.tipo, tarea.intentos, espera, exc)
+    else:
+        tarea.estado = Tarea.Estado.COMPLETADA
+        tarea.terminada = timezone.now()
+        tarea.error = ''
+        resultado_metrica = 'completada'
+        logger.info("Tarea %s (%s) completada en %.1f s", tarea.pk, tarea.tipo, time.perf_counter() - inicio)
+
+    if not _propia(tarea).update(**{campo: getattr(tarea, campo) for campo in campos}):
+        resultado_metrica = 'descartada'
+        logger.warning("Tarea %s (%s): otro worker la tomó durante el intento %s; se descarta su resultado",
+                       tarea.pk, tarea.tipo, tarea.intentos)
+    metricas.TAREAS_EJECUTADAS.inc(tipo=tarea.tipo, resultado=resultado_metrica)
+    metricas.DURACION_TAREA.observe(time.perf_counter() - inicio, tipo=tarea.tipo)
+    return tarea
+
+
+def reencolar_abandonadas():
+    """
+    Devuelve a 'pendiente' las tareas 'en curso' sin latido hace más de
+    TAREAS_TIEMPO_MAXIMO segundos (su worker se cayó o fue detenido a la
+    fuerza). Cuenta como un intento: si ya no quedan, se marcan fallidas.
+    """
+    limite = timezone.now() - timedelta(seconds=settings.TAREAS_TIEMPO_MAXIMO)
+    abandonadas = Tarea.objects.filter(estado=Tarea.Estado.EN_CURSO).filter(
+        Q(latido__lt=limite) | Q(latido__isnull=True, iniciada__lt=limite) # Reclamadas antes del latido
+    )
+    fallidas = abandonadas.filter(intentos__gte=F('max_intentos')).update(
+        estado=Tarea.Estado.FALLIDA, terminada=timezone.now(), error="Tiempo máximo de ejecución superado.",
+    )
+    reencoladas = abandonadas.update(estado=Tarea.Estado.PENDIENTE, disponible_desde=timezone.now())
+    return reencoladas + fallidas
+
+
+def limpiar_antiguas():
+    """Elimina las tareas terminadas hace más de TAREAS_RETENCION_DIAS días y sus archivos."""
+    limite = timezone.now() - timedelta(days=settings.TAREAS_RETENCION_DIAS)
+    antiguas = Tarea.objects.filter(
+        estado__in=[Tarea.Estado.COMPLETADA, Tarea.Estado.FALLIDA], terminada__lt=limite
+    )
+    ids = list(antiguas.values_list('pk', flat=True))
+    for pk in ids:
+        shutil.rmtree(os.path.join(settings.TAREAS_DIRECTORIO, str(pk)), ignore_errors=True)
+    Tarea.objects.filter(pk__in=ids).delete()
+    return len(ids)
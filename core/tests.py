@@ -0,0 +1,820 @@
+import io
+import json
+import marshal
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock, skipUnless
+from urllib.parse import urlencode
+
+from asgiref.sync import sync_to_async
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.contrib.auth.models import User
+from django.core.cache import cache, caches
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.db import DatabaseError, OperationalError, connection, transaction
+from django.urls import URLPattern, URLResolver, get_resolver, reverse
+from django.utils import timezone
+
+from finanzas.models import Gasto
+from inventario.models import Producto
+from recursos_humanos.models import Asistencia, AsistenciaMes, Trabajador
+from recursos_humanos.nomina import calcular_nomina, huella_nomina
+from ventas.models import Cliente, DetalleOrden, OrdenCompra
+
+from . import consultas_lentas, estaticos, metricas, sinteticos, tareas
+from .autenticacion import invalidar_usuarios
+from .consultas_lentas import RegistroConsultasLentas
+from .db import limite_de_tiempo
+from .instrumentacion import medir
+from .management.commands import medir_rendimiento
+from .middleware import EstaticosMiddleware, PerfiladorMiddleware
+from .models import Tarea
+
+
+def _nombres_de_urls(patrones=None, prefijo=''):
+    """Nombres completos ('app:nombre') de todas las URLs del proyecto."""
+    if patrones is None:
+        patrones = get_resolver().url_patterns
+    nombres = set()
+    for patron in patrones:
+        if isinstance(patron, URLResolver):
+            if patron.app_name == 'admin':
+                continue
+            espacio = f"{patron.namespace}:" if patron.namespace else ''
+            nombres |= _nombres_de_urls(patron.url_patterns, prefijo + espacio)
+        elif isinstance(patron, URLPattern) and patron.name:
+            nombres.add(prefijo + patron.name)
+    return nombres
+
+
+# Cachés en memoria para los tests: las sesiones y los usuarios no se
+# escriben en la caché de archivos del proyecto (CACHE_DIRECTORIO)
+CACHES_DE_PRUEBA = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'pruebas-local'},
+    'sesiones': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'pruebas-sesiones'},
+}
+
+
+class DatosSembradosMixin:
+    """
+    Conjunto de datos fijo para los tests de rendimiento: suficientes filas
+    para que una consulta N+1 se note (más consultas que filas relacionadas).
+    """
+    ORDENES = 15
+    LINEAS_POR_ORDEN = 3
+    TRABAJADORES = 12
+
+    @classmethod
+    def setUpClass(cls):
+        cls.enterClassContext(override_settings(CACHES=CACHES_DE_PRUEBA))
+        super().setUpClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user('medidor', password='clave-segura-123', is_staff=True)
+        cls.productos = Producto.objects.bulk_create([
+            Producto(nombre=f'Bloque {i}', stock=100000, precio_costo=Decimal('350'))
+            for i in range(5)
+        ])
+        hoy = date.today()
+        for i in range(cls.ORDENES):
+            orden = OrdenCompra.objects.create(
+                cliente=f'Cliente {i % 4}', rut=f'1111111{i % 4}-{i % 4}',
+                fecha=timezone.now() - timedelta(days=7 * i), tipo_proyecto='BLOQUERA',
+                total=Decimal('3000'), total_costo=Decimal('1050'), total_utilidad=Decimal('1950'),
+            )
+            DetalleOrden.objects.bulk_create([
+                DetalleOrden(orden=orden, producto=producto, cantidad=1,
+                             precio_unitario=Decimal('1000'), costo_unitario_en_venta=Decimal('350'))
+                for producto in cls.productos[:cls.LINEAS_POR_ORDEN]
+            ])
+        cls.orden = orden
+        Gasto.objects.bulk_create([
+            Gasto(fecha=hoy - timedelta(days=10 * i), descripcion=f'Gasto {i}', monto=Decimal('500'),
+                  tipo_proyecto='BLOQUERA')
+            for i in range(20)
+        ])
+        cls.trabajadores = Trabajador.objects.bulk_create([
+            Trabajador(nombre=f'Trabajador {i}', rut=f'2222222{i:02d}-K', salario_por_dia=Decimal('25000'),
+                       tipo_proyecto='BLOQUERA')
+            for i in range(cls.TRABAJADORES)
+        ])
+        inicio_mes = hoy.replace(day=1)
+        Asistencia.objects.bulk_create([
+            Asistencia(trabajador=trabajador, fecha=inicio_mes + timedelta(days=d), tipo_proyecto='BLOQUERA')
+            for trabajador in cls.trabajadores for d in range(5)
+        ])
+        AsistenciaMes.reconstruir()
+        cls.gasto = Gasto.objects.first()
+        cls.inicio_mes = inicio_mes
+        cls.tarea = Tarea.objects.create(tipo='prueba', usuario=cls.usuario, estado=Tarea.Estado.COMPLETADA)
+
+    def setUp(self):
+        for alias in CACHES_DE_PRUEBA:
+            caches[alias].clear()
+        self.client.force_login(self.usuario)
+
+
+class PresupuestoConsultasTests(DatosSembradosMixin, TestCase):
+    """
+    Fija la cantidad máxima de consultas SQL de cada URL del proyecto.
+
+    Si un cambio introduce consultas N+1 (o simplemente más consultas),
+    el test falla indicando la URL y las consultas ejecutadas. Al agregar
+    una URL nueva hay que agregar su presupuesto aquí.
+
+    Las cifras incluyen las consultas de sesión y usuario de la petición.
+    """
+
+    def peticiones(self):
+        """
+        (nombre de URL, método, ruta, datos POST, presupuesto[, respuesta esperada]).
+
+        La respuesta esperada es opcional: {'status': código, cabecera: valor}.
+        """
+        orden = self.orden.pk
+        producto = self.productos[0].pk
+        trabajador = self.trabajadores[0].pk
+        periodo = {
+            'fecha_inicio': self.inicio_mes.isoformat(),
+            'fecha_fin': (self.inicio_mes + timedelta(days=27)).isoformat(),
+            'tipo_proyecto': 'BLOQUERA',
+        }
+        filas_pago = calcular_nomina(
+            self.inicio_mes, self.inicio_mes + timedelta(days=27), 'BLOQUERA', trabajadores=[trabajador]
+        )
+        feed = f"?start={self.inicio_mes.isoformat()}&end={(self.inicio_mes + timedelta(days=42)).isoformat()}"
+        nueva_orden = {
+            'fecha': date.today().isoformat(), 'cliente': 'Cliente nuevo', 'rut': '', 'direccion': '',
+            'tipo_proyecto': 'BLOQUERA',
+            'detalles-TOTAL_FORMS': '3', 'detalles-INITIAL_FORMS': '0',
+            'detalles-MIN_NUM_FORMS': '0', 'detalles-MAX_NUM_FORMS': '1000',
+        }
+        for i, p in enumerate(self.productos[:3]):
+            nueva_orden.update({
+                f'detalles-{i}-producto': str(p.pk), f'detalles-{i}-cantidad': '2',
+                f'detalles-{i}-precio_unitario': '1000',
+            })
+        return [
+            # --- core ---
+            ('core:home', 'get', reverse('core:home'), None, 2),
+            ('core:api_dashboard', 'get', reverse('core:api_dashboard'), None, 8),
+            ('core:metricas', 'get', reverse('core:metricas'), None, 2),
+            ('core:login', 'get', reverse('core:login'), None, 2),
+            ('core:logout', 'post', reverse('core:logout'), {}, 4),
+            ('core:register', 'get', reverse('core:register'), None, 2),
+            ('core:user_settings', 'get', reverse('core:user_settings'), None, 2),
+            ('core:edit_profile', 'get', reverse('core:edit_profile'), None, 2),
+            ('core:password_change', 'get', reverse('core:password_change'), None, 2),
+            ('core:password_change_done', 'get', reverse('core:password_change_done'), None, 2),
+            ('core:tarea', 'get', reverse('core:tarea', args=[self.tarea.pk]), None, 3),
+            ('core:descargar_tarea', 'get', reverse('core:descargar_tarea', args=[self.tarea.pk]), None, 3),
+            # --- inventario ---
+            ('inventario:lista', 'get', reverse('inventario:lista'), None, 3),
+            ('inventario:crear', 'get', reverse('inventario:crear'), None, 2),
+            ('inventario:editar', 'get', reverse('inventario:editar', args=[producto]), None, 3),
+            ('inventario:eliminar', 'get', reverse('inventario:eliminar', args=[producto]), None, 3),
+            ('inventario:api_get_stock', 'get', reverse('inventario:api_get_stock', args=[producto]), None, 3),
+            # --- ventas ---
+            ('ventas:crear_orden', 'get', reverse('ventas:crear_orden'), None, 6),
+            ('ventas:crear_orden', 'post', reverse('ventas:crear_orden'), nueva_orden, 22),
+            ('ventas:lista_ordenes', 'get', reverse('ventas:lista_ordenes'), None, 5),
+            ('ventas:detalle_orden', 'get', reverse('ventas:detalle_orden', args=[orden]), None, 5),
+            ('ventas:descargar_orden_pdf', 'get', reverse('ventas:descargar_orden_pdf', args=[orden]), None, 5),
+            ('ventas:descargar_orden_docx', 'get', reverse('ventas:descargar_orden_docx', args=[orden]), None, 5),
+            ('ventas:registrar_pago_orden', 'get', reverse('ventas:registrar_pago_orden', args=[orden]), None, 3),
+            ('ventas:devolver_orden', 'get', reverse('ventas:devolver_orden', args=[orden]), None, 5),
+            ('ventas:api_buscar_clientes', 'get', reverse('ventas:api_buscar_clientes') + '?q=1111', None, 2),
+            ('ventas:analitica_productos', 'get', reverse('ventas:analitica_productos'), None, 5),
+            # --- finanzas ---
+            ('finanzas:lista_gastos', 'get', reverse('finanzas:lista_gastos'), None, 3),
+            ('finanzas:registrar_gasto', 'get', reverse('finanzas:registrar_gasto'), None, 2),
+            ('finanzas:editar_gasto', 'get', reverse('finanzas:editar_gasto', args=[self.gasto.pk]), None, 3),
+            ('finanzas:eliminar_gasto', 'get', reverse('finanzas:eliminar_gasto', args=[self.gasto.pk]), None, 3),
+            ('finanzas:estado_resultados', 'get', reverse('finanzas:estado_resultados'), None, 5),
+            ('finanzas:cuentas_por_cobrar', 'get', reverse('finanzas:cuentas_por_cobrar'), None, 5),
+            # --- recursos humanos ---
+            ('recursos_humanos:lista_trabajadores', 'get', reverse('recursos_humanos:lista_trabajadores'), None, 3),
+            ('recursos_humanos:crear_trabajador', 'get', reverse('recursos_humanos:crear_trabajador'), None, 2),
+            ('recursos_humanos:editar_trabajador', 'get',
+             reverse('recursos_humanos:editar_trabajador', args=[trabajador]), None, 3),
+            ('recursos_humanos:eliminar_trabajador', 'get',
+             reverse('recursos_humanos:eliminar_trabajador', args=[trabajador]), None, 3),
+            ('recursos_humanos:asistencia_manual', 'get', reverse('recursos_humanos:asistencia_manual'), None, 3),
+            ('recursos_humanos:asistencia_confirmacion', 'get',
+             reverse('recursos_humanos:asistencia_confirmacion'), None, 2),
+            ('recursos_humanos:asistencia_cuadrilla', 'get',
+             reverse('recursos_humanos:asistencia_cuadrilla') + '?tipo_proyecto=BLOQUERA', None, 4),
+            ('recursos_humanos:importar_asistencias', 'get',
+             reverse('recursos_humanos:importar_asistencias'), None, 2),
+            ('recursos_humanos:calcular_salario', 'post', reverse('recursos_humanos:calcular_salario'),
+             dict(periodo, trabajador=trabajador), 5),
+            ('recursos_humanos:registrar_pago_gasto', 'post', reverse('recursos_humanos:registrar_pago_gasto'),
+             dict(periodo, trabajador=trabajador, huella=huella_nomina(filas_pago)), 8,
+             {'status': 302, 'Location': reverse('finanzas:lista_gastos')}),
+            ('recursos_humanos:nomina', 'post', reverse('recursos_humanos:nomina'),
+             dict(periodo, accion='calcular'), 3),
+            ('recursos_humanos:descargar_liquidaciones', 'get',
+             reverse('recursos_humanos:descargar_liquidaciones') + '?' + urlencode(periodo), None, 2,
+             {'status': 200, 'Content-Type': 'application/zip'}),
+            ('recursos_humanos:calendario_asistencia', 'get',
+             reverse('recursos_humanos:calendario_asistencia'), None, 2),
+            ('recursos_humanos:api_asistencia_feed', 'get',
+             reverse('recursos_humanos:api_asistencia_feed') + feed, None, 3),
+        ]
+
+    def test_todas_las_urls_tienen_presupuesto(self):
+        cubiertas = {nombre for nombre, *_ in self.peticiones()}
+        faltantes = _nombres_de_urls() - cubiertas
+        self.assertFalse(faltantes, f"URLs sin presupuesto de consultas: {sorted(faltantes)}")
+
+    def test_presupuesto_de_consultas(self):
+        for nombre, metodo, ruta, datos, presupuesto, *esperada in self.peticiones():
+            with self.subTest(url=nombre, metodo=metodo):
+                self.client.force_login(self.usuario)
+                # El dashboard consulta en hilos aparte: aquí se ejecuta en el hilo
+                # de la petición para que 'medir()' cuente también esas consultas.
+                with mock.patch('core.views._en_hilo', sync_to_async), \
+                        medir(guardar_sentencias=True) as medicion:
+                    if metodo == 'post':
+                        respuesta = self.client.post(ruta, datos)
+                    else:
+                        respuesta = self.client.get(ruta)
+                    b''.join(getattr(respuesta, 'streaming_content', [b'']))
+                self.assertLess(respuesta.status_code, 400, f"{nombre} respondió {respuesta.status_code}")
+                for clave, valor in (esperada[0] if esperada else {}).items():
+                    obtenido = respuesta.status_code if clave == 'status' else respuesta.get(clave)
+                    self.assertEqual(obtenido, valor, f"{nombre}: {clave}")
+                self.assertLessEqual(
+                    medicion.consultas, presupuesto,
+                    f"{nombre} ({metodo.upper()}) ejecutó {medicion.consultas} consultas "
+                    f"(presupuesto {presupuesto}):\n" + "\n".join(sql for sql, _ in medicion.sentencias)
+                )
+
+
+class DashboardDatosTests(DatosSembradosMixin, TestCase):
+    """API asíncrona del dashboard: KPIs, series mensuales y cobranza a partir de los datos sembrados."""
+
+    def test_kpis_y_series(self):
+        # Las consultas corren en el hilo de la petición para ver los datos de la transacción del test
+        with mock.patch('core.views._en_hilo', sync_to_async):
+            datos = self.client.get(reverse('core:api_dashboard')).json()
+
+        self.assertEqual(datos['asistencia_del_mes'], self.TRABAJADORES * 5)
+        self.assertEqual(datos['total_ingresos'], 3000 * self.ORDENES)
+        self.assertEqual(datos['total_dinero_cobrado'], 0)
+        self.assertEqual(datos['total_cuentas_por_cobrar'], 3000 * self.ORDENES)
+        self.assertEqual(datos['total_utilidad'], 1950 * self.ORDENES)
+        self.assertEqual(datos['total_gastos'], 500 * 20)
+        self.assertEqual(sum(datos['datos_utilidad']), datos['total_utilidad'])
+        self.assertEqual(len(datos['meses_etiquetas']), len(datos['datos_gastos']))
+        self.assertEqual(datos['meses_etiquetas'], sorted(datos['meses_etiquetas']))
+        self.assertEqual(datos['porcentaje_utilidad'], round(1950 * self.ORDENES / (1950 * self.ORDENES + 500 * 20) * 100, 1))
+        self.assertEqual(datos['cobranza_d0_30'], 3000 * 5) # Órdenes de 0, 7, 14, 21 y 28 días
+
+    def test_requiere_sesion(self):
+        self.client.logout()
+        self.assertEqual(self.client.get(reverse('core:api_dashboard')).status_code, 302)
+
+    def test_consulta_que_supera_el_limite(self):
+        with mock.patch('core.views._en_hilo', sync_to_async), \
+                mock.patch('core.views._totales_ordenes', side_effect=OperationalError('interrupted')):
+            respuesta = self.client.get(reverse('core:api_dashboard'))
+        self.assertEqual(respuesta.status_code, 503)
+        self.assertIn('tardaron demasiado', respuesta.json()['error'])
+
+
+@skipUnless(connection.vendor == 'sqlite', "El límite en SQLite usa el progress handler")
+class LimiteDeTiempoTests(TestCase):
+    """'limite_de_tiempo' en SQLite: interrumpe la consulta y, anidado, respeta el plazo del bloque exterior."""
+
+    # Cuenta hasta cien millones: varios segundos, mucho más que los plazos de estos tests
+    LENTA = "WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c WHERE x < 100000000) SELECT count(*) FROM c"
+
+    def consulta_lenta(self):
+        with connection.cursor() as cursor:
+            cursor.execute(self.LENTA)
+
+    def test_interrumpe_al_vencer(self):
+        with self.assertRaises(OperationalError), limite_de_tiempo(0.05):
+            self.consulta_lenta()
+        with connection.cursor() as cursor: # Fuera del bloque ya no hay límite
+            cursor.execute("SELECT 1")
+
+    def test_bloque_anidado_no_quita_el_plazo_exterior(self):
+        with limite_de_tiempo(0.05):
+            with limite_de_tiempo(0.05):
+                pass
+            with self.assertRaises(OperationalError):
+                self.consulta_lenta()
+
+    def test_bloque_anidado_mas_largo_no_extiende_el_plazo(self):
+        with limite_de_tiempo(0.05), limite_de_tiempo(60):
+            with self.assertRaises(OperationalError):
+                self.consulta_lenta()
+
+
+class MetricasPeticionMiddlewareTests(DatosSembradosMixin, TestCase):
+
+    @override_settings(DEBUG=True)
+    def test_cabeceras_en_debug(self):
+        respuesta = self.client.get(reverse('ventas:lista_ordenes'))
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertGreater(int(respuesta['X-DB-Queries']), 0)
+        self.assertIn('X-DB-Time-ms', respuesta)
+        self.assertIn('X-Request-Time-ms', respuesta)
+
+    def test_sin_cabeceras_en_produccion(self):
+        with self.assertLogs('bloquera.rendimiento', level='INFO') as registros:
+            respuesta = self.client.get(reverse('ventas:lista_ordenes'))
+        self.assertNotIn('X-DB-Queries', respuesta)
+        registro = registros.records[0]
+        self.assertEqual(registro.vista, 'ventas:lista_ordenes')
+        self.assertEqual(registro.estado, 200)
+        self.assertGreater(registro.consultas, 0)
+
+
+class ImportacionesTests(SimpleTestCase):
+    """Lo que se carga al iniciar un worker o un comando (ver 'manage.py medir_importaciones')."""
+
+    def test_urls_no_importan_librerias_de_documentos(self):
+        # En un proceso aparte: en este ya pueden estar cargadas por otros tests
+        codigo = (
+            "import sys, django; django.setup(); "
+            "from django.urls import get_resolver; get_resolver().url_patterns; "
+            "print(','.join(sorted(m for m in ('reportlab', 'docx') if m in sys.modules)))"
+        )
+        entorno = dict(os.environ, DJANGO_SETTINGS_MODULE=settings.SETTINGS_MODULE)
+        proceso = subprocess.run([sys.executable, '-c', codigo], cwd=settings.BASE_DIR, env=entorno,
+                                 capture_output=True, text=True)
+        self.assertEqual(proceso.returncode, 0, proceso.stderr)
+        self.assertEqual(proceso.stdout.strip(), '', "Se importaron al cargar las URLs")
+
+
+@override_settings(CACHES=CACHES_DE_PRUEBA)
+class PerfiladorMiddlewareTests(TestCase):
+    """Perfilador: fuera de la cadena si está desactivado, a pedido para staff y por muestreo."""
+
+    def setUp(self):
+        self.directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directorio, ignore_errors=True)
+        self.fabrica = RequestFactory()
+
+    @staticmethod
+    def vista(request):
+        return HttpResponse(f"usuarios={User.objects.count()}")
+
+    def peticion(self, ruta='/', staff=False):
+        request = self.fabrica.get(ruta)
+        request.user = User(username='perfilado', is_staff=staff)
+        return request
+
+    @override_settings(PERFILADOR_ACTIVO=False)
+    def test_desactivado_se_retira_de_la_cadena(self):
+        with self.assertRaises(MiddlewareNotUsed):
+            PerfiladorMiddleware(self.vista)
+
+    def test_muestreo(self):
+        with override_settings(PERFILADOR_ACTIVO=True, PERFILADOR_MUESTREO=0, PERFILADOR_DIRECTORIO=self.directorio):
+            respuesta = PerfiladorMiddleware(self.vista)(self.peticion())
+        self.assertEqual(respuesta.content, b'usuarios=0')
+        self.assertEqual(os.listdir(self.directorio), [])
+
+        with override_settings(PERFILADOR_ACTIVO=True, PERFILADOR_MUESTREO=1, PERFILADOR_DIRECTORIO=self.directorio):
+            respuesta = PerfiladorMiddleware(self.vista)(self.peticion())
+        self.assertEqual(respuesta.content, b'usuarios=0') # La respuesta no cambia
+        archivos = sorted(os.listdir(self.directorio))
+        self.assertEqual([os.path.splitext(nombre)[1] for nombre in archivos], ['.json', '.prof'])
+        with open(os.path.join(self.directorio, archivos[0]), encoding='utf-8') as archivo:
+            self.assertEqual(json.load(archivo)['consultas'], 1)
+
+    def test_muestreo_no_consume_el_streaming_ni_falla_al_guardar(self):
+        trozos_enviados = []
+
+        def trozos():
+            for trozo in (b'uno', b'dos'):
+                trozos_enviados.append(trozo)
+                yield trozo
+
+        def vista(request):
+            return StreamingHttpResponse(trozos())
+
+        with override_settings(PERFILADOR_ACTIVO=True, PERFILADOR_MUESTREO=1, PERFILADOR_DIRECTORIO=self.directorio):
+            respuesta = PerfiladorMiddleware(vista)(self.peticion())
+        self.assertTrue(respuesta.streaming)
+        self.assertEqual(trozos_enviados, [], "El cuerpo se genera al enviarlo, no al perfilar")
+        self.assertEqual(b''.join(respuesta.streaming_content), b'unodos')
+
+        with override_settings(PERFILADOR_ACTIVO=True, PERFILADOR_MUESTREO=1, PERFILADOR_DIRECTORIO=self.directorio), \
+                mock.patch('core.perfilador.Perfil.guardar', side_effect=OSError("disco lleno")), \
+                self.assertLogs('bloquera.rendimiento', 'ERROR'):
+            respuesta = PerfiladorMiddleware(self.vista)(self.peticion())
+        self.assertEqual(respuesta.content, b'usuarios=0')
+
+    @override_settings(PERFILADOR_ACTIVO=True, PERFILADOR_MUESTREO=0)
+    def test_reporte_a_pedido_solo_para_staff(self):
+        middleware = PerfiladorMiddleware(self.vista)
+        self.assertEqual(middleware(self.peticion('/?perfilar=html')).content, b'usuarios=0')
+        respuesta = middleware(self.peticion('/?perfilar=prof', staff=True))
+        self.assertEqual(respuesta['Content-Type'], 'application/octet-stream')
+        self.assertEqual(respuesta['Cache-Control'], 'no-store')
+        self.assertTrue(marshal.loads(respuesta.content)) # Estadísticas de cProfile (formato .prof)
+
+
+class EstaticosMiddlewareTests(TestCase):
+    """Estáticos desde STATIC_ROOT: sin salir del directorio, caché según el nombre y precomprimidos."""
+
+    def setUp(self):
+        base = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, base, ignore_errors=True)
+        self.raiz = os.path.join(base, 'staticfiles')
+        os.makedirs(self.raiz)
+        archivos = {
+            'app.css': b'body{}',
+            'app.0123456789ab.css': b'body{color:red}',
+            'app.0123456789ab.css.gz': b'gz',
+            'app.0123456789ab.css.br': b'br',
+            '../secreto.txt': b'fuera de STATIC_ROOT',
+        }
+        for nombre, contenido in archivos.items():
+            with open(os.path.join(self.raiz, nombre), 'wb') as archivo:
+                archivo.write(contenido)
+        estaticos._archivos.clear()
+        self.addCleanup(estaticos._archivos.clear)
+        ajustes = override_settings(STATIC_ROOT=self.raiz, STATIC_URL='/static/', ESTATICOS_SERVIR=True)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        self.middleware = EstaticosMiddleware(lambda request: HttpResponse('vista', status=404))
+
+    def get(self, ruta, **cabeceras):
+        respuesta = self.middleware(RequestFactory().get(ruta, headers=cabeceras))
+        contenido = b''.join(respuesta.streaming_content) if respuesta.streaming else respuesta.content
+        respuesta.close()
+        return respuesta, contenido
+
+    @override_settings(ESTATICOS_SERVIR=False)
+    def test_desactivado_se_retira_de_la_cadena(self):
+        with self.assertRaises(MiddlewareNotUsed):
+            EstaticosMiddleware(lambda request: HttpResponse())
+
+    def test_no_sale_de_static_root(self):
+        self.assertIsNone(estaticos.buscar('../secreto.txt'))
+        respuesta, contenido = self.get('/static/../secreto.txt')
+        self.assertEqual((respuesta.status_code, contenido), (404, b'vista'))
+
+    def test_immutable_solo_con_hash(self):
+        respuesta, contenido = self.get('/static/app.0123456789ab.css')
+        self.assertEqual(respuesta['Cache-Control'], estaticos.CACHE_INMUTABLE)
+        respuesta, contenido = self.get('/static/app.css')
+        self.assertEqual((respuesta['Cache-Control'], contenido), (estaticos.CACHE_SIN_HASH, b'body{}'))
+        self.assertNotIn('Vary', respuesta) # Sin versiones precomprimidas
+        etag = respuesta['ETag']
+        self.assertEqual(self.get('/static/app.css', If_None_Match=etag)[0].status_code, 304)
+
+    def test_elige_br_o_gzip_segun_accept_encoding(self):
+        casos = [
+            ('gzip, deflate, br', 'br', b'br'),
+            ('gzip', 'gzip', b'gz'),
+            ('br;q=0, gzip', 'gzip', b'gz'),
+            ('', None, b'body{color:red}'),
+        ]
+        for accept_encoding, codificacion, esperado in casos:
+            with self.subTest(accept_encoding=accept_encoding):
+                respuesta, contenido = self.get('/static/app.0123456789ab.css', Accept_Encoding=accept_encoding)
+                self.assertEqual(respuesta.get('Content-Encoding'), codificacion)
+                self.assertEqual(contenido, esperado)
+                self.assertEqual(respuesta['Vary'], 'Accept-Encoding')
+                self.assertEqual(respuesta['Content-Type'], 'text/css')
+
+
+@override_settings(CACHES=CACHES_DE_PRUEBA)
+class ConsultasLentasTests(TestCase):
+    """Registro de consultas lentas: huella, umbral, EXPLAIN una vez por huella y consultas fallidas."""
+
+    def setUp(self):
+        explicadas = mock.patch.object(RegistroConsultasLentas, 'explicadas', set())
+        explicadas.start()
+        self.addCleanup(explicadas.stop)
+
+    def consultar(self, umbral_ms, *usernames):
+        with connection.execute_wrapper(RegistroConsultasLentas(connection, umbral_ms)):
+            for username in usernames:
+                list(User.objects.filter(username=username, id__in=[1, 2, 3]))
+
+    def test_huella_ignora_valores(self):
+        a = consultas_lentas.normalizar("SELECT * FROM t WHERE id IN (1, 2, 3) AND nombre = 'Ana'  AND x = 1.5")
+        b = consultas_lentas.normalizar("SELECT * FROM t WHERE id IN (%s, %s) AND nombre = %s AND x = %s")
+        self.assertEqual(a, "SELECT * FROM t WHERE id IN (...) AND nombre = ? AND x = ?")
+        self.assertEqual(consultas_lentas.huella(a), consultas_lentas.huella(b))
+
+    def test_bajo_el_umbral_no_se_registra(self):
+        with self.assertNoLogs('bloquera.consultas_lentas'):
+            self.consultar(60_000, 'ana')
+
+    def test_plan_solo_la_primera_vez(self):
+        with self.assertLogs('bloquera.consultas_lentas', level='WARNING') as registros:
+            self.consultar(0, 'ana', 'beto')
+        primero, segundo = (json.loads(registro.getMessage()) for registro in registros.records)
+        self.assertEqual(primero['huella'], segundo['huella'])
+        self.assertTrue(primero['plan'])
+        self.assertNotIn('plan', segundo)
+        self.assertEqual(primero['origen'].split(':')[0], os.path.join('core', 'tests.py'))
+
+    def test_consulta_fallida_no_se_registra(self):
+        with self.assertNoLogs('bloquera.consultas_lentas'), self.assertRaises(DatabaseError):
+            with transaction.atomic(), connection.execute_wrapper(RegistroConsultasLentas(connection, 0)):
+                with connection.cursor() as cursor:
+                    cursor.execute("SELECT * FROM tabla_que_no_existe")
+
+
+class MetricasVolcadoTests(SimpleTestCase):
+    """Volcado de métricas entre procesos: un archivo por proceso y errores que no rompen la petición."""
+
+    def setUp(self):
+        self.directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directorio, ignore_errors=True)
+        ajustes = override_settings(METRICAS_DIRECTORIO=self.directorio, METRICAS_INTERVALO=0)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+    def test_pid_reutilizado_no_pisa_el_archivo_anterior(self):
+        with mock.patch('os.getpid', return_value=424242):
+            metricas.volcar()
+        with mock.patch('os.getpid', return_value=434343):
+            metricas.volcar()
+        with mock.patch('os.getpid', return_value=424242): # Otro proceso con el PID del primero
+            metricas.volcar()
+        archivos = sorted(os.listdir(self.directorio))
+        self.assertEqual(len(archivos), 3, archivos) # Sin temporales sueltos
+        self.assertEqual(sum(nombre.startswith('metricas-424242-') for nombre in archivos), 2)
+
+    def test_volcados_concurrentes(self):
+        hilos = [threading.Thread(target=lambda: [metricas.PAGOS_REGISTRADOS.inc() for _ in range(50)]) for _ in range(8)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        self.assertEqual([nombre for nombre in os.listdir(self.directorio) if not nombre.endswith('.json')], [])
+
+    def test_error_al_volcar_no_llega_a_quien_mide(self):
+        ruta = os.path.join(self.directorio, 'no-es-directorio')
+        open(ruta, 'w').close()
+        with override_settings(METRICAS_DIRECTORIO=ruta), self.assertLogs('bloquera.rendimiento', 'ERROR'):
+            metricas.PAGOS_REGISTRADOS.inc()
+            metricas.DURACION_TAREA.observe(0.5, tipo='prueba')
+
+
+class MetricasNegocioTests(DatosSembradosMixin, TestCase):
+    """Contadores de negocio: se incrementan al confirmar y se publican en '/metrics'."""
+
+    def datos_orden(self, cantidad):
+        return {
+            'fecha': date.today().isoformat(), 'cliente': 'Cliente medido', 'tipo_proyecto': 'CONSTRUCTORA',
+            'detalles-TOTAL_FORMS': '1', 'detalles-INITIAL_FORMS': '0',
+            'detalles-MIN_NUM_FORMS': '0', 'detalles-MAX_NUM_FORMS': '1000',
+            'detalles-0-producto': str(self.productos[0].pk), 'detalles-0-cantidad': str(cantidad),
+            'detalles-0-precio_unitario': '1000',
+        }
+
+    def test_crear_orden_y_pago_en_metrics(self):
+        creadas = metricas.ORDENES_CREADAS.valores.get(('CONSTRUCTORA',), 0)
+        sin_stock = metricas.ORDENES_SIN_STOCK.valores.get((), 0)
+        monto = metricas.MONTO_PAGOS.valores.get((), 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('ventas:crear_orden'), self.datos_orden(10 ** 9))
+        self.assertEqual(metricas.ORDENES_SIN_STOCK.valores.get(()), sin_stock + 1)
+        self.assertEqual(metricas.ORDENES_CREADAS.valores.get(('CONSTRUCTORA',), 0), creadas)
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.client.post(reverse('ventas:crear_orden'), self.datos_orden(2))
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(metricas.ORDENES_CREADAS.valores[('CONSTRUCTORA',)], creadas + 1)
+
+        self.client.post(reverse('ventas:registrar_pago_orden', args=[self.orden.pk]), {'monto': '1200'})
+        self.assertEqual(metricas.MONTO_PAGOS.valores[()], monto + 1200)
+
+        texto = self.client.get(reverse('core:metricas')).content.decode()
+        self.assertIn('# TYPE bloquera_ordenes_creadas_total counter', texto)
+        self.assertIn(f'bloquera_ordenes_creadas_total{{tipo_proyecto="CONSTRUCTORA"}} {creadas + 1}', texto)
+        self.assertIn(f'bloquera_ordenes_rechazadas_sin_stock_total {sin_stock + 1}', texto)
+        self.assertIn('bloquera_http_request_duration_seconds_bucket{', texto)
+
+    @override_settings(METRICAS_TOKEN='secreto')
+    def test_token(self):
+        self.client.logout()
+        self.assertEqual(self.client.get(reverse('core:metricas')).status_code, 401)
+        respuesta = self.client.get(reverse('core:metricas'), HTTP_AUTHORIZATION='Bearer secreto')
+        self.assertEqual(respuesta.status_code, 200)
+
+
+class SesionCacheadaTests(DatosSembradosMixin, TestCase):
+    """Con la caché caliente, las APIs JSON no consultan la sesión ni el usuario."""
+
+    def test_endpoints_json_sin_consultas_de_sesion(self):
+        rutas = [
+            reverse('inventario:api_get_stock', args=[self.productos[0].pk]),
+            reverse('recursos_humanos:api_asistencia_feed')
+            + f"?start={self.inicio_mes.isoformat()}&end={(self.inicio_mes + timedelta(days=42)).isoformat()}",
+        ]
+        for ruta in rutas:
+            with self.subTest(ruta=ruta):
+                self.client.get(ruta) # Calienta la caché (sesión y usuario)
+                with medir(guardar_sentencias=True) as medicion:
+                    respuesta = self.client.get(ruta)
+                self.assertEqual(respuesta.status_code, 200)
+                sql = "\n".join(sentencia for sentencia, _ in medicion.sentencias)
+                self.assertNotIn('django_session', sql)
+                self.assertNotIn('auth_user', sql)
+
+    def test_la_cache_no_guarda_la_contrasena(self):
+        self.client.get(reverse('inventario:api_get_stock', args=[self.productos[0].pk]))
+        datos = caches['sesiones'].get(f"auth:usuario:{self.usuario.pk}")
+        self.assertNotIn('password', dict(datos['campos']))
+        self.assertNotIn(self.usuario.password, repr(datos))
+
+    def test_cambiar_contrasena_mantiene_la_sesion(self):
+        ruta = reverse('inventario:api_get_stock', args=[self.productos[0].pk])
+        self.client.get(ruta) # Usuario en caché (sin la contraseña)
+        respuesta = self.client.post(reverse('core:password_change'), {
+            'old_password': 'clave-segura-123', 'new_password1': 'otra-clave-789!', 'new_password2': 'otra-clave-789!',
+        })
+        self.assertRedirects(respuesta, reverse('core:password_change_done'), fetch_redirect_response=False)
+        self.assertEqual(self.client.get(ruta).status_code, 200)
+        self.usuario.refresh_from_db()
+        self.assertTrue(self.usuario.check_password('otra-clave-789!'))
+
+    def test_update_de_queryset_requiere_invalidar(self):
+        ruta = reverse('inventario:api_get_stock', args=[self.productos[0].pk])
+        self.client.get(ruta)
+        User.objects.filter(pk=self.usuario.pk).update(is_active=False) # No emite señales
+        invalidar_usuarios(self.usuario.pk)
+        self.assertEqual(self.client.get(ruta).status_code, 302)
+
+    def test_guardar_usuario_invalida_la_cache(self):
+        ruta = reverse('inventario:api_get_stock', args=[self.productos[0].pk])
+        self.client.get(ruta)
+        self.usuario.is_active = False
+        self.usuario.save()
+        respuesta = self.client.get(ruta)
+        self.assertEqual(respuesta.status_code, 302) # Redirige al login
+
+
+@override_settings(CACHES=CACHES_DE_PRUEBA)
+class DatosSinteticosTests(TestCase):
+    """Generador de datos sintéticos (core/sinteticos.py) y el benchmark que lo usa."""
+
+    def setUp(self):
+        self.filas = sinteticos.generar_datos(escala=0.1, anios=1, hasta=date(2025, 6, 30))
+
+    def test_cantidades_y_resumen_mensual(self):
+        filas = self.filas
+        self.assertEqual(filas['ordenes'], OrdenCompra.objects.filter(numero_venta__startswith='SIM-').count())
+        self.assertEqual(filas['detalles'], DetalleOrden.objects.filter(orden__numero_venta__startswith='SIM-').count())
+        self.assertEqual(filas['gastos'], Gasto.objects.filter(descripcion__startswith='[SIM]').count())
+        self.assertEqual(filas['asistencias'], Asistencia.objects.count())
+        # 0,6 gastos por semana a esta escala: unos 31 en el año (antes, ninguno bajo 0,29×)
+        self.assertTrue(20 <= filas['gastos'] <= 45, filas['gastos'])
+        self.assertTrue(filas['ordenes'] and filas['detalles'] >= filas['ordenes'])
+
+        esperado = {}
+        for trabajador_id, fecha, tipo in Asistencia.objects.values_list('trabajador_id', 'fecha', 'tipo_proyecto'):
+            clave = (trabajador_id, fecha.replace(day=1), tipo)
+            esperado[clave] = esperado.get(clave, 0) | AsistenciaMes.bit(fecha)
+        resumen = {(t, mes, tipo): dias for t, mes, tipo, dias in
+                   AsistenciaMes.objects.values_list('trabajador_id', 'mes', 'tipo_proyecto', 'dias')}
+        self.assertEqual(resumen, esperado)
+
+    def test_eliminar_datos(self):
+        sinteticos.eliminar_datos()
+        for modelo in (OrdenCompra, DetalleOrden, Gasto, Asistencia, AsistenciaMes, Trabajador, Producto, Cliente):
+            self.assertFalse(modelo.objects.exists(), modelo.__name__)
+
+    def test_medir_escala_y_comparar(self):
+        comando = medir_rendimiento.Command(stdout=io.StringIO())
+        mediciones = comando.medir_escala(repeticiones=1)
+        self.assertEqual(set(mediciones), {
+            'reporte_graficos_data', 'descargar_orden_pdf', 'asistencia_feed', 'asistencia_feed (caché)', 'crear_orden',
+        })
+        self.assertTrue(all(m['consultas'] > 0 for nombre, m in mediciones.items() if nombre != 'asistencia_feed (caché)'))
+
+        anterior = {'commit': 'abc123', 'escalas': {'0.1': {'casos': {
+            nombre: dict(medicion, mediana_ms=medicion['mediana_ms'] * 2 or 1) for nombre, medicion in mediciones.items()
+        }}}}
+        comando.comparar(anterior, {'escalas': {'0.1': {'casos': mediciones}}})
+        self.assertIn('Comparación con abc123', comando.stdout.getvalue())
+
+
+@tareas.tarea('core.prueba')
+def _tarea_de_prueba(texto, fallar=False):
+    if fallar:
+        raise RuntimeError("falla de prueba")
+    return tareas.Archivo('prueba.txt', 'text/plain', [texto.encode(), b'!'])
+
+
+@override_settings(CACHES=CACHES_DE_PRUEBA)
+class TareasTests(TestCase):
+    """Cola de tareas en segundo plano (core/tareas.py)."""
+
+    def setUp(self):
+        directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directorio, True)
+        ajustes = override_settings(TAREAS_DIRECTORIO=directorio, TAREAS_REINTENTO_SEGUNDOS=30)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        self.usuario = User.objects.create_user('dueno', password='clave-segura-123')
+
+    def test_reclamar_ejecutar_y_descargar(self):
+        tarea = tareas.encolar('core.prueba', usuario=self.usuario, texto='hola')
+        reclamada = tareas.reclamar('w1')
+        self.assertEqual(reclamada.pk, tarea.pk)
+        self.assertEqual(reclamada.estado, Tarea.Estado.EN_CURSO)
+        self.assertIsNone(tareas.reclamar('w2'), "Una tarea en curso no se vuelve a reclamar")
+
+        tareas.ejecutar(reclamada)
+        tarea.refresh_from_db()
+        self.assertEqual(tarea.estado, Tarea.Estado.COMPLETADA)
+
+        self.client.force_login(self.usuario)
+        estado = self.client.get(reverse('core:tarea', args=[tarea.pk]) + '?formato=json').json()
+        self.assertEqual(estado['estado'], 'COMPLETADA')
+        respuesta = self.client.get(estado['descarga'])
+        self.assertEqual(b''.join(respuesta.streaming_content), b'hola!')
+
+    def test_reintento_con_espera_creciente(self):
+        tarea = tareas.encolar('core.prueba', texto='x', fallar=True)
+        for intento in range(1, tarea.max_intentos + 1):
+            antes = timezone.now()
+            tareas.ejecutar(tareas.reclamar('w1'))
+            tarea.refresh_from_db()
+            if intento < tarea.max_intentos:
+                self.assertEqual(tarea.estado, Tarea.Estado.PENDIENTE)
+                self.assertGreaterEqual(tarea.disponible_desde, antes + timedelta(seconds=30 * 2 ** (intento - 1)))
+                self.assertIsNone(tareas.reclamar('w1'), "No se reintenta antes de la espera")
+                Tarea.objects.filter(pk=tarea.pk).update(disponible_desde=timezone.now())
+        self.assertEqual(tarea.estado, Tarea.Estado.FALLIDA)
+        self.assertIn('falla de prueba', tarea.error)
+
+    def test_tarea_con_latido_no_se_reencola(self):
+        tarea = tareas.encolar('core.prueba', texto='x')
+        tareas.reclamar('w1')
+        hace_rato = timezone.now() - timedelta(seconds=settings.TAREAS_TIEMPO_MAXIMO + 60)
+        Tarea.objects.filter(pk=tarea.pk).update(iniciada=hace_rato) # Lleva mucho corriendo, pero late
+        self.assertEqual(tareas.reencolar_abandonadas(), 0)
+
+        Tarea.objects.filter(pk=tarea.pk).update(latido=hace_rato) # Su worker dejó de latir
+        self.assertEqual(tareas.reencolar_abandonadas(), 1)
+        tarea.refresh_from_db()
+        self.assertEqual(tarea.estado, Tarea.Estado.PENDIENTE)
+
+    def test_intento_reemplazado_no_pisa_al_nuevo(self):
+        tarea = tareas.encolar('core.prueba', texto='original')
+        original = tareas.reclamar('w1')
+        # w1 deja de latir: se reencola y w2 la toma mientras w1 sigue corriendo
+        Tarea.objects.filter(pk=tarea.pk).update(latido=timezone.now() - timedelta(days=1))
+        tareas.reencolar_abandonadas()
+        reintento = tareas.reclamar('w2')
+        self.assertEqual(reintento.intentos, 2)
+
+        tareas.ejecutar(original)
+        tarea.refresh_from_db()
+        self.assertEqual(tarea.estado, Tarea.Estado.EN_CURSO, "El intento viejo no cierra la tarea")
+        self.assertEqual(tarea.trabajador, 'w2')
+        self.assertEqual(tarea.archivo, '')
+
+        reintento.argumentos = {'texto': 'reintento'}
+        tareas.ejecutar(reintento)
+        tarea.refresh_from_db()
+        self.assertEqual(tarea.estado, Tarea.Estado.COMPLETADA)
+        with open(tareas.ruta_archivo(tarea), 'rb') as archivo:
+            self.assertEqual(archivo.read(), b'reintento!')
+
+    @override_settings(TAREAS_SEGUNDO_PLANO=True)
+    def test_csv_de_cobranza_en_segundo_plano(self):
+        import finanzas.tareas # noqa: F401 (registra la tarea, como hace 'run_worker')
+
+        self.client.force_login(self.usuario)
+        respuesta = self.client.get(reverse('finanzas:cuentas_por_cobrar') + '?formato=csv')
+        tarea = Tarea.objects.get(tipo='finanzas.csv_cuentas_por_cobrar')
+        self.assertRedirects(respuesta, reverse('core:tarea', args=[tarea.pk]), fetch_redirect_response=False)
+
+        tareas.ejecutar(tareas.reclamar('w1'))
+        tarea.refresh_from_db()
+        self.assertEqual(tarea.estado, Tarea.Estado.COMPLETADA)
+        with open(tareas.ruta_archivo(tarea), encoding='utf-8-sig') as archivo:
+            self.assertTrue(archivo.readline().startswith('Cliente,RUT,'))
+
+    def test_solo_el_dueno_ve_la_tarea(self):
+        tarea = tareas.encolar('core.prueba', usuario=self.usuario, texto='hola')
+        otro = User.objects.create_user('otro', password='clave-segura-123')
+        self.client.force_login(otro)
+        self.assertEqual(self.client.get(reverse('core:tarea', args=[tarea.pk])).status_code, 404)
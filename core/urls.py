@@ -17,6 +17,16 @@ urlpatterns = [
     path('logout/', auth_views.LogoutView.as_view(next_page='core:login'), name='logout'),
     path('register/', views.register, name='register'),
 
+    # --- API del Dashboard (JSON, asíncrona) ---
+    path('api/dashboard/', views.dashboard_data, name='api_dashboard'),
+
+    # --- Métricas (formato Prometheus) ---
+    path('metrics', views.metricas, name='metricas'),
+
+    # --- Tareas en segundo plano (estado y descarga del resultado) ---
+    path('tareas/<int:tarea_id>/', views.estado_tarea, name='tarea'),
+    path('tareas/<int:tarea_id>/descargar/', views.descargar_tarea, name='descargar_tarea'),
+
     # --- URLs DE CONFIGURACIÓN DE USUARIO ---
     path('settings/', views.user_settings, name='user_settings'),
     path('settings/profile/', views.edit_profile, name='edit_profile'),
@@ -6,27 +6,39 @@ Esto incluye la página principal (dashboard), las vistas de autenticación
 (login, registro) y las vistas de configuración de perfil de usuario.
 """
 
+import asyncio
+import os
+from datetime import date
+
 # --- Importaciones de Django ---
-from django.shortcuts import render, redirect
-from django.urls import reverse_lazy
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse, reverse_lazy
 from django.contrib import messages
 from django.contrib.auth import login
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.views import LoginView, PasswordChangeView
 from django.contrib.auth.models import User
+from django.core.exceptions import PermissionDenied
+from django.db import OperationalError, close_old_connections
+from django.db.models import Sum, Count
+from django.db.models.functions import ExtractMonth, ExtractYear
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse
+from django.utils.crypto import constant_time_compare
 
-# --- Importaciones de Formularios Locales ---
+# --- Importaciones Locales ---
 from .forms import RegistroForm, EditProfileForm
+from .db import limite_de_tiempo
+from .models import Tarea
+from .tareas import ruta_archivo
+from . import metricas as metricas_app
 
-# --- Importaciones para el Dashboard ---
-from datetime import date
-from django.db.models import Sum, Count
-from django.db.models.functions import ExtractMonth, ExtractYear
-import json
 # Importación de modelos de otras apps (clave para el dashboard)
 from ventas.models import OrdenCompra
 from finanzas.models import Gasto
-from recursos_humanos.models import Asistencia
+from recursos_humanos.models import AsistenciaMes
+from finanzas.reportes import TRAMOS_ANTIGUEDAD, antiguedad_saldos
 
 
 # --- Vistas de Autenticación ---
@@ -59,100 +71,162 @@ def register(request):
 
 # --- Vista Home (Dashboard) ---
 
-def reporte_graficos_data():
-    """
-    Función auxiliar para obtener y procesar los datos
-    de los gráficos de tendencias (Utilidad vs Gastos).
-    """
-    # 1. Obtener utilidad agrupada por mes/año
-    ventas_qs = OrdenCompra.objects.annotate(
+def _clave_mes(fila):
+    """Convierte una fila {'ano': 2025, 'mes': 3} en la etiqueta '2025-03'."""
+    return f"{fila['ano']}-{str(fila['mes']).zfill(2)}"
+
+def _utilidad_por_mes():
+    """Utilidad de las ventas agrupada por mes/año (una sola consulta)."""
+    return list(OrdenCompra.objects.annotate(
         mes=ExtractMonth('fecha'), ano=ExtractYear('fecha')
-    ).values('mes', 'ano').annotate(total_utilidad_mes=Sum('total_utilidad')).order_by('ano', 'mes')
+    ).values('mes', 'ano').annotate(total_utilidad_mes=Sum('total_utilidad')).order_by('ano', 'mes'))
 
-    # 2. Obtener gastos agrupados por mes/año
-    gastos_qs = Gasto.objects.annotate(
+def _gastos_por_mes():
+    """Gastos agrupados por mes/año (una sola consulta)."""
+    return list(Gasto.objects.annotate(
         mes=ExtractMonth('fecha'), ano=ExtractYear('fecha')
-    ).values('mes', 'ano').annotate(total_gastos=Sum('monto')).order_by('ano', 'mes')
+    ).values('mes', 'ano').annotate(total_gastos=Sum('monto')).order_by('ano', 'mes'))
+
+def _asistencias_desde(primer_dia_mes):
+    """
+    Cantidad de asistencias registradas desde el mes indicado.
+    Suma los días marcados en los resúmenes mensuales (una fila por trabajador).
+    """
+    mascaras = AsistenciaMes.objects.filter(mes__gte=primer_dia_mes).values_list('dias', flat=True)
+    return sum(dias.bit_count() for dias in mascaras)
 
-    # 3. Crear un conjunto unificado de todas las etiquetas
-    meses_ventas = {f"{v['ano']}-{str(v['mes']).zfill(2)}" for v in ventas_qs}
-    meses_gastos = {f"{g['ano']}-{str(g['mes']).zfill(2)}" for g in gastos_qs}
-    meses_etiquetas = sorted(list(meses_ventas.union(meses_gastos)))
+def _totales_ordenes():
+    """Total vendido y total cobrado de todas las órdenes, en una sola consulta."""
+    return OrdenCompra.objects.aggregate(total_ingresos=Sum('total'), total_cobrado=Sum('monto_pagado'))
 
-    # 4. Convertir los QuerySets en diccionarios para acceso rápido
-    ventas_dict = {f"{v['ano']}-{str(v['mes']).zfill(2)}": v for v in ventas_qs}
-    gastos_dict = {f"{g['ano']}-{str(g['mes']).zfill(2)}": g for g in gastos_qs}
+def _resumen_cobranza():
+    """Totales por tramo de antigüedad de las cuentas por cobrar (del reporte cacheado)."""
+    return antiguedad_saldos()['totales']
 
-    # 5. Crear las listas finales de datos
+def _combinar_series(ventas_qs, gastos_qs):
+    """
+    Une las series mensuales de utilidad y gastos en un eje de meses común.
+    Los meses sin datos en una de las series se rellenan con 0.
+    """
+    # 1. Convertir las filas en diccionarios para acceso rápido
+    ventas_dict = {_clave_mes(v): v for v in ventas_qs}
+    gastos_dict = {_clave_mes(g): g for g in gastos_qs}
+
+    # 2. Crear un conjunto unificado de todas las etiquetas
+    meses_etiquetas = sorted(set(ventas_dict).union(gastos_dict))
+
+    # 3. Crear las listas finales de datos
     ventas_final = [ventas_dict.get(mes, {'total_utilidad_mes': 0}) for mes in meses_etiquetas]
     gastos_final = [gastos_dict.get(mes, {'total_gastos': 0}) for mes in meses_etiquetas]
 
     return meses_etiquetas, ventas_final, gastos_final
 
-@login_required # Proteger la vista, solo para usuarios autenticados
-def home(request):
+def reporte_graficos_data():
     """
-    Vista principal del Dashboard.
-    Recopila todos los datos para las tarjetas KPI y los gráficos.
+    Función auxiliar para obtener y procesar los datos
+    de los gráficos de tendencias (Utilidad vs Gastos).
+    """
+    with limite_de_tiempo():
+        return _combinar_series(_utilidad_por_mes(), _gastos_por_mes())
+
+def _en_hilo(funcion):
     """
-    # --- KPIs (Indicadores Clave) ---
-    hoy = date.today()
-    primer_dia_mes = hoy.replace(day=1)
-    # KPI 1: Asistencias del mes
-    asistencia_del_mes = Asistencia.objects.filter(fecha__gte=primer_dia_mes).count()
+    Envuelve una función del ORM para ejecutarla en un hilo propio
+    (thread_sensitive=False), de modo que varias consultas independientes
+    puedan correr en paralelo. Cada consulta tiene el límite de tiempo
+    de los reportes y al terminar se liberan las conexiones del hilo
+    según CONN_MAX_AGE.
+    """
+    def ejecutar(*args):
+        try:
+            with limite_de_tiempo():
+                return funcion(*args)
+        finally:
+            close_old_connections()
+    return sync_to_async(ejecutar, thread_sensitive=False)
+
+def construir_datos_dashboard(asistencia_del_mes, totales, ventas_qs, gastos_qs, cobranza):
+    """
+    Calcula los KPIs y las series de los gráficos a partir de los
+    resultados crudos de las consultas del dashboard. 'cobranza' son los
+    totales del reporte de antigüedad de cuentas por cobrar.
 
-    # --- Datos de Gráficos ---
-    meses_etiquetas, ventas_mensuales, gastos_mensuales = reporte_graficos_data() 
+    Returns:
+        dict: Valores listos para serializar a JSON.
+    """
+    meses_etiquetas, ventas_mensuales, gastos_mensuales = _combinar_series(ventas_qs, gastos_qs)
 
-    datos_utilidad_lista = [float(v.get('total_utilidad_mes', 0)) for v in ventas_mensuales]
-    datos_gastos_lista = [float(g.get('total_gastos', 0)) for g in gastos_mensuales]
+    datos_utilidad_lista = [float(v.get('total_utilidad_mes') or 0) for v in ventas_mensuales]
+    datos_gastos_lista = [float(g.get('total_gastos') or 0) for g in gastos_mensuales]
 
-    # --- CÁLCULOS DE KPI MODIFICADOS ---
-    
     # 1. Totales de Ventas (Ingresos)
-    total_ingresos_historico = OrdenCompra.objects.aggregate(Sum('total'))['total__sum'] or 0
-    
+    total_ingresos_historico = float(totales['total_ingresos'] or 0)
     # 2. Total Dinero Cobrado (Flujo de Caja)
-    total_dinero_cobrado = OrdenCompra.objects.aggregate(Sum('monto_pagado'))['monto_pagado__sum'] or 0
-    
+    total_dinero_cobrado = float(totales['total_cobrado'] or 0)
     # 3. Total Cuentas por Cobrar (Pendiente)
     total_cuentas_por_cobrar = total_ingresos_historico - total_dinero_cobrado
-    
     # 4. Total Utilidad (Rentabilidad)
     total_utilidad_historica = sum(datos_utilidad_lista)
-    
     # 5. Total Gastos (Egresos)
     total_gastos = sum(datos_gastos_lista)
-    
-    # --- FIN DE CÁLCULOS DE KPI ---
-
 
     # Cálculo de porcentajes para gráfico de dona (Utilidad vs Gastos)
     total_comparativo = total_utilidad_historica + total_gastos
     porcentaje_utilidad = (total_utilidad_historica / total_comparativo * 100) if total_comparativo > 0 else 0
     porcentaje_gastos = (total_gastos / total_comparativo * 100) if total_comparativo > 0 else 0
 
-
-    # --- Contexto para la Plantilla ---
-    context = {
+    return {
         'asistencia_del_mes': asistencia_del_mes,
-        
-        # --- NUEVOS VALORES DE CONTEXTO ---
-        'total_ingresos': total_ingresos_historico, 
+        'total_ingresos': total_ingresos_historico,
         'total_dinero_cobrado': total_dinero_cobrado,
         'total_cuentas_por_cobrar': total_cuentas_por_cobrar,
-        'total_utilidad': total_utilidad_historica, 
+        'total_utilidad': total_utilidad_historica,
         'total_gastos': total_gastos,
-        # --- FIN DE NUEVOS VALORES ---
-        
-        'meses_etiquetas_json': json.dumps(meses_etiquetas),
-        'datos_utilidad_json': json.dumps(datos_utilidad_lista), 
-        'datos_gastos_json': json.dumps(datos_gastos_lista),
-        
-        'porcentaje_utilidad': round(porcentaje_utilidad, 1), 
+        'meses_etiquetas': meses_etiquetas,
+        'datos_utilidad': datos_utilidad_lista,
+        'datos_gastos': datos_gastos_lista,
+        'porcentaje_utilidad': round(porcentaje_utilidad, 1),
         'porcentaje_gastos': round(porcentaje_gastos, 1),
+        # Antigüedad de las cuentas por cobrar (tarjeta "Cobranza")
+        **{f'cobranza_{tramo}': float(cobranza[tramo]) for tramo, *_ in TRAMOS_ANTIGUEDAD},
     }
-    return render(request, 'core/home.html', context)
+
+@login_required # Proteger la vista, solo para usuarios autenticados
+def home(request):
+    """
+    Vista principal del Dashboard.
+    Solo renderiza la estructura de la página: los KPIs y los gráficos
+    se cargan de forma asíncrona desde 'dashboard_data'.
+    """
+    return render(request, 'core/home.html')
+
+@login_required
+async def dashboard_data(request):
+    """
+    API asíncrona con los datos del Dashboard (KPIs y gráficos).
+
+    Las consultas son independientes entre sí, por lo que se lanzan
+    en paralelo y el tiempo de respuesta queda acotado por la más lenta.
+
+    Returns:
+        JsonResponse: Ver 'construir_datos_dashboard'. Si alguna consulta
+        supera REPORTES_LIMITE_SEGUNDOS, {'error': mensaje} con estado 503.
+    """
+    primer_dia_mes = date.today().replace(day=1)
+    try:
+        asistencia_del_mes, totales, ventas_qs, gastos_qs, cobranza = await asyncio.gather(
+            _en_hilo(_asistencias_desde)(primer_dia_mes),
+            _en_hilo(_totales_ordenes)(),
+            _en_hilo(_utilidad_por_mes)(),
+            _en_hilo(_gastos_por_mes)(),
+            _en_hilo(_resumen_cobranza)(),
+        )
+    except OperationalError:
+        return JsonResponse(
+            {'error': "Los datos del dashboard tardaron demasiado en calcularse. Intenta nuevamente en unos minutos."},
+            status=503,
+        )
+    return JsonResponse(construir_datos_dashboard(asistencia_del_mes, totales, ventas_qs, gastos_qs, cobranza))
 
 # --- Vistas de Configuración de Usuario ---
 
@@ -183,4 +257,68 @@ class CustomPasswordChangeView(PasswordChangeView):
     Solo define la plantilla y la URL de éxito.
     """
     template_name='core/password_change_form.html'
-    success_url = reverse_lazy('core:password_change_done')
\ No newline at end of file
+    success_url = reverse_lazy('core:password_change_done')
+
+
+# --- Métricas ---
+
+def metricas(request):
+    """
+    Métricas de la aplicación en el formato de texto de Prometheus.
+
+    Si METRICAS_TOKEN está configurado se exige la cabecera
+    'Authorization: Bearer <token>' (para el recolector); si no, solo
+    pueden verlas los usuarios staff.
+    """
+    token = settings.METRICAS_TOKEN
+    if token:
+        if not constant_time_compare(request.headers.get('Authorization', ''), f"Bearer {token}"):
+            return HttpResponse("No autorizado", status=401, content_type='text/plain')
+    elif not request.user.is_staff:
+        raise PermissionDenied
+    return HttpResponse(metricas_app.exposicion(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+# --- Tareas en segundo plano ---
+
+def _tarea_del_usuario(request, tarea_id):
+    """La tarea, si pertenece al usuario (o es staff); si no, 404."""
+    tarea = get_object_or_404(Tarea, pk=tarea_id)
+    if tarea.usuario_id != request.user.pk and not request.user.is_staff:
+        raise Http404
+    return tarea
+
+
+@login_required
+def estado_tarea(request, tarea_id):
+    """
+    Estado de una tarea en segundo plano. La página se recarga sola
+    mientras la tarea está pendiente o en curso; con '?formato=json'
+    responde solo el estado (para consultarlo desde JavaScript).
+    """
+    tarea = _tarea_del_usuario(request, tarea_id)
+    if request.GET.get('formato') == 'json':
+        return JsonResponse({
+            'id': tarea.pk,
+            'tipo': tarea.tipo,
+            'estado': tarea.estado,
+            'intentos': tarea.intentos,
+            'creada': tarea.creada,
+            'terminada': tarea.terminada,
+            'descarga': reverse('core:descargar_tarea', args=[tarea.pk]) if tarea.archivo else None,
+        })
+    return render(request, 'core/tarea.html', {'tarea': tarea})
+
+
+@login_required
+def descargar_tarea(request, tarea_id):
+    """Descarga el archivo generado por la tarea (si ya terminó)."""
+    tarea = _tarea_del_usuario(request, tarea_id)
+    ruta = ruta_archivo(tarea) if tarea.terminada_ok and tarea.archivo else None
+    if ruta is None or not os.path.isfile(ruta):
+        messages.warning(request, "El archivo de esta tarea no está disponible.")
+        return redirect('core:tarea', tarea_id=tarea.pk)
+    return FileResponse(
+        open(ruta, 'rb'), as_attachment=True, filename=tarea.nombre_archivo,
+        content_type=tarea.tipo_contenido or None,
+    )
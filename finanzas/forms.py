@@ -20,4 +20,21 @@ class GastoForm(forms.ModelForm):
             'descripcion': forms.Textarea(attrs={'class': 'form-control', 'rows': 3}),
             'monto': forms.NumberInput(attrs={'class': 'form-control'}),
             'tipo_proyecto': forms.Select(attrs={'class': 'form-control'}),
-        }
\ No newline at end of file
+        }
+
+class PeriodoForm(forms.Form):
+    """
+    Formulario (GET) para elegir el período de un reporte.
+    Ambas fechas son opcionales; la vista aplica valores por defecto.
+    """
+    fecha_inicio = forms.DateField(required=False, widget=forms.DateInput(attrs={'class': 'form-control', 'type': 'date'}))
+    fecha_fin = forms.DateField(required=False, widget=forms.DateInput(attrs={'class': 'form-control', 'type': 'date'}))
+
+    def clean(self):
+        """Valida que el rango de fechas no esté invertido."""
+        cleaned_data = super().clean()
+        fecha_inicio = cleaned_data.get('fecha_inicio')
+        fecha_fin = cleaned_data.get('fecha_fin')
+        if fecha_inicio and fecha_fin and fecha_inicio > fecha_fin:
+            raise forms.ValidationError("La fecha de inicio no puede ser posterior a la fecha de fin.")
+        return cleaned_data
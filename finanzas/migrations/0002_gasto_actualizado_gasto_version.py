@@ -0,0 +1,24 @@
+# Generated by Django 5.2.6 on 2026-10-19 13:33
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finanzas', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gasto',
+            name='actualizado',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+        migrations.AddField(
+            model_name='gasto',
+            name='version',
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+    ]
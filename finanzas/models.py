@@ -5,7 +5,9 @@ Define los modelos de la base de datos para la aplicación 'finanzas'.
 from django.db import models
 from datetime import date
 
-class Gasto(models.Model):
+from core.models import ModeloVersionado
+
+class Gasto(ModeloVersionado):
     """
     Representa un gasto operativo o de salario.
     """
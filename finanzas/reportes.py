@@ -0,0 +1,258 @@
+# finanzas/reportes.py
+"""
+Reportes financieros que cruzan datos de varias apps.
+
+Incluye el Estado de Resultados (P&L) por proyecto, donde el costo de
+mano de obra se deriva en SQL a partir de las asistencias registradas, y
+la antigüedad de las cuentas por cobrar por cliente.
+"""
+import csv
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, F, Max, Min, Q, Sum
+from django.db.models.functions import Coalesce, TruncMonth
+from django.utils import timezone
+
+from core.db import limite_de_tiempo
+from .models import Gasto
+from ventas.models import Cliente, OrdenCompra
+from recursos_humanos.models import Asistencia, Trabajador
+from core.rut import formatear_rut
+
+
+def _clave_mes(valor):
+    """Normaliza el resultado de TruncMonth (date o datetime) a 'YYYY-MM'."""
+    return valor.strftime('%Y-%m')
+
+
+def _ventas_por_proyecto_mes(fecha_inicio, fecha_fin):
+    """Ingresos y costo de las ventas por proyecto y mes (1 consulta)."""
+    return OrdenCompra.objects.filter(
+        fecha__date__range=[fecha_inicio, fecha_fin]
+    ).annotate(mes=TruncMonth('fecha')).values('tipo_proyecto', 'mes').annotate(
+        ingresos=Sum('total'),
+        costo_ventas=Sum('total_costo'),
+    ).order_by()
+
+
+def _mano_de_obra_por_proyecto_mes(fecha_inicio, fecha_fin):
+    """
+    Costo de mano de obra por proyecto y mes (1 consulta con JOIN).
+
+    Cada asistencia aporta el 'salario_por_dia' de su trabajador, por lo que
+    SUM(salario_por_dia) agrupado equivale a Σ(asistencias × salario_por_dia).
+    """
+    return Asistencia.objects.filter(
+        fecha__range=[fecha_inicio, fecha_fin]
+    ).annotate(mes=TruncMonth('fecha')).values('tipo_proyecto', 'mes').annotate(
+        dias_trabajados=Count('id'),
+        mano_de_obra=Sum('trabajador__salario_por_dia'),
+    ).order_by()
+
+
+def _gastos_por_proyecto_mes(fecha_inicio, fecha_fin):
+    """
+    Gastos operativos por proyecto y mes (1 consulta).
+    Se excluyen los gastos de SALARIO: la mano de obra ya se imputa
+    desde las asistencias y contarlos dos veces falsearía el resultado.
+    """
+    return Gasto.objects.filter(
+        fecha__range=[fecha_inicio, fecha_fin]
+    ).exclude(categoria='SALARIO').annotate(mes=TruncMonth('fecha')).values(
+        'tipo_proyecto', 'mes'
+    ).annotate(gastos=Sum('monto')).order_by()
+
+
+def calcular_estado_resultados(fecha_inicio, fecha_fin):
+    """
+    Calcula el Estado de Resultados por proyecto y mes.
+
+    Args:
+        fecha_inicio (date): Inicio del período (inclusive).
+        fecha_fin (date): Fin del período (inclusive).
+
+    Returns:
+        dict: {'meses': [...], 'proyectos': [{'codigo', 'nombre', 'filas', 'totales'}, ...]}
+              donde cada fila tiene ingresos, costo_ventas, mano_de_obra,
+              gastos y resultado.
+    """
+    campos = ('ingresos', 'costo_ventas', 'dias_trabajados', 'mano_de_obra', 'gastos')
+    tabla = {} # {(proyecto, 'YYYY-MM'): {campo: valor}}
+
+    consultas = (
+        _ventas_por_proyecto_mes(fecha_inicio, fecha_fin),
+        _mano_de_obra_por_proyecto_mes(fecha_inicio, fecha_fin),
+        _gastos_por_proyecto_mes(fecha_inicio, fecha_fin),
+    )
+    for consulta in consultas:
+        for fila in consulta:
+            celda = tabla.setdefault((fila['tipo_proyecto'], _clave_mes(fila['mes'])), {})
+            for campo in campos:
+                if campo in fila:
+                    celda[campo] = fila[campo] or 0
+
+    meses = sorted({mes for _, mes in tabla})
+    proyectos = []
+    for codigo, nombre in Trabajador.TIPO_PROYECTO:
+        filas = []
+        totales = dict.fromkeys(campos + ('resultado',), 0)
+        for mes in meses:
+            celda = tabla.get((codigo, mes), {})
+            fila = {campo: celda.get(campo, 0) for campo in campos}
+            fila['resultado'] = fila['ingresos'] - fila['costo_ventas'] - fila['mano_de_obra'] - fila['gastos']
+            fila['mes'] = mes
+            for campo in totales:
+                totales[campo] += fila[campo]
+            filas.append(fila)
+        proyectos.append({'codigo': codigo, 'nombre': nombre, 'filas': filas, 'totales': totales})
+
+    return {'meses': meses, 'proyectos': proyectos}
+
+
+def estado_resultados(fecha_inicio, fecha_fin, refrescar=False):
+    """
+    Versión cacheada (materializada) de 'calcular_estado_resultados'.
+
+    El resultado se guarda en la caché por REPORTES_CACHE_TIMEOUT segundos.
+    Con refrescar=True se recalcula y se reemplaza la copia guardada.
+    El cálculo está limitado a REPORTES_LIMITE_SEGUNDOS (OperationalError si lo supera).
+    """
+    clave = f"finanzas:estado_resultados:{fecha_inicio.isoformat()}:{fecha_fin.isoformat()}"
+    datos = None if refrescar else cache.get(clave)
+    if datos is None:
+        with limite_de_tiempo():
+            datos = calcular_estado_resultados(fecha_inicio, fecha_fin)
+        datos['generado'] = timezone.now()
+        cache.set(clave, datos, settings.REPORTES_CACHE_TIMEOUT)
+    return datos
+
+
+# --- Antigüedad de cuentas por cobrar ---
+
+# (clave, etiqueta, desde, hasta): días transcurridos desde la fecha de la orden
+TRAMOS_ANTIGUEDAD = (
+    ('d0_30', '0–30 días', 0, 30),
+    ('d31_60', '31–60 días', 31, 60),
+    ('d61_90', '61–90 días', 61, 90),
+    ('d90_mas', 'Más de 90 días', 91, None),
+)
+
+
+def calcular_antiguedad_saldos(hoy=None):
+    """
+    Saldos pendientes por cliente, repartidos por antigüedad de la orden.
+
+    Es una sola consulta con agregación condicional (SUM ... FILTER) sobre
+    las órdenes no pagadas. Filtra por 'estado_pago IN (PENDIENTE, ABONADA)'
+    en lugar de '!= PAGADA' (equivalente) para que use el índice
+    (estado_pago, fecha): las órdenes pagadas, que son la gran mayoría, no
+    se leen. Las órdenes con ficha de cliente se agrupan por ella; las
+    demás, por el nombre y RUT escritos en la orden.
+
+    Args:
+        hoy (date, opcional): Fecha de referencia (por defecto, hoy).
+
+    Returns:
+        dict: {'hoy', 'tramos': [(clave, etiqueta)], 'filas': [...], 'totales': {...}}
+              donde cada fila tiene cliente_id, nombre, rut, un monto por
+              tramo, total, ordenes y dias (antigüedad de la orden más antigua).
+    """
+    hoy = hoy or timezone.localdate()
+
+    def inicio_del_dia(dias_atras):
+        return timezone.make_aware(datetime.combine(hoy - timedelta(days=dias_atras), time.min))
+
+    saldo = F('total') - F('monto_pagado')
+    por_tramo = {}
+    for clave, _, desde, hasta in TRAMOS_ANTIGUEDAD:
+        filtro = Q()
+        if hasta is not None:
+            filtro &= Q(fecha__gte=inicio_del_dia(hasta))
+        if desde:
+            filtro &= Q(fecha__lt=inicio_del_dia(desde - 1))
+        por_tramo[clave] = Sum(saldo, filter=filtro, default=Decimal(0))
+
+    consulta = OrdenCompra.objects.filter(
+        estado_pago__in=[OrdenCompra.EstadoPago.PENDIENTE, OrdenCompra.EstadoPago.ABONADA]
+    ).values(
+        cliente_id=F('ficha_cliente'),
+        nombre=Coalesce('ficha_cliente__nombre', 'cliente'),
+        rut_cliente=Coalesce('ficha_cliente__rut', 'rut'),
+    ).annotate(
+        **por_tramo, total=Sum(saldo), ordenes=Count('id'), mas_antigua=Min('fecha'),
+    ).order_by('-total')
+
+    claves = [clave for clave, *_ in TRAMOS_ANTIGUEDAD]
+    totales = dict.fromkeys(claves + ['total'], Decimal(0))
+    totales.update(ordenes=0, clientes=0)
+    filas = []
+    for fila in consulta:
+        if not fila['total']:
+            continue # Abonada por el total (no debería ocurrir, pero no es deuda)
+        fila['rut'] = formatear_rut(fila.pop('rut_cliente'))
+        fila['dias'] = (hoy - timezone.localtime(fila.pop('mas_antigua')).date()).days
+        for clave in claves + ['total', 'ordenes']:
+            totales[clave] += fila[clave]
+        totales['clientes'] += 1
+        filas.append(fila)
+
+    return {
+        'hoy': hoy,
+        'tramos': [(clave, etiqueta) for clave, etiqueta, *_ in TRAMOS_ANTIGUEDAD],
+        'filas': filas,
+        'totales': totales,
+    }
+
+
+def version_cobranza():
+    """
+    Versión de los datos del reporte de antigüedad: cambia al crear,
+    modificar o eliminar una orden (pagos y devoluciones la guardan) o un
+    cliente. Dos consultas de agregación sin cargar filas, como
+    'ventas.analitica.version_datos'.
+    """
+    ordenes = OrdenCompra.objects.aggregate(ultima=Max('actualizado'), cantidad=Count('id'))
+    clientes = Cliente.objects.aggregate(ultima=Max('actualizado'), cantidad=Count('id'))
+    partes = [ordenes['ultima'], ordenes['cantidad'], clientes['ultima'], clientes['cantidad']]
+    return ':'.join(str(parte.timestamp() if hasattr(parte, 'timestamp') else parte) for parte in partes)
+
+
+def antiguedad_saldos(refrescar=False):
+    """
+    Versión cacheada de 'calcular_antiguedad_saldos' (del día de hoy). La
+    clave lleva la versión de los datos (ver 'version_cobranza'), así que
+    un pago, una devolución o una orden nueva generan una clave nueva en
+    vez de mostrar la deuda anterior hasta que venza REPORTES_CACHE_TIMEOUT.
+    El cálculo está limitado a REPORTES_LIMITE_SEGUNDOS.
+    """
+    hoy = timezone.localdate()
+    clave = f"finanzas:antiguedad_saldos:{hoy.isoformat()}:{version_cobranza()}"
+    datos = None if refrescar else cache.get(clave)
+    if datos is None:
+        with limite_de_tiempo():
+            datos = calcular_antiguedad_saldos(hoy)
+        datos['generado'] = timezone.now()
+        cache.set(clave, datos, settings.REPORTES_CACHE_TIMEOUT)
+    return datos
+
+
+def nombre_csv_antiguedad(hoy):
+    return f"cuentas_por_cobrar_{hoy.isoformat()}.csv"
+
+
+def escribir_csv_antiguedad(archivo, datos):
+    """CSV del reporte de antigüedad (con BOM, para que Excel lea bien los acentos)."""
+    archivo.write('\ufeff')
+    escritor = csv.writer(archivo)
+    escritor.writerow(
+        ['Cliente', 'RUT'] + [etiqueta for _, etiqueta in datos['tramos']]
+        + ['Total', 'Órdenes', 'Días (orden más antigua)']
+    )
+    for fila in datos['filas']:
+        escritor.writerow(
+            [fila['nombre'], fila['rut']] + [f"{fila[clave]:.0f}" for clave, _ in datos['tramos']]
+            + [f"{fila['total']:.0f}", fila['ordenes'], fila['dias']]
+        )
@@ -0,0 +1,19 @@
+# finanzas/tareas.py
+"""
+Tareas en segundo plano de 'finanzas' (ver core/tareas.py).
+"""
+import io
+
+from django.utils import timezone
+
+from core.tareas import Archivo, tarea
+from .reportes import calcular_antiguedad_saldos, escribir_csv_antiguedad, nombre_csv_antiguedad
+
+
+@tarea('finanzas.csv_cuentas_por_cobrar')
+def csv_cuentas_por_cobrar():
+    """CSV de la antigüedad de saldos al día de hoy (sin el límite de tiempo de la vista)."""
+    hoy = timezone.localdate()
+    contenido = io.StringIO()
+    escribir_csv_antiguedad(contenido, calcular_antiguedad_saldos(hoy))
+    return Archivo(nombre_csv_antiguedad(hoy), 'text/csv; charset=utf-8', [contenido.getvalue().encode('utf-8')])
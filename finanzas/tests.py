@@ -1,3 +1,127 @@
-from django.test import TestCase
+from datetime import date, datetime, timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import F
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from core.instrumentacion import medir
+from core.tests import CACHES_DE_PRUEBA, DatosSembradosMixin
+from recursos_humanos.models import Asistencia, Trabajador
+from ventas.models import OrdenCompra
+from .models import Gasto
+from .reportes import antiguedad_saldos, calcular_antiguedad_saldos, calcular_estado_resultados
+
+
+class CuentasPorCobrarTests(DatosSembradosMixin, TestCase):
+    """Antigüedad de cuentas por cobrar: una consulta, tramos por días y exportación CSV."""
+
+    def test_tramos_por_antiguedad(self):
+        # Sembradas: una orden por semana (0, 7, ..., 98 días), todas pendientes por 3000
+        OrdenCompra.objects.filter(fecha__lt=timezone.now() - timedelta(days=60)).update(
+            estado_pago=OrdenCompra.EstadoPago.PAGADA, monto_pagado=F('total'),
+        )
+        OrdenCompra.objects.filter(pk=self.orden.pk).update(
+            estado_pago=OrdenCompra.EstadoPago.ABONADA, monto_pagado=Decimal('1000'),
+        )
+        with medir() as medicion:
+            datos = calcular_antiguedad_saldos()
+        self.assertEqual(medicion.consultas, 1)
+
+        totales = datos['totales']
+        self.assertEqual(totales['d0_30'], Decimal('3000') * 5)   # 0, 7, 14, 21, 28 días
+        self.assertEqual(totales['d31_60'], Decimal('3000') * 4)  # 35, 42, 49, 56 días
+        self.assertEqual(totales['d61_90'], 0)
+        self.assertEqual(totales['d90_mas'], Decimal('2000'))     # 98 días, abonada
+        self.assertEqual(totales['total'], sum(fila['total'] for fila in datos['filas']))
+
+    def test_exportar_csv(self):
+        respuesta = self.client.get(reverse('finanzas:cuentas_por_cobrar') + '?formato=csv')
+        self.assertEqual(respuesta['Content-Type'], 'text/csv; charset=utf-8')
+        lineas = respuesta.content.decode('utf-8-sig').splitlines()
+        self.assertTrue(lineas[0].startswith('Cliente,RUT,0–30 días'))
+        self.assertEqual(len(lineas) - 1, len(calcular_antiguedad_saldos()['filas']))
+
+
+    def test_pago_cambia_el_reporte_cacheado(self):
+        antes = antiguedad_saldos()['totales']['total']
+        orden = OrdenCompra.objects.get(pk=self.orden.pk)
+        orden.registrar_pago(Decimal('1200'))
+        self.assertEqual(antiguedad_saldos()['totales']['total'], antes - Decimal('1200'))
+
+    def test_csv_no_usa_el_cache(self):
+        antiguedad_saldos()
+        # Cambio que no pasa por el ORM (no cambia la versión de los datos)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "UPDATE ventas_ordencompra SET monto_pagado = total, estado_pago = %s",
+                [OrdenCompra.EstadoPago.PAGADA],
+            )
+        respuesta = self.client.get(reverse('finanzas:cuentas_por_cobrar') + '?formato=csv')
+        self.assertEqual(len(respuesta.content.decode('utf-8-sig').splitlines()), 1)  # Solo el encabezado
+
+
+@override_settings(CACHES=CACHES_DE_PRUEBA)
+class EstadoResultadosTests(TestCase):
+    """P&L por proyecto y mes: ventas, mano de obra desde las asistencias y gastos sin los de salario."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user('contador', password='clave-segura-123')
+        marzo = timezone.make_aware(datetime(2025, 3, 10, 12))
+        OrdenCompra.objects.create(
+            cliente='Cliente', fecha=marzo, tipo_proyecto='CONSTRUCTORA',
+            total=Decimal('100000'), total_costo=Decimal('30000'), total_utilidad=Decimal('70000'),
+        )
+        OrdenCompra.objects.create(
+            cliente='Cliente', fecha=marzo, tipo_proyecto='BLOQUERA',
+            total=Decimal('8000'), total_costo=Decimal('2000'), total_utilidad=Decimal('6000'),
+        )
+        trabajador = Trabajador.objects.create(nombre='Albañil', rut='55555555-5', salario_por_dia=Decimal('20000'))
+        for dia in (3, 4):
+            Asistencia.objects.create(trabajador=trabajador, fecha=date(2025, 3, dia), tipo_proyecto='CONSTRUCTORA')
+        Gasto.objects.create(fecha=date(2025, 3, 15), descripcion='Cemento', monto=Decimal('5000'),
+                             tipo_proyecto='CONSTRUCTORA')
+        Gasto.objects.create(fecha=date(2025, 4, 2), descripcion='Flete', monto=Decimal('1500'),
+                             tipo_proyecto='CONSTRUCTORA')
+        # Ya está en la mano de obra (asistencias): no se cuenta dos veces
+        Gasto.objects.create(fecha=date(2025, 3, 31), descripcion='Sueldos', monto=Decimal('40000'),
+                             categoria='SALARIO', tipo_proyecto='CONSTRUCTORA')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.usuario)
+
+    def test_resultado_por_proyecto_y_mes(self):
+        with medir() as medicion:
+            datos = calcular_estado_resultados(date(2025, 3, 1), date(2025, 4, 30))
+        self.assertEqual(medicion.consultas, 3)
+        self.assertEqual(datos['meses'], ['2025-03', '2025-04'])
+
+        proyectos = {proyecto['codigo']: proyecto for proyecto in datos['proyectos']}
+        marzo, abril = proyectos['CONSTRUCTORA']['filas']
+        self.assertEqual(
+            (marzo['ingresos'], marzo['costo_ventas'], marzo['dias_trabajados'], marzo['mano_de_obra'], marzo['gastos']),
+            (100000, 30000, 2, 40000, 5000),
+        )
+        self.assertEqual(marzo['resultado'], 100000 - 30000 - 40000 - 5000)
+        self.assertEqual((abril['gastos'], abril['resultado']), (1500, -1500))
+        self.assertEqual(proyectos['CONSTRUCTORA']['totales']['resultado'], 25000 - 1500)
+        self.assertEqual(proyectos['BLOQUERA']['totales']['resultado'], 6000)
+
+    def test_vista_cacheada_y_refrescar(self):
+        ruta = reverse('finanzas:estado_resultados') + '?fecha_inicio=2025-03-01&fecha_fin=2025-03-31'
+
+        def resultado(respuesta):
+            proyectos = {proyecto['codigo']: proyecto for proyecto in respuesta.context['datos']['proyectos']}
+            return proyectos['CONSTRUCTORA']['totales']['resultado']
+
+        self.assertEqual(resultado(self.client.get(ruta)), 25000)
+        Gasto.objects.create(fecha=date(2025, 3, 20), descripcion='Arena', monto=Decimal('1000'),
+                             tipo_proyecto='CONSTRUCTORA')
+        self.assertEqual(resultado(self.client.get(ruta)), 25000) # Copia guardada
+        self.assertEqual(resultado(self.client.get(ruta + '&refrescar=1')), 24000)
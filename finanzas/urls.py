@@ -16,4 +16,8 @@ urlpatterns = [
     path('editar/<int:pk>/', views.editar_gasto, name='editar_gasto'),
     # Ej. /finanzas/eliminar/5/
     path('eliminar/<int:pk>/', views.eliminar_gasto, name='eliminar_gasto'),
+    # Ej. /finanzas/resultados/ (Estado de Resultados por proyecto)
+    path('resultados/', views.estado_resultados_proyecto, name='estado_resultados'),
+    # Ej. /finanzas/cobranza/ (Antigüedad de cuentas por cobrar; ?formato=csv para exportar)
+    path('cobranza/', views.cuentas_por_cobrar, name='cuentas_por_cobrar'),
 ]
\ No newline at end of file
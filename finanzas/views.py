@@ -1,13 +1,19 @@
 # finanzas/views.py
 """
 Define las vistas (lógica) para la aplicación 'finanzas'.
-Maneja el CRUD simple para el modelo Gasto.
+Maneja el CRUD simple para el modelo Gasto y los reportes financieros.
 """
+from datetime import date
+from django.conf import settings
+from django.http import HttpResponse
 from django.shortcuts import render, get_object_or_404, redirect, reverse
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
+from django.db import OperationalError
 from .models import Gasto
-from .forms import GastoForm
+from .forms import GastoForm, PeriodoForm
+from .reportes import antiguedad_saldos, escribir_csv_antiguedad, estado_resultados, nombre_csv_antiguedad
+from core.tareas import encolar
 
 @login_required
 def lista_gastos(request):
@@ -62,4 +68,80 @@ def eliminar_gasto(request, pk):
     return render(request, 'core/confirmar_eliminar.html', {
         'object': gasto,
         'cancel_url': reverse('finanzas:lista_gastos')
-    })
\ No newline at end of file
+    })
+
+# --- Reportes ---
+
+@login_required
+def estado_resultados_proyecto(request):
+    """
+    Muestra el Estado de Resultados (P&L) por proyecto y mes.
+    Por defecto abarca desde el 1 de enero del año en curso hasta hoy.
+    El parámetro GET 'refrescar' fuerza recalcular el reporte cacheado;
+    el CSV se calcula siempre de nuevo.
+    """
+    hoy = date.today()
+    form = PeriodoForm(request.GET or None)
+    fecha_inicio, fecha_fin = hoy.replace(month=1, day=1), hoy
+    if form.is_bound:
+        if form.is_valid():
+            fecha_inicio = form.cleaned_data['fecha_inicio'] or fecha_inicio
+            fecha_fin = form.cleaned_data['fecha_fin'] or fecha_fin
+        else:
+            messages.error(request, "Por favor corrige los errores en el formulario.")
+
+    try:
+        datos = estado_resultados(fecha_inicio, fecha_fin, refrescar='refrescar' in request.GET)
+    except OperationalError:
+        datos = None
+        messages.error(request, "El reporte tardó demasiado en calcularse. Intenta con un período más corto.")
+    return render(request, 'finanzas/estado_resultados.html', {
+        'form': form,
+        'fecha_inicio': fecha_inicio,
+        'fecha_fin': fecha_fin,
+        'datos': datos,
+    })
+
+
+# Clientes que se muestran en la página de cobranza (ordenados por saldo)
+MAX_FILAS_COBRANZA = 200
+
+
+@login_required
+def cuentas_por_cobrar(request):
+    """
+    Antigüedad de las cuentas por cobrar: saldo pendiente de cada cliente
+    repartido en tramos (0–30, 31–60, 61–90 y más de 90 días).
+    Con '?formato=csv' descarga la misma tabla como CSV (con
+    TAREAS_SEGUNDO_PLANO, lo genera 'run_worker' como tarea).
+    El parámetro GET 'refrescar' fuerza recalcular el reporte cacheado;
+    el CSV se calcula siempre de nuevo.
+    """
+    if request.GET.get('formato') == 'csv' and settings.TAREAS_SEGUNDO_PLANO:
+        tarea = encolar('finanzas.csv_cuentas_por_cobrar', usuario=request.user,
+                        descripcion="Cuentas por cobrar (CSV)")
+        return redirect('core:tarea', tarea_id=tarea.pk)
+
+    try:
+        datos = antiguedad_saldos(refrescar='refrescar' in request.GET or request.GET.get('formato') == 'csv')
+    except OperationalError:
+        datos = None
+        messages.error(request, "El reporte tardó demasiado en calcularse. Intenta nuevamente en unos minutos.")
+
+    if datos and request.GET.get('formato') == 'csv':
+        return _csv_cuentas_por_cobrar(datos)
+    # En pantalla, los mayores deudores; el CSV trae a todos
+    filas = datos['filas'][:MAX_FILAS_COBRANZA] if datos else []
+    return render(request, 'finanzas/cuentas_por_cobrar.html', {
+        'datos': datos,
+        'filas': filas,
+        'filas_ocultas': len(datos['filas']) - len(filas) if datos else 0,
+    })
+
+
+def _csv_cuentas_por_cobrar(datos):
+    """Respuesta con el CSV del reporte de antigüedad (ver reportes.escribir_csv_antiguedad)."""
+    response = HttpResponse(content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{nombre_csv_antiguedad(datos["hoy"])}"'
+    escribir_csv_antiguedad(response, datos)
+    return response
@@ -3,8 +3,11 @@
 Define el modelo de la base de datos para la aplicación 'inventario'.
 """
 from django.db import models
+from django.db.models import Case, F, Value, When
 
-class Producto(models.Model):
+from core.models import ModeloVersionado
+
+class Producto(ModeloVersionado):
     """
     Representa un producto o material en el inventario.
     
@@ -45,9 +48,30 @@ class Producto(models.Model):
     def aumentar_stock(self, cantidad):
         """
         Método de negocio para aumentar el stock (ej. devoluciones).
+        Usa 'aumentar_stock_en_bloque': suma en la BD, sin pisar otras ventas.
+        """
+        Producto.aumentar_stock_en_bloque({self.pk: cantidad})
+        self.refresh_from_db(fields=['stock', 'version', 'actualizado'])
+
+    @classmethod
+    def aumentar_stock_en_bloque(cls, cantidades):
+        """
+        Aumenta el stock de varios productos con un solo UPDATE:
+        SET stock = stock + CASE id WHEN ... END (y 'version', ver ModeloVersionado).
+
+        Args:
+            cantidades (dict): {producto_id: cantidad a sumar}
+
+        Returns:
+            int: Cantidad de productos actualizados.
         """
-        self.stock += cantidad
-        self.save()
+        if not cantidades:
+            return 0
+        incremento = Case(
+            *[When(pk=pk, then=Value(cantidad)) for pk, cantidad in cantidades.items()],
+            default=Value(0), output_field=models.IntegerField(),
+        )
+        return cls.objects.filter(pk__in=cantidades).update(stock=F('stock') + incremento)
 
     class Meta:
         verbose_name_plural = "Productos"
\ No newline at end of file
@@ -10,6 +10,7 @@ from django.shortcuts import render, get_object_or_404, redirect, reverse
 from django.http import JsonResponse
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
+from core.condicional import condicional_por_version
 from .models import Producto
 from .forms import ProductoForm
 
@@ -67,6 +68,7 @@ def eliminar_producto(request, pk):
 # --- API para JavaScript ---
 
 @login_required
+@condicional_por_version(Producto, 'producto_id')
 def get_stock_producto(request, producto_id):
     """
     Vista de API simple que devuelve el stock de un producto en formato JSON.
@@ -77,6 +79,8 @@ def get_stock_producto(request, producto_id):
         
     Returns:
         JsonResponse: {'stock': int} o {'error': str}
+
+    Lleva ETag: si el stock no cambió, el navegador recibe un 304.
     """
     try:
         producto = Producto.objects.get(pk=producto_id)
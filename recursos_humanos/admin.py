@@ -3,7 +3,7 @@
 Configuración del Admin para la app 'recursos_humanos'.
 """
 from django.contrib import admin
-from .models import Trabajador, Asistencia
+from .models import Trabajador, Asistencia, AsistenciaMes, PagoSalario
 
 @admin.register(Trabajador)
 class TrabajadorAdmin(admin.ModelAdmin):
@@ -17,4 +17,36 @@ class AsistenciaAdmin(admin.ModelAdmin):
     """Personaliza la vista de 'Asistencia'."""
     list_display = ('trabajador', 'fecha', 'tipo_proyecto')
     list_filter = ('fecha', 'tipo_proyecto', 'trabajador')
-    date_hierarchy = 'fecha'
\ No newline at end of file
+    date_hierarchy = 'fecha'
+
+@admin.register(AsistenciaMes)
+class AsistenciaMesAdmin(admin.ModelAdmin):
+    """
+    Vista de solo lectura del resumen mensual en bits.
+    Se genera desde Asistencia; no se edita a mano.
+    """
+    list_display = ('trabajador', 'mes', 'tipo_proyecto', 'dias_trabajados')
+    list_filter = ('mes', 'tipo_proyecto')
+    date_hierarchy = 'mes'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+@admin.register(PagoSalario)
+class PagoSalarioAdmin(admin.ModelAdmin):
+    """
+    Vista de solo lectura de los pagos de salario registrados por la nómina.
+    Para anular un pago se elimina su Gasto (el pago se elimina con él).
+    """
+    list_display = ('trabajador', 'fecha_inicio', 'fecha_fin', 'tipo_proyecto', 'gasto', 'creado')
+    list_filter = ('tipo_proyecto', 'fecha_inicio')
+    search_fields = ('trabajador__nombre', 'trabajador__rut')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class RecursosHumanosConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'recursos_humanos'
+
+    def ready(self):
+        # Registrar las señales (invalidación de la caché del calendario)
+        from . import signals  # noqa: F401
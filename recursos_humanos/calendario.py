@@ -0,0 +1,185 @@
+# recursos_humanos/calendario.py
+"""
+Datos y caché del calendario de asistencias (feed de FullCalendar).
+
+Cada mes tiene un "token de versión" en la caché. Cualquier escritura de
+asistencias de ese mes cambia el token, lo que invalida de una vez todas
+las respuestas cacheadas (y los ETag) que incluyen ese mes.
+
+Los tokens viven en la caché compartida entre procesos (CACHE_VERSIONES,
+la de archivos de las sesiones): un cambio hecho en un worker se ve en
+todos, y el ETag de un mes es el mismo sin importar qué worker responda.
+Las respuestas del feed pueden quedar en la caché local de cada proceso
+porque su clave ya incluye los tokens.
+"""
+import hashlib
+import json
+import time
+from collections import Counter
+from datetime import date, timedelta
+
+from django.core.cache import cache, caches
+from django.utils.dateparse import parse_date
+
+from .models import AsistenciaMes, Trabajador
+
+# Rango máximo que acepta el feed (una vista de mes de FullCalendar son 42 días)
+MAX_DIAS_FEED = 62
+
+# Segundos que se guarda una respuesta: los meses cerrados casi nunca cambian
+CACHE_MES_CERRADO = 24 * 60 * 60
+CACHE_MES_ABIERTO = 5 * 60
+
+MODOS_FEED = ('detalle', 'resumen')
+
+# Alias de la caché compartida entre procesos donde viven los tokens de versión
+CACHE_VERSIONES = 'sesiones'
+
+COLORES_PROYECTO = {
+    'CONSTRUCTORA': '#28a745',
+    'BLOQUERA': '#17a2b8',
+}
+NOMBRES_PROYECTO = dict(Trabajador.TIPO_PROYECTO)
+
+
+def leer_rango(start, end):
+    """
+    Valida los parámetros 'start'/'end' que envía FullCalendar.
+
+    Acepta fechas ISO con o sin hora ('2025-10-27' o '2025-10-27T00:00:00-03:00').
+    'end' es exclusivo, igual que en FullCalendar.
+
+    Returns:
+        tuple[date, date]: (inicio, fin_exclusivo)
+
+    Raises:
+        ValueError: Si faltan, son inválidos o el rango supera MAX_DIAS_FEED.
+    """
+    if not start or not end:
+        raise ValueError("Faltan parámetros start/end")
+    try:
+        inicio = parse_date(start[:10])
+        fin = parse_date(end[:10])
+    except ValueError:
+        inicio = fin = None
+    if inicio is None or fin is None:
+        raise ValueError("Parámetros start/end inválidos")
+    if fin <= inicio:
+        raise ValueError("'end' debe ser posterior a 'start'")
+    if (fin - inicio).days > MAX_DIAS_FEED:
+        raise ValueError(f"El rango no puede superar {MAX_DIAS_FEED} días")
+    return inicio, fin
+
+
+def meses_del_rango(inicio, fin):
+    """Lista de meses 'YYYY-MM' que toca el rango [inicio, fin)."""
+    meses = []
+    mes = inicio.replace(day=1)
+    while mes < fin:
+        meses.append(mes.strftime('%Y-%m'))
+        mes = (mes + timedelta(days=32)).replace(day=1)
+    return meses
+
+
+def _clave_version(mes):
+    return f"asistencia:version:{mes}"
+
+
+def versiones_meses(meses):
+    """
+    Devuelve el token de versión de cada mes (una sola lectura a la caché).
+    Los meses sin token (nunca escritos o expulsados de la caché) reciben uno nuevo.
+    """
+    compartida = caches[CACHE_VERSIONES]
+    claves = {mes: _clave_version(mes) for mes in meses}
+    guardadas = compartida.get_many(claves.values())
+    versiones = {}
+    for mes, clave in claves.items():
+        if clave not in guardadas:
+            compartida.add(clave, time.time_ns(), None)
+            guardadas[clave] = compartida.get(clave)
+        versiones[mes] = guardadas[clave]
+    return versiones
+
+
+def invalidar_meses(fechas):
+    """
+    Marca como modificados los meses de las fechas dadas.
+    Debe llamarse tras cualquier escritura masiva de asistencias
+    ('bulk_create', 'update', 'delete' de QuerySet) que no emite señales.
+    """
+    meses = {fecha.strftime('%Y-%m') for fecha in fechas}
+    token = time.time_ns()
+    caches[CACHE_VERSIONES].set_many({_clave_version(mes): token for mes in meses}, None)
+
+
+def clave_feed(modo, inicio, fin):
+    """Clave de caché (y base del ETag) de una respuesta del feed."""
+    versiones = versiones_meses(meses_del_rango(inicio, fin))
+    partes = [modo, inicio.isoformat(), fin.isoformat()] + [f"{mes}={v}" for mes, v in sorted(versiones.items())]
+    return "asistencia:feed:" + hashlib.md5(":".join(partes).encode()).hexdigest()
+
+
+def _resumenes_del_rango(inicio, fin):
+    """
+    Resúmenes mensuales (AsistenciaMes) de los meses que toca [inicio, fin).
+    Un mes de calendario son tantas filas como trabajadores, no como asistencias.
+    """
+    return AsistenciaMes.objects.filter(
+        mes__gte=inicio.replace(day=1), mes__lt=fin, dias__gt=0
+    ).values_list('mes', 'tipo_proyecto', 'dias', 'trabajador__nombre')
+
+
+def _eventos_detalle(inicio, fin):
+    """Un evento por asistencia (nombre del trabajador y proyecto)."""
+    ultimo = fin - timedelta(days=1)
+    filas = []
+    for mes, tipo_proyecto, dias, nombre in _resumenes_del_rango(inicio, fin):
+        mascara = dias & AsistenciaMes.mascara_rango(mes, inicio, ultimo)
+        for fecha in AsistenciaMes.fechas_de(mes, mascara):
+            filas.append((fecha, nombre, tipo_proyecto))
+    filas.sort()
+    return [
+        {
+            'title': f'{nombre} ({NOMBRES_PROYECTO.get(tipo_proyecto, tipo_proyecto)})',
+            'start': fecha.isoformat(), # Formato YYYY-MM-DD
+            'allDay': True,
+            'color': COLORES_PROYECTO.get(tipo_proyecto),
+        }
+        for fecha, nombre, tipo_proyecto in filas
+    ]
+
+
+def _eventos_resumen(inicio, fin):
+    """Un evento por día y proyecto con el total de asistencias."""
+    ultimo = fin - timedelta(days=1)
+    totales = Counter()
+    for mes, tipo_proyecto, dias, _ in _resumenes_del_rango(inicio, fin):
+        mascara = dias & AsistenciaMes.mascara_rango(mes, inicio, ultimo)
+        for fecha in AsistenciaMes.fechas_de(mes, mascara):
+            totales[(fecha, tipo_proyecto)] += 1
+    return [
+        {
+            'title': f"{total} {NOMBRES_PROYECTO.get(tipo_proyecto, tipo_proyecto)}",
+            'start': fecha.isoformat(),
+            'allDay': True,
+            'color': COLORES_PROYECTO.get(tipo_proyecto),
+            'extendedProps': {'tipo_proyecto': tipo_proyecto, 'total': total},
+        }
+        for (fecha, tipo_proyecto), total in sorted(totales.items())
+    ]
+
+
+def contenido_feed(modo, inicio, fin):
+    """
+    Devuelve el JSON (str) del feed, desde la caché si está disponible.
+    Los rangos que terminan antes del mes en curso se guardan por más tiempo.
+    """
+    clave = clave_feed(modo, inicio, fin)
+    contenido = cache.get(clave)
+    if contenido is None:
+        eventos = _eventos_resumen(inicio, fin) if modo == 'resumen' else _eventos_detalle(inicio, fin)
+        contenido = json.dumps(eventos)
+        cerrado = fin <= date.today().replace(day=1)
+        cache.set(clave, contenido, CACHE_MES_CERRADO if cerrado else CACHE_MES_ABIERTO)
+    return contenido
@@ -40,4 +40,46 @@ class CalculoSalarioForm(forms.Form):
     trabajador = forms.ModelChoiceField(queryset=Trabajador.objects.all(), widget=forms.Select(attrs={'class': 'form-control'}))
     fecha_inicio = forms.DateField(widget=forms.DateInput(attrs={'class': 'form-control', 'type': 'date'}))
     fecha_fin = forms.DateField(widget=forms.DateInput(attrs={'class': 'form-control', 'type': 'date'}))
-    tipo_proyecto = forms.ChoiceField(choices=Trabajador.TIPO_PROYECTO, widget=forms.Select(attrs={'class': 'form-control'}))
\ No newline at end of file
+    tipo_proyecto = forms.ChoiceField(choices=Trabajador.TIPO_PROYECTO, widget=forms.Select(attrs={'class': 'form-control'}))
+
+class AsistenciaCuadrillaForm(forms.Form):
+    """
+    Formulario estándar (no ModelForm) para elegir la semana y el proyecto
+    de la grilla de asistencia por cuadrilla.
+    """
+    semana = forms.DateField(
+        label="Semana del",
+        help_text="Cualquier día de la semana; se ajusta al lunes.",
+        widget=forms.DateInput(attrs={'class': 'form-control', 'type': 'date'})
+    )
+    tipo_proyecto = forms.ChoiceField(choices=Trabajador.TIPO_PROYECTO, widget=forms.Select(attrs={'class': 'form-control'}))
+
+
+class NominaForm(forms.Form):
+    """
+    Formulario estándar (no ModelForm) para calcular la nómina de todos
+    los trabajadores de un proyecto en un período.
+    """
+    fecha_inicio = forms.DateField(widget=forms.DateInput(attrs={'class': 'form-control', 'type': 'date'}))
+    fecha_fin = forms.DateField(widget=forms.DateInput(attrs={'class': 'form-control', 'type': 'date'}))
+    tipo_proyecto = forms.ChoiceField(choices=Trabajador.TIPO_PROYECTO, widget=forms.Select(attrs={'class': 'form-control'}))
+
+    def clean(self):
+        """Valida que el rango de fechas no esté invertido."""
+        cleaned_data = super().clean()
+        fecha_inicio = cleaned_data.get('fecha_inicio')
+        fecha_fin = cleaned_data.get('fecha_fin')
+        if fecha_inicio and fecha_fin and fecha_inicio > fecha_fin:
+            raise forms.ValidationError("La fecha de inicio no puede ser posterior a la fecha de fin.")
+        return cleaned_data
+
+
+class ImportarAsistenciaForm(forms.Form):
+    """
+    Formulario para subir un CSV de asistencias (rut, fecha, tipo_proyecto).
+    """
+    archivo = forms.FileField(
+        label="Archivo CSV",
+        help_text="Columnas: rut, fecha, tipo_proyecto. Fechas AAAA-MM-DD o DD-MM-AAAA.",
+        widget=forms.ClearableFileInput(attrs={'class': 'form-control', 'accept': '.csv,text/csv'})
+    )
@@ -0,0 +1,150 @@
+# recursos_humanos/importacion.py
+"""
+Importación masiva de asistencias desde CSV (planillas o relojes control).
+
+Formato esperado, una asistencia por línea (encabezado opcional):
+    rut, fecha, tipo_proyecto
+    12.345.678-9, 2025-11-03, CONSTRUCTORA
+
+La fecha puede venir como AAAA-MM-DD, DD-MM-AAAA o DD/MM/AAAA y el proyecto
+por su código ('BLOQUERA') o su nombre ('Bloquera').
+"""
+import csv
+from datetime import datetime
+
+from django.db import transaction
+
+from .models import Trabajador, Asistencia, AsistenciaMes
+from .calendario import invalidar_meses
+from core.rut import normalizar_rut
+
+FORMATOS_FECHA = ('%Y-%m-%d', '%d-%m-%Y', '%d/%m/%Y')
+
+
+class ArchivoInvalido(ValueError):
+    """El archivo no se puede leer como CSV de texto (p. ej., no es UTF-8)."""
+
+
+def _leer_fecha(valor):
+    """Convierte el texto a date probando los formatos aceptados."""
+    for formato in FORMATOS_FECHA:
+        try:
+            return datetime.strptime(valor, formato).date()
+        except ValueError:
+            continue
+    raise ValueError(f"Fecha inválida: '{valor}'")
+
+
+def _leer_proyecto(valor, proyectos):
+    """Devuelve el código del proyecto a partir del código o del nombre."""
+    codigo = proyectos.get(valor.strip().upper())
+    if codigo is None:
+        raise ValueError(f"Tipo de proyecto inválido: '{valor}'")
+    return codigo
+
+
+def _filas_csv(lineas, errores):
+    """
+    Recorre las filas del CSV con su número de línea.
+
+    Una fila mal formada (csv.Error: byte NUL, campo demasiado largo, etc.)
+    se agrega a 'errores' y la lectura sigue con la siguiente. Un archivo
+    que no es UTF-8 no se puede seguir leyendo: se informa con ArchivoInvalido.
+    """
+    lector = csv.reader(lineas)
+    while True:
+        try:
+            fila = next(lector)
+        except StopIteration:
+            return
+        except csv.Error as e:
+            errores.append((lector.line_num, f"Línea CSV mal formada: {e}"))
+            continue
+        except UnicodeDecodeError:
+            raise ArchivoInvalido(
+                f"El archivo no está codificado en UTF-8 (después de la línea {lector.line_num}). "
+                "Guárdalo como 'CSV UTF-8' e inténtalo de nuevo."
+            )
+        yield lector.line_num, fila
+
+
+@transaction.atomic
+def importar_asistencias(lineas, lote=1000):
+    """
+    Importa asistencias desde un iterable de líneas CSV (texto).
+
+    - Los RUT se resuelven con un diccionario armado en una sola consulta.
+    - Cada fila se valida en memoria; los errores se informan por línea.
+    - Las filas válidas se insertan por lotes con 'Asistencia.crear_en_bloque'
+      (descarta las ya registradas y devuelve las que sí se insertaron),
+      todo dentro de una sola transacción.
+    - El encabezado es opcional y se reconoce en la primera fila con datos.
+
+    Args:
+        lineas (iterable[str]): Archivo abierto en modo texto u otro iterable de líneas.
+        lote (int): Cantidad de filas por INSERT.
+
+    Returns:
+        dict: {'leidas', 'validas', 'creadas', 'duplicadas', 'errores': [(linea, mensaje), ...]}
+              'duplicadas' cuenta las repetidas en el archivo y las ya registradas.
+
+    Raises:
+        ArchivoInvalido: Si el archivo no se puede decodificar (no se importa nada).
+    """
+    trabajadores = {normalizar_rut(rut): pk for pk, rut in Trabajador.objects.values_list('pk', 'rut')}
+    proyectos = {}
+    for codigo, nombre in Trabajador.TIPO_PROYECTO:
+        proyectos[codigo.upper()] = codigo
+        proyectos[nombre.upper()] = codigo
+
+    resultado = {'leidas': 0, 'validas': 0, 'creadas': 0, 'duplicadas': 0, 'errores': []}
+    vistas = set()
+    pendientes = []
+    insertadas = []
+    primera = True
+
+    for numero, fila in _filas_csv(lineas, resultado['errores']):
+        # Saltar líneas vacías y el encabezado
+        if not fila or not any(celda.strip() for celda in fila):
+            continue
+        if primera:
+            primera = False
+            if fila[0].strip().lower() == 'rut':
+                continue
+
+        resultado['leidas'] += 1
+        try:
+            if len(fila) < 3:
+                raise ValueError("Se esperaban 3 columnas: rut, fecha, tipo_proyecto")
+            rut, fecha_str, proyecto_str = (celda.strip() for celda in fila[:3])
+            trabajador_id = trabajadores.get(normalizar_rut(rut))
+            if trabajador_id is None:
+                raise ValueError(f"RUT no registrado: '{rut}'")
+            fecha = _leer_fecha(fecha_str)
+            tipo_proyecto = _leer_proyecto(proyecto_str, proyectos)
+        except ValueError as e:
+            resultado['errores'].append((numero, str(e)))
+            continue
+
+        clave = (trabajador_id, fecha, tipo_proyecto)
+        if clave in vistas:
+            resultado['duplicadas'] += 1 # Repetida dentro del mismo archivo
+            continue
+        vistas.add(clave)
+        resultado['validas'] += 1
+        pendientes.append(Asistencia(trabajador_id=trabajador_id, fecha=fecha, tipo_proyecto=tipo_proyecto))
+
+        if len(pendientes) >= lote:
+            insertadas += Asistencia.crear_en_bloque(pendientes, lote=lote)
+            pendientes = []
+
+    if pendientes:
+        insertadas += Asistencia.crear_en_bloque(pendientes, lote=lote)
+
+    resultado['creadas'] = len(insertadas)
+    resultado['duplicadas'] += resultado['validas'] - resultado['creadas']
+    if insertadas:
+        # bulk_create no emite señales: marcar los días insertados en el resumen mensual y el calendario
+        AsistenciaMes.marcar_en_bloque(insertadas)
+        invalidar_meses(fecha for _, fecha, _ in insertadas)
+    return resultado
@@ -0,0 +1,196 @@
+# recursos_humanos/liquidaciones.py
+"""
+Generación de liquidaciones de sueldo (PDF) para un período de nómina.
+
+- Los datos salen de 'calcular_nomina' (una consulta agrupada).
+- Los estilos de ReportLab se construyen una sola vez por proceso.
+- Los PDF se generan en paralelo en un pool de procesos y se entregan
+  como un ZIP que se va escribiendo (streaming) a medida que están listos.
+"""
+import os
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from io import BytesIO
+
+from django.conf import settings
+from django.contrib.humanize.templatetags.humanize import intcomma
+
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_CENTER, TA_RIGHT
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.units import mm
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+from reportlab.platypus.flowables import HRFlowable
+
+EMPRESA = (
+    "CONSTRUCCIONES V & G LIZ CASTILLO GARCIA SPA",
+    "RUT: 77.858.577-4",
+    "Dirección: Vilaco 301, Toconao",
+    "Teléfono: +56 9 52341652",
+)
+
+# Por debajo de esta cantidad no conviene pagar el costo de levantar procesos
+MIN_LIQUIDACIONES_POOL = 4
+
+_ESTILOS = None
+
+
+def _estilos():
+    """Estilos de párrafo compartidos (se crean una vez por proceso)."""
+    global _ESTILOS
+    if _ESTILOS is None:
+        base = ParagraphStyle(name='LiqBase', parent=getSampleStyleSheet()['Normal'], fontSize=10, leading=13)
+        _ESTILOS = {
+            'base': base,
+            'empresa': ParagraphStyle(name='LiqEmpresa', parent=base, fontSize=8, leading=10),
+            'titulo': ParagraphStyle(name='LiqTitulo', parent=base, fontName='Helvetica-Bold', fontSize=14, leading=18, alignment=TA_CENTER),
+            'negrita': ParagraphStyle(name='LiqNegrita', parent=base, fontName='Helvetica-Bold'),
+            'derecha': ParagraphStyle(name='LiqDerecha', parent=base, alignment=TA_RIGHT),
+            'total': ParagraphStyle(name='LiqTotal', parent=base, fontName='Helvetica-Bold', fontSize=12, leading=15, alignment=TA_RIGHT),
+            'firma': ParagraphStyle(name='LiqFirma', parent=base, fontSize=9, alignment=TA_CENTER),
+        }
+    return _ESTILOS
+
+
+def _pesos(valor):
+    """Formatea un monto como '$12.345' (sin decimales)."""
+    return f"${intcomma(int(valor))}"
+
+
+def nombre_archivo(fila, fecha_inicio, fecha_fin):
+    """Nombre del PDF dentro del ZIP (ej. 'liquidacion_12345678-9_2025-11-01_2025-11-30.pdf')."""
+    rut = ''.join(c for c in (fila['rut'] or str(fila['trabajador_id'])) if c.isalnum() or c == '-')
+    return f"liquidacion_{rut}_{fecha_inicio.isoformat()}_{fecha_fin.isoformat()}.pdf"
+
+
+def generar_liquidacion_pdf(fila, fecha_inicio, fecha_fin, tipo_proyecto):
+    """
+    Genera la liquidación de un trabajador.
+
+    Args:
+        fila (dict): Una fila de 'calcular_nomina(..., con_fechas=True)'.
+
+    Returns:
+        bytes: El contenido del PDF.
+    """
+    estilos = _estilos()
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=letter, leftMargin=20 * mm, rightMargin=20 * mm,
+                            topMargin=15 * mm, bottomMargin=15 * mm,
+                            title=f"Liquidación {fila['nombre']}")
+
+    story = [Paragraph("<br/>".join(EMPRESA), estilos['empresa'])]
+    story.append(HRFlowable(width="100%", thickness=0.5, color=colors.black, spaceBefore=3 * mm, spaceAfter=5 * mm))
+    story.append(Paragraph("LIQUIDACIÓN DE SUELDO", estilos['titulo']))
+    story.append(Spacer(1, 5 * mm))
+
+    # --- Datos del trabajador y período ---
+    datos = [
+        [Paragraph("Trabajador:", estilos['negrita']), Paragraph(fila['nombre'], estilos['base'])],
+        [Paragraph("RUT:", estilos['negrita']), Paragraph(fila['rut'] or 'N/A', estilos['base'])],
+        [Paragraph("Cargo:", estilos['negrita']), Paragraph(fila.get('cargo') or 'N/A', estilos['base'])],
+        [Paragraph("Proyecto:", estilos['negrita']), Paragraph(tipo_proyecto.capitalize(), estilos['base'])],
+        [Paragraph("Período:", estilos['negrita']),
+         Paragraph(f"{fecha_inicio.strftime('%d-%m-%Y')} al {fecha_fin.strftime('%d-%m-%Y')}", estilos['base'])],
+    ]
+    story.append(Table(datos, colWidths=[35 * mm, None], style=[('VALIGN', (0, 0), (-1, -1), 'TOP')]))
+    story.append(Spacer(1, 6 * mm))
+
+    # --- Detalle del pago ---
+    detalle = [
+        [Paragraph("Concepto", estilos['negrita']), Paragraph("Días", estilos['negrita']),
+         Paragraph("Valor Día", estilos['negrita']), Paragraph("Total", estilos['negrita'])],
+        [Paragraph("Días trabajados", estilos['base']), Paragraph(str(fila['dias']), estilos['derecha']),
+         Paragraph(_pesos(fila['salario_por_dia']), estilos['derecha']), Paragraph(_pesos(fila['total']), estilos['derecha'])],
+    ]
+    tabla = Table(detalle, colWidths=[70 * mm, 25 * mm, 35 * mm, 40 * mm])
+    tabla.setStyle(TableStyle([
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#eeeeee')),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    ]))
+    story.append(tabla)
+    story.append(Spacer(1, 3 * mm))
+    story.append(Paragraph(f"Total a Pagar: {_pesos(fila['total'])}", estilos['total']))
+
+    # --- Días asistidos ---
+    if fila.get('fechas'):
+        story.append(Spacer(1, 6 * mm))
+        story.append(Paragraph("Días asistidos:", estilos['negrita']))
+        story.append(Paragraph(", ".join(f.strftime('%d/%m') for f in fila['fechas']), estilos['base']))
+
+    # --- Firmas ---
+    story.append(Spacer(1, 25 * mm))
+    firmas = Table([[Paragraph("_______________________<br/>Empleador", estilos['firma']),
+                     Paragraph("_______________________<br/>Trabajador", estilos['firma'])]],
+                   colWidths=[85 * mm, 85 * mm])
+    story.append(firmas)
+
+    doc.build(story)
+    return buffer.getvalue()
+
+
+def _generar(argumentos):
+    """Punto de entrada para el pool de procesos (debe ser una función de módulo)."""
+    fila, fecha_inicio, fecha_fin, tipo_proyecto = argumentos
+    return nombre_archivo(fila, fecha_inicio, fecha_fin), generar_liquidacion_pdf(fila, fecha_inicio, fecha_fin, tipo_proyecto)
+
+
+class _BufferZip:
+    """Archivo de solo escritura: acumula lo que escribe zipfile para ir enviándolo."""
+
+    def __init__(self):
+        self.partes = []
+        self.posicion = 0
+
+    def write(self, datos):
+        self.partes.append(bytes(datos))
+        self.posicion += len(datos)
+        return len(datos)
+
+    def tell(self):
+        return self.posicion
+
+    def flush(self):
+        pass
+
+    def vaciar(self):
+        datos = b''.join(self.partes)
+        self.partes = []
+        return datos
+
+
+def generar_zip_liquidaciones(filas, fecha_inicio, fecha_fin, tipo_proyecto):
+    """
+    Genera las liquidaciones de 'filas' y las va entregando dentro de un ZIP.
+
+    Con varios trabajadores los PDF se generan en un pool de procesos
+    (LIQUIDACIONES_PROCESOS). Cada PDF se agrega al ZIP apenas está listo
+    (en el orden en que terminan), por lo que la descarga comienza antes de
+    terminar todo el lote. Si el cliente corta la descarga, los PDF que aún
+    no empezaron se cancelan.
+
+    Yields:
+        bytes: Trozos consecutivos del archivo ZIP.
+    """
+    buffer = _BufferZip()
+    argumentos = [(fila, fecha_inicio, fecha_fin, tipo_proyecto) for fila in filas]
+    procesos = min(settings.LIQUIDACIONES_PROCESOS or os.cpu_count() or 1, len(argumentos))
+
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as archivo_zip:
+        if procesos > 1 and len(argumentos) >= MIN_LIQUIDACIONES_POOL:
+            pool = ProcessPoolExecutor(max_workers=procesos)
+            try:
+                for futuro in as_completed([pool.submit(_generar, a) for a in argumentos]):
+                    nombre, pdf = futuro.result()
+                    archivo_zip.writestr(nombre, pdf)
+                    yield buffer.vaciar()
+            finally:
+                # Al cerrarse el generador (cliente desconectado) no se espera al resto del lote
+                pool.shutdown(cancel_futures=True)
+        else:
+            for nombre, pdf in map(_generar, argumentos):
+                archivo_zip.writestr(nombre, pdf)
+                yield buffer.vaciar()
+    yield buffer.vaciar()
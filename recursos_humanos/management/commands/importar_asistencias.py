@@ -0,0 +1,47 @@
+# recursos_humanos/management/commands/importar_asistencias.py
+"""
+Comando: python manage.py importar_asistencias archivo.csv [--lote 1000] [--simular]
+
+Importa asistencias desde un CSV (rut, fecha, tipo_proyecto), igual que la
+vista de carga, e imprime el detalle de las líneas con error.
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from recursos_humanos.importacion import ArchivoInvalido, importar_asistencias
+
+
+class Simulacion(Exception):
+    """Se lanza para revertir la transacción en modo --simular."""
+
+
+class Command(BaseCommand):
+    help = "Importa asistencias desde un archivo CSV (rut, fecha, tipo_proyecto)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo', help="Ruta del archivo CSV.")
+        parser.add_argument('--lote', type=int, default=1000, help="Filas por INSERT.")
+        parser.add_argument('--simular', action='store_true', help="Valida e informa sin guardar cambios.")
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['archivo'], encoding='utf-8-sig', newline='') as archivo:
+                try:
+                    with transaction.atomic():
+                        resultado = importar_asistencias(archivo, lote=options['lote'])
+                        if options['simular']:
+                            raise Simulacion()
+                except Simulacion:
+                    self.stdout.write(self.style.WARNING("Modo simulación: no se guardó ningún cambio."))
+        except OSError as e:
+            raise CommandError(f"No se pudo leer el archivo: {e}")
+        except ArchivoInvalido as e:
+            raise CommandError(f"No se importó ninguna asistencia: {e}")
+
+        for linea, mensaje in resultado['errores']:
+            self.stderr.write(f"Línea {linea}: {mensaje}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Leídas: {resultado['leidas']} | Nuevas: {resultado['creadas']} | "
+            f"Ya registradas o repetidas: {resultado['duplicadas']} | Errores: {len(resultado['errores'])}"
+        ))
@@ -0,0 +1,40 @@
+# recursos_humanos/management/commands/reconstruir_asistencia_mes.py
+"""
+Comando: python manage.py reconstruir_asistencia_mes [--desde YYYY-MM-DD] [--hasta YYYY-MM-DD]
+
+Regenera los resúmenes mensuales en bits (AsistenciaMes) a partir de
+Asistencia. Útil tras cargas masivas o si se sospecha que están desfasados.
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from recursos_humanos.models import AsistenciaMes
+from recursos_humanos.calendario import invalidar_meses, meses_del_rango
+
+
+class Command(BaseCommand):
+    help = "Reconstruye los resúmenes mensuales de asistencia (AsistenciaMes) desde Asistencia."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', help="Fecha inicial (YYYY-MM-DD). Por defecto, toda la historia.")
+        parser.add_argument('--hasta', help="Fecha final (YYYY-MM-DD). Por defecto, toda la historia.")
+        parser.add_argument('--lote', type=int, default=2000, help="Tamaño de lote para lectura e inserción.")
+
+    def handle(self, *args, **options):
+        fechas = {}
+        for nombre in ('desde', 'hasta'):
+            valor = options[nombre]
+            fechas[nombre] = parse_date(valor) if valor else None
+            if valor and fechas[nombre] is None:
+                raise CommandError(f"Fecha inválida para --{nombre}: {valor}")
+
+        filas = AsistenciaMes.reconstruir(fechas['desde'], fechas['hasta'], lote=options['lote'])
+
+        # Invalidar la caché del calendario de los meses reconstruidos
+        if fechas['desde'] and fechas['hasta']:
+            meses = meses_del_rango(fechas['desde'].replace(day=1), fechas['hasta'])
+            invalidar_meses(parse_date(f"{mes}-01") for mes in meses)
+        else:
+            invalidar_meses(AsistenciaMes.objects.dates('mes', 'month'))
+
+        self.stdout.write(self.style.SUCCESS(f"{filas} resúmenes mensuales generados."))
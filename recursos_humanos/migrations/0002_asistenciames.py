@@ -0,0 +1,45 @@
+# Generated by Django 5.2.6 on 2026-10-19 13:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def poblar_asistencia_mes(apps, schema_editor):
+    """Genera los resúmenes mensuales a partir de las asistencias existentes."""
+    Asistencia = apps.get_model('recursos_humanos', 'Asistencia')
+    AsistenciaMes = apps.get_model('recursos_humanos', 'AsistenciaMes')
+    mascaras = {}
+    for trabajador_id, fecha, tipo_proyecto in Asistencia.objects.values_list('trabajador_id', 'fecha', 'tipo_proyecto').iterator(chunk_size=2000):
+        clave = (trabajador_id, fecha.replace(day=1), tipo_proyecto)
+        mascaras[clave] = mascaras.get(clave, 0) | (1 << (fecha.day - 1))
+    AsistenciaMes.objects.bulk_create(
+        [AsistenciaMes(trabajador_id=t, mes=m, tipo_proyecto=p, dias=d) for (t, m, p), d in mascaras.items()],
+        batch_size=2000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recursos_humanos', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AsistenciaMes',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mes', models.DateField(help_text='Primer día del mes.')),
+                ('tipo_proyecto', models.CharField(choices=[('CONSTRUCTORA', 'Constructora'), ('BLOQUERA', 'Bloquera')], default='CONSTRUCTORA', max_length=20)),
+                ('dias', models.PositiveIntegerField(default=0, help_text='Máscara de bits de los días trabajados (bit 0 = día 1).')),
+                ('trabajador', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='asistencias_mes', to='recursos_humanos.trabajador')),
+            ],
+            options={
+                'verbose_name': 'Asistencia Mensual',
+                'verbose_name_plural': 'Asistencias Mensuales',
+                'indexes': [models.Index(fields=['mes', 'tipo_proyecto'], name='recursos_hu_mes_fe1f23_idx')],
+                'unique_together': {('trabajador', 'mes', 'tipo_proyecto')},
+            },
+        ),
+        migrations.RunPython(poblar_asistencia_mes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.6 on 2026-10-19 14:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finanzas', '0002_gasto_actualizado_gasto_version'),
+        ('recursos_humanos', '0003_asistencia_actualizado_asistencia_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PagoSalario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha_inicio', models.DateField()),
+                ('fecha_fin', models.DateField()),
+                ('tipo_proyecto', models.CharField(choices=[('CONSTRUCTORA', 'Constructora'), ('BLOQUERA', 'Bloquera')], default='CONSTRUCTORA', max_length=20)),
+                ('creado', models.DateTimeField(auto_now_add=True)),
+                ('gasto', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='pago_salario', to='finanzas.gasto')),
+                ('trabajador', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pagos', to='recursos_humanos.trabajador')),
+            ],
+            options={
+                'verbose_name': 'Pago de Salario',
+                'verbose_name_plural': 'Pagos de Salario',
+                'unique_together': {('trabajador', 'fecha_inicio', 'fecha_fin', 'tipo_proyecto')},
+            },
+        ),
+    ]
@@ -2,8 +2,15 @@
 """
 Define los modelos de la base de datos para 'recursos_humanos'.
 """
-from django.db import models
+import calendar
+import operator
 from datetime import date
+from functools import reduce
+from django.db import models, transaction
+from django.db.models import Case, F, PositiveIntegerField, Q, Value, When
+from django.utils import timezone
+
+from core.models import ModeloVersionado
 
 class Trabajador(models.Model):
     """
@@ -39,7 +46,7 @@ class Trabajador(models.Model):
     class Meta:
         verbose_name_plural = "Trabajadores"
 
-class Asistencia(models.Model):
+class Asistencia(ModeloVersionado):
     """
     Representa un registro de asistencia diaria para un trabajador.
     """
@@ -53,8 +60,213 @@ class Asistencia(models.Model):
         """Representación en texto."""
         return f"Asistencia de {self.trabajador.nombre} el {self.fecha}"
 
+    @classmethod
+    def crear_en_bloque(cls, asistencias, lote=1000):
+        """
+        Inserta asistencias con 'bulk_create' (ignore_conflicts=True descarta
+        las ya registradas) y devuelve las que realmente se insertaron.
+
+        'bulk_create' con ignore_conflicts no informa qué filas insertó, así
+        que todas las del lote llevan el mismo 'actualizado' (sello) y después
+        del INSERT se leen las del lote con ese sello: una asistencia que ya
+        existía, o que otra petición insertó a la vez, conserva el suyo.
+
+        Args:
+            asistencias (iterable[Asistencia]): Instancias sin guardar.
+            lote (int): Cantidad de filas por INSERT.
+
+        Returns:
+            list[tuple]: (trabajador_id, fecha, tipo_proyecto) de las insertadas.
+        """
+        asistencias = list(asistencias)
+        if not asistencias:
+            return []
+        sello = timezone.now()
+        for asistencia in asistencias:
+            asistencia.actualizado = sello
+        cls.objects.bulk_create(asistencias, batch_size=lote, ignore_conflicts=True)
+        fechas = [asistencia.fecha for asistencia in asistencias]
+        return list(cls.objects.filter(
+            trabajador_id__in={asistencia.trabajador_id for asistencia in asistencias},
+            fecha__range=[min(fechas), max(fechas)],
+            actualizado=sello,
+        ).values_list('trabajador_id', 'fecha', 'tipo_proyecto'))
+
     class Meta:
         verbose_name_plural = "Asistencias"
         # Restricción clave: Evita duplicados. Un trabajador no puede
         # tener dos asistencias el mismo día para el mismo tipo de proyecto.
-        unique_together = ('trabajador', 'fecha', 'tipo_proyecto')
\ No newline at end of file
+        unique_together = ('trabajador', 'fecha', 'tipo_proyecto')
+
+class PagoSalario(models.Model):
+    """
+    Pago de salario de un trabajador por un período, registrado por la
+    nómina junto con su Gasto de SALARIO.
+
+    Sirve para no pagar dos veces los mismos días: 'registrar_nomina' omite
+    a los trabajadores con un pago cuyo período se cruza con el nuevo, y la
+    restricción única rechaza dos confirmaciones simultáneas del mismo
+    período. Si se elimina el Gasto, el pago se elimina con él.
+    """
+    trabajador = models.ForeignKey(Trabajador, on_delete=models.CASCADE, related_name='pagos')
+    fecha_inicio = models.DateField()
+    fecha_fin = models.DateField()
+    tipo_proyecto = models.CharField(max_length=20, choices=Trabajador.TIPO_PROYECTO, default='CONSTRUCTORA')
+    gasto = models.OneToOneField('finanzas.Gasto', on_delete=models.CASCADE, related_name='pago_salario')
+    creado = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        """Representación en texto."""
+        return f"Pago de {self.trabajador_id} del {self.fecha_inicio} al {self.fecha_fin} ({self.tipo_proyecto})"
+
+    class Meta:
+        verbose_name = "Pago de Salario"
+        verbose_name_plural = "Pagos de Salario"
+        unique_together = ('trabajador', 'fecha_inicio', 'fecha_fin', 'tipo_proyecto')
+
+
+class AsistenciaMes(models.Model):
+    """
+    Resumen mensual (derivado) de las asistencias de un trabajador en un proyecto.
+
+    'dias' es una máscara de bits: el bit (d - 1) indica asistencia el día d
+    del mes. Así, contar días es un "popcount" y un mes completo de un
+    trabajador es una sola fila. Se mantiene automáticamente desde Asistencia
+    (señales y 'marcar_en_bloque' en las escrituras masivas) y se puede
+    reconstruir con
+    'manage.py reconstruir_asistencia_mes'.
+    """
+    trabajador = models.ForeignKey(Trabajador, on_delete=models.CASCADE, related_name='asistencias_mes')
+    mes = models.DateField(help_text="Primer día del mes.")
+    tipo_proyecto = models.CharField(max_length=20, choices=Trabajador.TIPO_PROYECTO, default='CONSTRUCTORA')
+    dias = models.PositiveIntegerField(default=0, help_text="Máscara de bits de los días trabajados (bit 0 = día 1).")
+
+    def __str__(self):
+        """Representación en texto."""
+        return f"{self.trabajador_id} {self.mes:%Y-%m} {self.tipo_proyecto}: {self.dias_trabajados} días"
+
+    class Meta:
+        verbose_name = "Asistencia Mensual"
+        verbose_name_plural = "Asistencias Mensuales"
+        unique_together = ('trabajador', 'mes', 'tipo_proyecto')
+        indexes = [models.Index(fields=['mes', 'tipo_proyecto'])]
+
+    # --- Operaciones sobre la máscara ---
+
+    @staticmethod
+    def bit(fecha):
+        """Bit que representa la fecha dentro de la máscara de su mes."""
+        return 1 << (fecha.day - 1)
+
+    @staticmethod
+    def mascara_rango(mes, inicio, fin):
+        """
+        Máscara con los días del mes 'mes' que caen en [inicio, fin] (inclusive).
+        Devuelve 0 si el rango no toca el mes.
+        """
+        ultimo = mes.replace(day=calendar.monthrange(mes.year, mes.month)[1])
+        desde, hasta = max(inicio, mes), min(fin, ultimo)
+        if desde > hasta:
+            return 0
+        return ((1 << hasta.day) - 1) ^ ((1 << (desde.day - 1)) - 1)
+
+    @staticmethod
+    def fechas_de(mes, dias):
+        """Fechas (date) marcadas en la máscara 'dias' del mes 'mes'."""
+        return [mes.replace(day=d + 1) for d in range(31) if dias >> d & 1]
+
+    @property
+    def dias_trabajados(self):
+        """Días marcados en el mes."""
+        return self.dias.bit_count()
+
+    # --- Mantenimiento desde Asistencia ---
+
+    @classmethod
+    def marcar(cls, trabajador_id, fecha, tipo_proyecto):
+        """Marca un día (al crear una Asistencia)."""
+        bit = cls.bit(fecha)
+        filtro = {'trabajador_id': trabajador_id, 'mes': fecha.replace(day=1), 'tipo_proyecto': tipo_proyecto}
+        if not cls.objects.filter(**filtro).update(dias=F('dias').bitor(bit)):
+            _, creada = cls.objects.get_or_create(**filtro, defaults={'dias': bit})
+            if not creada: # Otra petición la creó entre medio
+                cls.objects.filter(**filtro).update(dias=F('dias').bitor(bit))
+
+    @classmethod
+    def desmarcar(cls, trabajador_id, fecha, tipo_proyecto):
+        """Desmarca un día (al eliminar una Asistencia)."""
+        cls.objects.filter(
+            trabajador_id=trabajador_id, mes=fecha.replace(day=1), tipo_proyecto=tipo_proyecto
+        ).update(dias=F('dias').bitand(~cls.bit(fecha) & 0x7FFFFFFF))
+
+    @classmethod
+    def marcar_en_bloque(cls, asistencias, lote=500):
+        """
+        Marca muchos días a la vez (tras un 'bulk_create' de Asistencia).
+
+        Solo toca las filas (trabajador, mes, proyecto) afectadas y les suma
+        los bits nuevos con un OR en la base de datos, igual que 'marcar':
+        no pisa los días que otra petición marque o desmarque al mismo
+        tiempo. Por cada lote de filas son dos consultas: un INSERT que crea
+        las que faltan (con 0 días, ignorando las existentes) y un UPDATE
+        con 'dias = dias | CASE ...'.
+
+        Args:
+            asistencias (iterable): Tuplas (trabajador_id, fecha, tipo_proyecto)
+                de las asistencias insertadas (p. ej., las que devuelve
+                'Asistencia.crear_en_bloque').
+        """
+        mascaras = {} # {(trabajador_id, mes, tipo_proyecto): bits nuevos}
+        for trabajador_id, fecha, tipo_proyecto in asistencias:
+            clave = (trabajador_id, fecha.replace(day=1), tipo_proyecto)
+            mascaras[clave] = mascaras.get(clave, 0) | cls.bit(fecha)
+
+        claves = list(mascaras)
+        for i in range(0, len(claves), lote):
+            bloque = claves[i:i + lote]
+            cls.objects.bulk_create(
+                [cls(trabajador_id=t, mes=m, tipo_proyecto=p, dias=0) for t, m, p in bloque],
+                ignore_conflicts=True,
+            )
+            filtros = {clave: Q(trabajador_id=clave[0], mes=clave[1], tipo_proyecto=clave[2]) for clave in bloque}
+            cls.objects.filter(reduce(operator.or_, filtros.values())).update(dias=F('dias').bitor(Case(
+                *[When(filtro, then=Value(mascaras[clave])) for clave, filtro in filtros.items()],
+                default=Value(0), output_field=PositiveIntegerField(),
+            )))
+
+    @classmethod
+    @transaction.atomic
+    def reconstruir(cls, inicio=None, fin=None, lote=2000):
+        """
+        Reconstruye los resúmenes de los meses que tocan [inicio, fin]
+        (o de toda la historia si no se indican) a partir de Asistencia.
+
+        Lee las asistencias en bloques con 'iterator()' y escribe con
+        'bulk_create'. Reemplaza meses completos, así que es para
+        mantenimiento ('manage.py reconstruir_asistencia_mes'), no para el
+        uso normal: las escrituras masivas usan 'marcar_en_bloque'.
+
+        Returns:
+            int: Cantidad de filas AsistenciaMes generadas.
+        """
+        asistencias = Asistencia.objects.all()
+        resumenes = cls.objects.all()
+        if inicio:
+            asistencias = asistencias.filter(fecha__gte=inicio.replace(day=1))
+            resumenes = resumenes.filter(mes__gte=inicio.replace(day=1))
+        if fin:
+            asistencias = asistencias.filter(fecha__lte=fin.replace(day=calendar.monthrange(fin.year, fin.month)[1]))
+            resumenes = resumenes.filter(mes__lte=fin.replace(day=1))
+
+        mascaras = {} # {(trabajador_id, mes, tipo_proyecto): dias}
+        filas = asistencias.values_list('trabajador_id', 'fecha', 'tipo_proyecto').order_by().iterator(chunk_size=lote)
+        for trabajador_id, fecha, tipo_proyecto in filas:
+            clave = (trabajador_id, fecha.replace(day=1), tipo_proyecto)
+            mascaras[clave] = mascaras.get(clave, 0) | cls.bit(fecha)
+
+        resumenes.delete()
+        cls.objects.bulk_create(
+            (cls(trabajador_id=t, mes=m, tipo_proyecto=p, dias=d) for (t, m, p), d in mascaras.items()),
+            batch_size=lote
+        )
+        return len(mascaras)
@@ -0,0 +1,154 @@
+# recursos_humanos/nomina.py
+"""
+Cálculo y registro de la nómina (pago de salarios) de un período.
+
+Los montos se calculan siempre en el servidor y en Decimal a partir de
+las asistencias y del 'salario_por_dia' de cada trabajador.
+"""
+import hashlib
+from datetime import date
+
+from django.db import transaction
+
+from .models import AsistenciaMes, PagoSalario
+from finanzas.models import Gasto
+
+
+class NominaModificada(Exception):
+    """Los totales recalculados no coinciden con los que revisó el usuario."""
+
+
+def calcular_nomina(fecha_inicio, fecha_fin, tipo_proyecto, trabajadores=None, con_fechas=False):
+    """
+    Calcula días trabajados y salario de todos los trabajadores en un período.
+
+    Lee los resúmenes mensuales en bits (AsistenciaMes) con una sola consulta
+    (JOIN con Trabajador para traer nombre y salario por día): se leen
+    trabajadores × meses filas en lugar de una por día, y los días del
+    período se cuentan con un "popcount" sobre la máscara.
+
+    Args:
+        fecha_inicio (date): Inicio del período (inclusive).
+        fecha_fin (date): Fin del período (inclusive).
+        tipo_proyecto (str): Proyecto cuyas asistencias se pagan.
+        trabajadores (iterable, opcional): Limita el cálculo a estos IDs.
+        con_fechas (bool): Si es True, cada fila incluye 'fechas' (lista de date).
+
+    Returns:
+        list[dict]: Una fila por trabajador con 'trabajador_id', 'nombre',
+                    'rut', 'cargo', 'salario_por_dia', 'dias' y 'total' (Decimal).
+    """
+    resumenes = AsistenciaMes.objects.filter(
+        mes__range=[fecha_inicio.replace(day=1), fecha_fin.replace(day=1)],
+        tipo_proyecto=tipo_proyecto
+    )
+    if trabajadores is not None:
+        resumenes = resumenes.filter(trabajador_id__in=list(trabajadores))
+
+    filas = {}
+    # 'iterator()' lee por bloques (cursor del lado del servidor en PostgreSQL)
+    consulta = resumenes.values_list(
+        'trabajador_id', 'trabajador__nombre', 'trabajador__rut', 'trabajador__cargo',
+        'trabajador__salario_por_dia', 'mes', 'dias'
+    ).order_by('trabajador__nombre', 'trabajador_id', 'mes').iterator(chunk_size=2000)
+    for trabajador_id, nombre, rut, cargo, salario_por_dia, mes, dias in consulta:
+        fila = filas.setdefault(trabajador_id, {
+            'trabajador_id': trabajador_id,
+            'nombre': nombre,
+            'rut': rut,
+            'cargo': cargo,
+            'salario_por_dia': salario_por_dia,
+            'dias': 0,
+        })
+        mascara = dias & AsistenciaMes.mascara_rango(mes, fecha_inicio, fecha_fin)
+        fila['dias'] += mascara.bit_count()
+        if con_fechas:
+            fila.setdefault('fechas', []).extend(AsistenciaMes.fechas_de(mes, mascara))
+
+    resultado = []
+    for fila in filas.values():
+        if fila['dias']:
+            fila['total'] = fila['dias'] * fila['salario_por_dia']
+            resultado.append(fila)
+    return resultado
+
+
+def descripcion_pago(nombre, fecha_inicio, fecha_fin, tipo_proyecto):
+    """Texto estándar del Gasto de salario (el mismo formato en todo el sistema)."""
+    return f"Pago salario a {nombre} por período {fecha_inicio.isoformat()} al {fecha_fin.isoformat()} ({tipo_proyecto})"
+
+
+def huella_nomina(filas):
+    """
+    Huella (SHA-256) de los totales de una nómina: identifica lo que el
+    usuario revisó, para confirmar exactamente eso y no una nómina que
+    cambió entre el cálculo y la confirmación.
+    """
+    partes = sorted(f"{fila['trabajador_id']}:{fila['dias']}:{fila['total']}" for fila in filas)
+    return hashlib.sha256('|'.join(partes).encode()).hexdigest()
+
+
+@transaction.atomic
+def registrar_nomina(fecha_inicio, fecha_fin, tipo_proyecto, trabajadores=None, huella=None):
+    """
+    Recalcula la nómina y registra un Gasto de SALARIO por trabajador.
+
+    Todos los gastos se insertan con un único 'bulk_create' dentro de una
+    transacción. Los trabajadores sin salario por día definido se omiten.
+
+    Cada pago queda en PagoSalario: se omiten los trabajadores que ya tienen
+    un pago del mismo proyecto cuyo período se cruza con este, así que
+    confirmar dos veces (doble clic, volver atrás y reenviar) no duplica los
+    gastos. Si dos confirmaciones del mismo período corren a la vez, la
+    restricción única de PagoSalario hace fallar la segunda (IntegrityError).
+
+    Args:
+        huella (str, opcional): 'huella_nomina' del resumen que revisó el
+            usuario: el de todo el período (nómina completa) o el de los
+            'trabajadores' indicados (cálculo individual).
+
+    Returns:
+        tuple[list[Gasto], list[str]]: Los gastos creados y los nombres de
+        los trabajadores omitidos por tener ya un pago del período.
+
+    Raises:
+        NominaModificada: Si 'huella' no coincide con los totales actuales.
+    """
+    filas = calcular_nomina(fecha_inicio, fecha_fin, tipo_proyecto)
+    if trabajadores is not None:
+        trabajadores = {int(trabajador_id) for trabajador_id in trabajadores}
+        seleccion = [fila for fila in filas if fila['trabajador_id'] in trabajadores]
+    else:
+        seleccion = filas
+    if huella is not None and huella not in (huella_nomina(filas), huella_nomina(seleccion)):
+        raise NominaModificada(
+            "Las asistencias del período cambiaron después de calcular la nómina. Revisa los nuevos totales."
+        )
+
+    pagados = set(PagoSalario.objects.filter(
+        trabajador_id__in=[fila['trabajador_id'] for fila in seleccion],
+        tipo_proyecto=tipo_proyecto,
+        fecha_inicio__lte=fecha_fin,
+        fecha_fin__gte=fecha_inicio,
+    ).values_list('trabajador_id', flat=True))
+    omitidos = [fila['nombre'] for fila in seleccion if fila['trabajador_id'] in pagados]
+    a_pagar = [fila for fila in seleccion if fila['total'] > 0 and fila['trabajador_id'] not in pagados]
+
+    gastos = Gasto.objects.bulk_create([
+        Gasto(
+            fecha=date.today(), # Fecha del pago es hoy
+            categoria='SALARIO',
+            descripcion=descripcion_pago(fila['nombre'], fecha_inicio, fecha_fin, tipo_proyecto),
+            monto=fila['total'],
+            tipo_proyecto=tipo_proyecto,
+        )
+        for fila in a_pagar
+    ])
+    PagoSalario.objects.bulk_create([
+        PagoSalario(
+            trabajador_id=fila['trabajador_id'], fecha_inicio=fecha_inicio, fecha_fin=fecha_fin,
+            tipo_proyecto=tipo_proyecto, gasto=gasto,
+        )
+        for fila, gasto in zip(a_pagar, gastos)
+    ])
+    return gastos, omitidos
@@ -0,0 +1,51 @@
+# recursos_humanos/signals.py
+"""
+Señales de la app 'recursos_humanos'.
+
+Cuando se guarda o elimina una asistencia (admin, formularios,
+get_or_create) mantienen al día:
+- El resumen mensual en bits (AsistenciaMes).
+- La caché del calendario.
+
+'delete()' de QuerySet también las cubre: como hay receptores de
+'post_delete', Django carga las filas y emite la señal por cada una, así
+que cada asistencia borrada pasa por 'AsistenciaMes.desmarcar' (una
+consulta por fila). 'bulk_create' y 'update' de QuerySet no emiten
+señales: quien los use debe llamar a 'AsistenciaMes.marcar_en_bloque'
+con las asistencias insertadas e 'invalidar_meses' para sus fechas.
+"""
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Asistencia, AsistenciaMes
+from .calendario import invalidar_meses
+
+
+@receiver(pre_save, sender=Asistencia)
+def recordar_asistencia_anterior(sender, instance, **kwargs):
+    """Guarda los valores previos de una asistencia que se está editando."""
+    instance._anterior = None
+    if instance.pk:
+        instance._anterior = Asistencia.objects.filter(pk=instance.pk).values_list(
+            'trabajador_id', 'fecha', 'tipo_proyecto'
+        ).first()
+
+
+@receiver(post_save, sender=Asistencia)
+def asistencia_guardada(sender, instance, created, **kwargs):
+    """Marca el día en el resumen mensual (y desmarca el anterior si cambió)."""
+    fechas = [instance.fecha]
+    anterior = getattr(instance, '_anterior', None)
+    actual = (instance.trabajador_id, instance.fecha, instance.tipo_proyecto)
+    if anterior and anterior != actual:
+        AsistenciaMes.desmarcar(*anterior)
+        fechas.append(anterior[1])
+    AsistenciaMes.marcar(*actual)
+    invalidar_meses(fechas)
+
+
+@receiver(post_delete, sender=Asistencia)
+def asistencia_eliminada(sender, instance, **kwargs):
+    """Desmarca el día en el resumen mensual."""
+    AsistenciaMes.desmarcar(instance.trabajador_id, instance.fecha, instance.tipo_proyecto)
+    invalidar_meses([instance.fecha])
@@ -0,0 +1,26 @@
+# recursos_humanos/tareas.py
+"""
+Tareas en segundo plano de 'recursos_humanos' (ver core/tareas.py).
+"""
+from datetime import date
+
+from core.tareas import Archivo, tarea
+from .nomina import calcular_nomina
+
+
+def nombre_zip_liquidaciones(fecha_inicio, fecha_fin, tipo_proyecto):
+    return f"liquidaciones_{tipo_proyecto.lower()}_{fecha_inicio.isoformat()}_{fecha_fin.isoformat()}.zip"
+
+
+@tarea('recursos_humanos.liquidaciones')
+def liquidaciones(fecha_inicio, fecha_fin, tipo_proyecto):
+    """ZIP con la liquidación (PDF) de cada trabajador con monto a pagar en el período."""
+    from .liquidaciones import generar_zip_liquidaciones
+
+    fecha_inicio, fecha_fin = date.fromisoformat(fecha_inicio), date.fromisoformat(fecha_fin)
+    filas = [fila for fila in calcular_nomina(fecha_inicio, fecha_fin, tipo_proyecto, con_fechas=True) if fila['total'] > 0]
+    return Archivo(
+        nombre_zip_liquidaciones(fecha_inicio, fecha_fin, tipo_proyecto),
+        'application/zip',
+        generar_zip_liquidaciones(filas, fecha_inicio, fecha_fin, tipo_proyecto),
+    )
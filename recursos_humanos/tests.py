@@ -1,3 +1,286 @@
-from django.test import TestCase
+import io
+import os
+import tempfile
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.contrib.messages import get_messages
+from django.core.cache import cache, caches
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core.instrumentacion import medir
+from core.models import Tarea
+from core.tests import CACHES_DE_PRUEBA
+from finanzas.models import Gasto
+from .models import Asistencia, AsistenciaMes, PagoSalario, Trabajador
+from .importacion import importar_asistencias
+from .liquidaciones import MIN_LIQUIDACIONES_POOL, generar_zip_liquidaciones
+from .nomina import NominaModificada, calcular_nomina, registrar_nomina
+
+
+@override_settings(CACHES=CACHES_DE_PRUEBA)
+class AsistenciaCuadrillaTests(TestCase):
+    """Grilla de asistencia por cuadrilla: inserción en bloque y conteo de las nuevas."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user('rrhh', password='clave-segura-123')
+        cls.trabajadores = Trabajador.objects.bulk_create([
+            Trabajador(nombre=f'Trabajador {i}', rut=f'3333333{i}-{i}', salario_por_dia=Decimal('20000'))
+            for i in range(3)
+        ])
+        cls.lunes = date(2025, 3, 3)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.usuario)
+
+    def test_crear_en_bloque_solo_devuelve_las_insertadas(self):
+        # La primera "ya estaba" (p. ej., la guardó otra persona después de leer la grilla)
+        Asistencia.objects.create(trabajador=self.trabajadores[0], fecha=self.lunes, tipo_proyecto='CONSTRUCTORA')
+        insertadas = Asistencia.crear_en_bloque(
+            Asistencia(trabajador=trabajador, fecha=self.lunes, tipo_proyecto='CONSTRUCTORA')
+            for trabajador in self.trabajadores
+        )
+        self.assertEqual(sorted(insertadas), [
+            (trabajador.pk, self.lunes, 'CONSTRUCTORA') for trabajador in self.trabajadores[1:]
+        ])
+        self.assertEqual(Asistencia.objects.count(), 3)
+
+    def test_guardar_grilla(self):
+        Asistencia.objects.create(trabajador=self.trabajadores[0], fecha=self.lunes, tipo_proyecto='CONSTRUCTORA')
+        casillas = [f'{t.pk}:{(self.lunes + timedelta(days=d)).isoformat()}' for t in self.trabajadores for d in range(2)]
+        respuesta = self.client.post(reverse('recursos_humanos:asistencia_cuadrilla'), {
+            'semana': self.lunes.isoformat(), 'tipo_proyecto': 'CONSTRUCTORA', 'asistencia': casillas,
+        })
+        self.assertEqual(respuesta.status_code, 302)
+        mensajes = [str(m) for m in get_messages(respuesta.wsgi_request)]
+        self.assertIn("5 asistencias nuevas registradas.", mensajes)
+        self.assertIn("1 asistencias ya estaban registradas anteriormente.", mensajes)
+        # El resumen mensual refleja los dos días (3 y 4 de marzo) de cada trabajador
+        dias = AsistenciaMes.bit(self.lunes) | AsistenciaMes.bit(self.lunes + timedelta(days=1))
+        self.assertEqual(list(AsistenciaMes.objects.values_list('dias', flat=True)), [dias] * len(self.trabajadores))
+
+
+@override_settings(CACHES=CACHES_DE_PRUEBA)
+class NominaTests(TestCase):
+    """Nómina: montos desde las asistencias, confirmación única, huella de lo revisado y liquidaciones en ZIP."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user('nomina', password='clave-segura-123')
+        cls.trabajadores = Trabajador.objects.bulk_create([
+            Trabajador(nombre=f'Trabajador {i}', rut=f'4444444{i}-{i}', salario_por_dia=Decimal('20000'))
+            for i in range(2)
+        ])
+        cls.lunes = date(2025, 3, 3)
+        for trabajador in cls.trabajadores:
+            for dia in range(3):
+                Asistencia.objects.create(trabajador=trabajador, fecha=cls.lunes + timedelta(days=dia), tipo_proyecto='CONSTRUCTORA')
+        cls.periodo = {'fecha_inicio': '2025-03-01', 'fecha_fin': '2025-03-31', 'tipo_proyecto': 'CONSTRUCTORA'}
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.usuario)
+
+    def confirmar(self, huella):
+        return self.client.post(reverse('recursos_humanos:nomina'), dict(
+            self.periodo, accion='confirmar', huella=huella, trabajadores=[t.pk for t in self.trabajadores],
+        ))
+
+    def test_calcular_muestra_montos(self):
+        respuesta = self.client.post(reverse('recursos_humanos:nomina'), dict(self.periodo, accion='calcular'))
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual([(f['dias'], f['total']) for f in respuesta.context['filas']], [(3, Decimal('60000'))] * 2)
+        self.assertEqual(respuesta.context['total_nomina'], Decimal('120000'))
+
+    def test_confirmar_dos_veces_no_duplica_pagos(self):
+        huella = self.client.post(reverse('recursos_humanos:nomina'), dict(self.periodo, accion='calcular')).context['huella']
+        self.assertRedirects(self.confirmar(huella), reverse('finanzas:lista_gastos'), fetch_redirect_response=False)
+        respuesta = self.confirmar(huella)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(Gasto.objects.filter(categoria='SALARIO').count(), 2)
+        self.assertEqual(PagoSalario.objects.count(), 2)
+        self.assertIn("Se omitieron 2 trabajadores", ' '.join(str(m) for m in get_messages(respuesta.wsgi_request)))
+
+    def test_confirmar_no_crece_con_los_trabajadores(self):
+        with medir() as medicion:
+            registrar_nomina(date(2025, 3, 1), date(2025, 3, 31), 'CONSTRUCTORA', trabajadores=[self.trabajadores[0].pk])
+        una = medicion.consultas
+        PagoSalario.objects.all().delete()
+        Gasto.objects.all().delete()
+        with medir() as medicion:
+            registrar_nomina(date(2025, 3, 1), date(2025, 3, 31), 'CONSTRUCTORA')
+        self.assertEqual(medicion.consultas, una)
+
+    def test_confirmar_con_totales_cambiados_se_rechaza(self):
+        huella = self.client.post(reverse('recursos_humanos:nomina'), dict(self.periodo, accion='calcular')).context['huella']
+        Asistencia.objects.create(trabajador=self.trabajadores[0], fecha=date(2025, 3, 10), tipo_proyecto='CONSTRUCTORA')
+        respuesta = self.confirmar(huella)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertFalse(Gasto.objects.exists())
+        self.assertNotEqual(respuesta.context['huella'], huella) # Se muestra el resumen nuevo para revisarlo
+        with self.assertRaises(NominaModificada):
+            registrar_nomina(date(2025, 3, 1), date(2025, 3, 31), 'CONSTRUCTORA', huella=huella)
+
+
+    @override_settings(LIQUIDACIONES_PROCESOS=1)
+    def test_descargar_liquidaciones_zip(self):
+        respuesta = self.client.get(reverse('recursos_humanos:descargar_liquidaciones'), self.periodo)
+        self.assertEqual(respuesta['Content-Type'], 'application/zip')
+        self.assertIn('liquidaciones_constructora_2025-03-01_2025-03-31.zip', respuesta['Content-Disposition'])
+        with zipfile.ZipFile(io.BytesIO(b''.join(respuesta.streaming_content))) as archivo_zip:
+            self.assertEqual(sorted(archivo_zip.namelist()), sorted(
+                f"liquidacion_{t.rut}_2025-03-01_2025-03-31.pdf" for t in self.trabajadores
+            ))
+            for nombre in archivo_zip.namelist():
+                self.assertTrue(archivo_zip.read(nombre).startswith(b'%PDF'))
+
+    @override_settings(LIQUIDACIONES_PROCESOS=2)
+    def test_zip_en_paralelo_y_descarga_cortada(self):
+        marzo = (date(2025, 3, 1), date(2025, 3, 31), 'CONSTRUCTORA')
+        base = calcular_nomina(*marzo, con_fechas=True)[0]
+        filas = [dict(base, rut=f'1000000{i:02d}-{i % 10}') for i in range(3 * MIN_LIQUIDACIONES_POOL)]
+
+        with zipfile.ZipFile(io.BytesIO(b''.join(generar_zip_liquidaciones(filas, *marzo)))) as archivo_zip:
+            self.assertEqual(len(archivo_zip.namelist()), len(filas))
+
+        # Si el cliente corta la descarga, el pool se cierra cancelando lo pendiente
+        trozos = generar_zip_liquidaciones(filas, *marzo)
+        next(trozos)
+        cerrar = ProcessPoolExecutor.shutdown
+        with mock.patch.object(ProcessPoolExecutor, 'shutdown', autospec=True, side_effect=cerrar) as shutdown:
+            trozos.close()
+        self.assertTrue(shutdown.call_args.kwargs['cancel_futures'])
+
+    @override_settings(TAREAS_SEGUNDO_PLANO=True)
+    def test_liquidaciones_en_segundo_plano(self):
+        respuesta = self.client.get(reverse('recursos_humanos:descargar_liquidaciones'), self.periodo)
+        tarea = Tarea.objects.get(tipo='recursos_humanos.liquidaciones')
+        self.assertRedirects(respuesta, reverse('core:tarea', args=[tarea.pk]), fetch_redirect_response=False)
+        self.assertEqual(tarea.argumentos, self.periodo)
+
+@override_settings(CACHES=CACHES_DE_PRUEBA)
+class CalendarioFeedTests(TestCase):
+    """Feed del calendario: eventos, ETag/304 y tokens de versión en la caché compartida."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user('calendario', password='clave-segura-123')
+        cls.trabajador = Trabajador.objects.create(nombre='Ana', rut='55555555-5', salario_por_dia=Decimal('20000'))
+        Asistencia.objects.create(trabajador=cls.trabajador, fecha=date(2025, 3, 3), tipo_proyecto='CONSTRUCTORA')
+        cls.url = reverse('recursos_humanos:api_asistencia_feed') + '?start=2025-03-01&end=2025-04-01'
+
+    def setUp(self):
+        for alias in CACHES_DE_PRUEBA:
+            caches[alias].clear()
+        self.client.force_login(self.usuario)
+
+    def test_eventos_y_revalidacion(self):
+        respuesta = self.client.get(self.url)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual([(e['start'], e['title']) for e in respuesta.json()], [('2025-03-03', 'Ana (Constructora)')])
+        etag = respuesta['ETag']
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        # Otro proceso (caché local vacía) calcula el mismo ETag: la versión está en la compartida
+        caches['default'].clear()
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        # Una asistencia nueva del mes cambia el ETag y el contenido
+        Asistencia.objects.create(trabajador=self.trabajador, fecha=date(2025, 3, 4), tipo_proyecto='CONSTRUCTORA')
+        respuesta = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual([e['start'] for e in respuesta.json()], ['2025-03-03', '2025-03-04'])
+
+
+@override_settings(CACHES=CACHES_DE_PRUEBA)
+class AsistenciaMesTests(TestCase):
+    """Resumen mensual en bits mantenido con operaciones por conjunto."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.trabajadores = Trabajador.objects.bulk_create([
+            Trabajador(nombre=f'Trabajador {i}', rut=f'6666666{i}-{i}', salario_por_dia=Decimal('20000'))
+            for i in range(2)
+        ])
+
+    def test_marcar_en_bloque_suma_bits_sin_pisar_los_existentes(self):
+        a, b = (t.pk for t in self.trabajadores)
+        # Día marcado por otra vía (p. ej., una señal) que no está en el lote
+        AsistenciaMes.objects.create(trabajador_id=a, mes=date(2025, 3, 1), tipo_proyecto='BLOQUERA', dias=AsistenciaMes.bit(date(2025, 3, 31)))
+        AsistenciaMes.marcar_en_bloque([
+            (a, date(2025, 3, 1), 'BLOQUERA'),
+            (a, date(2025, 3, 2), 'BLOQUERA'),
+            (b, date(2025, 3, 2), 'BLOQUERA'),
+            (b, date(2025, 4, 30), 'CONSTRUCTORA'),
+        ], lote=2)
+        resumenes = {(t, m, p): d for t, m, p, d in AsistenciaMes.objects.values_list('trabajador_id', 'mes', 'tipo_proyecto', 'dias')}
+        self.assertEqual(resumenes, {
+            (a, date(2025, 3, 1), 'BLOQUERA'): 0b11 | 1 << 30,
+            (b, date(2025, 3, 1), 'BLOQUERA'): 0b10,
+            (b, date(2025, 4, 1), 'CONSTRUCTORA'): 1 << 29,
+        })
+        self.assertEqual(AsistenciaMes.objects.get(trabajador_id=a, mes=date(2025, 3, 1)).dias_trabajados, 3)
+
+    def test_mascara_rango(self):
+        mes = date(2025, 2, 1)
+        self.assertEqual(AsistenciaMes.mascara_rango(mes, date(2025, 2, 3), date(2025, 2, 5)), 0b11100)
+        self.assertEqual(AsistenciaMes.mascara_rango(mes, date(2025, 1, 1), date(2025, 12, 31)), (1 << 28) - 1)
+        self.assertEqual(AsistenciaMes.mascara_rango(mes, date(2025, 3, 1), date(2025, 3, 31)), 0)
+
+
+@override_settings(CACHES=CACHES_DE_PRUEBA)
+class ImportacionAsistenciasTests(TestCase):
+    """Importación de asistencias desde CSV: conteos y errores por línea o de archivo."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.trabajador = Trabajador.objects.create(nombre='Ana', rut='12.345.678-5', salario_por_dia=Decimal('20000'))
+
+    def test_filas_validas_y_encabezado_tras_lineas_vacias(self):
+        resultado = importar_asistencias([
+            '\n',
+            'rut,fecha,tipo_proyecto\n',
+            '12345678-5,2025-03-03,CONSTRUCTORA\n',
+            '12.345.678-5,04/03/2025,Bloquera\n',
+        ])
+        self.assertEqual((resultado['leidas'], resultado['creadas'], resultado['errores']), (2, 2, []))
+        self.assertEqual(AsistenciaMes.objects.get(tipo_proyecto='CONSTRUCTORA').dias, AsistenciaMes.bit(date(2025, 3, 3)))
+
+    def test_duplicadas_en_el_archivo_y_ya_registradas(self):
+        Asistencia.objects.create(trabajador=self.trabajador, fecha=date(2025, 3, 3), tipo_proyecto='CONSTRUCTORA')
+        resultado = importar_asistencias([
+            '12345678-5,2025-03-03,CONSTRUCTORA\n', # Ya registrada
+            '12345678-5,2025-03-04,CONSTRUCTORA\n',
+            '12345678-5,04-03-2025,CONSTRUCTORA\n', # Repetida en el archivo
+        ])
+        self.assertEqual((resultado['validas'], resultado['creadas'], resultado['duplicadas']), (2, 1, 2))
+        self.assertEqual(Asistencia.objects.count(), 2)
+
+    def test_rut_no_registrado_y_csv_mal_formado(self):
+        resultado = importar_asistencias([
+            '11111111-1,2025-03-03,CONSTRUCTORA\n',
+            'x' * 200000 + '\n', # Campo más largo que el límite del módulo csv
+            '12345678-5,2025-03-32,CONSTRUCTORA\n',
+            '12345678-5,2025-03-05,CONSTRUCTORA\n',
+        ])
+        self.assertEqual([linea for linea, _ in resultado['errores']], [1, 2, 3])
+        self.assertIn("RUT no registrado", resultado['errores'][0][1])
+        self.assertIn("mal formada", resultado['errores'][1][1])
+        self.assertEqual(resultado['creadas'], 1)
+
+    def test_comando_con_archivo_que_no_es_utf8(self):
+        with tempfile.NamedTemporaryFile('wb', suffix='.csv', delete=False) as archivo:
+            archivo.write('12345678-5,2025-03-03,CONSTRUCCIÓN\n'.encode('latin-1'))
+        self.addCleanup(os.remove, archivo.name)
+        with self.assertRaisesMessage(CommandError, "UTF-8"):
+            call_command('importar_asistencias', archivo.name, stdout=io.StringIO(), stderr=io.StringIO())
+        self.assertFalse(Asistencia.objects.exists())
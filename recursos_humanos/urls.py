@@ -23,10 +23,18 @@ urlpatterns = [
     path('asistencia/', views.asistencia_manual, name='asistencia_manual'),
     # Ej. /personal/asistencia/confirmacion/
     path('asistencia/confirmacion/', views.asistencia_confirmacion, name='asistencia_confirmacion'),
+    # Ej. /personal/asistencia/cuadrilla/?semana=2025-11-03&tipo_proyecto=BLOQUERA
+    path('asistencia/cuadrilla/', views.asistencia_cuadrilla, name='asistencia_cuadrilla'),
+    # Ej. /personal/asistencia/importar/ (Carga desde CSV)
+    path('asistencia/importar/', views.importar_asistencias_csv, name='importar_asistencias'),
     # Ej. /personal/salarios/calcular/
     path('salarios/calcular/', views.calcular_salario, name='calcular_salario'),
     # Ej. /personal/salarios/registrar_gasto/ (Procesa el pago)
     path('salarios/registrar_gasto/', views.registrar_pago_gasto, name='registrar_pago_gasto'),
+    # Ej. /personal/salarios/nomina/ (Pago de todos los trabajadores de un período)
+    path('salarios/nomina/', views.nomina, name='nomina'),
+    # Ej. /personal/salarios/liquidaciones/?fecha_inicio=...&fecha_fin=...&tipo_proyecto=...
+    path('salarios/liquidaciones/', views.descargar_liquidaciones, name='descargar_liquidaciones'),
     
     path('calendario/', views.calendario_asistencia, name='calendario_asistencia'),
     # El feed de datos JSON para el calendario
@@ -5,21 +5,36 @@ Maneja la lógica de las vistas para la aplicación 'recursos_humanos'.
 Incluye:
 - CRUD para el modelo Trabajador.
 - Registro manual de Asistencia (evitando duplicados).
+- Registro masivo de Asistencia por cuadrilla (trabajadores × días de una semana).
+- Importación de Asistencia desde archivos CSV.
 - Cálculo de Salario basado en asistencias en un rango de fechas.
 - Registro del pago de salario como un Gasto en la app 'finanzas'.
+- Nómina: cálculo y pago de todos los trabajadores de un período de una vez.
+- Liquidaciones de sueldo en PDF para toda la nómina (descarga en ZIP).
 """
 
 # --- Importaciones de Django ---
+from django.db import IntegrityError, transaction
 from django.shortcuts import render, get_object_or_404, redirect, reverse
-from django.http import JsonResponse # <-- ¡IMPORTACIÓN AÑADIDA!
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import condition
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from datetime import date
+from django.conf import settings
+from datetime import date, timedelta
+import io
 
 # --- Importaciones de Modelos y Forms ---
-from .models import Trabajador, Asistencia
-from .forms import TrabajadorForm, AsistenciaManualForm, CalculoSalarioForm
-from finanzas.models import Gasto # Importación clave para cruzar apps
+from .models import Trabajador, Asistencia, AsistenciaMes
+from .forms import (
+    TrabajadorForm, AsistenciaManualForm, CalculoSalarioForm, AsistenciaCuadrillaForm,
+    NominaForm, ImportarAsistenciaForm,
+)
+from .nomina import NominaModificada, calcular_nomina, huella_nomina, registrar_nomina
+from .calendario import MODOS_FEED, leer_rango, clave_feed, contenido_feed, invalidar_meses
+from .importacion import ArchivoInvalido, importar_asistencias
+from .tareas import nombre_zip_liquidaciones
+from core.tareas import encolar
 
 # --- Vistas de Trabajadores (CRUD) ---
 
@@ -106,6 +121,117 @@ def asistencia_manual(request):
         form = AsistenciaManualForm()
     return render(request, 'recursos_humanos/asistencia_manual.html', {'form': form})
 
+@login_required
+def asistencia_cuadrilla(request):
+    """
+    Grilla de asistencia por cuadrilla: trabajadores × días de una semana.
+
+    En GET muestra la grilla con las asistencias ya registradas marcadas.
+    En POST inserta todas las casillas marcadas con un único 'bulk_create'
+    (ignore_conflicts=True se apoya en el 'unique_together' del modelo
+    para descartar duplicados) e informa cuántas se insertaron realmente
+    (ver Asistencia.crear_en_bloque: si otra persona guardó la misma
+    grilla a la vez, sus asistencias no se cuentan como nuevas aquí).
+    """
+    datos = {'semana': date.today().isoformat(), 'tipo_proyecto': 'CONSTRUCTORA'}
+    datos.update((request.POST if request.method == 'POST' else request.GET).dict())
+    form = AsistenciaCuadrillaForm(datos)
+    if not form.is_valid():
+        messages.error(request, "Por favor corrige los errores en el formulario.")
+        return render(request, 'recursos_humanos/asistencia_cuadrilla.html', {'form': form})
+
+    # Normalizar la semana al lunes y construir los 7 días
+    semana = form.cleaned_data['semana']
+    lunes = semana - timedelta(days=semana.weekday())
+    dias = [lunes + timedelta(days=i) for i in range(7)]
+    tipo_proyecto = form.cleaned_data['tipo_proyecto']
+
+    trabajadores = list(Trabajador.objects.order_by('nombre').only('id', 'nombre'))
+    # Conjunto de (trabajador_id, fecha) ya registrados en la semana (1 consulta)
+    registradas = set(Asistencia.objects.filter(
+        fecha__range=[dias[0], dias[-1]],
+        tipo_proyecto=tipo_proyecto
+    ).values_list('trabajador_id', 'fecha'))
+
+    if request.method == 'POST':
+        ids_validos = {t.id for t in trabajadores}
+        dias_validos = set(dias)
+        marcadas = set()
+        # Cada casilla llega como "<trabajador_id>:<YYYY-MM-DD>"
+        for valor in request.POST.getlist('asistencia'):
+            try:
+                trabajador_id, fecha_str = valor.split(':')
+                clave = (int(trabajador_id), date.fromisoformat(fecha_str))
+            except ValueError:
+                continue
+            if clave[0] in ids_validos and clave[1] in dias_validos:
+                marcadas.add(clave)
+
+        # Un solo INSERT para toda la cuadrilla (las ya registradas ni se envían)
+        with transaction.atomic():
+            nuevas = Asistencia.crear_en_bloque(
+                Asistencia(trabajador_id=trabajador_id, fecha=fecha, tipo_proyecto=tipo_proyecto)
+                for trabajador_id, fecha in sorted(marcadas - registradas)
+            )
+            # bulk_create no emite señales: marcar solo los días insertados en el resumen mensual
+            AsistenciaMes.marcar_en_bloque(nuevas)
+        if nuevas:
+            invalidar_meses(fecha for _, fecha, _ in nuevas)
+
+        repetidas = len(marcadas) - len(nuevas)
+        if nuevas:
+            messages.success(request, f"{len(nuevas)} asistencias nuevas registradas.")
+        if repetidas:
+            messages.warning(request, f"{repetidas} asistencias ya estaban registradas anteriormente.")
+        if not marcadas:
+            messages.warning(request, "No se marcó ninguna asistencia.")
+
+        url = reverse('recursos_humanos:asistencia_cuadrilla')
+        return redirect(f"{url}?semana={lunes.isoformat()}&tipo_proyecto={tipo_proyecto}")
+
+    filas = [
+        {'trabajador': t, 'celdas': [{'fecha': dia, 'marcada': (t.id, dia) in registradas} for dia in dias]}
+        for t in trabajadores
+    ]
+    context = {
+        'form': form,
+        'dias': dias,
+        'filas': filas,
+        'tipo_proyecto': tipo_proyecto,
+        'semana_anterior': lunes - timedelta(days=7),
+        'semana_siguiente': lunes + timedelta(days=7),
+    }
+    return render(request, 'recursos_humanos/asistencia_cuadrilla.html', context)
+
+@login_required
+def importar_asistencias_csv(request):
+    """
+    Sube un CSV de asistencias (rut, fecha, tipo_proyecto) y lo importa
+    en bloque. Muestra un resumen y el detalle de las líneas con error.
+    """
+    resultado = None
+    if request.method == 'POST':
+        form = ImportarAsistenciaForm(request.POST, request.FILES)
+        if form.is_valid():
+            # Leer el archivo como texto en streaming ('utf-8-sig' ignora el BOM de Excel)
+            lineas = io.TextIOWrapper(form.cleaned_data['archivo'].file, encoding='utf-8-sig', errors='replace')
+            try:
+                resultado = importar_asistencias(lineas)
+            except ArchivoInvalido as e:
+                messages.error(request, str(e))
+                return render(request, 'recursos_humanos/importar_asistencias.html', {'form': form, 'resultado': None})
+            if resultado['creadas']:
+                messages.success(request, f"{resultado['creadas']} asistencias nuevas importadas.")
+            if resultado['errores']:
+                messages.warning(request, f"{len(resultado['errores'])} líneas con errores no se importaron.")
+            if not resultado['creadas'] and not resultado['errores']:
+                messages.warning(request, "El archivo no contenía asistencias nuevas.")
+        else:
+            messages.error(request, "Por favor corrige los errores en el formulario.")
+    else:
+        form = ImportarAsistenciaForm()
+    return render(request, 'recursos_humanos/importar_asistencias.html', {'form': form, 'resultado': resultado})
+
 @login_required
 def asistencia_confirmacion(request):
     """Página de "éxito" simple mostrada después de registrar asistencia."""
@@ -134,13 +260,9 @@ def calcular_salario(request):
                 messages.error(request, f"El trabajador {trabajador.nombre} no tiene un salario por día definido.")
                 context['form'] = form
             else:
-                # 1. Contar las asistencias en el rango
-                asistencias_qs = Asistencia.objects.filter(
-                    trabajador=trabajador,
-                    fecha__range=[fecha_inicio, fecha_fin],
-                    tipo_proyecto=tipo_proyecto
-                )
-                asistencias_count = asistencias_qs.count()
+                # 1. Contar las asistencias en el rango (desde el resumen mensual en bits)
+                filas = calcular_nomina(fecha_inicio, fecha_fin, tipo_proyecto, trabajadores=[trabajador.id])
+                asistencias_count = filas[0]['dias'] if filas else 0
                 
                 # 2. Calcular salario
                 salario_total = asistencias_count * trabajador.salario_por_dia
@@ -151,12 +273,13 @@ def calcular_salario(request):
                 context['salario_total'] = salario_total
                 
                 # 4. Pasar los datos al formulario 'registrar_pago_gasto'
+                # (el monto NO viaja: se recalcula en el servidor al registrar)
                 context['form_data'] = {
                     'trabajador': trabajador.id,
                     'fecha_inicio': fecha_inicio.isoformat(),
                     'fecha_fin': fecha_fin.isoformat(),
                     'tipo_proyecto': tipo_proyecto,
-                    'salario_total': float(salario_total) # Convertir Decimal a float
+                    'huella': huella_nomina(filas),
                 }
                 context['form'] = form
         else:
@@ -172,6 +295,9 @@ def registrar_pago_gasto(request):
     """
     Recibe un POST (desde 'calcular_salario') y crea un registro
     en el modelo 'Gasto' de la app 'finanzas'.
+
+    El monto se recalcula en el servidor (en Decimal) a partir de las
+    asistencias; el formulario solo indica trabajador, período y proyecto.
     """
     if request.method == 'POST':
         # 1. Obtener datos del formulario POST
@@ -179,34 +305,38 @@ def registrar_pago_gasto(request):
         fecha_inicio_str = request.POST.get('fecha_inicio')
         fecha_fin_str = request.POST.get('fecha_fin')
         tipo_proyecto = request.POST.get('tipo_proyecto')
-        salario_total_str = request.POST.get('salario_total')
+        huella = request.POST.get('huella', '')
 
         # 2. Validar que todos los datos necesarios llegaron
-        if not all([trabajador_id, fecha_inicio_str, fecha_fin_str, tipo_proyecto, salario_total_str]):
+        if not all([trabajador_id, fecha_inicio_str, fecha_fin_str, tipo_proyecto]):
             messages.error(request, "Faltan datos para registrar el gasto.")
             return redirect('recursos_humanos:calcular_salario')
 
         try:
             trabajador = Trabajador.objects.get(pk=trabajador_id)
-            salario_total = float(salario_total_str)
-            if salario_total < 0:
-                 raise ValueError("Monto inválido.")
-
-            # 3. Crear el Gasto en la app 'finanzas'
-            Gasto.objects.create(
-                fecha=date.today(), # Fecha del pago es hoy
-                categoria='SALARIO', # Categoría fija
-                descripcion=f"Pago salario a {trabajador.nombre} por período {fecha_inicio_str} al {fecha_fin_str} ({tipo_proyecto})",
-                monto=salario_total,
-                tipo_proyecto=tipo_proyecto
-            )
-            messages.success(request, f"Salario de ${salario_total:,.0f} para {trabajador.nombre} registrado como Gasto.")
+            fecha_inicio = date.fromisoformat(fecha_inicio_str)
+            fecha_fin = date.fromisoformat(fecha_fin_str)
+
+            # 3. Recalcular y crear el Gasto en la app 'finanzas'
+            gastos, omitidos = registrar_nomina(fecha_inicio, fecha_fin, tipo_proyecto, trabajadores=[trabajador.id], huella=huella)
+            if omitidos:
+                messages.warning(request, f"{trabajador.nombre} ya tiene un pago registrado que cubre este período.")
+                return redirect('finanzas:lista_gastos')
+            if not gastos:
+                raise ValueError("Monto inválido.")
+
+            messages.success(request, f"Salario de ${gastos[0].monto:,.0f} para {trabajador.nombre} registrado como Gasto.")
             return redirect('finanzas:lista_gastos') # Redirigir a la lista de gastos
 
         except Trabajador.DoesNotExist:
             messages.error(request, "Trabajador no encontrado.")
+        except NominaModificada as e:
+            messages.error(request, str(e))
+        except IntegrityError:
+            messages.warning(request, f"El salario de {trabajador.nombre} para este período ya se estaba registrando.")
+            return redirect('finanzas:lista_gastos')
         except ValueError:
-            messages.error(request, "Monto de salario inválido.")
+            messages.error(request, "Datos de período o monto de salario inválidos.")
         except Exception as e:
             messages.error(request, f"Error inesperado al registrar el gasto: {e}")
 
@@ -216,6 +346,110 @@ def registrar_pago_gasto(request):
     # Si no es POST, redirigir
     return redirect('recursos_humanos:calcular_salario')
 
+@login_required
+def nomina(request):
+    """
+    Nómina del período: calcula el pago de TODOS los trabajadores de un
+    proyecto y, tras la revisión del usuario, lo registra como Gastos.
+
+    - POST con accion=calcular: muestra el resumen (1 consulta agrupada).
+    - POST con accion=confirmar: recalcula en el servidor y crea todos los
+      Gastos de SALARIO con un único 'bulk_create' en una transacción. Se
+      rechaza si los totales cambiaron desde la revisión (huella) y se
+      omiten los trabajadores ya pagados, así que reenviar no duplica pagos.
+
+    La confirmación corre en la petición también con TAREAS_SEGUNDO_PLANO:
+    son unas pocas consultas que no crecen con la cantidad de trabajadores
+    (una agrupada, una de pagos previos y dos 'bulk_create'), y el usuario
+    necesita la respuesta al instante para volver a revisar si los totales
+    cambiaron o saber a quién se omitió. Lo pesado de la nómina, las
+    liquidaciones en PDF, sí se encola (ver 'descargar_liquidaciones').
+    """
+    context = {}
+    if request.method == 'POST':
+        form = NominaForm(request.POST)
+        if form.is_valid():
+            fecha_inicio = form.cleaned_data['fecha_inicio']
+            fecha_fin = form.cleaned_data['fecha_fin']
+            tipo_proyecto = form.cleaned_data['tipo_proyecto']
+
+            if request.POST.get('accion') == 'confirmar':
+                # Solo los trabajadores marcados; los montos NO vienen del cliente
+                seleccion = [int(i) for i in request.POST.getlist('trabajadores') if i.isdigit()]
+                try:
+                    gastos, omitidos = registrar_nomina(
+                        fecha_inicio, fecha_fin, tipo_proyecto, trabajadores=seleccion,
+                        huella=request.POST.get('huella', ''),
+                    )
+                except NominaModificada as e:
+                    messages.error(request, str(e))
+                except IntegrityError:
+                    messages.warning(request, "Esta nómina ya se estaba registrando; revisa la lista de gastos antes de volver a confirmar.")
+                    return redirect('finanzas:lista_gastos')
+                else:
+                    if omitidos:
+                        messages.warning(request, f"Se omitieron {len(omitidos)} trabajadores que ya tienen un pago del período: {', '.join(omitidos)}.")
+                    if gastos:
+                        total = sum(gasto.monto for gasto in gastos)
+                        messages.success(request, f"Nómina registrada: {len(gastos)} pagos por un total de ${total:,.0f}.")
+                        return redirect('finanzas:lista_gastos')
+                    if not omitidos:
+                        messages.warning(request, "No se registró ningún pago (no hay trabajadores seleccionados con monto a pagar).")
+
+            filas = calcular_nomina(fecha_inicio, fecha_fin, tipo_proyecto)
+            context['filas'] = filas
+            context['total_nomina'] = sum(fila['total'] for fila in filas)
+            context['total_dias'] = sum(fila['dias'] for fila in filas)
+            context['huella'] = huella_nomina(filas)
+        else:
+            messages.error(request, "Por favor corrige los errores en el formulario.")
+    else: # Método GET
+        form = NominaForm()
+
+    context['form'] = form
+    return render(request, 'recursos_humanos/nomina.html', context)
+
+@login_required
+def descargar_liquidaciones(request):
+    """
+    Descarga un ZIP con la liquidación (PDF) de cada trabajador de la
+    nómina del período indicado por GET (fecha_inicio, fecha_fin, tipo_proyecto).
+
+    Con TAREAS_SEGUNDO_PLANO el ZIP lo genera 'run_worker' y se redirige a
+    la página de estado de la tarea, desde donde se descarga al terminar.
+    """
+    form = NominaForm(request.GET)
+    if not form.is_valid():
+        messages.error(request, "Período inválido para generar las liquidaciones.")
+        return redirect('recursos_humanos:nomina')
+
+    fecha_inicio = form.cleaned_data['fecha_inicio']
+    fecha_fin = form.cleaned_data['fecha_fin']
+    tipo_proyecto = form.cleaned_data['tipo_proyecto']
+
+    filas = [fila for fila in calcular_nomina(fecha_inicio, fecha_fin, tipo_proyecto, con_fechas=True) if fila['total'] > 0]
+    if not filas:
+        messages.warning(request, "No hay trabajadores con monto a pagar en el período.")
+        return redirect('recursos_humanos:nomina')
+
+    if settings.TAREAS_SEGUNDO_PLANO:
+        tarea = encolar(
+            'recursos_humanos.liquidaciones', usuario=request.user,
+            descripcion=f"Liquidaciones {tipo_proyecto} del {fecha_inicio:%d-%m-%Y} al {fecha_fin:%d-%m-%Y}",
+            fecha_inicio=fecha_inicio.isoformat(), fecha_fin=fecha_fin.isoformat(), tipo_proyecto=tipo_proyecto,
+        )
+        return redirect('core:tarea', tarea_id=tarea.pk)
+
+    from .liquidaciones import generar_zip_liquidaciones # Carga ReportLab solo al usarse
+    response = StreamingHttpResponse(
+        generar_zip_liquidaciones(filas, fecha_inicio, fecha_fin, tipo_proyecto),
+        content_type='application/zip'
+    )
+    response['Content-Disposition'] = (
+        f'attachment; filename="{nombre_zip_liquidaciones(fecha_inicio, fecha_fin, tipo_proyecto)}"'
+    )
+    return response
+
 
 # --- VISTAS DEL CALENDARIO (AÑADIDAS AL FINAL) ---
 
@@ -227,34 +461,47 @@ def calendario_asistencia(request):
     return render(request, 'recursos_humanos/calendario_asistencia.html')
 
 
+def _etag_feed(request):
+    """
+    ETag del feed: depende de los parámetros y de la versión de cada mes
+    del rango, por lo que se calcula sin tocar la base de datos.
+    """
+    try:
+        inicio, fin = leer_rango(request.GET.get('start'), request.GET.get('end'))
+    except ValueError:
+        return None
+    modo = request.GET.get('modo', 'detalle')
+    if modo not in MODOS_FEED:
+        return None
+    return clave_feed(modo, inicio, fin)
+
+
 @login_required
+@condition(etag_func=_etag_feed)
 def asistencia_feed(request):
     """
     Esta es la vista de API que FullCalendar llamará.
     Devuelve las asistencias en formato JSON.
+
+    Parámetros GET:
+        start, end: Rango de la vista actual ('end' exclusivo, máx. MAX_DIAS_FEED días).
+        modo: 'detalle' (un evento por asistencia, por defecto) o
+              'resumen' (un evento por día y proyecto con el total).
+
+    Las respuestas se cachean por mes y llevan ETag, así que volver a un
+    mes ya visto responde 304 sin consultar la base de datos.
     """
     # FullCalendar envía las fechas 'start' y 'end' de la vista actual
-    start = request.GET.get('start')
-    end = request.GET.get('end')
-
-    if not start or not end:
-        return JsonResponse({'error': 'Faltan parámetros start/end'}, status=400)
-
-    # Cargar asistencias con el trabajador relacionado para optimizar
-    asistencias = Asistencia.objects.filter(
-        fecha__range=[start, end]
-    ).select_related('trabajador')
-
-    eventos = []
-    for asistencia in asistencias:
-        # Creamos un "evento" por cada asistencia registrada
-        eventos.append({
-            'title': f'{asistencia.trabajador.nombre} ({asistencia.get_tipo_proyecto_display()})',
-            'start': asistencia.fecha.isoformat(), # Formato YYYY-MM-DD
-            'allDay': True,
-            # (Opcional) Asignar un color por tipo de proyecto
-            'color': '#28a745' if asistencia.tipo_proyecto == 'CONSTRUCTORA' else '#17a2b8'
-        })
-
-    # 'safe=False' es necesario porque estamos devolviendo una lista
-    return JsonResponse(eventos, safe=False)
\ No newline at end of file
+    try:
+        inicio, fin = leer_rango(request.GET.get('start'), request.GET.get('end'))
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    modo = request.GET.get('modo', 'detalle')
+    if modo not in MODOS_FEED:
+        return JsonResponse({'error': f"Modo inválido: {modo}"}, status=400)
+
+    response = HttpResponse(contenido_feed(modo, inicio, fin), content_type='application/json')
+    # El navegador debe revalidar siempre (con el ETag) antes de reutilizar la respuesta
+    response['Cache-Control'] = 'private, no-cache'
+    return response
@@ -3,7 +3,7 @@
 Configuración del Admin para la app 'ventas'.
 """
 from django.contrib import admin
-from .models import OrdenCompra, DetalleOrden
+from .models import Cliente, DetalleDevolucion, Devolucion, OrdenCompra, DetalleOrden
 
 class DetalleOrdenInline(admin.TabularInline):
     """
@@ -17,18 +17,78 @@ class DetalleOrdenInline(admin.TabularInline):
     # (muy útil si tienes miles de productos).
     autocomplete_fields = ['producto'] 
 
+class DevolucionInline(admin.TabularInline):
+    """
+    Historial de devoluciones y anulaciones de la orden (solo lectura):
+    se registran desde la vista 'ventas:devolver_orden'.
+    """
+    model = Devolucion
+    extra = 0
+    can_delete = False
+    fields = ('fecha', 'tipo', 'usuario', 'motivo', 'monto', 'reembolso')
+    readonly_fields = fields
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
 @admin.register(OrdenCompra)
 class OrdenCompraAdmin(admin.ModelAdmin):
     """
     Personaliza la vista de 'OrdenCompra' en el admin.
     """
     # Columnas a mostrar en la lista
-    list_display = ('numero_venta', 'cliente', 'fecha', 'total', 'rut')
+    list_display = ('numero_venta', 'cliente', 'fecha', 'total', 'rut', 'tipo_proyecto', 'anulada')
     # Campos que se pueden usar en la barra de búsqueda
     search_fields = ('numero_venta', 'cliente', 'rut')
     # Filtros que aparecen en el panel derecho
-    list_filter = ('fecha',)
+    list_filter = ('fecha', 'tipo_proyecto', 'anulada')
     date_hierarchy = 'fecha' # Navegación por fechas tipo "drill-down"
-    inlines = [DetalleOrdenInline] # Añade el editor en línea de detalles
+    inlines = [DetalleOrdenInline, DevolucionInline] # Añade el editor en línea de detalles
+    autocomplete_fields = ['ficha_cliente']
     # Campos que no se pueden editar (se calculan automáticamente)
-    readonly_fields = ('numero_venta', 'total')
\ No newline at end of file
+    readonly_fields = ('numero_venta', 'total')
+
+
+@admin.register(Cliente)
+class ClienteAdmin(admin.ModelAdmin):
+    """
+    Fichas de cliente (una por RUT). Se crean al registrar órdenes con RUT
+    o con 'manage.py vincular_clientes' a partir de las órdenes antiguas.
+    """
+    list_display = ('nombre', 'rut', 'direccion', 'creado')
+    search_fields = ('rut', 'nombre')
+    readonly_fields = ('creado',)
+
+
+class DetalleDevolucionInline(admin.TabularInline):
+    model = DetalleDevolucion
+    extra = 0
+    can_delete = False
+    fields = ('producto', 'cantidad', 'precio_unitario', 'costo_unitario')
+    readonly_fields = fields
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(Devolucion)
+class DevolucionAdmin(admin.ModelAdmin):
+    """
+    Registro de auditoría de devoluciones y anulaciones: de solo lectura,
+    porque el stock y los totales ya se ajustaron al registrarlas.
+    """
+    list_display = ('orden', 'tipo', 'fecha', 'usuario', 'monto', 'reembolso')
+    list_filter = ('tipo', 'fecha')
+    search_fields = ('orden__numero_venta', 'motivo')
+    date_hierarchy = 'fecha'
+    inlines = [DetalleDevolucionInline]
+    list_select_related = ('orden', 'usuario')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
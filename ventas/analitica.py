@@ -0,0 +1,174 @@
+# ventas/analitica.py
+"""
+Analítica de ventas por producto: unidades, ingresos, costo y margen.
+
+- Los datos salen de una sola consulta agrupada por producto y mes sobre
+  'DetalleOrden' (precio y costo unitario guardados al momento de la venta).
+- Con ellos se arma una tabla dinámica producto × mes en memoria, de la que
+  salen los totales, la clasificación ABC, la variación mensual y la matriz
+  que se muestra en pantalla.
+- La exportación a CSV ('escribir_csv') la usan la vista y la tarea
+  'ventas.csv_analitica' (ver ventas/tareas.py).
+- El resultado se guarda en la caché con la versión de los datos en la
+  clave (ver 'version_datos'): mientras no cambie una orden ni un producto
+  se reutiliza, y cualquier cambio genera una clave nueva.
+"""
+import csv
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db.models import Count, F, Max, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from core.db import limite_de_tiempo
+from inventario.models import Producto
+from .models import DetalleOrden, OrdenCompra
+
+MEDIDAS = ('unidades', 'ingresos', 'costo', 'utilidad')
+
+# Clasificación ABC por participación acumulada en los ingresos
+LIMITE_A = Decimal('80')
+LIMITE_B = Decimal('95')
+
+# La clave incluye la versión de los datos, así que no hace falta expirar pronto
+ANALITICA_CACHE_SEGUNDOS = 60 * 60 * 24
+
+
+def _clave_mes(valor):
+    """Normaliza el resultado de TruncMonth (date o datetime) a 'YYYY-MM'."""
+    return valor.strftime('%Y-%m')
+
+
+def _margen(utilidad, ingresos):
+    """Margen sobre la venta, en porcentaje (None sin ingresos)."""
+    return utilidad / ingresos * 100 if ingresos else None
+
+
+def ventas_por_producto_mes(fecha_inicio, fecha_fin):
+    """Unidades, ingresos y costo por producto y mes del período (1 consulta)."""
+    return DetalleOrden.objects.filter(
+        orden__fecha__date__range=[fecha_inicio, fecha_fin]
+    ).annotate(mes=TruncMonth('orden__fecha')).values('producto_id', 'producto__nombre', 'mes').annotate(
+        unidades=Sum('cantidad'),
+        ingresos=Sum(F('cantidad') * F('precio_unitario')),
+        costo=Sum(F('cantidad') * F('costo_unitario_en_venta')),
+    ).order_by()
+
+
+def calcular_analitica(fecha_inicio, fecha_fin):
+    """
+    Arma la tabla dinámica producto × mes y sus indicadores.
+
+    Returns:
+        dict: {'meses': ['YYYY-MM', ...], 'productos': [...], 'totales': {...}}
+              Cada producto (ordenados por ingresos) tiene id, nombre, los
+              totales de MEDIDAS, margen (%), participacion (% de los
+              ingresos), abc ('A', 'B' o 'C'), por_mes ({medida: [valor por
+              mes]} alineado con 'meses'), variacion (% de ingresos del
+              último mes contra el anterior) y variacion_margen (puntos).
+              'totales' tiene lo mismo para todos los productos juntos.
+    """
+    filas = list(ventas_por_producto_mes(fecha_inicio, fecha_fin))
+    meses = sorted({_clave_mes(fila['mes']) for fila in filas})
+    columna = {mes: i for i, mes in enumerate(meses)}
+
+    def serie_vacia():
+        return {medida: [Decimal(0)] * len(meses) for medida in MEDIDAS}
+
+    productos = {} # {producto_id: {'id', 'nombre', 'por_mes'}}
+    totales = {'por_mes': serie_vacia()}
+    for fila in filas:
+        producto = productos.setdefault(fila['producto_id'], {
+            'id': fila['producto_id'], 'nombre': fila['producto__nombre'], 'por_mes': serie_vacia(),
+        })
+        i = columna[_clave_mes(fila['mes'])]
+        valores = {
+            'unidades': Decimal(fila['unidades'] or 0),
+            'ingresos': fila['ingresos'] or Decimal(0),
+            'costo': fila['costo'] or Decimal(0),
+        }
+        valores['utilidad'] = valores['ingresos'] - valores['costo']
+        for medida, valor in valores.items():
+            producto['por_mes'][medida][i] += valor
+            totales['por_mes'][medida][i] += valor
+
+    for grupo in [*productos.values(), totales]:
+        _resumir(grupo)
+
+    # ABC: de mayor a menor ingreso, hasta el 80% acumulado es A, hasta el 95% B
+    ordenados = sorted(productos.values(), key=lambda p: p['ingresos'], reverse=True)
+    acumulado = Decimal(0)
+    for producto in ordenados:
+        producto['participacion'] = producto['ingresos'] / totales['ingresos'] * 100 if totales['ingresos'] else Decimal(0)
+        producto['abc'] = 'A' if acumulado < LIMITE_A else 'B' if acumulado < LIMITE_B else 'C'
+        acumulado += producto['participacion']
+
+    return {'meses': meses, 'productos': ordenados, 'totales': totales}
+
+
+def _resumir(grupo):
+    """Totales del período, margen y variación del último mes de una fila de la tabla."""
+    por_mes = grupo['por_mes']
+    for medida in MEDIDAS:
+        grupo[medida] = sum(por_mes[medida], Decimal(0))
+    grupo['margen'] = _margen(grupo['utilidad'], grupo['ingresos'])
+    por_mes['margen'] = [_margen(u, i) for u, i in zip(por_mes['utilidad'], por_mes['ingresos'])]
+
+    grupo['variacion'] = grupo['variacion_margen'] = None
+    if len(por_mes['ingresos']) >= 2:
+        anterior, ultimo = por_mes['ingresos'][-2:]
+        if anterior:
+            grupo['variacion'] = (ultimo - anterior) / anterior * 100
+        margen_anterior, margen_ultimo = por_mes['margen'][-2:]
+        if margen_anterior is not None and margen_ultimo is not None:
+            grupo['variacion_margen'] = margen_ultimo - margen_anterior
+
+
+def version_datos():
+    """
+    Versión de los datos de los que depende la analítica: cambia al
+    crear, modificar o eliminar una orden (sus líneas se guardan con ella)
+    o un producto. Dos consultas de agregación sin cargar filas.
+    """
+    ordenes = OrdenCompra.objects.aggregate(ultima=Max('actualizado'), cantidad=Count('id'))
+    productos = Producto.objects.aggregate(ultima=Max('actualizado'), cantidad=Count('id'))
+    partes = [ordenes['ultima'], ordenes['cantidad'], productos['ultima'], productos['cantidad']]
+    return ':'.join(str(parte.timestamp() if hasattr(parte, 'timestamp') else parte) for parte in partes)
+
+
+def analitica_productos(fecha_inicio, fecha_fin):
+    """
+    Versión cacheada de 'calcular_analitica', con la versión de los datos
+    en la clave. El cálculo está limitado a REPORTES_LIMITE_SEGUNDOS.
+    """
+    clave = f"ventas:analitica:{fecha_inicio.isoformat()}:{fecha_fin.isoformat()}:{version_datos()}"
+    datos = cache.get(clave)
+    if datos is None:
+        with limite_de_tiempo():
+            datos = calcular_analitica(fecha_inicio, fecha_fin)
+        datos['generado'] = timezone.now()
+        cache.set(clave, datos, ANALITICA_CACHE_SEGUNDOS)
+    return datos
+
+
+def nombre_csv(fecha_inicio, fecha_fin):
+    return f"analitica_productos_{fecha_inicio.isoformat()}_{fecha_fin.isoformat()}.csv"
+
+
+def escribir_csv(archivo, datos):
+    """CSV de la analítica: una fila por producto y mes (con BOM, para que Excel lea bien los acentos)."""
+    archivo.write('\ufeff')
+    escritor = csv.writer(archivo)
+    escritor.writerow(['Producto', 'Clase ABC', 'Mes', 'Unidades', 'Ingresos', 'Costo', 'Utilidad', 'Margen %'])
+    for producto in datos['productos']:
+        por_mes = producto['por_mes']
+        for i, mes in enumerate(datos['meses']):
+            if not por_mes['unidades'][i]:
+                continue # El producto no se vendió ese mes
+            margen = por_mes['margen'][i]
+            escritor.writerow([
+                producto['nombre'], producto['abc'], mes, f"{por_mes['unidades'][i]:.0f}",
+                f"{por_mes['ingresos'][i]:.0f}", f"{por_mes['costo'][i]:.0f}", f"{por_mes['utilidad'][i]:.0f}",
+                '' if margen is None else f"{margen:.1f}",
+            ])
@@ -0,0 +1,141 @@
+# ventas/devoluciones.py
+"""
+Devoluciones parciales y anulación de órdenes de compra.
+
+Ambas operaciones corren en una transacción corta con una cantidad fija
+de consultas, sin importar cuántas líneas tenga la orden:
+
+1. Bloquea la orden y sus líneas (SELECT ... FOR UPDATE; en SQLite lo
+   garantiza el BEGIN IMMEDIATE).
+2. Repone el stock de todos los productos con un solo UPDATE
+   (Producto.aumentar_stock_en_bloque: stock = stock + CASE ...).
+3. Descuenta las cantidades devueltas de las líneas con otro UPDATE.
+4. Ajusta total, costo, utilidad y pago de la orden (y su versión).
+5. Registra la devolución y sus líneas (auditoría).
+
+Las cantidades de las líneas quedan netas de lo devuelto, así que los
+reportes (estado de resultados, cobranza, analítica de productos) ya
+excluyen lo devuelto y las órdenes anuladas sin cambios adicionales.
+"""
+from collections import Counter
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Case, F, PositiveIntegerField, Value, When
+
+from core import metricas
+from inventario.models import Producto
+from .models import DetalleDevolucion, DetalleOrden, Devolucion, OrdenCompra
+
+
+def devolver(orden_id, cantidades, usuario=None, motivo=''):
+    """
+    Devuelve parte de una orden.
+
+    Args:
+        orden_id (int): Orden a la que pertenecen las líneas.
+        cantidades (dict): {detalle_id: cantidad a devolver}; se ignoran los ceros.
+        usuario (User, opcional): Quién registra la devolución.
+        motivo (str, opcional): Texto libre para el registro.
+
+    Returns:
+        Devolucion: El registro creado.
+
+    Raises:
+        ValidationError: Orden anulada, línea ajena a la orden, cantidad
+            mayor a la vendida (neta de devoluciones anteriores) o nada que devolver.
+    """
+    return _registrar(orden_id, cantidades, usuario, motivo, anular=False)
+
+
+def anular(orden_id, usuario=None, motivo=''):
+    """
+    Anula una orden: devuelve todo lo que queda de cada línea, deja los
+    totales en cero y la marca como anulada. Lo pagado se registra como
+    reembolso. Ver 'devolver' para los argumentos y errores.
+    """
+    return _registrar(orden_id, None, usuario, motivo, anular=True)
+
+
+def _registrar(orden_id, cantidades, usuario, motivo, anular):
+    with transaction.atomic():
+        orden = OrdenCompra.objects.select_for_update().get(pk=orden_id)
+        if orden.anulada:
+            raise ValidationError("La orden ya está anulada.")
+        detalles = {
+            detalle.pk: detalle
+            for detalle in DetalleOrden.objects.select_for_update(of=('self',)).select_related('producto')
+                                               .filter(orden=orden)
+        }
+
+        if anular:
+            cantidades = {pk: detalle.cantidad for pk, detalle in detalles.items()}
+        cantidades = {int(pk): cantidad for pk, cantidad in cantidades.items() if cantidad}
+        for pk, cantidad in cantidades.items():
+            detalle = detalles.get(pk)
+            if detalle is None:
+                raise ValidationError(f"La línea {pk} no pertenece a la orden {orden}.")
+            if cantidad < 0 or cantidad > detalle.cantidad:
+                raise ValidationError(
+                    f"No se pueden devolver {cantidad} de '{detalle.producto.nombre}' "
+                    f"(quedan {detalle.cantidad} en la orden)."
+                )
+        if not cantidades and not anular:
+            raise ValidationError("Indica al menos una cantidad a devolver.")
+
+        lineas = [
+            DetalleDevolucion(
+                detalle=detalles[pk], producto=detalles[pk].producto.nombre, cantidad=cantidad,
+                precio_unitario=detalles[pk].precio_unitario, costo_unitario=detalles[pk].costo_unitario_en_venta,
+            )
+            for pk, cantidad in cantidades.items()
+        ]
+        monto = sum((linea.cantidad * linea.precio_unitario for linea in lineas), Decimal(0))
+        costo = sum((linea.cantidad * linea.costo_unitario for linea in lineas), Decimal(0))
+
+        # Stock: un mismo producto puede estar en varias líneas de la orden, se suman
+        stock = Counter()
+        for pk, cantidad in cantidades.items():
+            stock[detalles[pk].producto_id] += cantidad
+        Producto.aumentar_stock_en_bloque(stock)
+        if cantidades:
+            DetalleOrden.objects.filter(pk__in=cantidades).update(cantidad=F('cantidad') - Case(
+                *[When(pk=pk, then=Value(cantidad)) for pk, cantidad in cantidades.items()],
+                default=Value(0), output_field=PositiveIntegerField(),
+            ))
+
+        # Totales y pago: lo pagado por sobre el nuevo total se devuelve al cliente
+        total = orden.total - monto
+        reembolso = max(orden.monto_pagado - total, 0)
+        monto_pagado = orden.monto_pagado - reembolso
+        if monto_pagado >= total:
+            estado_pago = OrdenCompra.EstadoPago.PAGADA # Incluye total 0: no queda deuda
+        elif monto_pagado > 0:
+            estado_pago = OrdenCompra.EstadoPago.ABONADA
+        else:
+            estado_pago = OrdenCompra.EstadoPago.PENDIENTE
+        OrdenCompra.objects.filter(pk=orden.pk).update(
+            total=total,
+            total_costo=orden.total_costo - costo,
+            total_utilidad=orden.total_utilidad - (monto - costo),
+            monto_pagado=monto_pagado,
+            estado_pago=estado_pago,
+            anulada=anular,
+        )
+
+        devolucion = Devolucion.objects.create(
+            orden=orden,
+            tipo=Devolucion.Tipo.ANULACION if anular else Devolucion.Tipo.DEVOLUCION,
+            usuario=usuario if usuario is not None and usuario.is_authenticated else None,
+            motivo=motivo[:200],
+            monto=monto,
+            costo=costo,
+            reembolso=reembolso,
+        )
+        for linea in lineas:
+            linea.devolucion = devolucion
+        DetalleDevolucion.objects.bulk_create(lineas)
+
+    metricas.DEVOLUCIONES.inc(tipo=devolucion.tipo)
+    return devolucion
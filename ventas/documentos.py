@@ -0,0 +1,267 @@
+# ventas/documentos.py
+"""
+Generación de los documentos (PDF y DOCX) de una orden de compra.
+
+Este módulo importa ReportLab y python-docx, que son pesados: las vistas
+lo importan dentro de la función, así solo se carga en la primera
+descarga y no al iniciar cada worker ni cada comando de 'manage.py'
+(ver 'test_urls_no_importan_librerias_de_documentos' en core/tests.py).
+"""
+import os
+from io import BytesIO # Buffer en memoria para archivos
+
+from django.contrib.humanize.templatetags.humanize import intcomma
+
+# --- IMPORTACIONES PARA PDF (ReportLab) ---
+from reportlab.lib.units import mm # Para usar milímetros
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.platypus import Paragraph, Spacer, Table, TableStyle, Image, Frame, BaseDocTemplate, PageTemplate
+from reportlab.platypus.flowables import HRFlowable # Línea horizontal
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT
+
+# --- IMPORTACIONES PARA DOCX (python-docx) ---
+from docx import Document
+from docx.shared import Inches, Pt
+from docx.enum.text import WD_ALIGN_PARAGRAPH
+
+
+def nombre_archivo(orden, extension):
+    return f"orden_{orden.numero_venta or orden.id}.{extension}"
+
+
+def orden_pdf(orden, logo_path=None):
+    """
+    Genera el PDF de la orden de compra con ReportLab.
+    El formato está diseñado para simular un ticket de 80mm.
+
+    Args:
+        orden (OrdenCompra): Idealmente con 'detalles__producto' precargado.
+        logo_path (str, opcional): Ruta absoluta del logo; sin logo se usa
+                                   solo el nombre de la empresa.
+
+    Returns:
+        bytes: Contenido del PDF.
+    """
+    # 1. Configurar el buffer en memoria
+    buffer = BytesIO()
+
+    # 2. Configuración del Documento (Ticket 80mm)
+    ticket_width = 80 * mm
+    ticket_height = 200 * mm # Altura estimada, puede crecer
+    pagesize = (ticket_width, ticket_height)
+    margin = 5 * mm
+    effective_width = ticket_width - 2 * margin # Ancho útil
+
+    doc = BaseDocTemplate(buffer, pagesize=pagesize,
+                          leftMargin=margin, rightMargin=margin,
+                          topMargin=margin, bottomMargin=margin)
+
+    # 3. Definición de Estilos de Párrafo
+    styles = getSampleStyleSheet()
+    style_base = ParagraphStyle(name='Base', parent=styles['Normal'], fontSize=8, leading=10)
+    style_normal = ParagraphStyle(name='Normal', parent=style_base, alignment=TA_LEFT)
+    style_bold = ParagraphStyle(name='Bold', parent=style_base, fontName='Helvetica-Bold')
+    style_header_info = ParagraphStyle(name='HeaderInfo', parent=style_base, fontSize=7, leading=8.5, alignment=TA_LEFT)
+    style_header_name = ParagraphStyle(name='HeaderName', parent=style_header_info, fontName='Helvetica-Bold')
+    style_order_title = ParagraphStyle(name='OrderTitle', parent=style_bold, fontSize=9, leading=11, alignment=TA_LEFT)
+    style_center = ParagraphStyle(name='Center', parent=style_base, alignment=TA_CENTER)
+    style_right_bold = ParagraphStyle(name='RightBold', parent=style_bold, alignment=TA_RIGHT)
+    style_total_label = ParagraphStyle(name='TotalLabel', parent=style_right_bold, fontSize=10, leading = 12)
+    style_gracias = ParagraphStyle(name='Gracias', parent=style_center, fontSize=8, leading=10)
+    style_table_header = ParagraphStyle(name='TableHeader', parent=style_bold, fontSize=7, alignment=TA_CENTER)
+    style_table_cell = ParagraphStyle(name='TableCell', parent=style_base, fontSize=7)
+    style_table_cell_right = ParagraphStyle(name='TableCellRight', parent=style_table_cell, alignment=TA_RIGHT)
+    style_table_product = ParagraphStyle(name='TableProduct', parent=style_table_cell, alignment=TA_LEFT)
+
+    # 4. Contenido del PDF (El "Story" de ReportLab)
+    story = []
+
+    # --- Encabezado con Logo ---
+    if logo_path and os.path.exists(logo_path):
+        img = Image(logo_path, height=15*mm, width=15*mm) # Ajustar tamaño
+        img.hAlign = 'LEFT'
+        
+        # Usar una tabla para alinear logo e info de la empresa
+        header_data = [
+            [img, Paragraph("<b>CONSTRUCCIONES V & G<br/>LIZ CASTILLO GARCIA SPA</b><br/>"
+                           "RUT: 77.858.577-4<br/>"
+                           "Dirección: Vilaco 301, Toconao<br/>"
+                           "Teléfono: +56 9 52341652", style_header_info)]
+        ]
+        header_table = Table(header_data, colWidths=[20*mm, effective_width - 20*mm])
+        header_table.setStyle(TableStyle([
+            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+            ('LEFTPADDING', (0,0), (-1,-1), 0),
+            ('BOTTOMPADDING', (0,0), (-1,-1), 1*mm),
+        ]))
+        story.append(header_table)
+    else:
+        # Fallback si no se encuentra el logo
+        story.append(Paragraph("CONSTRUCCIONES V & G LIZ CASTILLO GARCIA SPA", style_center))
+
+    story.append(Spacer(1, 1 * mm))
+    story.append(HRFlowable(width="100%", thickness=0.5, color=colors.black, spaceBefore=1*mm, spaceAfter=1*mm))
+
+    # --- Info de la Orden ---
+    story.append(Paragraph(f"Orden de Compra #{orden.numero_venta or orden.id}", style_order_title))
+    story.append(Paragraph(f"Cliente: {orden.cliente}", style_normal))
+    if orden.rut:
+        story.append(Paragraph(f"RUT: {orden.rut}", style_normal))
+    story.append(Paragraph(f"Fecha: {orden.fecha.strftime('%d-%m-%Y %H:%M')}", style_normal))
+    if orden.direccion:
+        story.append(Paragraph(f"Dirección: {orden.direccion}", style_normal))
+    story.append(Spacer(1, 3 * mm))
+    story.append(Paragraph("Detalle", style_bold))
+    story.append(Spacer(1, 1 * mm))
+
+    # --- Tabla de Productos ---
+    headers = [
+        Paragraph('Producto', style_table_header),
+        Paragraph('Cant', style_table_header),
+        Paragraph('P. Unitario', style_table_header),
+        Paragraph('Total', style_table_header)
+    ]
+    data = [headers]
+    detalles = orden.detalles.all()
+
+    # Estilos de la tabla
+    table_style_commands = [
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.black), # Borde
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ('ALIGN', (0, 0), (0, -1), 'LEFT'),    # Col 0 (Producto)
+        ('ALIGN', (1, 0), (1, -1), 'CENTER'),  # Col 1 (Cant)
+        ('ALIGN', (2, 0), (-1, -1), 'RIGHT'),  # Col 2 y 3 (Precios)
+        ('LEFTPADDING', (0, 0), (-1, -1), 1.5*mm),
+        ('RIGHTPADDING', (0, 0), (-1, -1), 1.5*mm),
+    ]
+
+    for detalle in detalles:
+        data.append([
+            Paragraph(detalle.producto.nombre, style_table_product),
+            Paragraph(str(detalle.cantidad), style_table_cell),
+            Paragraph(f"${intcomma(int(detalle.precio_unitario))}", style_table_cell_right),
+            Paragraph(f"${intcomma(int(detalle.total_linea))}", style_table_cell_right)
+        ])
+
+    col_widths = [effective_width * 0.40, effective_width * 0.15, effective_width * 0.22, effective_width * 0.23]
+    tabla = Table(data, colWidths=col_widths)
+    tabla.setStyle(TableStyle(table_style_commands))
+    story.append(tabla)
+    story.append(Spacer(1, 3 * mm))
+
+    # --- Total ---
+    total_str = f"${intcomma(int(orden.total))}"
+    total_data = [[Paragraph('Total a Pagar:', style_total_label), Paragraph(total_str, style_total_label)]]
+    total_table = Table(total_data, colWidths=[effective_width * 0.6, effective_width * 0.4])
+    total_table.setStyle(TableStyle([('ALIGN', (0, 0), (-1, -1), 'RIGHT')])) # Alinear todo a la derecha
+    story.append(total_table)
+    story.append(HRFlowable(width="100%", thickness=0.5, color=colors.black, spaceBefore=1*mm, spaceAfter=1*mm))
+
+    # --- Mensaje final ---
+    story.append(Paragraph("¡Gracias por su compra!", style_gracias))
+    story.append(Paragraph("Esperamos atenderle pronto.", style_gracias))
+
+    # 5. Construir el PDF
+    frame = Frame(doc.leftMargin, doc.bottomMargin, doc.width, doc.height, id='normal')
+    template = PageTemplate(id='main', frames=[frame])
+    doc.addPageTemplates([template])
+    doc.build(story)
+    return buffer.getvalue()
+
+
+def orden_docx(orden):
+    """
+    Genera el DOCX (Word) de la orden de compra con python-docx.
+
+    Returns:
+        bytes: Contenido del documento.
+    """
+    # 1. Crear documento y configurar márgenes
+    document = Document()
+    sections = document.sections
+    for section in sections:
+        section.top_margin = Inches(0.4)
+        section.bottom_margin = Inches(0.4)
+        section.left_margin = Inches(0.5)
+        section.right_margin = Inches(0.5)
+
+    # 2. Añadir contenido
+    # --- Info Empresa ---
+    p_empresa = document.add_paragraph()
+    p_empresa.alignment = WD_ALIGN_PARAGRAPH.RIGHT
+    runner = p_empresa.add_run(
+        "CONSTRUCCIONES V & G LIZ CASTILLO GARCIA SPA\n"
+        "RUT: 77.858.577-4\n"
+        "Dirección: Vilaco 301, Toconao\n"
+        "Teléfono: +56 9 52341652"
+    )
+    runner.font.size = Pt(8)
+    runner.bold = True
+    p_empresa.paragraph_format.space_after = Pt(0)
+
+    document.add_paragraph("---" * 12).alignment = WD_ALIGN_PARAGRAPH.CENTER
+
+    # --- Info Orden ---
+    p_orden_info = document.add_paragraph()
+    p_orden_info.add_run(f"Orden de Compra #{orden.numero_venta or orden.id}\n").bold = True
+    p_orden_info.add_run(f"Cliente: {orden.cliente}\n")
+    p_orden_info.add_run(f"Rut: {orden.rut or 'N/A'}\n")
+    p_orden_info.add_run(f"Fecha: {orden.fecha.strftime('%d-%m-%Y %H:%M')}\n")
+    p_orden_info.add_run(f"Dirección: {orden.direccion or 'N/A'}")
+    for run in p_orden_info.runs:
+        run.font.size = Pt(9)
+    p_orden_info.paragraph_format.space_after = Pt(6)
+
+    document.add_paragraph("---" * 12).alignment = WD_ALIGN_PARAGRAPH.CENTER
+
+    # --- Tabla de Productos ---
+    document.add_paragraph().add_run("Detalle").bold = True
+
+    table = document.add_table(rows=1, cols=4)
+    table.style = 'Table Grid' # Estilo con bordes
+    table.autofit = False
+
+    # Encabezados
+    hdr_cells = table.rows[0].cells
+    hdr_cells[0].text = 'Producto'
+    hdr_cells[1].text = 'Cant'
+    hdr_cells[2].text = 'P. Unit.'
+    hdr_cells[3].text = 'Total'
+
+    # Datos
+    for detalle in orden.detalles.all():
+        row_cells = table.add_row().cells
+        # Formatear números con separador de miles (usando intcomma)
+        precio_unit_str = f"${intcomma(int(detalle.precio_unitario))}"
+        total_linea_str = f"${intcomma(int(detalle.total_linea))}"
+
+        row_cells[0].text = detalle.producto.nombre
+        row_cells[1].text = str(detalle.cantidad)
+        row_cells[2].text = precio_unit_str
+        row_cells[3].text = total_linea_str
+
+        # Alinear celdas numéricas
+        for i, cell in enumerate(row_cells):
+            cell.paragraphs[0].runs[0].font.size = Pt(9)
+            if i > 0:
+                cell.paragraphs[0].alignment = WD_ALIGN_PARAGRAPH.CENTER
+
+    # Definir ancho de columnas
+    table.columns[0].width = Inches(2.8)
+    table.columns[1].width = Inches(0.5)
+    table.columns[2].width = Inches(0.9)
+    table.columns[3].width = Inches(1.0)
+
+    # --- Total ---
+    p_total = document.add_paragraph()
+    p_total.alignment = WD_ALIGN_PARAGRAPH.RIGHT
+    total_str = f"${intcomma(int(orden.total))}"
+    runner_total = p_total.add_run(f"Total a Pagar: {total_str}")
+    runner_total.bold = True
+    runner_total.font.size = Pt(11)
+
+    # 3. Guardar en buffer de memoria
+    buffer = BytesIO()
+    document.save(buffer)
+    return buffer.getvalue()
@@ -1,23 +1,45 @@
 # ventas/forms.py
+import uuid
+
 from django import forms
 from django.forms.models import inlineformset_factory
 from django.forms import DateInput # Importación añadida
 from .models import OrdenCompra, DetalleOrden
 from inventario.models import Producto # Importar Producto
+from core.rut import formatear_rut, rut_valido
+from finanzas.forms import PeriodoForm
 
 class OrdenCompraForm(forms.ModelForm):
     class Meta:
         model = OrdenCompra
         # Se añade 'fecha'
-        fields = ['fecha', 'cliente', 'rut', 'direccion']
+        fields = ['fecha', 'cliente', 'rut', 'direccion', 'tipo_proyecto']
         widgets = {
             # Nuevo widget para el selector de fecha
             'fecha': DateInput(attrs={'class': 'form-control', 'type': 'date'}),
-            'cliente': forms.TextInput(attrs={'class': 'form-control'}),
-            'rut': forms.TextInput(attrs={'class': 'form-control'}),
+            'cliente': forms.TextInput(attrs={'class': 'form-control', 'list': 'clientes-por-nombre', 'autocomplete': 'off'}),
+            'rut': forms.TextInput(attrs={'class': 'form-control', 'list': 'clientes-sugeridos', 'autocomplete': 'off'}),
             'direccion': forms.Textarea(attrs={'class': 'form-control', 'rows': 2}), # Textarea
+            'tipo_proyecto': forms.Select(attrs={'class': 'form-control'}),
         }
 
+    # Token de idempotencia: se emite con el formulario y viaja oculto en el POST
+    clave_envio = forms.UUIDField(required=False, widget=forms.HiddenInput)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if not self.is_bound:
+            self.initial.setdefault('clave_envio', uuid.uuid4())
+
+    def clean_rut(self):
+        """El RUT es opcional; si se ingresa, debe tener dígito verificador válido. Se guarda con formato."""
+        rut = self.cleaned_data.get('rut')
+        if not rut:
+            return rut
+        if not rut_valido(rut):
+            raise forms.ValidationError("RUT inválido (revise el dígito verificador).")
+        return formatear_rut(rut)
+
 class DetalleOrdenForm(forms.ModelForm):
     # Opcional: Filtrar productos con stock > 0 si lo deseas
     # producto = forms.ModelChoiceField(queryset=Producto.objects.filter(stock__gt=0),
@@ -71,4 +93,44 @@ class RegistrarPagoForm(forms.Form):
             if monto > saldo_pendiente:
                 raise forms.ValidationError(f"El monto no puede superar el saldo pendiente de ${saldo_pendiente:,.0f}")
         
-        return monto
\ No newline at end of file
+        return monto
+
+
+class AnaliticaForm(PeriodoForm):
+    """
+    Formulario (GET) de la analítica de productos: período, cuántos
+    productos mostrar, por qué medida ordenarlos y qué medida ver por mes.
+    """
+    MEDIDAS = [('ingresos', 'Ingresos'), ('utilidad', 'Utilidad'), ('unidades', 'Unidades'), ('margen', 'Margen %')]
+
+    top = forms.IntegerField(required=False, min_value=1, max_value=100,
+                             widget=forms.NumberInput(attrs={'class': 'form-control', 'placeholder': '10'}))
+    orden = forms.ChoiceField(required=False, choices=MEDIDAS, widget=forms.Select(attrs={'class': 'form-control'}))
+    medida = forms.ChoiceField(required=False, choices=MEDIDAS, widget=forms.Select(attrs={'class': 'form-control'}))
+
+
+class DevolucionForm(forms.Form):
+    """
+    Formulario de devolución: una cantidad por línea de la orden (hasta lo
+    que queda de ella) y el motivo. Los campos de las líneas se llaman
+    'linea_<id del detalle>'.
+    """
+    motivo = forms.CharField(required=False, max_length=200,
+                             widget=forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Ej.: material dañado'}))
+
+    def __init__(self, *args, detalles=(), **kwargs):
+        super().__init__(*args, **kwargs)
+        self.detalles = list(detalles)
+        for detalle in self.detalles:
+            self.fields[f'linea_{detalle.pk}'] = forms.IntegerField(
+                required=False, min_value=0, max_value=detalle.cantidad, initial=0,
+                widget=forms.NumberInput(attrs={'class': 'form-control form-control-sm', 'style': 'width: 7rem;'}),
+            )
+
+    def lineas(self):
+        """(detalle, campo) de cada línea, para la plantilla."""
+        return [(detalle, self[f'linea_{detalle.pk}']) for detalle in self.detalles]
+
+    def cantidades(self):
+        """{detalle_id: cantidad a devolver} (solo válido tras is_valid)."""
+        return {detalle.pk: self.cleaned_data.get(f'linea_{detalle.pk}') or 0 for detalle in self.detalles}
@@ -0,0 +1,83 @@
+# ventas/management/commands/vincular_clientes.py
+"""
+Comando: python manage.py vincular_clientes [--lote 2000] [--simular]
+
+Crea las fichas de Cliente a partir de las órdenes existentes y vincula
+cada orden con la suya ('ficha_cliente'). Las órdenes se agrupan por RUT
+normalizado, así "12.345.678-5" y "12345678-5" (con el nombre escrito
+como sea) quedan en el mismo cliente; el nombre y la dirección de la
+ficha son los de la última orden registrada (mayor clave primaria).
+
+Recorre las órdenes sin vincular de la más nueva a la más antigua por
+lotes de '--lote' filas (paginación por clave primaria, una transacción
+por lote), por lo que se puede interrumpir y volver a ejecutar. Las
+órdenes sin RUT o con un RUT inválido quedan sin vincular y se informan.
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.rut import normalizar_rut, rut_valido
+from ventas.models import Cliente, OrdenCompra, texto_busqueda
+
+
+class Command(BaseCommand):
+    help = "Crea los clientes (por RUT) a partir de las órdenes existentes y vincula las órdenes."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=2000, help="Órdenes por lote.")
+        parser.add_argument('--simular', action='store_true', help="Solo informa, no guarda cambios.")
+
+    def handle(self, *args, **options):
+        pendientes = (
+            OrdenCompra.objects.filter(ficha_cliente__isnull=True).exclude(rut__isnull=True).exclude(rut='')
+            .only('pk', 'version', 'rut', 'cliente', 'direccion').order_by('-pk')
+        )
+        vinculadas = creados = invalidas = 0
+        invalidos_ejemplo, ruts_creados = set(), set() # ruts_creados: para no contarlos dos veces al simular
+        ultimo = None
+        while True:
+            lote = list((pendientes.filter(pk__lt=ultimo) if ultimo else pendientes)[:options['lote']])
+            if not lote:
+                break
+            ultimo = lote[-1].pk
+
+            # La primera orden de cada RUT en el lote es la última registrada (orden por -pk)
+            por_rut = {}
+            for orden in lote:
+                if rut_valido(orden.rut):
+                    por_rut.setdefault(normalizar_rut(orden.rut), orden)
+                else:
+                    invalidas += 1
+                    if len(invalidos_ejemplo) < 10:
+                        invalidos_ejemplo.add(orden.rut)
+
+            with transaction.atomic():
+                existentes = dict(Cliente.objects.filter(rut__in=list(por_rut)).values_list('rut', 'pk'))
+                nuevos = [
+                    Cliente(rut=rut, nombre=orden.cliente, direccion=orden.direccion or '')
+                    for rut, orden in por_rut.items() if rut not in existentes and rut not in ruts_creados
+                ]
+                for cliente in nuevos: # bulk_create no llama a save(): completar el campo calculado
+                    cliente.nombre_busqueda = texto_busqueda(cliente.nombre)[:100]
+                creados += len(nuevos)
+                ruts_creados.update(cliente.rut for cliente in nuevos)
+                if options['simular']:
+                    vinculadas += sum(1 for orden in lote if rut_valido(orden.rut))
+                    continue
+                Cliente.objects.bulk_create(nuevos)
+                existentes.update((cliente.rut, cliente.pk) for cliente in nuevos)
+
+                a_vincular = [orden for orden in lote if normalizar_rut(orden.rut) in existentes]
+                for orden in a_vincular:
+                    orden.ficha_cliente_id = existentes[normalizar_rut(orden.rut)]
+                OrdenCompra.objects.bulk_update(a_vincular, ['ficha_cliente'], batch_size=500)
+                vinculadas += len(a_vincular)
+            self.stdout.write(f"  ... {vinculadas} órdenes vinculadas, {creados} clientes nuevos")
+
+        prefijo = "[simulación] " if options['simular'] else ""
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefijo}Órdenes vinculadas: {vinculadas}. Clientes creados: {creados}. "
+            f"Órdenes con RUT inválido (sin vincular): {invalidas}."
+        ))
+        if invalidos_ejemplo:
+            self.stdout.write(f"Ejemplos de RUT inválidos: {', '.join(sorted(invalidos_ejemplo))}")
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-19 13:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ventas', '0004_ordencompra_estado_pago_ordencompra_monto_pagado'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ordencompra',
+            name='tipo_proyecto',
+            field=models.CharField(choices=[('CONSTRUCTORA', 'Constructora'), ('BLOQUERA', 'Bloquera')], default='BLOQUERA', help_text='Línea de negocio a la que se imputa la venta.', max_length=20),
+        ),
+    ]
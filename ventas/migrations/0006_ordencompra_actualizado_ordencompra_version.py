@@ -0,0 +1,24 @@
+# Generated by Django 5.2.6 on 2026-10-19 13:33
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ventas', '0005_ordencompra_tipo_proyecto'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ordencompra',
+            name='actualizado',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+        migrations.AddField(
+            model_name='ordencompra',
+            name='version',
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-19 13:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ventas', '0006_ordencompra_actualizado_ordencompra_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ordencompra',
+            name='clave_envio',
+            field=models.UUIDField(blank=True, editable=False, null=True, unique=True),
+        ),
+    ]
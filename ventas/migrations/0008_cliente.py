@@ -0,0 +1,33 @@
+# Generated by Django 5.2.6 on 2026-10-19 13:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ventas', '0007_ordencompra_clave_envio'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Cliente',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rut', models.CharField(max_length=12, unique=True)),
+                ('nombre', models.CharField(max_length=100)),
+                ('nombre_busqueda', models.CharField(db_index=True, editable=False, max_length=100)),
+                ('direccion', models.TextField(blank=True)),
+                ('creado', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['nombre'],
+            },
+        ),
+        migrations.AddField(
+            model_name='ordencompra',
+            name='ficha_cliente',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='ordenes', to='ventas.cliente'),
+        ),
+    ]
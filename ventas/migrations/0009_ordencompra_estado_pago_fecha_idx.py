@@ -0,0 +1,17 @@
+# Generated by Django 5.2.6 on 2026-10-19 13:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ventas', '0008_cliente'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ordencompra',
+            index=models.Index(fields=['estado_pago', 'fecha'], name='orden_estado_pago_fecha_idx'),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.6 on 2026-10-19 13:51
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ventas', '0009_ordencompra_estado_pago_fecha_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ordencompra',
+            name='anulada',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.CreateModel(
+            name='Devolucion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('DEVOLUCION', 'Devolución parcial'), ('ANULACION', 'Anulación')], default='DEVOLUCION', max_length=10)),
+                ('fecha', models.DateTimeField(default=django.utils.timezone.now)),
+                ('motivo', models.CharField(blank=True, max_length=200)),
+                ('monto', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('costo', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('reembolso', models.DecimalField(decimal_places=2, default=0, help_text='Parte de lo ya pagado que excede el nuevo total y se devuelve al cliente.', max_digits=10)),
+                ('orden', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='devoluciones', to='ventas.ordencompra')),
+                ('usuario', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='devoluciones', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'Devoluciones',
+                'ordering': ['-fecha'],
+            },
+        ),
+        migrations.CreateModel(
+            name='DetalleDevolucion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('producto', models.CharField(max_length=100)),
+                ('cantidad', models.PositiveIntegerField()),
+                ('precio_unitario', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('costo_unitario', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('detalle', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='devoluciones', to='ventas.detalleorden')),
+                ('devolucion', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lineas', to='ventas.devolucion')),
+            ],
+        ),
+    ]
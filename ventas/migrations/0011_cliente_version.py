@@ -0,0 +1,24 @@
+# Generated by Django 5.2.6 on 2026-10-19 14:15
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ventas', '0010_devoluciones'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cliente',
+            name='actualizado',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+        migrations.AddField(
+            model_name='cliente',
+            name='version',
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+    ]
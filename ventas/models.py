@@ -4,12 +4,76 @@ Define los modelos de la base de datos para la aplicación 'ventas'.
 ...
 """
 
+import unicodedata
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
 from django.db import models
 from django.utils import timezone
+from core.models import ModeloVersionado
+from core.rut import formatear_rut, normalizar_rut, rut_valido
 from inventario.models import Producto
+from recursos_humanos.models import Trabajador
 from decimal import Decimal # <-- ¡AÑADIR ESTA IMPORTACIÓN!
 
-class OrdenCompra(models.Model):
+def texto_busqueda(texto):
+    """
+    Texto para búsquedas por prefijo: minúsculas, sin tildes y con un solo
+    espacio entre palabras. Ej.: '  JUAN  Pérez ' -> 'juan perez'
+    """
+    sin_tildes = unicodedata.normalize('NFKD', texto or '').encode('ascii', 'ignore').decode()
+    return ' '.join(sin_tildes.lower().split())
+
+
+class Cliente(ModeloVersionado):
+    """
+    Ficha de un cliente, identificada por su RUT normalizado (sin puntos ni
+    guion, ej. '12345678K') con índice único: las órdenes de un mismo
+    cliente quedan unidas aunque su nombre se haya escrito distinto.
+    """
+    rut = models.CharField(max_length=12, unique=True)
+    nombre = models.CharField(max_length=100)
+    # Nombre normalizado (ver texto_busqueda) para autocompletar por prefijo con índice
+    nombre_busqueda = models.CharField(max_length=100, db_index=True, editable=False)
+    direccion = models.TextField(blank=True)
+    creado = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['nombre']
+
+    def __str__(self):
+        return f"{self.nombre} ({self.rut_formateado})"
+
+    @property
+    def rut_formateado(self):
+        return formatear_rut(self.rut)
+
+    def clean(self):
+        if not rut_valido(self.rut):
+            raise ValidationError({'rut': "RUT inválido (revise el dígito verificador)."})
+
+    def save(self, *args, **kwargs):
+        self.rut = normalizar_rut(self.rut)
+        self.nombre_busqueda = texto_busqueda(self.nombre)[:100]
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def registrar(cls, rut, nombre, direccion=''):
+        """
+        Devuelve la ficha del RUT (ya validado), creándola si no existe. Si
+        el cliente ya existía, se actualizan su nombre y dirección con los
+        de la orden más reciente.
+        """
+        cliente, creado = cls.objects.get_or_create(
+            rut=normalizar_rut(rut), defaults={'nombre': nombre, 'direccion': direccion or ''}
+        )
+        if not creado and (cliente.nombre, cliente.direccion) != (nombre, direccion or ''):
+            cliente.nombre, cliente.direccion = nombre, direccion or ''
+            cliente.save(update_fields=['nombre', 'nombre_busqueda', 'direccion'])
+        return cliente
+
+
+class OrdenCompra(ModeloVersionado):
     """
     Representa el encabezado de una orden de compra (venta).
     ...
@@ -19,6 +83,7 @@ class OrdenCompra(models.Model):
         PENDIENTE = 'PENDIENTE', 'Pendiente'
         ABONADA = 'ABONADA', 'Abonada'
         PAGADA = 'PAGADA', 'Pagada'
+
     
     numero_venta = models.CharField(max_length=15, unique=True, editable=False, blank=True)
     fecha = models.DateTimeField(default=timezone.now)
@@ -36,10 +101,32 @@ class OrdenCompra(models.Model):
         default=EstadoPago.PENDIENTE
     )
     monto_pagado = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    tipo_proyecto = models.CharField(
+        max_length=20,
+        choices=Trabajador.TIPO_PROYECTO, # Reutiliza las choices de TIPO_PROYECTO del modelo Trabajador
+        default='BLOQUERA',
+        help_text="Línea de negocio a la que se imputa la venta."
+    )
+    # Ficha del cliente (por RUT); 'cliente', 'rut' y 'direccion' guardan lo
+    # escrito en la orden. Las órdenes antiguas se vinculan con 'vincular_clientes'.
+    ficha_cliente = models.ForeignKey(
+        Cliente, on_delete=models.PROTECT, null=True, blank=True, related_name='ordenes'
+    )
+    # Token del formulario que creó la orden: un reenvío del mismo formulario
+    # (doble clic, reintento) encuentra la orden por este índice y no la duplica.
+    clave_envio = models.UUIDField(null=True, blank=True, unique=True, editable=False)
+    # Anulada con 'ventas.devoluciones.anular': el stock se repuso y los totales quedan en cero.
+    # La orden no se elimina; su historial queda en 'devoluciones'.
+    anulada = models.BooleanField(default=False, editable=False)
 
     class Meta:
         verbose_name_plural = "Órdenes de Compra"
         ordering = ['-fecha'] # Ordenar por defecto de más nueva a más antigua
+        indexes = [
+            # Cuentas por cobrar: el reporte de antigüedad solo recorre las
+            # órdenes no pagadas, aunque las pagadas sean la gran mayoría.
+            models.Index(fields=['estado_pago', 'fecha'], name='orden_estado_pago_fecha_idx'),
+        ]
 
     # --- MÉTODOS EN LA UBICACIÓN CORRECTA ---
     @property
@@ -85,7 +172,7 @@ class OrdenCompra(models.Model):
             year = self.fecha.year if self.fecha else timezone.now().year
             self.numero_venta = f"OC-{year}-{self.id:04d}"
             OrdenCompra.objects.filter(pk=self.pk).update(numero_venta=self.numero_venta)
-            self.refresh_from_db(fields=['numero_venta'])
+            self.refresh_from_db(fields=['numero_venta', 'version', 'actualizado'])
 
     def __str__(self):
         """Representación en texto del modelo (ej. en el Admin)."""
@@ -118,4 +205,61 @@ class DetalleOrden(models.Model):
         if self.cantidad is not None and self.precio_unitario is not None:
             costo_total_linea = self.cantidad * self.costo_unitario_en_venta
             return self.total_linea - costo_total_linea
-        return 0
\ No newline at end of file
+        return 0
+
+
+class Devolucion(models.Model):
+    """
+    Registro (auditoría) de una devolución parcial o de la anulación de una
+    orden: quién, cuándo, por qué, cuánto se descontó de la venta y cuánto
+    del pago se devolvió al cliente. Ver 'ventas/devoluciones.py'.
+
+    La orden queda protegida: una orden con devoluciones no se puede
+    eliminar (ni desde el admin), para no perder este historial.
+    """
+
+    class Tipo(models.TextChoices):
+        DEVOLUCION = 'DEVOLUCION', 'Devolución parcial'
+        ANULACION = 'ANULACION', 'Anulación'
+
+    orden = models.ForeignKey(OrdenCompra, on_delete=models.PROTECT, related_name='devoluciones')
+    tipo = models.CharField(max_length=10, choices=Tipo.choices, default=Tipo.DEVOLUCION)
+    fecha = models.DateTimeField(default=timezone.now)
+    usuario = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='devoluciones'
+    )
+    motivo = models.CharField(max_length=200, blank=True)
+    # Lo que se descontó de 'total', 'total_costo' y 'monto_pagado' de la orden
+    monto = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    costo = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    reembolso = models.DecimalField(
+        max_digits=10, decimal_places=2, default=0,
+        help_text="Parte de lo ya pagado que excede el nuevo total y se devuelve al cliente."
+    )
+
+    class Meta:
+        verbose_name_plural = "Devoluciones"
+        ordering = ['-fecha']
+
+    def __str__(self):
+        return f"{self.get_tipo_display()} de {self.orden} ({self.fecha:%d-%m-%Y})"
+
+
+class DetalleDevolucion(models.Model):
+    """
+    Una línea devuelta: cantidad, y precio y costo unitarios de la venta.
+    El nombre del producto se copia para que el registro no dependa de él.
+    """
+    devolucion = models.ForeignKey(Devolucion, on_delete=models.CASCADE, related_name='lineas')
+    detalle = models.ForeignKey(DetalleOrden, on_delete=models.SET_NULL, null=True, related_name='devoluciones')
+    producto = models.CharField(max_length=100)
+    cantidad = models.PositiveIntegerField()
+    precio_unitario = models.DecimalField(max_digits=10, decimal_places=2)
+    costo_unitario = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+
+    def __str__(self):
+        return f"{self.cantidad} x {self.producto}"
+
+    @property
+    def total_linea(self):
+        return self.cantidad * self.precio_unitario
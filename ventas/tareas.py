@@ -0,0 +1,20 @@
+# ventas/tareas.py
+"""
+Tareas en segundo plano de 'ventas' (ver core/tareas.py).
+"""
+import io
+from datetime import date
+
+from core.tareas import Archivo, tarea
+from . import analitica
+
+
+@tarea('ventas.csv_analitica')
+def csv_analitica(fecha_inicio, fecha_fin):
+    """CSV de la analítica de productos del período (sin el límite de tiempo de la vista)."""
+    fecha_inicio, fecha_fin = date.fromisoformat(fecha_inicio), date.fromisoformat(fecha_fin)
+    contenido = io.StringIO()
+    analitica.escribir_csv(contenido, analitica.calcular_analitica(fecha_inicio, fecha_fin))
+    return Archivo(
+        analitica.nombre_csv(fecha_inicio, fecha_fin), 'text/csv; charset=utf-8', [contenido.getvalue().encode('utf-8')]
+    )
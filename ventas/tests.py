@@ -0,0 +1,229 @@
+import io
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core.condicional import version_codigo
+from core.instrumentacion import medir
+from core.tests import DatosSembradosMixin
+from inventario.models import Producto
+from . import devoluciones
+from .analitica import analitica_productos, calcular_analitica
+from .models import Cliente, DetalleOrden, Devolucion, OrdenCompra
+
+
+class DetalleOrdenCondicionalTests(DatosSembradosMixin, TestCase):
+    """ETag del detalle y documentos de una orden: cambia con la orden, sus productos y la ficha del cliente."""
+
+    def setUp(self):
+        super().setUp()
+        self.ruta = reverse('ventas:detalle_orden', args=[self.orden.pk])
+
+    def etag(self):
+        respuesta = self.client.get(self.ruta)
+        self.assertEqual(respuesta.status_code, 200)
+        return respuesta['ETag']
+
+    def assertNoModificada(self, etag, modificada=False):
+        estado = self.client.get(self.ruta, HTTP_IF_NONE_MATCH=etag).status_code
+        self.assertEqual(estado, 200 if modificada else 304)
+
+    def test_cambio_de_nombre_de_producto(self):
+        etag = self.etag()
+        self.assertNoModificada(etag)
+        producto = self.productos[0]
+        producto.nombre = 'Bloque renombrado'
+        producto.save()
+        self.assertNoModificada(etag, modificada=True)
+
+    def test_cambio_de_ficha_del_cliente(self):
+        cliente = Cliente.objects.create(rut='11111111-1', nombre='Cliente 1')
+        OrdenCompra.objects.filter(pk=self.orden.pk).update(ficha_cliente=cliente)
+        etag = self.etag()
+        Cliente.registrar('11111111-1', 'Cliente 1 Ltda.', 'Av. Siempre Viva 123')
+        self.assertNoModificada(etag, modificada=True)
+
+    def test_version_de_despliegue(self):
+        version_codigo.cache_clear()
+        self.addCleanup(version_codigo.cache_clear)
+        etag = self.etag()
+        with override_settings(VERSION_DESPLIEGUE='v2.0.0'):
+            version_codigo.cache_clear()
+            self.assertEqual(version_codigo(), 'v2.0.0')
+            self.assertNoModificada(etag, modificada=True)
+
+
+class OrdenIdempotenteTests(DatosSembradosMixin, TestCase):
+    """Reenviar el formulario de 'crear_orden' no duplica la orden ni el descuento de stock."""
+
+    def test_reenvio_redirige_a_la_orden_creada(self):
+        formulario = self.client.get(reverse('ventas:crear_orden')).context['orden_form']
+        datos = {
+            'clave_envio': str(formulario.initial['clave_envio']),
+            'fecha': date.today().isoformat(), 'cliente': 'Cliente apurado', 'tipo_proyecto': 'BLOQUERA',
+            'detalles-TOTAL_FORMS': '1', 'detalles-INITIAL_FORMS': '0',
+            'detalles-MIN_NUM_FORMS': '0', 'detalles-MAX_NUM_FORMS': '1000',
+            'detalles-0-producto': str(self.productos[0].pk), 'detalles-0-cantidad': '5',
+            'detalles-0-precio_unitario': '1000',
+        }
+        primera = self.client.post(reverse('ventas:crear_orden'), datos)
+        with medir(guardar_sentencias=True) as medicion:
+            segunda = self.client.post(reverse('ventas:crear_orden'), datos)
+
+        self.assertEqual(segunda.status_code, 302)
+        self.assertEqual(segunda['Location'], primera['Location'])
+        self.assertEqual(OrdenCompra.objects.filter(cliente='Cliente apurado').count(), 1)
+        self.assertEqual(Producto.objects.get(pk=self.productos[0].pk).stock, 100000 - 5)
+        self.assertLessEqual(medicion.consultas, 1, "\n".join(sql for sql, _ in medicion.sentencias))
+
+
+class ClientesTests(DatosSembradosMixin, TestCase):
+    """Ficha de cliente por RUT normalizado: vinculación, autocompletado y filtro por cliente."""
+
+    def test_vincular_clientes_agrupa_por_rut(self):
+        OrdenCompra.objects.filter(pk=self.orden.pk).update(rut='11.111.111-1', cliente='JUAN PÉREZ')
+        call_command('vincular_clientes', lote=4, stdout=io.StringIO())
+        # '11111111-1' es válido; los demás RUT sembrados ('1111111X-X') no
+        cliente = Cliente.objects.get()
+        self.assertEqual(cliente.rut, '111111111')
+        self.assertEqual(set(cliente.ordenes.values_list('rut', flat=True)), {'11111111-1', '11.111.111-1'})
+        self.assertEqual(cliente.nombre, 'JUAN PÉREZ') # El de la última orden registrada
+
+        sugerencias = self.client.get(reverse('ventas:api_buscar_clientes') + '?q=11.111').json()['clientes']
+        self.assertEqual([c['rut'] for c in sugerencias], ['11.111.111-1'])
+        sugerencias = self.client.get(reverse('ventas:api_buscar_clientes') + '?q=juan pe').json()['clientes']
+        self.assertEqual([c['id'] for c in sugerencias], [cliente.pk])
+
+        respuesta = self.client.get(reverse('ventas:lista_ordenes') + f'?cliente={cliente.pk}')
+        self.assertEqual(len(respuesta.context['ordenes']), cliente.ordenes.count())
+
+    def test_crear_orden_valida_rut_y_asigna_cliente(self):
+        datos = {
+            'fecha': date.today().isoformat(), 'cliente': 'Juan Pérez', 'rut': '12345678-9',
+            'tipo_proyecto': 'BLOQUERA',
+            'detalles-TOTAL_FORMS': '1', 'detalles-INITIAL_FORMS': '0',
+            'detalles-MIN_NUM_FORMS': '0', 'detalles-MAX_NUM_FORMS': '1000',
+            'detalles-0-producto': str(self.productos[0].pk), 'detalles-0-cantidad': '1',
+            'detalles-0-precio_unitario': '1000',
+        }
+        respuesta = self.client.post(reverse('ventas:crear_orden'), datos)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertIn('rut', respuesta.context['orden_form'].errors)
+
+        datos['rut'] = '12.345.678-5'
+        self.client.post(reverse('ventas:crear_orden'), datos)
+        orden = OrdenCompra.objects.get(cliente='Juan Pérez')
+        self.assertEqual(orden.ficha_cliente.rut, '123456785')
+
+
+class AnaliticaProductosTests(DatosSembradosMixin, TestCase):
+    """Analítica por producto: una consulta agrupada, margen, ABC y caché por versión de los datos."""
+
+    def setUp(self):
+        super().setUp()
+        # Ingresos: producto 0 = 15 × 18000 (90%), productos 1 y 2 = 15 × 1000 (5% cada uno)
+        DetalleOrden.objects.filter(producto=self.productos[0]).update(precio_unitario=Decimal('18000'))
+        self.hasta = date.today()
+        self.desde = self.hasta - timedelta(days=365)
+
+    def test_margen_y_clasificacion_abc(self):
+        with medir() as medicion:
+            datos = calcular_analitica(self.desde, self.hasta)
+        self.assertEqual(medicion.consultas, 1)
+
+        productos = {p['nombre']: p for p in datos['productos']}
+        principal, segundo, tercero = datos['productos']
+        self.assertEqual(principal['nombre'], 'Bloque 0')
+        self.assertEqual(principal['ingresos'], Decimal('270000'))
+        self.assertEqual(principal['unidades'], self.ORDENES)
+        self.assertEqual(productos['Bloque 1']['margen'], Decimal('65'))    # (1000 - 350) / 1000
+        self.assertEqual(principal['participacion'], Decimal('90'))
+        self.assertEqual([principal['abc'], segundo['abc'], tercero['abc']], ['A', 'B', 'C'])
+        self.assertEqual(datos['totales']['utilidad'], Decimal('300000') - Decimal('350') * self.ORDENES * 3)
+        self.assertEqual(sum(principal['por_mes']['ingresos']), principal['ingresos'])
+
+    def test_cache_por_version_de_los_datos(self):
+        primero = analitica_productos(self.desde, self.hasta)
+        with medir() as medicion:
+            self.assertEqual(analitica_productos(self.desde, self.hasta), primero)
+        self.assertEqual(medicion.consultas, 2) # Solo la versión de los datos
+
+        # Cambiar una orden cambia la versión: se recalcula sin esperar a que expire
+        OrdenCompra.objects.filter(pk=self.orden.pk).update(cliente='Otro')
+        DetalleOrden.objects.filter(orden=self.orden, producto=self.productos[1]).update(cantidad=11)
+        recalculado = analitica_productos(self.desde, self.hasta)
+        unidades = {p['nombre']: p['unidades'] for p in recalculado['productos']}
+        self.assertEqual(unidades['Bloque 1'], self.ORDENES + 10)
+
+    def test_exportar_csv(self):
+        respuesta = self.client.get(reverse('ventas:analitica_productos') + '?formato=csv')
+        self.assertEqual(respuesta['Content-Type'], 'text/csv; charset=utf-8')
+        lineas = respuesta.content.decode('utf-8-sig').splitlines()
+        self.assertTrue(lineas[0].startswith('Producto,Clase ABC,Mes,Unidades'))
+        datos = calcular_analitica(self.desde, self.hasta) # Cubre todas las órdenes sembradas, como el período por defecto
+        vendidos = sum(1 for p in datos['productos'] for unidades in p['por_mes']['unidades'] if unidades)
+        self.assertEqual(len(lineas) - 1, vendidos)
+
+
+class DevolucionesTests(DatosSembradosMixin, TestCase):
+    """Devoluciones y anulaciones: stock repuesto en bloque, totales y pago ajustados, historial."""
+
+    def setUp(self):
+        super().setUp()
+        self.orden.registrar_pago(Decimal('2500')) # Total 3000: 3 líneas de 1 × 1000 (costo 350)
+        self.detalles = list(self.orden.detalles.order_by('pk'))
+
+    def stock(self):
+        return dict(Producto.objects.values_list('pk', 'stock'))
+
+    def test_devolucion_parcial(self):
+        antes, version = self.stock(), self.orden.version
+        with medir() as medicion:
+            devolucion = devoluciones.devolver(self.orden.pk, {self.detalles[0].pk: 1}, self.usuario, 'Dañado')
+        consultas_una_linea = medicion.consultas
+
+        orden = OrdenCompra.objects.get(pk=self.orden.pk)
+        self.assertEqual((orden.total, orden.total_costo, orden.total_utilidad), (2000, 700, 1300))
+        # Se había pagado 2500: el exceso sobre el nuevo total se reembolsa
+        self.assertEqual((orden.monto_pagado, orden.estado_pago, devolucion.reembolso), (2000, 'PAGADA', 500))
+        self.assertGreater(orden.version, version)
+        self.assertFalse(orden.anulada)
+        self.assertEqual(self.stock()[self.detalles[0].producto_id], antes[self.detalles[0].producto_id] + 1)
+        self.assertEqual(DetalleOrden.objects.get(pk=self.detalles[0].pk).cantidad, 0)
+        self.assertEqual([str(linea) for linea in devolucion.lineas.all()], ['1 x Bloque 0'])
+
+        # Anular (las 2 líneas restantes) cuesta las mismas consultas que devolver una
+        with medir() as medicion:
+            anulacion = devoluciones.anular(self.orden.pk, self.usuario)
+        self.assertEqual(medicion.consultas, consultas_una_linea)
+        orden.refresh_from_db()
+        self.assertTrue(orden.anulada)
+        self.assertEqual((orden.total, orden.monto_pagado, anulacion.reembolso), (0, 0, 2000))
+        self.assertEqual(self.stock(), {pk: stock + (1 if pk in {d.producto_id for d in self.detalles} else 0)
+                                        for pk, stock in antes.items()})
+        self.assertEqual(orden.devoluciones.count(), 2)
+        with self.assertRaises(ValidationError):
+            devoluciones.anular(self.orden.pk)
+
+    def test_cantidad_mayor_a_la_vendida_no_cambia_nada(self):
+        antes = self.stock()
+        with self.assertRaises(ValidationError):
+            devoluciones.devolver(self.orden.pk, {self.detalles[0].pk: 1, self.detalles[1].pk: 2})
+        self.assertEqual(self.stock(), antes)
+        self.assertEqual(OrdenCompra.objects.get(pk=self.orden.pk).total, 3000)
+        self.assertFalse(Devolucion.objects.exists())
+
+    def test_vista_anular(self):
+        url = reverse('ventas:devolver_orden', args=[self.orden.pk])
+        respuesta = self.client.post(url, {'accion': 'anular', 'motivo': 'Cliente desistió'})
+        self.assertRedirects(respuesta, reverse('ventas:detalle_orden', args=[self.orden.pk]))
+        devolucion = Devolucion.objects.get()
+        self.assertEqual((devolucion.tipo, devolucion.usuario, devolucion.motivo),
+                         (Devolucion.Tipo.ANULACION, self.usuario, 'Cliente desistió'))
+        # Una orden anulada ya no admite pagos
+        respuesta = self.client.get(reverse('ventas:registrar_pago_orden', args=[self.orden.pk]))
+        self.assertRedirects(respuesta, reverse('ventas:detalle_orden', args=[self.orden.pk]))
@@ -20,4 +20,10 @@ urlpatterns = [
     # Ej. /ventas/detalle/5/docx/
     path('detalle/<int:orden_id>/docx/', views.descargar_orden_docx, name='descargar_orden_docx'),
     path('detalle/<int:orden_id>/pagar/', views.registrar_pago_orden, name='registrar_pago_orden'),
+    # Ej. /ventas/detalle/5/devolver/ (devolución parcial o anulación)
+    path('detalle/<int:orden_id>/devolver/', views.devolver_orden, name='devolver_orden'),
+    # Ej. /ventas/api/clientes/?q=12345 (autocompletado del formulario de órdenes)
+    path('api/clientes/', views.buscar_clientes, name='api_buscar_clientes'),
+    # Ej. /ventas/analitica/?top=20&orden=utilidad (o ?formato=csv)
+    path('analitica/', views.analitica_productos, name='analitica_productos'),
 ]
\ No newline at end of file
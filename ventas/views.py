@@ -6,41 +6,36 @@ Incluye:
 - CRUD para Órdenes de Compra (Crear, Listar, Ver Detalle).
 - Validación de stock y actualización atómica durante la creación.
 - Generación de documentos (PDF y DOCX) para las órdenes.
+- Devoluciones parciales y anulación de órdenes.
+- Analítica de ventas y margen por producto.
 """
 
+import uuid
+from datetime import date
+
 # --- Importaciones de Django ---
+from django.conf import settings
 from django.shortcuts import render, get_object_or_404, redirect, reverse
 from django.http import HttpResponse, JsonResponse
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.db import transaction # Para asegurar la integridad de la BD
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, OperationalError, connection, transaction # Para asegurar la integridad de la BD
 from django.template.loader import render_to_string
-from django.contrib.humanize.templatetags.humanize import intcomma
 from django.contrib.staticfiles import finders # Para encontrar el logo
-import os
 
 # --- Importaciones de Modelos y Forms ---
-from .models import OrdenCompra, DetalleOrden
+from .models import Cliente, OrdenCompra, DetalleOrden, texto_busqueda
+from . import analitica, devoluciones
 from inventario.models import Producto
 from .forms import *
+from core import metricas
+from core.condicional import condicional_por_version
+from core.tareas import encolar
+from core.rut import formatear_rut, normalizar_rut
 
-# --- Importaciones de Librerías (PDF, DOCX, etc.) ---
-from io import BytesIO # Buffer en memoria para archivos
-
-# --- IMPORTACIONES PARA PDF (ReportLab) ---
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter, landscape
-from reportlab.lib.units import mm # Para usar milímetros
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.platypus import Paragraph, Spacer, Table, TableStyle, Image, Frame, BaseDocTemplate, PageTemplate
-from reportlab.platypus.flowables import HRFlowable # Línea horizontal
-from reportlab.lib import colors
-from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT
-
-# --- IMPORTACIONES PARA DOCX (python-docx) ---
-from docx import Document
-from docx.shared import Inches, Pt
-from docx.enum.text import WD_ALIGN_PARAGRAPH
+# La generación de PDF/DOCX (ReportLab, python-docx) vive en 'ventas/documentos.py'
+# y se importa dentro de las vistas de descarga: así no se carga al iniciar.
 
 # --- Vistas de Órdenes de Compra ---
 
@@ -53,11 +48,73 @@ def lista_ordenes(request):
     # .prefetch_related() optimiza la consulta al traer los detalles
     # y productos relacionados en una sola consulta adicional.
     ordenes = OrdenCompra.objects.prefetch_related('detalles__producto').all().order_by('-fecha')
-    return render(request, 'ventas/lista_ordenes.html', {'ordenes': ordenes})
+    # '?cliente=<id>': solo las órdenes de ese cliente (índice de la FK 'ficha_cliente')
+    cliente = None
+    if request.GET.get('cliente', '').isdigit():
+        cliente = get_object_or_404(Cliente, pk=request.GET['cliente'])
+        ordenes = ordenes.filter(ficha_cliente=cliente)
+    return render(request, 'ventas/lista_ordenes.html', {'ordenes': ordenes, 'cliente': cliente})
+
+
+# Sugerencias que devuelve el autocompletado de clientes
+MAX_SUGERENCIAS_CLIENTES = 10
+
+
+@login_required
+def buscar_clientes(request):
+    """
+    API de autocompletado para 'crear_orden': clientes cuyo RUT (si 'q' es
+    numérico) o nombre comienza con 'q'.
+
+    Ambas columnas están indexadas y el nombre se compara normalizado (sin
+    tildes ni mayúsculas). En PostgreSQL el prefijo es un LIKE 'q%' (Django
+    crea el índice '_like' para él); en SQLite, donde ese LIKE no usa
+    índices, es el rango equivalente (>= 'q' y < 'q~').
+
+    Returns:
+        JsonResponse: {'clientes': [{'id', 'rut', 'nombre', 'direccion'}, ...]}
+    """
+    consulta = request.GET.get('q', '').strip()
+    rut = normalizar_rut(consulta)
+    if rut[:1].isdigit():
+        campo, prefijo = 'rut', rut
+    else:
+        campo, prefijo = 'nombre_busqueda', texto_busqueda(consulta)
+    if len(prefijo) < 2:
+        return JsonResponse({'clientes': []})
+    if connection.vendor == 'sqlite':
+        filtro = {f'{campo}__gte': prefijo, f'{campo}__lt': prefijo + '~'} # '~' va después de dígitos y letras
+    else:
+        filtro = {f'{campo}__startswith': prefijo}
+    clientes = (
+        Cliente.objects.filter(**filtro)
+        .order_by(campo).values('id', 'rut', 'nombre', 'direccion')[:MAX_SUGERENCIAS_CLIENTES]
+    )
+    return JsonResponse({'clientes': [
+        dict(cliente, rut=formatear_rut(cliente['rut'])) for cliente in clientes
+    ]})
+
+
+def _clave_envio(datos):
+    """El token 'clave_envio' del POST como UUID (None si falta o no es válido)."""
+    try:
+        return uuid.UUID(datos.get('clave_envio', ''))
+    except ValueError:
+        return None
+
+
+def _orden_ya_creada(request, clave):
+    """Redirección a la orden creada con el token 'clave', o None si no existe."""
+    if clave is None:
+        return None
+    orden = OrdenCompra.objects.filter(clave_envio=clave).values_list('pk', 'numero_venta').first()
+    if orden is None:
+        return None
+    messages.info(request, f"La orden {orden[1]} ya había sido creada con este formulario; no se duplicó.")
+    return redirect('ventas:detalle_orden', orden_id=orden[0])
 
 
 @login_required
-@transaction.atomic # Decorador clave: Si algo falla, revierte todos los cambios en la BD.
 def crear_orden(request):
     """
     Maneja la creación de una nueva Orden de Compra (GET y POST).
@@ -68,98 +125,133 @@ def crear_orden(request):
     3. Si el stock es válido, calcula el total.
     4. Guarda la orden y sus detalles.
     5. Disminuye el stock de los productos vendidos.
-    Todo esto ocurre dentro de una transacción atómica.
+    Todo esto ocurre dentro de una transacción atómica (solo en POST: el GET
+    no toma el permiso de escritura de SQLite).
+
+    El formulario lleva un token ('clave_envio'). Si el mismo formulario se
+    envía de nuevo (doble clic, reintento tras una respuesta lenta), la orden
+    ya creada se encuentra con una consulta por índice y se redirige a ella
+    sin validar ni repetir la transacción (ni descontar stock dos veces).
     """
     if request.method == 'POST':
+        clave = _clave_envio(request.POST)
+        ya_creada = _orden_ya_creada(request, clave)
+        if ya_creada:
+            return ya_creada
+
         orden_form = OrdenCompraForm(request.POST)
         # El prefix='detalles' debe coincidir con el usado en el template
         detalle_formset = DetalleOrdenFormSet(request.POST, prefix='detalles')
 
         if orden_form.is_valid() and detalle_formset.is_valid():
             try:
-                # 1. Preparar datos (sin guardar en BD aún)
-                orden = orden_form.save(commit=False)
-                detalles_instancias = detalle_formset.save(commit=False)
+                # Si algo falla, la transacción revierte todos los cambios en la BD.
+                with transaction.atomic():
+                    # Otra petición con el mismo token pudo terminar mientras esta
+                    # validaba; en SQLite, con BEGIN IMMEDIATE, aquí ya no hay carrera.
+                    ya_creada = _orden_ya_creada(request, clave)
+                    if ya_creada:
+                        return ya_creada
+
+                    # 1. Preparar datos (sin guardar en BD aún)
+                    orden = orden_form.save(commit=False)
+                    orden.clave_envio = clave
+                    detalles_instancias = detalle_formset.save(commit=False)
                 
-                # --- CAMBIOS AQUÍ ---
-                total_orden = 0
-                total_costo_orden = 0 # <- Añadir
-                total_utilidad_orden = 0 # <- Añadir
-                # --- FIN DE CAMBIOS ---
+                    # --- CAMBIOS AQUÍ ---
+                    total_orden = 0
+                    total_costo_orden = 0 # <- Añadir
+                    total_utilidad_orden = 0 # <- Añadir
+                    # --- FIN DE CAMBIOS ---
                 
-                productos_a_actualizar = [] 
-                detalles_a_guardar = [] 
-                valid_details_count = 0
-
-                # 2. Validar stock y calcular total
-                for form in detalle_formset:
-                    # Ignorar formularios vacíos o marcados para borrar
-                    if form.cleaned_data and not form.cleaned_data.get('DELETE', False):
-                        producto = form.cleaned_data.get('producto')
-                        cantidad = form.cleaned_data.get('cantidad')
-                        precio = form.cleaned_data.get('precio_unitario')
-
-                        # Asegurarse que la línea tiene todos los datos
-                        if producto and cantidad and cantidad > 0 and precio is not None:
-                            valid_details_count += 1
-                            detalle = form.instance
+                    productos_a_actualizar = [] 
+                    detalles_a_guardar = [] 
+                    valid_details_count = 0
+
+                    # 2. Validar stock y calcular total
+                    for form in detalle_formset:
+                        # Ignorar formularios vacíos o marcados para borrar
+                        if form.cleaned_data and not form.cleaned_data.get('DELETE', False):
+                            producto = form.cleaned_data.get('producto')
+                            cantidad = form.cleaned_data.get('cantidad')
+                            precio = form.cleaned_data.get('precio_unitario')
+
+                            # Asegurarse que la línea tiene todos los datos
+                            if producto and cantidad and cantidad > 0 and precio is not None:
+                                valid_details_count += 1
+                                detalle = form.instance
                             
-                            # ¡CRÍTICO! Bloquear la fila del producto para evitar
-                            # que dos ventas del mismo producto ocurran a la vez (race condition).
-                            producto_db = Producto.objects.select_for_update().get(pk=producto.pk)
+                                # ¡CRÍTICO! Bloquear la fila del producto para evitar
+                                # que dos ventas del mismo producto ocurran a la vez (race condition).
+                                # (SQLite ignora FOR UPDATE: ahí lo garantiza el BEGIN IMMEDIATE.)
+                                producto_db = Producto.objects.select_for_update().get(pk=producto.pk)
                             
-                            # Validar stock
-                            if producto_db.stock < cantidad:
-                                # Si falla, se lanza una excepción que será capturada
-                                # y la transacción se revertirá.
-                                raise Exception(f"No hay suficiente stock para: {producto.nombre} (disponible: {producto_db.stock})")
-
-                            # --- CAMBIOS AQUÍ: CALCULAR COSTO Y UTILIDAD ---
-                            costo_unitario = producto_db.precio_costo # Obtener costo
+                                # Validar stock
+                                if producto_db.stock < cantidad:
+                                    metricas.ORDENES_SIN_STOCK.inc()
+                                    # Si falla, se lanza una excepción que será capturada
+                                    # y la transacción se revertirá.
+                                    raise Exception(f"No hay suficiente stock para: {producto.nombre} (disponible: {producto_db.stock})")
+
+                                # --- CAMBIOS AQUÍ: CALCULAR COSTO Y UTILIDAD ---
+                                costo_unitario = producto_db.precio_costo # Obtener costo
                             
-                            total_linea = cantidad * precio
-                            costo_total_linea = cantidad * costo_unitario # Calcular costo de línea
-                            utilidad_linea = total_linea - costo_total_linea # Calcular utilidad de línea
+                                total_linea = cantidad * precio
+                                costo_total_linea = cantidad * costo_unitario # Calcular costo de línea
+                                utilidad_linea = total_linea - costo_total_linea # Calcular utilidad de línea
 
-                            total_orden += total_linea
-                            total_costo_orden += costo_total_linea # <- Añadir
-                            total_utilidad_orden += utilidad_linea # <- Añadir
+                                total_orden += total_linea
+                                total_costo_orden += costo_total_linea # <- Añadir
+                                total_utilidad_orden += utilidad_linea # <- Añadir
                             
-                            detalle.costo_unitario_en_venta = costo_unitario # <- Añadir (Guardar el costo)
-                            # --- FIN DE CAMBIOS ---
+                                detalle.costo_unitario_en_venta = costo_unitario # <- Añadir (Guardar el costo)
+                                # --- FIN DE CAMBIOS ---
 
-                            detalles_a_guardar.append(detalle)
-                            productos_a_actualizar.append({'producto': producto_db, 'cantidad': cantidad})
+                                detalles_a_guardar.append(detalle)
+                                productos_a_actualizar.append({'producto': producto_db, 'cantidad': cantidad})
 
-                # Validar que al menos se añadió un producto
-                if valid_details_count == 0:
-                    raise Exception("Debes añadir al menos un producto válido a la orden.")
+                    # Validar que al menos se añadió un producto
+                    if valid_details_count == 0:
+                        raise Exception("Debes añadir al menos un producto válido a la orden.")
 
-                # --- CAMBIOS AQUÍ: GUARDAR NUEVOS TOTALES ---
-                orden.total = total_orden
-                orden.total_costo = total_costo_orden # <- Añadir
-                orden.total_utilidad = total_utilidad_orden # <- Añadir
-                # --- FIN DE CAMBIOS ---
+                    # --- CAMBIOS AQUÍ: GUARDAR NUEVOS TOTALES ---
+                    orden.total = total_orden
+                    orden.total_costo = total_costo_orden # <- Añadir
+                    orden.total_utilidad = total_utilidad_orden # <- Añadir
+                    # --- FIN DE CAMBIOS ---
                 
-                orden.save()
-
-                # 4. Guardar detalles y actualizar stock
-                for detalle in detalles_a_guardar:
-                    detalle.orden = orden # Asignar la orden ya guardada
-                    detalle.save()
-
-                for item in productos_a_actualizar:
-                    # Usar el método del modelo para disminuir stock
-                    item['producto'].disminuir_stock(item['cantidad'])
-
-                detalle_formset.save_m2m() # Guardar relaciones (aunque aquí no hay m2m)
-
-                messages.success(request, f"Orden {orden.numero_venta} creada exitosamente.")
-                return redirect('ventas:detalle_orden', orden_id=orden.pk)
-
+                    if orden.rut: # Ya validado por el formulario
+                        orden.ficha_cliente = Cliente.registrar(orden.rut, orden.cliente, orden.direccion)
+                    orden.save()
+
+                    # 4. Guardar detalles y actualizar stock
+                    for detalle in detalles_a_guardar:
+                        detalle.orden = orden # Asignar la orden ya guardada
+                        detalle.save()
+
+                    for item in productos_a_actualizar:
+                        # Usar el método del modelo para disminuir stock
+                        item['producto'].disminuir_stock(item['cantidad'])
+
+                    detalle_formset.save_m2m() # Guardar relaciones (aunque aquí no hay m2m)
+                    # Se cuenta solo si la transacción se confirma
+                    transaction.on_commit(
+                        lambda tipo=orden.tipo_proyecto: metricas.ORDENES_CREADAS.inc(tipo_proyecto=tipo)
+                    )
+
+                    messages.success(request, f"Orden {orden.numero_venta} creada exitosamente.")
+                    return redirect('ventas:detalle_orden', orden_id=orden.pk)
+
+            except IntegrityError as e:
+                # PostgreSQL: la petición gemela confirmó la orden con el mismo token
+                # durante esta transacción (índice único de 'clave_envio').
+                ya_creada = _orden_ya_creada(request, clave)
+                if ya_creada:
+                    return ya_creada
+                messages.error(request, f"Error al crear la orden: {e}")
             except Exception as e:
                 # Si algo falló (ej. stock), se muestra el error
-                # y @transaction.atomic revierte la creación de la orden.
+                # y transaction.atomic ya revirtió la creación de la orden.
                 messages.error(request, f"Error al crear la orden: {e}")
 
     else: # Método GET
@@ -174,7 +266,14 @@ def crear_orden(request):
     return render(request, 'ventas/crear_orden.html', context)
 
 
+# Relaciones cuyos datos muestran el detalle y los documentos de una orden:
+# su versión forma parte del ETag (un cambio de nombre de producto o de la
+# ficha del cliente invalida la respuesta guardada)
+ORDEN_RELACIONADAS = ('ficha_cliente', 'detalles__producto')
+
+
 @login_required
+@condicional_por_version(OrdenCompra, 'orden_id', pagina=True, relacionadas=ORDEN_RELACIONADAS)
 def detalle_orden(request, orden_id):
     """
     Muestra la vista de detalle (ticket) de una orden de compra específica.
@@ -186,270 +285,60 @@ def detalle_orden(request, orden_id):
 # --- Vistas de Descarga de Documentos ---
 
 @login_required
+@condicional_por_version(OrdenCompra, 'orden_id', relacionadas=ORDEN_RELACIONADAS) # Un 304 no genera el documento ni cuenta en las métricas
+@metricas.medir_documento('pdf')
 def descargar_orden_pdf(request, orden_id):
     """
     Genera y sirve un archivo PDF de la orden de compra usando ReportLab.
     El formato está diseñado para simular un ticket de 80mm.
     """
+    from .documentos import nombre_archivo, orden_pdf # Carga ReportLab solo al usarse
+
     orden = get_object_or_404(OrdenCompra.objects.prefetch_related('detalles__producto'), pk=orden_id)
 
-    # 1. Configurar el buffer en memoria
-    buffer = BytesIO()
-
-    # 2. Configuración del Documento (Ticket 80mm)
-    ticket_width = 80 * mm
-    ticket_height = 200 * mm # Altura estimada, puede crecer
-    pagesize = (ticket_width, ticket_height)
-    margin = 5 * mm
-    effective_width = ticket_width - 2 * margin # Ancho útil
-
-    doc = BaseDocTemplate(buffer, pagesize=pagesize,
-                          leftMargin=margin, rightMargin=margin,
-                          topMargin=margin, bottomMargin=margin)
-
-    # 3. Definición de Estilos de Párrafo
-    styles = getSampleStyleSheet()
-    style_base = ParagraphStyle(name='Base', parent=styles['Normal'], fontSize=8, leading=10)
-    style_normal = ParagraphStyle(name='Normal', parent=style_base, alignment=TA_LEFT)
-    style_bold = ParagraphStyle(name='Bold', parent=style_base, fontName='Helvetica-Bold')
-    style_header_info = ParagraphStyle(name='HeaderInfo', parent=style_base, fontSize=7, leading=8.5, alignment=TA_LEFT)
-    style_header_name = ParagraphStyle(name='HeaderName', parent=style_header_info, fontName='Helvetica-Bold')
-    style_order_title = ParagraphStyle(name='OrderTitle', parent=style_bold, fontSize=9, leading=11, alignment=TA_LEFT)
-    style_center = ParagraphStyle(name='Center', parent=style_base, alignment=TA_CENTER)
-    style_right_bold = ParagraphStyle(name='RightBold', parent=style_bold, alignment=TA_RIGHT)
-    style_total_label = ParagraphStyle(name='TotalLabel', parent=style_right_bold, fontSize=10, leading = 12)
-    style_gracias = ParagraphStyle(name='Gracias', parent=style_center, fontSize=8, leading=10)
-    style_table_header = ParagraphStyle(name='TableHeader', parent=style_bold, fontSize=7, alignment=TA_CENTER)
-    style_table_cell = ParagraphStyle(name='TableCell', parent=style_base, fontSize=7)
-    style_table_cell_right = ParagraphStyle(name='TableCellRight', parent=style_table_cell, alignment=TA_RIGHT)
-    style_table_product = ParagraphStyle(name='TableProduct', parent=style_table_cell, alignment=TA_LEFT)
-
-    # 4. Contenido del PDF (El "Story" de ReportLab)
-    story = []
-
-    # --- Encabezado con Logo ---
     logo_path_relative = 'app/img/logo.png' # Ruta en /core/static/
     logo_path_absolute = finders.find(logo_path_relative)
-
-    if logo_path_absolute and os.path.exists(logo_path_absolute):
-        img = Image(logo_path_absolute, height=15*mm, width=15*mm) # Ajustar tamaño
-        img.hAlign = 'LEFT'
-        
-        # Usar una tabla para alinear logo e info de la empresa
-        header_data = [
-            [img, Paragraph("<b>CONSTRUCCIONES V & G<br/>LIZ CASTILLO GARCIA SPA</b><br/>"
-                           "RUT: 77.858.577-4<br/>"
-                           "Dirección: Vilaco 301, Toconao<br/>"
-                           "Teléfono: +56 9 52341652", style_header_info)]
-        ]
-        header_table = Table(header_data, colWidths=[20*mm, effective_width - 20*mm])
-        header_table.setStyle(TableStyle([
-            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-            ('LEFTPADDING', (0,0), (-1,-1), 0),
-            ('BOTTOMPADDING', (0,0), (-1,-1), 1*mm),
-        ]))
-        story.append(header_table)
-    else:
-        # Fallback si no se encuentra el logo
-        story.append(Paragraph("CONSTRUCCIONES V & G LIZ CASTILLO GARCIA SPA", style_center))
-        if not logo_path_absolute:
-            messages.warning(request, f"No se encontró el archivo del logo en: {logo_path_relative}")
-
-    story.append(Spacer(1, 1 * mm))
-    story.append(HRFlowable(width="100%", thickness=0.5, color=colors.black, spaceBefore=1*mm, spaceAfter=1*mm))
-
-    # --- Info de la Orden ---
-    story.append(Paragraph(f"Orden de Compra #{orden.numero_venta or orden.id}", style_order_title))
-    story.append(Paragraph(f"Cliente: {orden.cliente}", style_normal))
-    if orden.rut:
-        story.append(Paragraph(f"RUT: {orden.rut}", style_normal))
-    story.append(Paragraph(f"Fecha: {orden.fecha.strftime('%d-%m-%Y %H:%M')}", style_normal))
-    if orden.direccion:
-        story.append(Paragraph(f"Dirección: {orden.direccion}", style_normal))
-    story.append(Spacer(1, 3 * mm))
-    story.append(Paragraph("Detalle", style_bold))
-    story.append(Spacer(1, 1 * mm))
-
-    # --- Tabla de Productos ---
-    headers = [
-        Paragraph('Producto', style_table_header),
-        Paragraph('Cant', style_table_header),
-        Paragraph('P. Unitario', style_table_header),
-        Paragraph('Total', style_table_header)
-    ]
-    data = [headers]
-    detalles = orden.detalles.all()
-
-    # Estilos de la tabla
-    table_style_commands = [
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.black), # Borde
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ('ALIGN', (0, 0), (0, -1), 'LEFT'),    # Col 0 (Producto)
-        ('ALIGN', (1, 0), (1, -1), 'CENTER'),  # Col 1 (Cant)
-        ('ALIGN', (2, 0), (-1, -1), 'RIGHT'),  # Col 2 y 3 (Precios)
-        ('LEFTPADDING', (0, 0), (-1, -1), 1.5*mm),
-        ('RIGHTPADDING', (0, 0), (-1, -1), 1.5*mm),
-    ]
-
-    for detalle in detalles:
-        data.append([
-            Paragraph(detalle.producto.nombre, style_table_product),
-            Paragraph(str(detalle.cantidad), style_table_cell),
-            Paragraph(f"${intcomma(int(detalle.precio_unitario))}", style_table_cell_right),
-            Paragraph(f"${intcomma(int(detalle.total_linea))}", style_table_cell_right)
-        ])
-
-    col_widths = [effective_width * 0.40, effective_width * 0.15, effective_width * 0.22, effective_width * 0.23]
-    tabla = Table(data, colWidths=col_widths)
-    tabla.setStyle(TableStyle(table_style_commands))
-    story.append(tabla)
-    story.append(Spacer(1, 3 * mm))
-
-    # --- Total ---
-    total_str = f"${intcomma(int(orden.total))}"
-    total_data = [[Paragraph('Total a Pagar:', style_total_label), Paragraph(total_str, style_total_label)]]
-    total_table = Table(total_data, colWidths=[effective_width * 0.6, effective_width * 0.4])
-    total_table.setStyle(TableStyle([('ALIGN', (0, 0), (-1, -1), 'RIGHT')])) # Alinear todo a la derecha
-    story.append(total_table)
-    story.append(HRFlowable(width="100%", thickness=0.5, color=colors.black, spaceBefore=1*mm, spaceAfter=1*mm))
-
-    # --- Mensaje final ---
-    story.append(Paragraph("¡Gracias por su compra!", style_gracias))
-    story.append(Paragraph("Esperamos atenderle pronto.", style_gracias))
-
-    # 5. Construir el PDF
-    frame = Frame(doc.leftMargin, doc.bottomMargin, doc.width, doc.height, id='normal')
-    template = PageTemplate(id='main', frames=[frame])
-    doc.addPageTemplates([template])
+    if not logo_path_absolute:
+        messages.warning(request, f"No se encontró el archivo del logo en: {logo_path_relative}")
 
     try:
-        doc.build(story)
+        contenido = orden_pdf(orden, logo_path_absolute)
     except Exception as e:
         print(f"Error al construir PDF con ReportLab: {e}")
         messages.error(request, f"Error al generar PDF: {e}")
         return redirect('ventas:detalle_orden', orden_id=orden.pk)
 
-    # 6. Crear y devolver la Respuesta HTTP
-    buffer.seek(0)
-    response = HttpResponse(buffer, content_type='application/pdf')
-    response['Content-Disposition'] = f'attachment; filename="orden_{orden.numero_venta or orden.id}.pdf"'
+    response = HttpResponse(contenido, content_type='application/pdf')
+    response['Content-Disposition'] = f'attachment; filename="{nombre_archivo(orden, "pdf")}"'
     return response
 
 
 @login_required
+@condicional_por_version(OrdenCompra, 'orden_id', relacionadas=ORDEN_RELACIONADAS)
+@metricas.medir_documento('docx')
 def descargar_orden_docx(request, orden_id):
     """
     Genera y sirve un archivo DOCX (Word) de la orden de compra
     usando la librería python-docx.
     """
+    from .documentos import nombre_archivo, orden_docx # Carga python-docx solo al usarse
+
     orden = get_object_or_404(OrdenCompra.objects.prefetch_related('detalles__producto'), pk=orden_id)
     try:
-        # 1. Crear documento y configurar márgenes
-        document = Document()
-        sections = document.sections
-        for section in sections:
-            section.top_margin = Inches(0.4)
-            section.bottom_margin = Inches(0.4)
-            section.left_margin = Inches(0.5)
-            section.right_margin = Inches(0.5)
-
-        # 2. Añadir contenido
-        # --- Info Empresa ---
-        p_empresa = document.add_paragraph()
-        p_empresa.alignment = WD_ALIGN_PARAGRAPH.RIGHT
-        runner = p_empresa.add_run(
-            "CONSTRUCCIONES V & G LIZ CASTILLO GARCIA SPA\n"
-            "RUT: 77.858.577-4\n"
-            "Dirección: Vilaco 301, Toconao\n"
-            "Teléfono: +56 9 52341652"
-        )
-        runner.font.size = Pt(8)
-        runner.bold = True
-        p_empresa.paragraph_format.space_after = Pt(0)
-
-        document.add_paragraph("---" * 12).alignment = WD_ALIGN_PARAGRAPH.CENTER
-
-        # --- Info Orden ---
-        p_orden_info = document.add_paragraph()
-        p_orden_info.add_run(f"Orden de Compra #{orden.numero_venta or orden.id}\n").bold = True
-        p_orden_info.add_run(f"Cliente: {orden.cliente}\n")
-        p_orden_info.add_run(f"Rut: {orden.rut or 'N/A'}\n")
-        p_orden_info.add_run(f"Fecha: {orden.fecha.strftime('%d-%m-%Y %H:%M')}\n")
-        p_orden_info.add_run(f"Dirección: {orden.direccion or 'N/A'}")
-        for run in p_orden_info.runs:
-            run.font.size = Pt(9)
-        p_orden_info.paragraph_format.space_after = Pt(6)
-
-        document.add_paragraph("---" * 12).alignment = WD_ALIGN_PARAGRAPH.CENTER
-
-        # --- Tabla de Productos ---
-        document.add_paragraph().add_run("Detalle").bold = True
-        
-        table = document.add_table(rows=1, cols=4)
-        table.style = 'Table Grid' # Estilo con bordes
-        table.autofit = False
-
-        # Encabezados
-        hdr_cells = table.rows[0].cells
-        hdr_cells[0].text = 'Producto'
-        hdr_cells[1].text = 'Cant'
-        hdr_cells[2].text = 'P. Unit.'
-        hdr_cells[3].text = 'Total'
-
-        # Datos
-        for detalle in orden.detalles.all():
-            row_cells = table.add_row().cells
-            # Formatear números con separador de miles (usando intcomma)
-            precio_unit_str = f"${intcomma(int(detalle.precio_unitario))}"
-            total_linea_str = f"${intcomma(int(detalle.total_linea))}"
-
-            row_cells[0].text = detalle.producto.nombre
-            row_cells[1].text = str(detalle.cantidad)
-            row_cells[2].text = precio_unit_str
-            row_cells[3].text = total_linea_str
-            
-            # Alinear celdas numéricas
-            for i, cell in enumerate(row_cells):
-                cell.paragraphs[0].runs[0].font.size = Pt(9)
-                if i > 0:
-                    cell.paragraphs[0].alignment = WD_ALIGN_PARAGRAPH.CENTER
-
-        # Definir ancho de columnas
-        table.columns[0].width = Inches(2.8)
-        table.columns[1].width = Inches(0.5)
-        table.columns[2].width = Inches(0.9)
-        table.columns[3].width = Inches(1.0)
-
-        # --- Total ---
-        p_total = document.add_paragraph()
-        p_total.alignment = WD_ALIGN_PARAGRAPH.RIGHT
-        total_str = f"${intcomma(int(orden.total))}"
-        runner_total = p_total.add_run(f"Total a Pagar: {total_str}")
-        runner_total.bold = True
-        runner_total.font.size = Pt(11)
-
-        # 3. Guardar en buffer de memoria
-        f = BytesIO()
-        document.save(f)
-        f.seek(0)
-
-        # 4. Crear y devolver la Respuesta HTTP
-        response = HttpResponse(
-            f.getvalue(),
-            content_type='application/vnd.openxmlformats-officedocument.wordprocessingml.document'
-        )
-        response['Content-Disposition'] = f'attachment; filename="orden_{orden.numero_venta or orden.id}.docx"'
-        f.close()
-        return response
-
+        contenido = orden_docx(orden)
     except Exception as e:
         print(f"Error al generar DOCX: {e}")
         messages.error(request, f"Error al generar DOCX: {e}.")
         return redirect('ventas:detalle_orden', orden_id=orden.pk)
-    
-    
-    
-    
+
+    response = HttpResponse(
+        contenido,
+        content_type='application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+    )
+    response['Content-Disposition'] = f'attachment; filename="{nombre_archivo(orden, "docx")}"'
+    return response
+
+
     # --- VISTA AÑADIDA ---
 @login_required
 def registrar_pago_orden(request, orden_id):
@@ -458,6 +347,9 @@ def registrar_pago_orden(request, orden_id):
     para una Orden de Compra específica.
     """
     orden = get_object_or_404(OrdenCompra, pk=orden_id)
+    if orden.anulada:
+        messages.error(request, f"La orden {orden.numero_venta} está anulada: no admite pagos.")
+        return redirect('ventas:detalle_orden', orden_id=orden.pk)
     
     if request.method == 'POST':
         # Pasamos la instancia de la orden al formulario para la validación
@@ -467,7 +359,11 @@ def registrar_pago_orden(request, orden_id):
             monto = form.cleaned_data['monto']
             
             # Usamos el método del modelo para registrar el pago
+            pagado_antes = orden.monto_pagado
             orden.registrar_pago(monto)
+            metricas.PAGOS_REGISTRADOS.inc()
+            # 'registrar_pago' no deja pagar más que el total: se cuenta lo realmente abonado
+            metricas.MONTO_PAGOS.inc(float(orden.monto_pagado - pagado_antes))
             
             messages.success(request, f"Pago de ${monto:,.0f} registrado exitosamente.")
             return redirect('ventas:detalle_orden', orden_id=orden.pk)
@@ -484,4 +380,135 @@ def registrar_pago_orden(request, orden_id):
         'orden': orden
     }
     # Usaremos una nueva plantilla para esto
-    return render(request, 'ventas/registrar_pago_orden.html', context)
\ No newline at end of file
+    return render(request, 'ventas/registrar_pago_orden.html', context)
+
+
+@login_required
+def devolver_orden(request, orden_id):
+    """
+    Devolución parcial o anulación de una orden (GET y POST).
+
+    En POST, 'accion=anular' anula la orden completa; si no, se devuelven
+    las cantidades indicadas por línea. En ambos casos se repone el stock,
+    se ajustan los totales y el pago, y queda el registro en el historial
+    que muestra esta misma página (ver ventas/devoluciones.py).
+    """
+    orden = get_object_or_404(
+        OrdenCompra.objects.prefetch_related('detalles__producto', 'devoluciones__lineas', 'devoluciones__usuario'),
+        pk=orden_id,
+    )
+    detalles = [detalle for detalle in orden.detalles.all() if detalle.cantidad]
+
+    if request.method == 'POST' and not orden.anulada:
+        form = DevolucionForm(request.POST, detalles=detalles)
+        if form.is_valid():
+            anular = request.POST.get('accion') == 'anular'
+            try:
+                if anular:
+                    devolucion = devoluciones.anular(orden.pk, request.user, form.cleaned_data['motivo'])
+                else:
+                    devolucion = devoluciones.devolver(
+                        orden.pk, form.cantidades(), request.user, form.cleaned_data['motivo']
+                    )
+            except ValidationError as e:
+                messages.error(request, ' '.join(e.messages))
+            else:
+                texto = "anulada" if anular else f"con devolución de ${devolucion.monto:,.0f}"
+                if devolucion.reembolso:
+                    texto += f" (reembolsar ${devolucion.reembolso:,.0f} al cliente)"
+                messages.success(request, f"Orden {orden.numero_venta} {texto}.")
+                return redirect('ventas:detalle_orden', orden_id=orden.pk)
+        else:
+            messages.error(request, "Por favor corrige los errores en el formulario.")
+    else:
+        form = DevolucionForm(detalles=detalles)
+
+    return render(request, 'ventas/devolver_orden.html', {
+        'orden': orden,
+        'form': form,
+        'devoluciones': orden.devoluciones.all(),
+    })
+
+
+# --- Analítica de productos ---
+
+# Productos que se muestran si no se indica '?top='
+TOP_PRODUCTOS = 10
+
+
+def _inicio_ultimos_meses(hoy, meses=12):
+    """Primer día del mes de hace 'meses - 1' meses (los últimos 'meses' meses, incluido el actual)."""
+    indice = hoy.year * 12 + hoy.month - 1 - (meses - 1)
+    return date(indice // 12, indice % 12 + 1, 1)
+
+
+@login_required
+def analitica_productos(request):
+    """
+    Ventas por producto: unidades, ingresos, costo, utilidad y margen del
+    período (por defecto, los últimos 12 meses), con clasificación ABC y
+    variación del último mes. Muestra los '?top=N' productos ordenados por
+    '?orden=' y una matriz producto × mes de la '?medida=' elegida.
+    Con '?formato=csv' descarga todos los productos, mes a mes (con
+    TAREAS_SEGUNDO_PLANO, lo genera 'run_worker' como tarea).
+    """
+    hoy = date.today()
+    form = AnaliticaForm(request.GET or None)
+    fecha_inicio, fecha_fin = _inicio_ultimos_meses(hoy), hoy
+    top, orden, medida = TOP_PRODUCTOS, 'ingresos', 'ingresos'
+    if form.is_bound:
+        if form.is_valid():
+            fecha_inicio = form.cleaned_data['fecha_inicio'] or fecha_inicio
+            fecha_fin = form.cleaned_data['fecha_fin'] or fecha_fin
+            top = form.cleaned_data['top'] or top
+            orden = form.cleaned_data['orden'] or orden
+            medida = form.cleaned_data['medida'] or medida
+        else:
+            messages.error(request, "Por favor corrige los errores en el formulario.")
+
+    if request.GET.get('formato') == 'csv' and settings.TAREAS_SEGUNDO_PLANO:
+        tarea = encolar(
+            'ventas.csv_analitica', usuario=request.user,
+            descripcion=f"Analítica de productos del {fecha_inicio:%d-%m-%Y} al {fecha_fin:%d-%m-%Y} (CSV)",
+            fecha_inicio=fecha_inicio.isoformat(), fecha_fin=fecha_fin.isoformat(),
+        )
+        return redirect('core:tarea', tarea_id=tarea.pk)
+
+    try:
+        datos = analitica.analitica_productos(fecha_inicio, fecha_fin)
+    except OperationalError:
+        datos = None
+        messages.error(request, "El reporte tardó demasiado en calcularse. Intenta con un período más corto.")
+
+    if datos and request.GET.get('formato') == 'csv':
+        return _csv_analitica(datos, fecha_inicio, fecha_fin)
+
+    productos, matriz = [], []
+    if datos:
+        # El margen puede ser None (producto sin ingresos): esos van al final
+        productos = sorted(
+            datos['productos'], key=lambda p: (p[orden] is not None, p[orden] or 0), reverse=True
+        )[:top]
+        matriz = [(producto, producto['por_mes'][medida]) for producto in productos]
+    return render(request, 'ventas/analitica_productos.html', {
+        'form': form,
+        'fecha_inicio': fecha_inicio,
+        'fecha_fin': fecha_fin,
+        'datos': datos,
+        'productos': productos,
+        'productos_ocultos': len(datos['productos']) - len(productos) if datos else 0,
+        'matriz': matriz,
+        'medida': medida,
+        'medida_nombre': dict(AnaliticaForm.MEDIDAS)[medida],
+        'total_por_mes': datos['totales']['por_mes'][medida] if datos else [],
+    })
+
+
+def _csv_analitica(datos, fecha_inicio, fecha_fin):
+    """Respuesta con el CSV de la analítica (ver analitica.escribir_csv)."""
+    response = HttpResponse(content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = (
+        f'attachment; filename="{analitica.nombre_csv(fecha_inicio, fecha_fin)}"'
+    )
+    analitica.escribir_csv(response, datos)
+    return response